@@ -10,6 +10,7 @@ const historyModule = {
     totalPages: 1,
     pageSize: 20,
     searchQuery: '',
+    pageCursors: {},
     isLoading: false,
     
     // DOM elements
@@ -122,6 +123,7 @@ const historyModule = {
         }
         // Reset pagination
         this.currentPage = 1;
+        this.pageCursors = {};
         // Update state and fetch data
         this.currentApp = selectedApp;
         this.fetchHistoryData();
@@ -135,6 +137,7 @@ const historyModule = {
         if (newSearchQuery !== this.searchQuery) {
             this.searchQuery = newSearchQuery;
             this.currentPage = 1; // Reset to first page
+            this.pageCursors = {};
             this.fetchHistoryData();
         }
     },
@@ -145,6 +148,7 @@ const historyModule = {
         if (newPageSize !== this.pageSize) {
             this.pageSize = newPageSize;
             this.currentPage = 1; // Reset to first page
+            this.pageCursors = {};
             this.fetchHistoryData();
         }
     },
@@ -176,6 +180,11 @@ const historyModule = {
         if (this.searchQuery) {
             url += `&search=${encodeURIComponent(this.searchQuery)}`;
         }
+        // Continue from the previous page's last entry so new entries don't shift the page
+        const cursor = this.pageCursors[this.currentPage];
+        if (cursor) {
+            url += `&cursor=${encodeURIComponent(cursor)}`;
+        }
         
         fetch(url)
             .then(response => {
@@ -186,6 +195,9 @@ const historyModule = {
             })
             .then(data => {
                 this.totalPages = data.total_pages;
+                if (data.next_cursor) {
+                    this.pageCursors[this.currentPage + 1] = data.next_cursor;
+                }
                 this.renderHistoryData(data);
                 this.updatePaginationUI();
                 this.setLoading(false);
@@ -212,6 +224,8 @@ const historyModule = {
             })
             .then(() => {
                 // Reload data
+                this.currentPage = 1;
+                this.pageCursors = {};
                 this.fetchHistoryData();
             })
             .catch(error => {
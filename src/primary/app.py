@@ -54,6 +54,7 @@ def migrate_settings():
     # Settings file path
     # Use the centralized path configuration
     from src.primary.utils.config_paths import CONFIG_PATH
+    from src.primary.utils.durable_store import write_json
     SETTINGS_DIR = CONFIG_PATH
     SETTINGS_FILE = SETTINGS_DIR / "huntarr.json"
     
@@ -110,8 +111,8 @@ def migrate_settings():
         
         # Save changes if needed
         if changes_made:
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as file:
-                json.dump(settings, file, indent=2)
+            if not write_json(SETTINGS_FILE, settings, indent=2):
+                raise OSError(f"Could not write {SETTINGS_FILE}")
             logging.info("Settings migration completed successfully.")
         else:
             logging.info("No changes needed, settings are already in the correct format.")
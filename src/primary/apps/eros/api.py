@@ -12,17 +12,16 @@ import time
 import datetime
 import traceback
 import sys
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Union, Callable
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
 
 # Get logger for the Eros app
 eros_logger = get_logger("eros")
 
-# Use a session for better performance
-session = requests.Session()
-
-def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None) -> Any:
+def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None,
+                retries: bool = True) -> Any:
     """
     Make a request to the Eros API.
     
@@ -33,6 +32,7 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         endpoint: The API endpoint to call
         method: HTTP method (GET, POST, PUT, DELETE)
         data: Optional data payload for POST/PUT requests
+        retries: Whether to retry transient failures (False for status checks)
     
     Returns:
         The parsed JSON response or None if the request failed
@@ -67,13 +67,13 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         
         try:
             if method.upper() == "GET":
-                response = session.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl, retries=retries)
             elif method.upper() == "POST":
-                response = session.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "PUT":
-                response = session.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "DELETE":
-                response = session.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
             else:
                 eros_logger.error(f"Unsupported HTTP method: {method}")
                 return None
@@ -335,7 +335,8 @@ def refresh_item(api_url: str, api_key: str, api_timeout: int, item_id: int) ->
     # Return a placeholder command ID to simulate success without actually refreshing
     return 123
 
-def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int]) -> int:
+def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int],
+                stop_check: Callable[[], bool] = lambda: False) -> int:
     """
     Trigger a search for one or more movies in Whisparr V3.
     
@@ -344,6 +345,7 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         item_ids: A list of movie IDs to search for
+        stop_check: Function returning True if the rate limit wait should be aborted
         
     Returns:
         The command ID if the search command was triggered successfully, None otherwise
@@ -354,6 +356,11 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
             return None
             
         eros_logger.debug(f"Searching for movies with IDs: {item_ids}")
+        
+        # Wait for the hourly API cap to allow these hits
+        if not rate_limiter.acquire("eros", api_url, len(item_ids), stop_check=stop_check):
+            eros_logger.warning(f"Rate limit: skipping search for movie IDs {item_ids}")
+            return None
 
         # Try several possible command formats, as the API might be in flux
         possible_commands = [
@@ -431,40 +438,6 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
         eros_logger.error(f"Error searching for movies: {str(e)}")
         return None
 
-def get_command_status(api_url: str, api_key: str, api_timeout: int, command_id: int) -> Optional[Dict]:
-    """
-    Get the status of a specific command.
-
-    Args:
-        api_url: The base URL of the Eros API
-        api_key: The API key for authentication
-        api_timeout: Timeout for the API request
-        command_id: The ID of the command to check
-
-    Returns:
-        A dictionary containing the command status, or None if the request failed.
-    """
-    if not command_id:
-        eros_logger.error("No command ID provided for status check.")
-        return None
-        
-    try:
-        command_endpoint = f"command/{command_id}"
-        
-        # Make the API request
-        result = arr_request(api_url, api_key, api_timeout, command_endpoint)
-        
-        if result:
-            eros_logger.debug(f"Command {command_id} status: {result.get('status', 'unknown')}")
-            return result
-        else:
-            eros_logger.error(f"Failed to get command status for ID {command_id}")
-            return None
-            
-    except Exception as e:
-        eros_logger.error(f"Error getting command status for ID {command_id}: {e}")
-        return None
-
 def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
     """
     Check the connection to Whisparr V3 API.
@@ -481,7 +454,7 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
         eros_logger.debug(f"Checking connection to Whisparr V3 instance at {api_url}")
         
         endpoint = "system/status"
-        response = arr_request(api_url, api_key, api_timeout, endpoint)
+        response = arr_request(api_url, api_key, api_timeout, endpoint, retries=False)
         
         if response is not None:
             # Get the version information if available
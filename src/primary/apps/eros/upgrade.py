@@ -9,21 +9,22 @@ Exclusively supports the v3 API.
 import time
 import random
 import datetime
-from typing import List, Dict, Any, Set, Callable
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.eros import api as eros_api
-from src.primary.settings_manager import load_settings, get_advanced_setting
-from src.primary.stateful_manager import is_processed, add_processed_id
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
 from src.primary.stats_manager import increment_stat
-from src.primary.utils.history_utils import log_processed_media
+from src.primary.utils.history_utils import log_processed_media_batch
 from src.primary.state import check_state_reset
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 eros_logger = get_logger("eros")
 
 def process_cutoff_upgrades(
     app_settings: Dict[str, Any],
-    stop_check: Callable[[], bool] # Function to check if stop is requested
+    stop_check: Callable[[], bool], # Function to check if stop is requested
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process quality cutoff upgrades for Eros based on settings.
@@ -31,10 +32,14 @@ def process_cutoff_upgrades(
     Args:
         app_settings: Dictionary containing all settings for Eros
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle. Built on the spot if not given.
         
     Returns:
         True if any items were processed for upgrades, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("eros")
+
     eros_logger.info("Starting quality cutoff upgrades processing cycle for Eros.")
     processed_any = False
     
@@ -44,12 +49,9 @@ def process_cutoff_upgrades(
     # Extract necessary settings
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
     instance_name = app_settings.get("instance_name", "Eros Default")
     
-    # Load general settings to get centralized timeout
-    general_settings = load_settings('general')
-    
     monitored_only = app_settings.get("monitored_only", True)
     # skip_item_refresh setting removed as it was a performance bottleneck
     search_mode = app_settings.get("search_mode", "movie")  # Default to movie mode if not specified
@@ -60,9 +62,9 @@ def process_cutoff_upgrades(
     hunt_upgrade_items = app_settings.get("hunt_upgrade_items", app_settings.get("hunt_upgrade_scenes", 0))
     
     # Use advanced settings from general.json for command operations
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
-    state_reset_interval_hours = get_advanced_setting("stateful_management_hours", 168)  
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
+    state_reset_interval_hours = cycle_settings.stateful_management_hours  
     
     # Log that we're using Eros API v3
     eros_logger.debug(f"Using Eros API v3 for instance: {instance_name}")
@@ -93,13 +95,8 @@ def process_cutoff_upgrades(
     eros_logger.info(f"Found {len(upgrade_eligible_data)} items eligible for quality upgrade.")
     
     # Filter out already processed items using stateful management
-    unprocessed_items = []
-    for item in upgrade_eligible_data:
-        item_id = str(item.get("id"))
-        if not is_processed("eros", instance_name, item_id):
-            unprocessed_items.append(item)
-        else:
-            eros_logger.debug(f"Skipping already processed item ID: {item_id}")
+    unprocessed_ids = set(filter_unprocessed("eros", instance_name, [str(item.get("id")) for item in upgrade_eligible_data]))
+    unprocessed_items = [item for item in upgrade_eligible_data if str(item.get("id")) in unprocessed_ids]
     
     eros_logger.info(f"Found {len(unprocessed_items)} unprocessed items out of {len(upgrade_eligible_data)} total items eligible for quality upgrade.")
     
@@ -116,79 +113,69 @@ def process_cutoff_upgrades(
     
     eros_logger.info(f"Selected {len(items_to_upgrade)} items for quality upgrade.")
     
-    # Process selected items
-    for item in items_to_upgrade:
-        # Check for stop signal before each item
+    # Search the selected items in batches - one search command per batch
+    batch_size = cycle_settings.search_batch_size
+    for batch_start in range(0, len(items_to_upgrade), batch_size):
+        # Check for stop signal before each batch
         if stop_check():
             eros_logger.info("Stop requested during item processing. Aborting...")
             break
-            
+        
         # Re-check limit in case it changed
         current_limit = app_settings.get("hunt_upgrade_items", app_settings.get("hunt_upgrade_scenes", 1))
         if items_processed >= current_limit:
             eros_logger.info(f"Reached HUNT_UPGRADE_ITEMS limit ({current_limit}) for this cycle.")
             break
         
-        item_id = item.get("id")
-        title = item.get("title", "Unknown Title")
-        
-        # For movies, we don't use season/episode format
-        if search_mode == "movie":
-            item_info = title
-            # In Whisparr, movie quality is stored differently than TV shows
-            current_quality = item.get("movieFile", {}).get("quality", {}).get("quality", {}).get("name", "Unknown")
-        else:
-            # If somehow using scene mode, try to format as S/E if available
+        batch = items_to_upgrade[batch_start:batch_start + min(batch_size, current_limit - items_processed)]
+        batch_media = []
+        for item in batch:
+            title = item.get("title", "Unknown Title")
+            # For movies, we don't use season/episode format
             season_number = item.get('seasonNumber')
             episode_number = item.get('episodeNumber')
-            if season_number is not None and episode_number is not None:
-                season_episode = f"S{season_number:02d}E{episode_number:02d}"
-                item_info = f"{title} - {season_episode}"
+            if search_mode != "movie" and season_number is not None and episode_number is not None:
+                item_info = f"{title} - S{season_number:02d}E{episode_number:02d}"
             else:
                 item_info = title
-            # Legacy episode quality path
-            current_quality = item.get("episodeFile", {}).get("quality", {}).get("quality", {}).get("name", "Unknown")
-        
-        eros_logger.info(f"Processing item for quality upgrade: \"{item_info}\" (Item ID: {item_id})")
-        eros_logger.info(f" - Current quality: {current_quality}")
+            if search_mode == "movie":
+                # In Whisparr, movie quality is stored differently than TV shows
+                current_quality = item.get("movieFile", {}).get("quality", {}).get("quality", {}).get("name", "Unknown")
+            else:
+                # Legacy episode quality path
+                current_quality = item.get("episodeFile", {}).get("quality", {}).get("quality", {}).get("name", "Unknown")
+            eros_logger.info(f"Processing item for quality upgrade: \"{item_info}\" (Item ID: {item.get('id')})")
+            eros_logger.info(f" - Current quality: {current_quality}")
+            batch_media.append((item_info, item.get("id")))
+        item_ids = [item.get("id") for item in batch]
         
-        # Mark the item as processed BEFORE triggering any searches
-        add_processed_id("eros", instance_name, str(item_id))
-        eros_logger.debug(f"Added item ID {item_id} to processed list for {instance_name}")
+        # Mark the items as processed BEFORE triggering any searches
+        mark_processed_many("eros", instance_name, item_ids, "upgrade")
+        eros_logger.debug(f"Added item IDs {item_ids} to processed list for {instance_name}")
         
-        # Refresh the item information if not skipped
-        refresh_command_id = None
         # Refresh functionality has been removed as it was identified as a performance bottleneck
         
-        # Check for stop signal before searching
-        if stop_check():
-            eros_logger.info(f"Stop requested before searching for {title}. Aborting...")
-            break
-        
-        # Search for the item
-        eros_logger.info(" - Searching for quality upgrade...")
-        search_command_id = eros_api.item_search(api_url, api_key, api_timeout, [item_id])
+        # Search for the items
+        eros_logger.info(f" - Searching for quality upgrades ({len(batch)} items)...")
+        search_command_id = eros_api.item_search(api_url, api_key, api_timeout, item_ids, stop_check=stop_check)
         if search_command_id:
-            eros_logger.info(f"Triggered search command {search_command_id}. Assuming success for now.")
+            eros_logger.info(f"Triggered search command {search_command_id}.")
             
-            # Log to history so the upgrade appears in the history UI
-            log_processed_media("eros", item_info, item_id, instance_name, "upgrade")
-            eros_logger.debug(f"Logged quality upgrade to history for item ID {item_id}")
+            # Log to history system
+            log_processed_media_batch("eros", batch_media, instance_name, "upgrade")
+            eros_logger.debug(f"Logged history entries for item IDs: {item_ids}")
             
-            items_processed += 1
+            items_processed += len(batch)
             processing_done = True
             
-            # Increment the upgraded statistics for Eros
-            increment_stat("eros", "upgraded", 1)
-            eros_logger.debug(f"Incremented eros upgraded statistics by 1")
-            
+            # Increment the upgraded statistics once per batch
+            increment_stat("eros", "upgraded", len(batch), instance_name=instance_name)
+            eros_logger.debug(f"Incremented eros upgraded statistics by {len(batch)}")
+
             # Log progress
-            current_limit = app_settings.get("hunt_upgrade_items", app_settings.get("hunt_upgrade_scenes", 1))
-            eros_logger.info(f"Processed {items_processed}/{current_limit} items for quality upgrade this cycle.")
+            eros_logger.info(f"Processed {items_processed}/{current_limit} items this cycle.")
         else:
-            eros_logger.warning(f"Failed to trigger search command for item ID {item_id}.")
-            # Do not mark as processed if search couldn't be triggered
-            continue
+            eros_logger.warning(f"Failed to trigger search command for item IDs {item_ids}.")
     
     # Log final status
     if items_processed > 0:
@@ -11,16 +11,14 @@ import time
 import datetime
 import traceback
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Callable
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
 
 # Get logger for the Lidarr app
 lidarr_logger = get_logger("lidarr")
 
-# Use a session for better performance
-session = requests.Session()
-
 def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None, params: Dict = None) -> Any:
     """
     Make a request to the Lidarr API.
@@ -67,7 +65,7 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
     lidarr_logger.debug(f"Lidarr API Request: {method} {full_url} Params: {params} Data: {data}")
 
     try:
-        response = session.request(
+        response = http_client.request(
             method=method.upper(),
             url=full_url,
             headers=headers,
@@ -144,7 +142,7 @@ def get_system_status(api_url: str, api_key: str, api_timeout: int, verify_ssl:
         headers = {"X-Api-Key": api_key}
         
         # Execute the request with SSL verification setting
-        response = requests.get(endpoint, headers=headers, timeout=api_timeout, verify=verify_ssl)
+        response = http_client.get(endpoint, headers=headers, timeout=api_timeout, verify=verify_ssl, retries=False)
         response.raise_for_status()
         
         # Parse and return the result
@@ -212,35 +210,22 @@ def get_tracks(api_url: str, api_key: str, api_timeout: int, album_id: Optional[
 def get_queue(api_url: str, api_key: str, api_timeout: int) -> List:
     """Get the current queue from Lidarr (handles pagination)."""
     # Lidarr v1 queue endpoint supports pagination, unlike Sonarr v3's simple list
-    all_records = []
-    page = 1
     page_size = 1000 # Request large page size
 
-    while True:
+    def fetch_page(page: int) -> Any:
         params = {
             "page": page,
             "pageSize": page_size,
             "sortKey": "timeleft", # Example sort key
             "sortDir": "asc"
         }
-        response = arr_request(api_url, api_key, api_timeout, "queue", params=params)
-        
-        if response and isinstance(response, dict) and 'records' in response:
-            records = response.get('records', [])
-            if not records:
-                break # No more records
-            all_records.extend(records)
-            
-            # Check if this was the last page
-            total_records = response.get('totalRecords', 0)
-            if len(all_records) >= total_records:
-                break
-            
-            page += 1
-        else:
-            lidarr_logger.error(f"Failed to get queue page {page} or invalid response format.")
-            break # Return what we have so far
-            
+        return arr_request(api_url, api_key, api_timeout, "queue", params=params)
+
+    all_records, _ = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_records is None:
+        lidarr_logger.error("Failed to get queue page 1 or invalid response format.")
+        return []
+
     return all_records
 
 def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int:
@@ -259,55 +244,27 @@ def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int
 def get_missing_albums(api_url: str, api_key: str, api_timeout: int, monitored_only: bool) -> List[Dict[str, Any]]:
     """Get missing albums from Lidarr, handling pagination."""
     endpoint = "wanted/missing"
-    page = 1
     page_size = 1000 
-    all_missing_albums = []
-    total_records_reported = -1
 
     lidarr_logger.debug(f"Starting fetch for missing albums (monitored_only={monitored_only}).")
 
-    while True:
+    def fetch_page(page: int) -> Any:
         params = {
             "page": page,
             "pageSize": page_size,
             "includeArtist": "true" # Include artist info for filtering
-            # Removed sortKey and sortDir
         }
-        
         lidarr_logger.debug(f"Requesting missing albums page {page} with params: {params}")
-        response = arr_request(api_url, api_key, api_timeout, endpoint, params=params)
+        return arr_request(api_url, api_key, api_timeout, endpoint, params=params)
 
-        if response and isinstance(response, dict) and 'records' in response:
-            records = response.get('records', [])
-            total_records_on_page = len(records)
-
-            if page == 1:
-                total_records_reported = response.get('totalRecords', 0)
-                lidarr_logger.debug(f"Lidarr API reports {total_records_reported} total missing albums.")
-
-            lidarr_logger.debug(f"Parsed {total_records_on_page} missing album records from Lidarr API JSON (page {page}).")
-
-            if not records:
-                lidarr_logger.debug(f"No more missing records found on page {page}. Stopping pagination.")
-                break
-
-            all_missing_albums.extend(records)
-
-            if total_records_reported >= 0 and len(all_missing_albums) >= total_records_reported:
-                lidarr_logger.debug(f"Fetched {len(all_missing_albums)} records, matching or exceeding total reported ({total_records_reported}). Assuming last page.")
-                break
-
-            if total_records_on_page < page_size:
-                lidarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Assuming last page.")
-                break
-                
-            page += 1
-            # time.sleep(0.1) # Optional delay
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    all_missing_albums, total_records_reported = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_missing_albums is None:
+        lidarr_logger.error("Failed to get missing albums page 1 or invalid response format.")
+        all_missing_albums = []
+    else:
+        lidarr_logger.debug(f"Lidarr API reports {total_records_reported} total missing albums.")
 
-        else:
-            lidarr_logger.error(f"Failed to get missing albums page {page} or invalid response format.")
-            break # Return what we have so far
-            
     lidarr_logger.info(f"Total missing albums fetched across all pages: {len(all_missing_albums)}")
 
     # Apply monitored filter after fetching
@@ -328,58 +285,26 @@ def get_cutoff_unmet_albums(api_url: str, api_key: str, api_timeout: int, monito
     """Get cutoff unmet albums from Lidarr, handling pagination."""
     # Note: Lidarr API returns ALBUMS for cutoff unmet, not tracks.
     endpoint = "wanted/cutoff"
-    page = 1
     page_size = 1000 # Adjust page size if needed, Lidarr default might be smaller
-    all_cutoff_unmet = []
-    total_records_reported = -1
 
     lidarr_logger.debug(f"Starting fetch for cutoff unmet albums (monitored_only={monitored_only}).")
 
-    while True:
+    def fetch_page(page: int) -> Any:
         params = {
             "page": page,
             "pageSize": page_size,
             "includeArtist": "true" # Include artist info for filtering
-            # Removed sortKey and sortDir
         }
-        
         lidarr_logger.debug(f"Requesting cutoff unmet albums page {page} with params: {params}")
-        response = arr_request(api_url, api_key, api_timeout, endpoint, params=params)
-        
-        if response and isinstance(response, dict) and 'records' in response:
-            records = response.get('records', [])
-            total_records_on_page = len(records)
-
-            if page == 1:
-                total_records_reported = response.get('totalRecords', 0)
-                lidarr_logger.debug(f"Lidarr API reports {total_records_reported} total cutoff unmet albums.")
-
-            lidarr_logger.debug(f"Parsed {total_records_on_page} cutoff unmet album records from Lidarr API JSON (page {page}).")
-
-            if not records:
-                lidarr_logger.debug(f"No more cutoff unmet records found on page {page}. Stopping pagination.")
-                break
-
-            all_cutoff_unmet.extend(records)
-
-            # Check if we have fetched all reported records
-            if total_records_reported >= 0 and len(all_cutoff_unmet) >= total_records_reported:
-                lidarr_logger.debug(f"Fetched {len(all_cutoff_unmet)} records, matching or exceeding total reported ({total_records_reported}). Assuming last page.")
-                break
-
-            # Check if the number of records received is less than the page size
-            if total_records_on_page < page_size:
-                lidarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Assuming last page.")
-                break
-                
-            page += 1
-            # time.sleep(0.1) # Optional small delay between pages
+        return arr_request(api_url, api_key, api_timeout, endpoint, params=params)
 
-        else:
-            # Log the error based on the response received (handled in arr_request)
-            lidarr_logger.error(f"Error getting cutoff unmet albums from Lidarr (page {page}) or invalid response format. Stopping pagination.")
-            # Return what we have so far, or indicate complete failure? Let's return what we have.
-            break 
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    all_cutoff_unmet, total_records_reported = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_cutoff_unmet is None:
+        lidarr_logger.error("Error getting cutoff unmet albums from Lidarr (page 1) or invalid response format.")
+        all_cutoff_unmet = []
+    else:
+        lidarr_logger.debug(f"Lidarr API reports {total_records_reported} total cutoff unmet albums.")
 
     lidarr_logger.info(f"Total cutoff unmet albums fetched across all pages: {len(all_cutoff_unmet)}")
 
@@ -397,11 +322,17 @@ def get_cutoff_unmet_albums(api_url: str, api_key: str, api_timeout: int, monito
         lidarr_logger.debug(f"Returning {len(all_cutoff_unmet)} cutoff unmet albums (monitored_only=False).")
         return all_cutoff_unmet
 
-def search_albums(api_url: str, api_key: str, api_timeout: int, album_ids: List[int]) -> Optional[Dict]:
+def search_albums(api_url: str, api_key: str, api_timeout: int, album_ids: List[int],
+                  stop_check: Callable[[], bool] = lambda: False) -> Optional[Dict]:
     """Trigger a search for specific albums in Lidarr."""
     if not album_ids:
         lidarr_logger.warning("No album IDs provided for search.")
         return None
+    
+    # Wait for the hourly API cap to allow these hits
+    if not rate_limiter.acquire("lidarr", api_url, len(album_ids), stop_check=stop_check):
+        lidarr_logger.warning(f"Rate limit: skipping AlbumSearch for album IDs {album_ids}")
+        return None
         
     payload = {
         "name": "AlbumSearch",
@@ -417,8 +348,13 @@ def search_albums(api_url: str, api_key: str, api_timeout: int, album_ids: List[
         lidarr_logger.error(f"Failed to trigger Lidarr AlbumSearch for album IDs {album_ids}. Response: {response}")
         return None
 
-def search_artist(api_url: str, api_key: str, api_timeout: int, artist_id: int) -> Optional[Dict]:
+def search_artist(api_url: str, api_key: str, api_timeout: int, artist_id: int,
+                  stop_check: Callable[[], bool] = lambda: False) -> Optional[Dict]:
     """Trigger a search for a specific artist in Lidarr."""
+    # Wait for the hourly API cap to allow this hit
+    if not rate_limiter.acquire("lidarr", api_url, 1, stop_check=stop_check):
+        lidarr_logger.warning(f"Rate limit: skipping ArtistSearch for artist ID {artist_id}")
+        return None
     payload = {
         "name": "ArtistSearch",
         "artistIds": [artist_id]
@@ -446,16 +382,6 @@ def refresh_artist(api_url: str, api_key: str, api_timeout: int, artist_id: int)
         'message': 'Refresh functionality disabled for performance reasons'
     }
 
-def get_command_status(api_url: str, api_key: str, api_timeout: int, command_id: int) -> Optional[Dict[str, Any]]:
-    """Get the status of a Lidarr command."""
-    response = arr_request(api_url, api_key, api_timeout, f"command/{command_id}")
-    if response and isinstance(response, dict):
-        lidarr_logger.debug(f"Checked Lidarr command status for ID {command_id}: {response.get('status')}")
-        return response
-    else:
-         lidarr_logger.error(f"Error getting Lidarr command status for ID {command_id}. Response: {response}")
-         return None
-
 def get_artist_by_id(api_url: str, api_key: str, api_timeout: int, artist_id: int) -> Optional[Dict[str, Any]]:
     """Get artist details by ID from Lidarr."""
     return arr_request(api_url, api_key, api_timeout, f"artist/{artist_id}")
\ No newline at end of file
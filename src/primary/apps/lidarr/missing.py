@@ -9,14 +9,15 @@ import random
 import datetime
 import os
 import json
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.lidarr import api as lidarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
+from src.primary.stateful_manager import filter_unprocessed, add_processed_id, mark_processed_many
 from src.primary.utils.history_utils import log_processed_media
-from src.primary.settings_manager import load_settings, get_advanced_setting
+from src.primary.settings_manager import load_settings
 from src.primary.state import get_state_file_path, check_state_reset
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 import json
 import os
 
@@ -26,7 +27,8 @@ lidarr_logger = get_logger(__name__) # Use __name__ for correct logger hierarchy
 
 def process_missing_albums(
     app_settings: Dict[str, Any],      # Combined settings dictionary
-    stop_check: Callable[[], bool] = None      # Function to check for stop signal
+    stop_check: Callable[[], bool] = None,     # Function to check for stop signal
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Processes missing albums for a specific Lidarr instance based on settings.
@@ -34,22 +36,23 @@ def process_missing_albums(
     Args:
         app_settings (dict): Dictionary containing combined instance and general settings.
         stop_check (Callable[[], bool]): Function to check if shutdown is requested.
+        cycle_settings (CycleSettings): Settings snapshot for this cycle. Built on the spot if not given.
 
     Returns:
         bool: True if any items were processed, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("lidarr")
     
     # Copy instance-specific information
     instance_name = app_settings.get("instance_name", "Default")
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
     monitored_only = app_settings.get("monitored_only", True)
     skip_future_releases = app_settings.get("skip_future_releases", False)
     hunt_missing_items = app_settings.get("hunt_missing_items", 0)
     hunt_missing_mode = app_settings.get("hunt_missing_mode", "album")
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
     
     # Early exit for disabled features
     if not api_url or not api_key:
@@ -153,8 +156,7 @@ def process_missing_albums(
             
             # Filter out already processed artists
             lidarr_logger.info(f"Found {len(target_entities)} artists with missing albums before filtering")
-            unprocessed_entities = [eid for eid in target_entities 
-                                   if not is_processed("lidarr", instance_name, str(eid))]
+            unprocessed_entities = filter_unprocessed("lidarr", instance_name, target_entities)
             
             lidarr_logger.info(f"Found {len(unprocessed_entities)} unprocessed artists out of {len(target_entities)} total")
         else:
@@ -163,8 +165,7 @@ def process_missing_albums(
             
             # Filter out processed albums
             lidarr_logger.info(f"Found {len(target_entities)} missing albums before filtering")
-            unprocessed_entities = [eid for eid in target_entities 
-                                   if not is_processed("lidarr", instance_name, str(eid))]
+            unprocessed_entities = filter_unprocessed("lidarr", instance_name, target_entities)
             
             lidarr_logger.info(f"Found {len(unprocessed_entities)} unprocessed albums out of {len(target_entities)} total")
         
@@ -246,23 +247,21 @@ def process_missing_albums(
                 lidarr_logger.debug(f"Added artist ID {artist_id} to processed list for {instance_name}, success: {success}")
                 
                 # Trigger the search AFTER marking as processed
-                command_result = lidarr_api.search_artist(api_url, api_key, api_timeout, artist_id)
+                command_result = lidarr_api.search_artist(api_url, api_key, api_timeout, artist_id, stop_check=stop_check)
                 command_id = command_result.get('id', 'unknown') if command_result else 'failed'
                 lidarr_logger.info(f"Triggered Lidarr ArtistSearch for artist ID: {artist_id}, Command ID: {command_id}")
                 
                 # Increment stats for UI tracking
                 if command_result:
-                    increment_stat("lidarr", "hunted")
+                    increment_stat("lidarr", "hunted", instance_name=instance_name)
                     processed_count += 1  # Count successful searches
                     processed_artists_or_albums.add(artist_id)
                 
                 # Also mark all albums from this artist as processed
                 if artist_id in items_by_artist:
-                    for album in items_by_artist[artist_id]:
-                        album_id = album.get('id')
-                        if album_id:
-                            album_success = add_processed_id("lidarr", instance_name, str(album_id))
-                            lidarr_logger.debug(f"Added album ID {album_id} to processed list for {instance_name}, success: {album_success}")
+                    album_ids = [album.get('id') for album in items_by_artist[artist_id] if album.get('id')]
+                    album_success = mark_processed_many("lidarr", instance_name, album_ids)
+                    lidarr_logger.debug(f"Added album IDs {album_ids} to processed list for {instance_name}, success: {album_success}")
                 
                 # Log to history system
                 log_processed_media("lidarr", f"{artist_name}", artist_id, instance_name, "missing")
@@ -319,16 +318,15 @@ def process_missing_albums(
                     lidarr_logger.info(f" {detail_line}")
 
             # Mark the albums as processed BEFORE triggering the search
-            for album_id in album_ids_to_search:
-                success = add_processed_id("lidarr", instance_name, str(album_id))
-                lidarr_logger.debug(f"Added album ID {album_id} to processed list for {instance_name}, success: {success}")
+            success = mark_processed_many("lidarr", instance_name, album_ids_to_search)
+            lidarr_logger.debug(f"Added album IDs {album_ids_to_search} to processed list for {instance_name}, success: {success}")
             
             # Now trigger the search
-            command_id = lidarr_api.search_albums(api_url, api_key, api_timeout, album_ids_to_search)
+            command_id = lidarr_api.search_albums(api_url, api_key, api_timeout, album_ids_to_search, stop_check=stop_check)
             if command_id:
                 # Log after successful search
                 lidarr_logger.debug(f"Album search command triggered with ID: {command_id} for albums: [{', '.join(album_details_log)}]")
-                increment_stat("lidarr", "hunted") # Changed from "missing" to "hunted"
+                increment_stat("lidarr", "hunted", instance_name=instance_name) # Changed from "missing" to "hunted"
                 processed_count += len(album_ids_to_search) # Count albums searched
                 processed_artists_or_albums.update(album_ids_to_search)
                 
@@ -342,8 +340,6 @@ def process_missing_albums(
                         media_name = f"{artist_name} - {title}"
                         log_processed_media("lidarr", media_name, album_id, instance_name, "missing")
                         lidarr_logger.debug(f"Logged history entry for album: {media_name}")
-                
-                time.sleep(command_wait_delay) # Basic delay after the single command
             else:
                 lidarr_logger.warning(f"Failed to trigger album search for IDs {album_ids_to_search} on {instance_name}.")
 
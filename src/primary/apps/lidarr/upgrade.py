@@ -4,23 +4,23 @@ Lidarr cutoff upgrade processing module for Huntarr
 Handles albums that do not meet the configured quality cutoff.
 """
 
-import time
 import random
 from typing import Dict, Any, Optional, Callable, List, Union, Set # Added List, Union and Set
 from src.primary.utils.logger import get_logger
 from src.primary.apps.lidarr import api as lidarr_api
 from src.primary.utils.history_utils import log_processed_media
-from src.primary.stateful_manager import is_processed, add_processed_id
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
 from src.primary.stats_manager import increment_stat
-from src.primary.settings_manager import load_settings, get_advanced_setting
 from src.primary.state import check_state_reset  # Add the missing import
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 lidarr_logger = get_logger(__name__) # Use __name__ for correct logger hierarchy
 
 def process_cutoff_upgrades(
     app_settings: Dict[str, Any], # Changed signature: Use app_settings
-    stop_check: Callable[[], bool] # Changed signature: Use stop_check
+    stop_check: Callable[[], bool], # Changed signature: Use stop_check
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Processes cutoff upgrades for albums in a specific Lidarr instance.
@@ -28,10 +28,14 @@ def process_cutoff_upgrades(
     Args:
         app_settings (dict): Dictionary containing combined instance and general Lidarr settings.
         stop_check (Callable[[], bool]): Function to check if shutdown is requested.
+        cycle_settings (CycleSettings): Settings snapshot for this cycle. Built on the spot if not given.
 
     Returns:
         bool: True if any items were processed, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("lidarr")
+
     lidarr_logger.info("Starting quality cutoff upgrades processing cycle for Lidarr.")
     processed_any = False
 
@@ -42,11 +46,7 @@ def process_cutoff_upgrades(
     # Extract necessary settings
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
-    
-    # Get command wait settings from general.json
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
 
     # General Lidarr settings (also from app_settings)
     hunt_upgrade_items = app_settings.get("hunt_upgrade_items", 0)
@@ -95,13 +95,8 @@ def process_cutoff_upgrades(
         lidarr_logger.info(f"Found {len(cutoff_unmet_albums)} cutoff unmet albums for {instance_name}.")
 
         # Filter out already processed items
-        unprocessed_albums = []
-        for album in cutoff_unmet_albums:
-            album_id = str(album.get('id'))
-            if not is_processed("lidarr", instance_name, album_id):
-                unprocessed_albums.append(album)
-            else:
-                lidarr_logger.debug(f"Skipping already processed album ID: {album_id}")
+        unprocessed_ids = set(filter_unprocessed("lidarr", instance_name, [str(album.get('id')) for album in cutoff_unmet_albums]))
+        unprocessed_albums = [album for album in cutoff_unmet_albums if str(album.get('id')) in unprocessed_ids]
         
         lidarr_logger.info(f"Found {len(unprocessed_albums)} unprocessed albums out of {len(cutoff_unmet_albums)} total albums eligible for quality upgrade.")
         
@@ -140,9 +135,8 @@ def process_cutoff_upgrades(
             return False # Return False as no search was triggered in this case
 
         # Mark albums as processed BEFORE triggering search
-        for album_id in album_ids_to_search:
-            add_processed_id("lidarr", instance_name, str(album_id))
-            lidarr_logger.debug(f"Added album ID {album_id} to processed list for {instance_name}")
+        mark_processed_many("lidarr", instance_name, album_ids_to_search, "upgrade")
+        lidarr_logger.debug(f"Added album IDs {album_ids_to_search} to processed list for {instance_name}")
 
         lidarr_logger.info(f"Triggering Album Search for {len(album_ids_to_search)} albums for upgrade on instance {instance_name}: {album_ids_to_search}")
         # Pass necessary details extracted above to the API function
@@ -150,11 +144,12 @@ def process_cutoff_upgrades(
             api_url,
             api_key,
             api_timeout,
-            album_ids_to_search
+            album_ids_to_search,
+            stop_check=stop_check
         )
         if command_id:
             lidarr_logger.debug(f"Upgrade album search command triggered with ID: {command_id} for albums: {album_ids_to_search}")
-            increment_stat("lidarr", "upgraded") # Use appropriate stat key
+            increment_stat("lidarr", "upgraded", instance_name=instance_name) # Use appropriate stat key
             
             # Log to history
             for album_id in album_ids_to_search:
@@ -168,11 +163,8 @@ def process_cutoff_upgrades(
                         lidarr_logger.debug(f"Logged quality upgrade to history for album ID {album_id}")
                         break
                 
-            time.sleep(command_wait_delay) # Basic delay
             processed_count += len(album_ids_to_search)
             processed_any = True # Mark that we processed something
-            # Consider adding wait_for_command logic if needed
-            # wait_for_command(api_url, api_key, command_id, command_wait_delay, command_wait_attempts)
         else:
             lidarr_logger.warning(f"Failed to trigger upgrade album search for IDs {album_ids_to_search} on {instance_name}.")
 
@@ -9,17 +9,17 @@ import json
 import sys
 import time
 import traceback
-from typing import List, Dict, Any, Optional, Union
+import datetime
+from typing import List, Dict, Any, Optional, Union, Callable
 # Correct the import path
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
+from src.primary import library_cache
 
 # Get logger for the Radarr app
 radarr_logger = get_logger("radarr")
 
-# Use a session for better performance
-session = requests.Session()
-
 def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None) -> Any:
     """
     Make a request to the Radarr API.
@@ -60,13 +60,13 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         
         # Make the request based on the method
         if method.upper() == "GET":
-            response = session.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+            response = http_client.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
         elif method.upper() == "POST":
-            response = session.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+            response = http_client.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
         elif method.upper() == "PUT":
-            response = session.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+            response = http_client.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
         elif method.upper() == "DELETE":
-            response = session.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+            response = http_client.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
         else:
             radarr_logger.error(f"Unsupported HTTP method: {method}")
             return None
@@ -83,6 +83,46 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         radarr_logger.error(f"API request failed: {e}")
         return None
 
+def arr_request_filtered(api_url: str, api_key: str, api_timeout: int, endpoint: str, predicate: Optional[Callable[[Dict], bool]],
+                         transform: Optional[Callable[[Dict], Dict]] = None) -> Optional[List[Dict]]:
+    """
+    Stream a list endpoint from the Radarr API, keeping only records that match a predicate.
+
+    The response is decoded one record at a time, so non-matching records are
+    discarded as they are read instead of loading the whole library into memory.
+
+    Args:
+        api_url: The base URL of the Radarr API
+        api_key: The API key for authentication
+        api_timeout: Timeout for the API request
+        endpoint: The API endpoint to call (without /api/v3/), must return a JSON array
+        predicate: Function returning True for records to keep, or None to keep all
+        transform: Optional function applied to each kept record
+
+    Returns:
+        The list of matching records or None if the request failed
+    """
+    try:
+        if not api_url or not api_key:
+            radarr_logger.error("No URL or API key provided")
+            return None
+
+        full_url = f"{api_url.rstrip('/')}/api/v3/{endpoint.lstrip('/')}"
+        radarr_logger.debug(f"Making streaming GET request to: {full_url}")
+
+        headers = {
+            "X-Api-Key": api_key,
+            "User-Agent": "Huntarr/1.0 (https://github.com/plexguide/Huntarr.io)"
+        }
+        return http_client.get_json_array(full_url, predicate, transform, headers=headers, timeout=api_timeout)
+
+    except requests.exceptions.RequestException as e:
+        radarr_logger.error(f"API request failed: {e}")
+        return None
+    except ValueError as e:
+        radarr_logger.error(f"Error decoding JSON array from {endpoint}: {e}")
+        return None
+
 def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int:
     """
     Get the current size of the download queue.
@@ -102,7 +142,7 @@ def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int
         # Radarr uses /api/v3/queue
         endpoint = f"{api_url.rstrip('/')}/api/v3/queue?page=1&pageSize=1000" # Fetch a large page size
         headers = {"X-Api-Key": api_key}
-        response = session.get(endpoint, headers=headers, timeout=api_timeout)
+        response = http_client.get(endpoint, headers=headers, timeout=api_timeout)
         response.raise_for_status()
         queue_data = response.json()
         queue_size = queue_data.get('totalRecords', 0)
@@ -115,7 +155,110 @@ def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int
         radarr_logger.error(f"An unexpected error occurred while getting Radarr queue size: {e}")
         return -1
 
-def get_movies_with_missing(api_url: str, api_key: str, api_timeout: int, monitored_only: bool) -> Optional[List[Dict]]:
+# More changed movies than this since the last snapshot triggers a full refresh instead
+MAX_INCREMENTAL_MOVIE_UPDATES = 200
+
+def get_changed_movie_ids(api_url: str, api_key: str, api_timeout: int, since: float) -> Optional[set]:
+    """
+    Get the IDs of movies with history events (grabs, imports, deletions) since a timestamp.
+
+    Args:
+        api_url: The base URL of the Radarr API
+        api_key: The API key for authentication
+        api_timeout: Timeout for the API request
+        since: Unix timestamp of the last snapshot
+
+    Returns:
+        A set of movie IDs, or None if the request failed
+    """
+    since_iso = datetime.datetime.fromtimestamp(since, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    events = arr_request(api_url, api_key, api_timeout, f"history/since?date={since_iso}")
+    if events is None or not isinstance(events, list):
+        return None
+    return {event.get("movieId") for event in events if event.get("movieId")}
+
+def get_movie_library(api_url: str, api_key: str, api_timeout: int, instance_name: str) -> Optional[List[Dict]]:
+    """
+    Get all movies from the instance's library snapshot, refreshing it as needed.
+
+    A fresh snapshot is brought up to date from the history feed, so only movies
+    that changed since the last cycle are re-fetched. Stale or missing snapshots
+    are rebuilt with one streamed request. Additions and monitored changes write
+    no history event and are picked up by the next full refresh (see
+    'library_snapshot_max_age_minutes').
+
+    Args:
+        api_url: The base URL of the Radarr API
+        api_key: The API key for authentication
+        api_timeout: Timeout for the API request
+        instance_name: The instance the snapshot belongs to
+
+    Returns:
+        The list of (compacted) movies, or None if the library could not be fetched
+    """
+    snapshot = library_cache.load_snapshot("radarr", instance_name, "movies")
+
+    if library_cache.is_fresh(snapshot):
+        refresh_started = time.time()
+        changed_ids = get_changed_movie_ids(api_url, api_key, api_timeout, snapshot["fetched_at"])
+        if changed_ids is not None and len(changed_ids) <= MAX_INCREMENTAL_MOVIE_UPDATES:
+            items = dict(snapshot["items"])
+            for movie_id in changed_ids:
+                movie = arr_request(api_url, api_key, api_timeout, f"movie/{movie_id}")
+                if isinstance(movie, dict) and movie.get("id"):
+                    items[str(movie_id)] = library_cache.compact_record(movie)
+                else:
+                    # Removed from Radarr (or temporarily unavailable) - picked up again on the next full refresh
+                    items.pop(str(movie_id), None)
+            if changed_ids:
+                library_cache.save_snapshot("radarr", instance_name, "movies", items, fetched_at=refresh_started,
+                                            refreshed_at=snapshot.get("refreshed_at", snapshot["fetched_at"]))
+                radarr_logger.debug(f"Updated {len(changed_ids)} changed movies in library snapshot for {instance_name}")
+            else:
+                # Nothing changed - only move the history cursor, no need to rewrite the file
+                snapshot.setdefault("refreshed_at", snapshot["fetched_at"])
+                snapshot["fetched_at"] = refresh_started
+            return list(items.values())
+        radarr_logger.debug(f"Too many changes (or no history) for {instance_name}, doing a full library refresh")
+
+    refresh_started = time.time()
+    movies = arr_request_filtered(api_url, api_key, api_timeout, "movie", None, transform=library_cache.compact_record)
+    if movies is None:
+        return None
+
+    items = {str(movie["id"]): movie for movie in movies if movie.get("id") is not None}
+    library_cache.save_snapshot("radarr", instance_name, "movies", items, fetched_at=refresh_started)
+    radarr_logger.info(f"Refreshed Radarr library snapshot for {instance_name}: {len(items)} movies")
+    return movies
+
+def get_quality_profiles(api_url: str, api_key: str, api_timeout: int, instance_name: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    Get the quality profiles, served from the instance's snapshot while it is fresh.
+
+    Args:
+        api_url: The base URL of the Radarr API
+        api_key: The API key for authentication
+        api_timeout: Timeout for the API request
+        instance_name: The instance the snapshot belongs to. No caching if None.
+
+    Returns:
+        The list of quality profiles, or None if the request failed
+    """
+    if instance_name and library_cache.is_snapshot_enabled():
+        snapshot = library_cache.load_snapshot("radarr", instance_name, "profiles")
+        if library_cache.is_fresh(snapshot):
+            return list(snapshot["items"].values())
+
+    profiles = arr_request(api_url, api_key, api_timeout, "qualityprofile")
+    if profiles is None or not isinstance(profiles, list):
+        return None
+
+    if instance_name and library_cache.is_snapshot_enabled():
+        library_cache.save_snapshot("radarr", instance_name, "profiles", {str(p["id"]): p for p in profiles})
+    return profiles
+
+def get_movies_with_missing(api_url: str, api_key: str, api_timeout: int, monitored_only: bool,
+                            release_date_field: Optional[str] = None, instance_name: Optional[str] = None) -> Optional[List[Dict]]:
     """
     Get a list of movies with missing files (not downloaded/available).
 
@@ -124,28 +267,43 @@ def get_movies_with_missing(api_url: str, api_key: str, api_timeout: int, monito
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         monitored_only: If True, only return monitored movies.
+        release_date_field: If set (e.g. 'physicalRelease'), only return movies already released by that date.
+        instance_name: If set, select from the instance's library snapshot instead of fetching every movie.
 
     Returns:
         A list of movie objects with missing files, or None if the request failed.
     """
-    # Use the updated arr_request with passed arguments
-    movies = arr_request(api_url, api_key, api_timeout, "movie")
-    if movies is None: # Check for None explicitly, as an empty list is valid
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    def is_missing(movie: Dict) -> bool:
+        # Apply monitored_only filter if requested
+        if movie.get("hasFile", False) or (monitored_only and not movie.get("monitored", False)):
+            return False
+        if release_date_field:
+            release_date = movie.get(release_date_field)
+            if not release_date:
+                return False
+            try:
+                return datetime.datetime.fromisoformat(release_date.replace('Z', '+00:00')) < now
+            except ValueError:
+                return False
+        return True
+
+    if instance_name and library_cache.is_snapshot_enabled():
+        movies = get_movie_library(api_url, api_key, api_timeout, instance_name)
+        missing_movies = [movie for movie in movies if is_missing(movie)] if movies is not None else None
+    else:
+        # Stream the movie list so only missing movies are kept in memory
+        missing_movies = arr_request_filtered(api_url, api_key, api_timeout, "movie", is_missing)
+    if missing_movies is None: # Check for None explicitly, as an empty list is valid
         radarr_logger.error("Failed to retrieve movies from Radarr API.")
         return None
     
-    missing_movies = []
-    for movie in movies:
-        is_monitored = movie.get("monitored", False)
-        has_file = movie.get("hasFile", False)
-        # Apply monitored_only filter if requested
-        if not has_file and (not monitored_only or is_monitored):
-            missing_movies.append(movie)
-    
     radarr_logger.debug(f"Found {len(missing_movies)} missing movies (monitored_only={monitored_only}).")
     return missing_movies
 
-def get_cutoff_unmet_movies(api_url: str, api_key: str, api_timeout: int, monitored_only: bool) -> Optional[List[Dict]]:
+def get_cutoff_unmet_movies(api_url: str, api_key: str, api_timeout: int, monitored_only: bool,
+                            instance_name: Optional[str] = None) -> Optional[List[Dict]]:
     """
     Get a list of movies that don't meet their quality profile cutoff.
 
@@ -154,6 +312,7 @@ def get_cutoff_unmet_movies(api_url: str, api_key: str, api_timeout: int, monito
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         monitored_only: If True, only return monitored movies.
+        instance_name: If set, select from the instance's library snapshot instead of fetching every movie.
 
     Returns:
         A list of movie objects that need quality upgrades, or None if the request failed.
@@ -162,15 +321,10 @@ def get_cutoff_unmet_movies(api_url: str, api_key: str, api_timeout: int, monito
     # Note: Radarr's /api/v3/movie endpoint doesn't directly support a simple 'cutoffUnmet=true' like Sonarr's wanted/cutoff.
     # We need to fetch all movies and filter locally, or use the /api/v3/movie/lookup endpoint if searching by TMDB/IMDB ID.
     # Fetching all movies is simpler for now.
-    radarr_logger.debug("Fetching all movies to determine cutoff unmet status...")
-    movies = arr_request(api_url, api_key, api_timeout, "movie")
-    if movies is None:
-        radarr_logger.error("Failed to retrieve movies from Radarr API for cutoff check.")
-        return None
 
     # Need quality profile information to determine cutoff unmet status.
     # Fetch quality profiles first.
-    profiles = arr_request(api_url, api_key, api_timeout, "qualityprofile")
+    profiles = get_quality_profiles(api_url, api_key, api_timeout, instance_name)
     if profiles is None:
         radarr_logger.error("Failed to retrieve quality profiles from Radarr API.")
         return None
@@ -180,29 +334,34 @@ def get_cutoff_unmet_movies(api_url: str, api_key: str, api_timeout: int, monito
     profile_cutoff_map = {p['id']: p.get('cutoff') for p in profiles}
     # TODO: Potentially incorporate cutoffFormatScore if needed for more complex logic
 
-    unmet_movies = []
-    for movie in movies:
-        is_monitored = movie.get("monitored", False)
-        has_file = movie.get("hasFile", False)
+    def is_cutoff_unmet(movie: Dict) -> bool:
+        # Apply monitored_only filter if requested
+        if monitored_only and not movie.get("monitored", False):
+            return False
+
         profile_id = movie.get("qualityProfileId")
         movie_file = movie.get("movieFile")
+        if not movie.get("hasFile", False) or not movie_file or profile_id not in profile_cutoff_map:
+            return False
 
-        # Apply monitored_only filter if requested
-        if not monitored_only or is_monitored:
-            if has_file and movie_file and profile_id in profile_cutoff_map:
-                cutoff_quality_id = profile_cutoff_map[profile_id]
-                current_quality_id = movie_file.get("quality", {}).get("quality", {}).get("id")
-                
-                # Simple check: if current quality ID is less than cutoff quality ID
-                # This assumes quality IDs are ordered correctly (lower ID = lower quality)
-                # A more robust check might involve comparing quality *names* or *scores* if IDs aren't reliable order indicators.
-                if current_quality_id is not None and cutoff_quality_id is not None and current_quality_id < cutoff_quality_id:
-                    # TODO: Add check for cutoffFormatScore if necessary
-                    unmet_movies.append(movie)
-            # else: # Log why a movie wasn't considered unmet (optional)
-            #     if not has_file: radarr_logger.debug(f"Skipping {movie.get('title')} - no file.")
-            #     elif not movie_file: radarr_logger.debug(f"Skipping {movie.get('title')} - no movieFile info.")
-            #     elif profile_id not in profile_cutoff_map: radarr_logger.debug(f"Skipping {movie.get('title')} - profile ID {profile_id} not found.")
+        cutoff_quality_id = profile_cutoff_map[profile_id]
+        current_quality_id = movie_file.get("quality", {}).get("quality", {}).get("id")
+
+        # Simple check: if current quality ID is less than cutoff quality ID
+        # This assumes quality IDs are ordered correctly (lower ID = lower quality)
+        # A more robust check might involve comparing quality *names* or *scores* if IDs aren't reliable order indicators.
+        # TODO: Add check for cutoffFormatScore if necessary
+        return current_quality_id is not None and cutoff_quality_id is not None and current_quality_id < cutoff_quality_id
+
+    if instance_name and library_cache.is_snapshot_enabled():
+        movies = get_movie_library(api_url, api_key, api_timeout, instance_name)
+        unmet_movies = [movie for movie in movies if is_cutoff_unmet(movie)] if movies is not None else None
+    else:
+        radarr_logger.debug("Streaming all movies to determine cutoff unmet status...")
+        unmet_movies = arr_request_filtered(api_url, api_key, api_timeout, "movie", is_cutoff_unmet)
+    if unmet_movies is None:
+        radarr_logger.error("Failed to retrieve movies from Radarr API for cutoff check.")
+        return None
 
     radarr_logger.debug(f"Found {len(unmet_movies)} cutoff unmet movies (monitored_only={monitored_only}).")
     return unmet_movies
@@ -228,7 +387,8 @@ def refresh_movie(api_url: str, api_key: str, api_timeout: int, movie_id: int,
     # Return a placeholder command ID (123) to simulate success without actually refreshing
     return 123
 
-def movie_search(api_url: str, api_key: str, api_timeout: int, movie_ids: List[int]) -> Optional[int]:
+def movie_search(api_url: str, api_key: str, api_timeout: int, movie_ids: List[int],
+                 stop_check: Callable[[], bool] = lambda: False) -> Optional[int]:
     """
     Trigger a search for one or more movies.
     
@@ -237,6 +397,7 @@ def movie_search(api_url: str, api_key: str, api_timeout: int, movie_ids: List[i
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         movie_ids: A list of movie IDs to search for
+        stop_check: Function returning True if the rate limit wait should be aborted
         
     Returns:
         The command ID if the search command was triggered successfully, None otherwise
@@ -244,6 +405,11 @@ def movie_search(api_url: str, api_key: str, api_timeout: int, movie_ids: List[i
     if not movie_ids:
         radarr_logger.warning("No movie IDs provided for search.")
         return None
+    
+    # Wait for the hourly API cap to allow these hits
+    if not rate_limiter.acquire("radarr", api_url, len(movie_ids), stop_check=stop_check):
+        radarr_logger.warning(f"Rate limit: skipping search for movie IDs {movie_ids}")
+        return None
         
     endpoint = "command"
     data = {
@@ -278,7 +444,7 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
         base_url = api_url.rstrip('/')
         full_url = f"{base_url}/api/v3/system/status"
         
-        response = requests.get(full_url, headers={"X-Api-Key": api_key}, timeout=api_timeout)
+        response = http_client.get(full_url, headers={"X-Api-Key": api_key}, timeout=api_timeout, retries=False)
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
         radarr_logger.debug("Successfully connected to Radarr.")
         return True
@@ -288,34 +454,3 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
     except Exception as e:
         radarr_logger.error(f"An unexpected error occurred during Radarr connection check: {e}")
         return False
-
-def wait_for_command(api_url: str, api_key: str, api_timeout: int, command_id: int, 
-                    delay_seconds: int = 1, max_attempts: int = 600) -> bool:
-    """
-    Wait for a command to complete.
-    
-    Args:
-        api_url: The base URL of the Radarr API
-        api_key: The API key for authentication
-        api_timeout: Timeout for the API request
-        command_id: The ID of the command to wait for
-        delay_seconds: Seconds to wait between command status checks
-        max_attempts: Maximum number of status check attempts
-        
-    Returns:
-        True if the command completed successfully, False if timed out
-    """
-    attempts = 0
-    while attempts < max_attempts:
-        response = arr_request(api_url, api_key, api_timeout, f"command/{command_id}")
-        if response and 'state' in response:
-            state = response['state']
-            if state == "completed":
-                return True
-            elif state == "failed":
-                radarr_logger.error(f"Command {command_id} failed")
-                return False
-        time.sleep(delay_seconds)
-        attempts += 1
-    radarr_logger.warning(f"Timed out waiting for command {command_id} to complete")
-    return False
\ No newline at end of file
@@ -4,23 +4,22 @@ Missing Movies Processing for Radarr
 Handles searching for missing movies in Radarr
 """
 
-import time
 import random
-import datetime
-from typing import List, Dict, Any, Set, Callable
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.radarr import api as radarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
-from src.primary.utils.history_utils import log_processed_media
-from src.primary.settings_manager import load_settings, get_advanced_setting
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
+from src.primary.utils.history_utils import log_processed_media_batch
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 radarr_logger = get_logger("radarr")
 
 def process_missing_movies(
     app_settings: Dict[str, Any],
-    stop_check: Callable[[], bool] # Function to check if stop is requested
+    stop_check: Callable[[], bool], # Function to check if stop is requested
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process missing movies in Radarr based on provided settings.
@@ -28,10 +27,14 @@ def process_missing_movies(
     Args:
         app_settings: Dictionary containing all settings for Radarr
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle. Built on the spot if not given.
     
     Returns:
         True if any movies were processed, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("radarr")
+
     processed_any = False
     
     # Get instance name - check for instance_name first, fall back to legacy "name" key if needed
@@ -44,15 +47,15 @@ def process_missing_movies(
     # Extract necessary settings
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
     monitored_only = app_settings.get("monitored_only", True)
     skip_future_releases = app_settings.get("skip_future_releases", True)
     # skip_movie_refresh setting removed as it was a performance bottleneck
     hunt_missing_movies = app_settings.get("hunt_missing_movies", 0)
     
     # Use advanced settings from general.json for command operations
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
     release_type = app_settings.get("release_type", "physical")
     
     radarr_logger.info(f"Hunt Missing Movies: {hunt_missing_movies}")
@@ -88,7 +91,10 @@ def process_missing_movies(
     
     # Get missing movies 
     radarr_logger.info("Retrieving movies with missing files...")
-    missing_movies = radarr_api.get_movies_with_missing(api_url, api_key, api_timeout, monitored_only) 
+    # Future releases are filtered out while the movie list is streamed
+    missing_movies = radarr_api.get_movies_with_missing(api_url, api_key, api_timeout, monitored_only,
+                                                        release_type_field if skip_future_releases else None,
+                                                        instance_name=instance_name)
     
     if missing_movies is None: # API call failed
         radarr_logger.error("Failed to retrieve missing movies from Radarr API.")
@@ -105,34 +111,15 @@ def process_missing_movies(
     
     radarr_logger.info(f"Found {len(missing_movies)} movies with missing files.")
     
-    # Filter out future releases if configured
     if skip_future_releases:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        original_count = len(missing_movies)
-        
-        missing_movies = [
-            movie for movie in missing_movies
-            if movie.get(release_type_field) and datetime.datetime.fromisoformat(movie[release_type_field].replace('Z', '+00:00')) < now
-        ]
-        skipped_count = original_count - len(missing_movies)
-        if skipped_count > 0:
-            radarr_logger.info(f"Skipped {skipped_count} future movie releases based on {release_type} release date.")
-
-    if not missing_movies:
-        radarr_logger.info("No missing movies left to process after filtering future releases.")
-        return False
+        radarr_logger.info(f"Future movie releases were skipped based on {release_type} release date.")
         
     movies_processed = 0
     processing_done = False
     
     # Filter out already processed movies using stateful management
-    unprocessed_movies = []
-    for movie in missing_movies:
-        movie_id = str(movie.get("id"))
-        if not is_processed("radarr", instance_name, movie_id):
-            unprocessed_movies.append(movie)
-        else:
-            radarr_logger.debug(f"Skipping already processed movie ID: {movie_id}")
+    unprocessed_ids = set(filter_unprocessed("radarr", instance_name, [str(movie.get("id")) for movie in missing_movies]))
+    unprocessed_movies = [movie for movie in missing_movies if str(movie.get("id")) in unprocessed_ids]
     
     radarr_logger.info(f"Found {len(unprocessed_movies)} unprocessed missing movies out of {len(missing_movies)} total.")
     
@@ -158,38 +145,41 @@ def process_missing_movies(
             year = movie.get("year", "Unknown Year")
             radarr_logger.info(f"  {idx+1}. {movie_title} ({year}) - ID: {movie_id}")
     
-    # Process each movie
-    for movie in movies_to_process:
+    # Search the selected movies in batches - one MoviesSearch command per batch
+    batch_size = cycle_settings.search_batch_size
+    for batch_start in range(0, len(movies_to_process), batch_size):
         if stop_check():
             radarr_logger.info("Stop requested during processing. Aborting...")
             break
             
-        movie_id = movie.get("id")
-        movie_title = movie.get("title", "Unknown Title")
+        batch = movies_to_process[batch_start:batch_start + batch_size]
+        movie_ids = [movie.get("id") for movie in batch]
         
         # Refresh functionality has been removed as it was identified as a performance bottleneck
         
-        # Search for the movie
-        radarr_logger.info(f"Searching for movie '{movie_title}' (ID: {movie_id})...")
-        search_success = radarr_api.movie_search(api_url, api_key, api_timeout, [movie_id])
+        # Search for the movies
+        radarr_logger.info(f"Searching for {len(batch)} movies: {', '.join(movie.get('title', 'Unknown Title') for movie in batch)}")
+        search_success = radarr_api.movie_search(api_url, api_key, api_timeout, movie_ids, stop_check=stop_check)
         
         if search_success:
-            radarr_logger.info(f"Successfully triggered search for movie '{movie_title}'")
+            radarr_logger.info(f"Successfully triggered search for {len(batch)} movies")
             # Immediately add to processed IDs to prevent duplicate processing
-            success = add_processed_id("radarr", instance_name, str(movie_id))
-            radarr_logger.debug(f"Added processed ID: {movie_id}, success: {success}")
+            success = mark_processed_many("radarr", instance_name, movie_ids)
+            radarr_logger.debug(f"Added processed IDs: {movie_ids}, success: {success}")
             
             # Log to history system
-            year = movie.get("year", "Unknown Year")
-            media_name = f"{movie_title} ({year})"
-            log_processed_media("radarr", media_name, movie_id, instance_name, "missing")
-            radarr_logger.debug(f"Logged history entry for movie: {media_name}")
+            log_processed_media_batch(
+                "radarr",
+                [(f"{movie.get('title', 'Unknown Title')} ({movie.get('year', 'Unknown Year')})", movie.get("id")) for movie in batch],
+                instance_name,
+                "missing"
+            )
             
-            increment_stat("radarr", "hunted")
-            movies_processed += 1
+            increment_stat("radarr", "hunted", len(batch), instance_name=instance_name)
+            movies_processed += len(batch)
             processed_any = True
         else:
-            radarr_logger.warning(f"Failed to trigger search for movie '{movie_title}'")
+            radarr_logger.warning(f"Failed to trigger search for movie IDs {movie_ids}")
     
     radarr_logger.info(f"Finished processing missing movies. Processed {movies_processed} of {len(movies_to_process)} selected movies.")
     return processed_any
\ No newline at end of file
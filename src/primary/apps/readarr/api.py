@@ -8,19 +8,17 @@ import requests
 import json
 import time
 import datetime
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Callable
 # Correct the import path
 from src.primary.utils.logger import get_logger
 # Import load_settings
 from src.primary.settings_manager import load_settings, get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
 import importlib
 
 # Get app-specific logger
 logger = get_logger("readarr")
 
-# Use a session for better performance
-session = requests.Session()
-
 # Default API timeout in seconds - used as fallback only
 API_TIMEOUT = 30
 
@@ -48,7 +46,7 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
         }
         logger.debug(f"Using User-Agent: {headers['User-Agent']}")
         
-        response = requests.get(full_url, headers=headers, timeout=api_timeout)
+        response = http_client.get(full_url, headers=headers, timeout=api_timeout, retries=False)
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
         logger.debug("Successfully connected to Readarr.")
         return True
@@ -85,7 +83,7 @@ def get_download_queue_size(api_url: str = None, api_key: str = None, timeout: i
             }
             
             # Make the request
-            response = session.get(url, headers=headers, timeout=timeout)
+            response = http_client.get(url, headers=headers, timeout=timeout)
             response.raise_for_status()
             
             # Parse JSON response
@@ -202,13 +200,13 @@ def arr_request(endpoint: str, method: str = "GET", data: Dict = None, app_type:
     # Make the request with appropriate method
     try:
         if method.upper() == "GET":
-            response = requests.get(full_url, headers=headers, params=params, timeout=timeout, verify=verify_ssl)
+            response = http_client.get(full_url, headers=headers, params=params, timeout=timeout, verify=verify_ssl)
         elif method.upper() == "POST":
-            response = requests.post(full_url, headers=headers, json=data, timeout=timeout, verify=verify_ssl)
+            response = http_client.post(full_url, headers=headers, json=data, timeout=timeout, verify=verify_ssl)
         elif method.upper() == "PUT":
-            response = requests.put(full_url, headers=headers, json=data, timeout=timeout, verify=verify_ssl)
+            response = http_client.put(full_url, headers=headers, json=data, timeout=timeout, verify=verify_ssl)
         elif method.upper() == "DELETE":
-            response = requests.delete(full_url, headers=headers, timeout=timeout, verify=verify_ssl)
+            response = http_client.delete(full_url, headers=headers, timeout=timeout, verify=verify_ssl)
         else:
             logger.error(f"Unsupported HTTP method: {method}")
             return None
@@ -281,8 +279,6 @@ def get_wanted_missing_books(api_url: str, api_key: str, api_timeout: int, monit
     Returns:
         A list of dictionaries, each representing a missing book, or an empty list on error.
     """
-    all_missing_books = []
-    page = 1
     page_size = 100 # Adjust as needed, check Readarr API limits
     endpoint = "wanted/missing"
 
@@ -300,7 +296,9 @@ def get_wanted_missing_books(api_url: str, api_key: str, api_timeout: int, monit
     }
     logger.debug(f"Using User-Agent: {headers['User-Agent']}")
 
-    while True:
+    failed_pages = []
+
+    def fetch_page(page: int) -> Optional[Dict]:
         params = {
             'page': page,
             'pageSize': page_size,
@@ -309,31 +307,24 @@ def get_wanted_missing_books(api_url: str, api_key: str, api_timeout: int, monit
             # 'sortDirection': 'ascending',
             # 'monitored': monitored_only # Note: Check if Readarr API supports this directly for wanted/missing
         }
+        response = None
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=api_timeout)
+            response = http_client.get(url, headers=headers, params=params, timeout=api_timeout)
             response.raise_for_status()
-            data = response.json()
-
-            if not data or 'records' not in data or not data['records']:
-                break # No more data or unexpected format
-
-            all_missing_books.extend(data['records'])
-
-            total_records = data.get('totalRecords', 0)
-            if len(all_missing_books) >= total_records:
-                break # We have fetched all records
-
-            page += 1
-
+            return response.json() or {}
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching missing books (page {page}) from {url}: {e}")
-            return [] # Return empty list on error
         except json.JSONDecodeError:
             logger.error(f"Error decoding JSON response from {url} (page {page}). Response: {response.text[:200]}")
-            return []
         except Exception as e:
             logger.error(f"Unexpected error fetching missing books (page {page}): {e}", exc_info=True)
-            return []
+        failed_pages.append(page)
+        return None
+
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    all_missing_books, _ = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_missing_books is None or failed_pages:
+        return [] # Return empty list on error
 
     logger.info(f"Successfully fetched {len(all_missing_books)} missing books from Readarr.")
     return all_missing_books
@@ -356,7 +347,8 @@ def refresh_author(author_id: int, api_url: Optional[str] = None, api_key: Optio
     # Always return success without making any API calls
     return True
 
-def book_search(book_ids: List[int], api_url: Optional[str] = None, api_key: Optional[str] = None, api_timeout: Optional[int] = None) -> bool:
+def book_search(book_ids: List[int], api_url: Optional[str] = None, api_key: Optional[str] = None, api_timeout: Optional[int] = None,
+                stop_check: Callable[[], bool] = lambda: False) -> bool:
     """
     Trigger a search for one or more books.
     Accepts optional API credentials.
@@ -366,10 +358,28 @@ def book_search(book_ids: List[int], api_url: Optional[str] = None, api_key: Opt
         api_url: Optional API URL
         api_key: Optional API key
         api_timeout: Optional API timeout
+        stop_check: Function returning True if the rate limit wait should be aborted
         
     Returns:
         True if the search command was successful, False otherwise
     """
+    # Without credentials arr_request sends the command to the first configured instance,
+    # so that instance is charged for the hits
+    instance_data = None
+    if not (api_url and api_key):
+        from src.primary.apps.readarr import get_configured_instances
+        instances = get_configured_instances()
+        if not instances:
+            logger.error("No Readarr instance configured for BookSearch")
+            return None
+        instance_data = instances[0]
+    
+    # Wait for the hourly API cap to allow these hits
+    rate_limit_url = instance_data.get("api_url", "") if instance_data else api_url
+    if not rate_limiter.acquire("readarr", rate_limit_url, len(book_ids), stop_check=stop_check):
+        logger.warning(f"Rate limit: skipping BookSearch for book IDs {book_ids}")
+        return None
+    
     endpoint = "command"
     data = {
         "name": "BookSearch",
@@ -377,7 +387,8 @@ def book_search(book_ids: List[int], api_url: Optional[str] = None, api_key: Opt
     }
     
     # Pass credentials to arr_request
-    response = arr_request(endpoint, method="POST", data=data, api_url=api_url, api_key=api_key, api_timeout=api_timeout)
+    response = arr_request(endpoint, method="POST", data=data, api_url=api_url, api_key=api_key, api_timeout=api_timeout,
+                           instance_data=instance_data)
     # Return the response object (contains command ID) instead of just True/False
     # The calling function expects the command object now.
     return response 
@@ -387,7 +398,7 @@ def get_author_details(api_url: str, api_key: str, author_id: int, api_timeout:
     endpoint = f"{api_url}/api/v1/author/{author_id}"
     headers = {'X-Api-Key': api_key}
     try:
-        response = requests.get(endpoint, headers=headers, timeout=api_timeout)
+        response = http_client.get(endpoint, headers=headers, timeout=api_timeout)
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
         author_data = response.json()
         logger.debug(f"Successfully fetched details for author ID {author_id}.")
@@ -399,8 +410,13 @@ def get_author_details(api_url: str, api_key: str, author_id: int, api_timeout:
         logger.error(f"An unexpected error occurred fetching author details for ID {author_id}: {e}")
         return None
 
-def search_books(api_url: str, api_key: str, book_ids: List[int], api_timeout: int = 120) -> Optional[Dict]:
+def search_books(api_url: str, api_key: str, book_ids: List[int], api_timeout: int = 120,
+                 stop_check: Callable[[], bool] = lambda: False) -> Optional[Dict]:
     """Triggers a search for specific book IDs in Readarr."""
+    # Wait for the hourly API cap to allow these hits
+    if not rate_limiter.acquire("readarr", api_url, len(book_ids), stop_check=stop_check):
+        logger.warning(f"Rate limit: skipping BookSearch for book IDs {book_ids}")
+        return None
     endpoint = f"{api_url}/api/v1/command" # This uses the full URL, not arr_request
     headers = {'X-Api-Key': api_key}
     payload = {
@@ -409,7 +425,7 @@ def search_books(api_url: str, api_key: str, book_ids: List[int], api_timeout: i
     }
     try:
         # This uses requests.post directly, not arr_request. It's already correct.
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=api_timeout)
+        response = http_client.post(endpoint, headers=headers, json=payload, timeout=api_timeout)
         response.raise_for_status()
         command_data = response.json()
         command_id = command_data.get('id')
@@ -6,21 +6,23 @@ Handles searching for missing books in Readarr
 
 import time
 import random
-from typing import List, Dict, Any, Set, Callable
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.readarr import api as readarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
-from src.primary.utils.history_utils import log_processed_media
-from src.primary.settings_manager import load_settings, get_advanced_setting
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
+from src.primary.utils.history_utils import log_processed_media_batch
+from src.primary.settings_manager import load_settings
 from src.primary.state import check_state_reset
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 readarr_logger = get_logger("readarr")
 
 def process_missing_books(
     app_settings: Dict[str, Any],
-    stop_check: Callable[[], bool] # Function to check if stop is requested
+    stop_check: Callable[[], bool], # Function to check if stop is requested
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process missing books in Readarr based on provided settings.
@@ -28,23 +30,24 @@ def process_missing_books(
     Args:
         app_settings: Dictionary containing all settings for Readarr
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle. Built on the spot if not given.
     
     Returns:
         True if any books were processed, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("readarr")
+
     readarr_logger.info("Starting missing books processing cycle for Readarr.")
     processed_any = False
     
     # Reset state files if enough time has passed
     check_state_reset("readarr")
     
-    # Get the settings for the instance
-    general_settings = readarr_api.load_settings('general')
-    
     # Extract necessary settings
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
     instance_name = app_settings.get("instance_name", "Readarr Default")
     
     readarr_logger.info(f"Using API timeout of {api_timeout} seconds for Readarr")
@@ -55,8 +58,8 @@ def process_missing_books(
     hunt_missing_books = app_settings.get("hunt_missing_books", 0)
     
     # Use advanced settings from general.json for command operations
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
 
     # Get missing books
     readarr_logger.info("Retrieving wanted/missing books...")
@@ -83,12 +86,7 @@ def process_missing_books(
     author_ids = list(books_by_author.keys())
 
     # Filter out already processed authors using stateful management
-    unprocessed_authors = []
-    for author_id in author_ids:
-        if not is_processed("readarr", instance_name, str(author_id)):
-            unprocessed_authors.append(author_id)
-        else:
-            readarr_logger.debug(f"Skipping already processed author ID: {author_id}")
+    unprocessed_authors = filter_unprocessed("readarr", instance_name, author_ids)
 
     readarr_logger.info(f"Found {len(unprocessed_authors)} unprocessed authors out of {len(author_ids)} total authors with missing books.")
     
@@ -104,6 +102,7 @@ def process_missing_books(
     processed_count = 0
     processed_something = False
     processed_authors = [] # Track author names processed
+    searched_author_ids = [] # Marked as processed with a single write after the loop
 
     for author_id in authors_to_process:
         if stop_check():
@@ -132,28 +131,24 @@ def process_missing_books(
         log_message = f"Triggering Book Search for {len(book_details)} books by author '{author_name}': [{details_string}]"
         readarr_logger.debug(log_message) # Changed level from INFO to DEBUG
         
-        # Mark author as processed BEFORE triggering any searches
-        add_processed_id("readarr", instance_name, str(author_id))
-        readarr_logger.debug(f"Added author ID {author_id} to processed list for {instance_name}")
+        # The author counts as processed even if triggering the search fails
+        searched_author_ids.append(str(author_id))
         
         # Now trigger the search
-        search_command_result = readarr_api.search_books(api_url, api_key, book_ids_for_author, api_timeout)
+        search_command_result = readarr_api.search_books(api_url, api_key, book_ids_for_author, api_timeout, stop_check=stop_check)
 
         if search_command_result:
             # Extract command ID if the result is a dictionary, otherwise use the result directly
             command_id = search_command_result.get('id') if isinstance(search_command_result, dict) else search_command_result
-            readarr_logger.info(f"Triggered book search command {command_id} for author {author_name}. Assuming success for now.") # Log only command ID
-            increment_stat("readarr", "hunted")
+            readarr_logger.info(f"Triggered book search command {command_id} for author {author_name}.") # Log only command ID
+            increment_stat("readarr", "hunted", instance_name=instance_name)
             
-            # Log multiple history entries - one for each book with author info
+            # Log one history entry per book with author info, in a single write
+            history_items = []
             for book in books_by_author[author_id]:
                 book_title = book.get('title', f"Unknown Book ID {book['id']}")
-                # Format includes both author and book info
-                media_name = f"{author_name} - {book_title}"
-                # Log each book as a separate history entry with book_id
-                log_processed_media("readarr", media_name, book['id'], instance_name, "missing")
-                readarr_logger.debug(f"Logged missing book history entry: {media_name} (ID: {book['id']})")
-            
+                history_items.append((f"{author_name} - {book_title}", book['id']))
+            log_processed_media_batch("readarr", history_items, instance_name, "missing")
             readarr_logger.debug(f"Logged history entries for {len(books_by_author[author_id])} books by author: {author_name}")
             
             processed_count += 1 # Count processed authors/groups
@@ -167,6 +162,10 @@ def process_missing_books(
             readarr_logger.info(f"Reached target of {hunt_missing_books} authors/groups processed for this cycle.")
             break
 
+    if searched_author_ids:
+        success = mark_processed_many("readarr", instance_name, searched_author_ids)
+        readarr_logger.debug(f"Added author IDs {searched_author_ids} to processed list for {instance_name}, success: {success}")
+
     if processed_authors:
         authors_list = '", "'.join(processed_authors)
         readarr_logger.info(f'Completed processing {processed_count} authors/groups for missing books this cycle: "{authors_list}"')
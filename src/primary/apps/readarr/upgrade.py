@@ -11,17 +11,18 @@ from typing import List, Dict, Any, Set, Callable, Union, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.readarr import api as readarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
 from src.primary.utils.history_utils import log_processed_media
 from src.primary.state import check_state_reset
-from src.primary.settings_manager import load_settings # Import load_settings function
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 readarr_logger = get_logger("readarr")
 
 def process_cutoff_upgrades(
     app_settings: Dict[str, Any],
-    stop_check: Callable[[], bool] # Function to check if stop is requested
+    stop_check: Callable[[], bool], # Function to check if stop is requested
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process quality cutoff upgrades for Readarr based on settings.
@@ -29,10 +30,14 @@ def process_cutoff_upgrades(
     Args:
         app_settings: Dictionary containing all settings for Readarr
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle. Built on the spot if not given.
         
     Returns:
         True if any books were processed for upgrades, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("readarr")
+
     readarr_logger.info("Starting quality cutoff upgrades processing cycle for Readarr.")
     
     # Reset state files if enough time has passed
@@ -40,15 +45,12 @@ def process_cutoff_upgrades(
     
     processed_any = False
     
-    # Load general settings to get centralized timeout
-    general_settings = load_settings('general')
-    
     # Get the API credentials for this instance
     api_url = app_settings.get('api_url', '')
     api_key = app_settings.get('api_key', '')
     
-    # Use the centralized timeout from general settings with app-specific as fallback
-    api_timeout = general_settings.get("api_timeout", app_settings.get("api_timeout", 90))  # Use centralized timeout
+    # Use the centralized timeout from general settings
+    api_timeout = cycle_settings.api_timeout  # Use centralized timeout
     
     readarr_logger.info(f"Using API timeout of {api_timeout} seconds for Readarr")
     
@@ -116,13 +118,8 @@ def process_cutoff_upgrades(
         return False
         
     # Filter out already processed books using stateful management
-    unprocessed_books = []
-    for book in upgrade_eligible_data:
-        book_id = str(book.get("id"))
-        if not is_processed("readarr", instance_name, book_id):
-            unprocessed_books.append(book)
-        else:
-            readarr_logger.debug(f"Skipping already processed book ID: {book_id}")
+    unprocessed_ids = set(filter_unprocessed("readarr", instance_name, [str(book.get("id")) for book in upgrade_eligible_data]))
+    unprocessed_books = [book for book in upgrade_eligible_data if str(book.get("id")) in unprocessed_ids]
     
     readarr_logger.info(f"Found {len(unprocessed_books)} unprocessed books out of {len(upgrade_eligible_data)} total books eligible for upgrade.")
     
@@ -141,17 +138,16 @@ def process_cutoff_upgrades(
     book_ids_to_search = [book.get("id") for book in books_to_process]
 
     # Mark books as processed BEFORE triggering any searches
-    for book_id in book_ids_to_search:
-        add_processed_id("readarr", instance_name, str(book_id))
-        readarr_logger.debug(f"Added book ID {book_id} to processed list for {instance_name}")
+    mark_processed_many("readarr", instance_name, book_ids_to_search, "upgrade")
+    readarr_logger.debug(f"Added book IDs {book_ids_to_search} to processed list for {instance_name}")
         
     # Now trigger the search
-    search_command_result = readarr_api.search_books(api_url, api_key, book_ids_to_search, api_timeout)
+    search_command_result = readarr_api.search_books(api_url, api_key, book_ids_to_search, api_timeout, stop_check=stop_check)
         
     if search_command_result:
-        command_id = search_command_result
+        command_id = search_command_result.get('id') if isinstance(search_command_result, dict) else search_command_result
         readarr_logger.info(f"Triggered upgrade search command {command_id} for {len(book_ids_to_search)} books.")
-        increment_stat("readarr", "upgraded")
+        increment_stat("readarr", "upgraded", instance_name=instance_name)
             
         # Log to history system for each book
         for book in books_to_process:
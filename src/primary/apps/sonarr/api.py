@@ -7,21 +7,20 @@ Handles all communication with the Sonarr API
 import requests
 import json
 import sys
-import time
 import datetime
 import traceback
 from typing import List, Dict, Any, Optional, Union, Callable
 # Correct the import path
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
+from src.primary import library_cache
 
 # Get logger for the Sonarr app
 sonarr_logger = get_logger("sonarr")
 
-# Use a session for better performance
-session = requests.Session()
-
-def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None) -> Any:
+def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None,
+                retries: bool = True) -> Any:
     """
     Make a request to the Sonarr API.
     
@@ -32,6 +31,7 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         endpoint: The API endpoint to call
         method: HTTP method (GET, POST, PUT, DELETE)
         data: Optional data payload for POST/PUT requests
+        retries: Whether to retry transient failures (False for status checks)
     
     Returns:
         The parsed JSON response or None if the request failed
@@ -69,13 +69,13 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         
         try:
             if method.upper() == "GET":
-                response = session.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl, retries=retries)
             elif method.upper() == "POST":
-                response = session.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "PUT":
-                response = session.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "DELETE":
-                response = session.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
             else:
                 sonarr_logger.error(f"Unsupported HTTP method: {method}")
                 return None
@@ -154,12 +154,13 @@ def get_system_status(api_url: str, api_key: str, api_timeout: int) -> Dict:
     Returns:
         System status information or empty dict if request failed
     """
-    response = arr_request(api_url, api_key, api_timeout, "system/status")
+    response = arr_request(api_url, api_key, api_timeout, "system/status", retries=False)
     if response:
         return response
     return {}
 
-def get_series(api_url: str, api_key: str, api_timeout: int, series_id: Optional[int] = None) -> Union[List, Dict, None]:
+def get_series(api_url: str, api_key: str, api_timeout: int, series_id: Optional[int] = None,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> Union[List, Dict, None]:
     """
     Get series information from Sonarr.
     
@@ -168,16 +169,32 @@ def get_series(api_url: str, api_key: str, api_timeout: int, series_id: Optional
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         series_id: Optional series ID to get a specific series
+        predicate: Optional filter applied while the series list is streamed;
+            series that do not match are never kept in memory
     
     Returns:
         List of all series, a specific series, or None if request failed
     """
     if series_id:
-        endpoint = f"series/{series_id}"
-    else:
-        endpoint = "series"
+        return arr_request(api_url, api_key, api_timeout, f"series/{series_id}")
     
-    return arr_request(api_url, api_key, api_timeout, endpoint)
+    if not api_url or not api_key:
+        sonarr_logger.error("No URL or API key provided")
+        return None
+    
+    url = f"{api_url.rstrip('/')}/api/v3/series"
+    headers = {
+        "X-Api-Key": api_key,
+        "User-Agent": "Huntarr/1.0 (https://github.com/plexguide/Huntarr.io)"
+    }
+    try:
+        return http_client.get_json_array(url, predicate, headers=headers, timeout=api_timeout)
+    except requests.exceptions.RequestException as e:
+        sonarr_logger.error(f"Error during GET request to series: {e}")
+        return None
+    except ValueError as e:
+        sonarr_logger.error(f"Error decoding JSON response from series: {e}")
+        return None
 
 def get_episode(api_url: str, api_key: str, api_timeout: int, episode_id: int) -> Dict:
     """
@@ -267,113 +284,58 @@ def command_status(api_url: str, api_key: str, api_timeout: int, command_id: Uni
 def get_missing_episodes(api_url: str, api_key: str, api_timeout: int, monitored_only: bool, series_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """Get missing episodes from Sonarr, handling pagination."""
     endpoint = "wanted/missing"
-    page = 1
     page_size = 1000 # Adjust page size if needed, but 1000 is usually good
-    all_missing_episodes = []
-    retries_per_page = 2
-    retry_delay = 3
-    
-    while True:
-        retry_count = 0
-        success = False
-        
-        while retry_count <= retries_per_page and not success:
-            # Parameters for the request
-            params = {
-                "page": page,
-                "pageSize": page_size,
-                "includeSeries": "true"
-            }
-            
-            # Add series ID filter if provided
-            if series_id is not None:
-                params["seriesId"] = series_id
-            
-            # Ensure proper URL construction with scheme
-            base_url = api_url.rstrip('/')
-            url = f"{base_url}/api/v3/{endpoint.lstrip('/')}"
-            sonarr_logger.debug(f"Requesting missing episodes page {page} (attempt {retry_count+1}/{retries_per_page+1})")
-            
-            try:
-                response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
-                response.raise_for_status() # Check for HTTP errors (4xx or 5xx)
-                
-                if not response.content:
-                    sonarr_logger.warning(f"Empty response for missing episodes page {page} (attempt {retry_count+1})")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up on empty response after {retries_per_page+1} attempts")
-                        break  # Exit the retry loop, continuing to next page or ending
-                
-                try:
-                    data = response.json()
-                    records = data.get('records', [])
-                    total_records_on_page = len(records)
-                    sonarr_logger.debug(f"Parsed {total_records_on_page} missing episode records from page {page}")
-                    
-                    if not records: # No more records found
-                        sonarr_logger.debug(f"No more records found on page {page}. Stopping pagination.")
-                        success = True  # Mark as successful even though no records (might be legitimate)
-                        break  # Exit retry loop, then also exit pagination loop
-                    
-                    all_missing_episodes.extend(records)
-                    
-                    # Check if this was the last page
-                    if total_records_on_page < page_size:
-                        sonarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Last page.")
-                        success = True
-                        break  # Exit retry loop, then also exit pagination loop
-                    
-                    # We got records and need to continue - mark success for this page
-                    success = True
-                    break  # Exit retry loop, continue to next page
-                    
-                except json.JSONDecodeError as e:
-                    sonarr_logger.error(f"Failed to decode JSON response for missing episodes page {page} (attempt {retry_count+1}): {e}")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up after {retries_per_page+1} failed JSON decode attempts")
-                        break  # Exit retry loop, moving to next page or ending
-    
-            except requests.exceptions.RequestException as e:
-                sonarr_logger.error(f"Request error for missing episodes page {page} (attempt {retry_count+1}): {e}")
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up on request after {retries_per_page+1} failed attempts")
-                    break  # Exit retry loop
-            except Exception as e:
-                sonarr_logger.error(f"Unexpected error for missing episodes page {page} (attempt {retry_count+1}): {e}")
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up after unexpected error and {retries_per_page+1} attempts")
-                    break  # Exit retry loop
-        
-        # If we didn't succeed after all retries or there are no more records, stop pagination
-        if not success or not records:
-            break
-            
-        # Prepare for the next page
-        page += 1
-    
+
+    # Ensure proper URL construction with scheme
+    base_url = api_url.rstrip('/')
+    url = f"{base_url}/api/v3/{endpoint.lstrip('/')}"
+
+    def fetch_page(page: int) -> Optional[Dict[str, Any]]:
+        # Parameters for the request
+        params = {
+            "page": page,
+            "pageSize": page_size,
+            "includeSeries": "true"
+        }
+
+        # Add series ID filter if provided
+        if series_id is not None:
+            params["seriesId"] = series_id
+
+        sonarr_logger.debug(f"Requesting missing episodes page {page}")
+
+        # Transient failures are retried with backoff by the shared HTTP client
+        try:
+            response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+            response.raise_for_status() # Check for HTTP errors (4xx or 5xx)
+
+            if not response.content:
+                sonarr_logger.error(f"Empty response for missing episodes page {page}. Stopping pagination.")
+                return None
+
+            data = response.json()
+            sonarr_logger.debug(f"Parsed {len(data.get('records', []))} missing episode records from page {page}")
+            return data
+        except json.JSONDecodeError as e:
+            sonarr_logger.error(f"Failed to decode JSON response for missing episodes page {page}: {e}")
+        except requests.exceptions.RequestException as e:
+            sonarr_logger.error(f"Request error for missing episodes page {page}: {e}")
+        except Exception as e:
+            sonarr_logger.error(f"Unexpected error for missing episodes page {page}: {e}")
+        return None
+
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    all_missing_episodes, _ = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_missing_episodes is None:
+        all_missing_episodes = []
+
     sonarr_logger.info(f"Total missing episodes fetched across all pages: {len(all_missing_episodes)}")
 
     # Apply monitored filter after fetching all pages
     if monitored_only:
         original_count = len(all_missing_episodes)
         filtered_missing = [
-            ep for ep in all_missing_episodes 
+            ep for ep in all_missing_episodes
             if ep.get('series', {}).get('monitored', False) and ep.get('monitored', False)
         ]
         sonarr_logger.debug(f"Filtered for monitored_only=True: {len(filtered_missing)} monitored episodes (out of {original_count} total)")
@@ -385,127 +347,57 @@ def get_missing_episodes(api_url: str, api_key: str, api_timeout: int, monitored
 def get_cutoff_unmet_episodes(api_url: str, api_key: str, api_timeout: int, monitored_only: bool) -> List[Dict[str, Any]]:
     """Get cutoff unmet episodes from Sonarr, handling pagination."""
     endpoint = "wanted/cutoff"
-    page = 1
     page_size = 1000 # Sonarr's max page size for this endpoint
-    all_cutoff_unmet = []
-    retries_per_page = 2
-    retry_delay = 3
+    url = f"{api_url}/api/v3/{endpoint}"
 
     sonarr_logger.debug(f"Starting fetch for cutoff unmet episodes (monitored_only={monitored_only}).")
 
-    while True:
-        retry_count = 0
-        success = False
-        records = []
-        
-        while retry_count <= retries_per_page and not success:
-            # Parameters for the request
-            params = {
-                "page": page,
-                "pageSize": page_size,
-                "includeSeries": "true", # Include series info for filtering
-                "sortKey": "airDateUtc",
-                "sortDir": "asc"
-            }
-            url = f"{api_url}/api/v3/{endpoint}"
-            sonarr_logger.debug(f"Requesting cutoff unmet page {page} (attempt {retry_count+1}/{retries_per_page+1})")
+    def fetch_page(page: int) -> Optional[Dict[str, Any]]:
+        # Parameters for the request
+        params = {
+            "page": page,
+            "pageSize": page_size,
+            "includeSeries": "true", # Include series info for filtering
+            "sortKey": "airDateUtc",
+            "sortDir": "asc"
+        }
+        sonarr_logger.debug(f"Requesting cutoff unmet page {page}")
 
-            try:
-                response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
-                sonarr_logger.debug(f"Sonarr API response status code for cutoff unmet page {page}: {response.status_code}")
-                response.raise_for_status() # Check for HTTP errors
-                
-                if not response.content:
-                    sonarr_logger.warning(f"Empty response for cutoff unmet episodes page {page} (attempt {retry_count+1})")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up on empty response after {retries_per_page+1} attempts")
-                        break
+        # Transient failures are retried with backoff by the shared HTTP client
+        try:
+            response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+            sonarr_logger.debug(f"Sonarr API response status code for cutoff unmet page {page}: {response.status_code}")
+            response.raise_for_status() # Check for HTTP errors
 
-                try:
-                    data = response.json()
-                    records = data.get('records', [])
-                    total_records_on_page = len(records)
-                    total_records_reported = data.get('totalRecords', 0)
-                    
-                    if page == 1:
-                        sonarr_logger.info(f"Sonarr API reports {total_records_reported} total cutoff unmet records.")
-                    
-                    sonarr_logger.debug(f"Parsed {total_records_on_page} cutoff unmet records from page {page}")
-                    
-                    if not records: # No more records found
-                        sonarr_logger.debug(f"No more cutoff unmet records found on page {page}. Stopping pagination.")
-                        success = True
-                        break
+            if not response.content:
+                sonarr_logger.error(f"Empty response for cutoff unmet episodes page {page}. Stopping pagination.")
+                return None
 
-                    all_cutoff_unmet.extend(records)
-                    
-                    # Check if this was the last page
-                    if total_records_on_page < page_size:
-                        sonarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Last page.")
-                        success = True
-                        break
-                    
-                    # Success for this page
-                    success = True
-                    break
-                    
-                except json.JSONDecodeError as e:
-                    sonarr_logger.error(f"Failed to decode JSON for cutoff unmet page {page} (attempt {retry_count+1}): {e}")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up after {retries_per_page+1} failed JSON decode attempts")
-                        break
-                        
-            except requests.exceptions.Timeout as e:
-                sonarr_logger.error(f"Timeout for cutoff unmet page {page} (attempt {retry_count+1}): {e}")
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    # Use a slightly longer retry delay for timeouts
-                    time.sleep(retry_delay * 2)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up after {retries_per_page+1} timeout failures")
-                    break
-                    
-            except requests.exceptions.RequestException as e:
-                error_details = f"Error: {e}"
-                if hasattr(e, 'response') and e.response is not None:
-                    error_details += f", Status Code: {e.response.status_code}"
-                    if hasattr(e.response, 'text') and e.response.text:
-                        error_details += f", Response: {e.response.text[:500]}"
-                        
-                sonarr_logger.error(f"Request error for cutoff unmet page {page} (attempt {retry_count+1}): {error_details}")
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up on request after {retries_per_page+1} failed attempts")
-                    break
-                    
-            except Exception as e:
-                sonarr_logger.error(f"Unexpected error for cutoff unmet page {page} (attempt {retry_count+1}): {e}", exc_info=True)
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up after unexpected error and {retries_per_page+1} attempts")
-                    break
+            data = response.json()
+            sonarr_logger.debug(f"Parsed {len(data.get('records', []))} cutoff unmet records from page {page}")
+            return data
+        except json.JSONDecodeError as e:
+            sonarr_logger.error(f"Failed to decode JSON for cutoff unmet page {page}: {e}")
+        except requests.exceptions.Timeout as e:
+            sonarr_logger.error(f"Timeout for cutoff unmet page {page}: {e}")
+        except requests.exceptions.RequestException as e:
+            error_details = f"Error: {e}"
+            if hasattr(e, 'response') and e.response is not None:
+                error_details += f", Status Code: {e.response.status_code}"
+                if hasattr(e.response, 'text') and e.response.text:
+                    error_details += f", Response: {e.response.text[:500]}"
 
-        # If we didn't succeed after all retries or there are no more records, stop pagination
-        if not success or not records:
-            break
-            
-        # Prepare for the next page
-        page += 1
+            sonarr_logger.error(f"Request error for cutoff unmet page {page}: {error_details}")
+        except Exception as e:
+            sonarr_logger.error(f"Unexpected error for cutoff unmet page {page}: {e}", exc_info=True)
+        return None
+
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    all_cutoff_unmet, total_records_reported = http_client.fetch_all_pages(api_url, fetch_page, page_size)
+    if all_cutoff_unmet is None:
+        all_cutoff_unmet = []
+    else:
+        sonarr_logger.info(f"Sonarr API reports {total_records_reported} total cutoff unmet records.")
 
     sonarr_logger.info(f"Total cutoff unmet episodes fetched across all pages: {len(all_cutoff_unmet)}")
 
@@ -551,7 +443,7 @@ def get_cutoff_unmet_episodes_random_page(api_url: str, api_key: str, api_timeou
     
     try:
         # Get total record count from a minimal query
-        response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+        response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
         response.raise_for_status()
         data = response.json()
         total_records = data.get('totalRecords', 0)
@@ -579,7 +471,7 @@ def get_cutoff_unmet_episodes_random_page(api_url: str, api_key: str, api_timeou
             "includeSeries": "true"
         }
         
-        response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+        response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
         response.raise_for_status()
         
         data = response.json()
@@ -619,7 +511,7 @@ def get_missing_episodes_random_page(api_url: str, api_key: str, api_timeout: in
     """
     Get a specified number of random missing episodes by selecting a random page.
     This is more efficient for very large libraries.
-    
+
     Args:
         api_url: The base URL of the Sonarr API
         api_key: The API key for authentication
@@ -627,15 +519,13 @@ def get_missing_episodes_random_page(api_url: str, api_key: str, api_timeout: in
         monitored_only: Whether to include only monitored episodes
         count: How many episodes to return
         series_id: Optional series ID to filter results for a specific series
-        
+
     Returns:
         A list of randomly selected missing episodes, up to the requested count
     """
     endpoint = "wanted/missing"
     page_size = 100  # Smaller page size for better performance
-    retries = 2
-    retry_delay = 3
-    
+
     # First, make a request to get just the total record count (page 1 with size=1)
     params = {
         "page": 1,
@@ -643,126 +533,104 @@ def get_missing_episodes_random_page(api_url: str, api_key: str, api_timeout: in
         "includeSeries": "true"  # Include series info for filtering
     }
     url = f"{api_url}/api/v3/{endpoint}"
-    
-    for attempt in range(retries + 1):
-        try:
-            # Get total record count from a minimal query
-            sonarr_logger.debug(f"Getting missing episodes count (attempt {attempt+1}/{retries+1})")
-            response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
-            response.raise_for_status()
-            
-            if not response.content:
-                sonarr_logger.warning(f"Empty response when getting missing count (attempt {attempt+1})")
-                if attempt < retries:
-                    time.sleep(retry_delay)
-                    continue
-                return []
-                
-            try:
-                data = response.json()
-                total_records = data.get('totalRecords', 0)
-                
-                if total_records == 0:
-                    sonarr_logger.info("No missing episodes found in Sonarr.")
-                    return []
-                    
-                # Calculate total pages with our desired page size
-                total_pages = (total_records + page_size - 1) // page_size
-                sonarr_logger.info(f"Found {total_records} total missing episodes across {total_pages} pages")
-                
-                if total_pages == 0:
-                    return []
-                    
-                # Select a random page
-                import random
-                random_page = random.randint(1, total_pages)
-                sonarr_logger.info(f"Selected random page {random_page} of {total_pages} for missing episodes")
-                
-                # Get episodes from the random page
-                params = {
-                    "page": random_page,
-                    "pageSize": page_size,
-                    "includeSeries": "true"
-                }
-                
-                if series_id is not None:
-                    params["seriesId"] = series_id
-                
-                response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
-                response.raise_for_status()
-                
-                if not response.content:
-                    sonarr_logger.warning(f"Empty response when getting missing episodes page {random_page}")
-                    return []
-                    
-                try:
-                    data = response.json()
-                    records = data.get('records', [])
-                    sonarr_logger.info(f"Retrieved {len(records)} missing episodes from page {random_page}")
-                    
-                    # Apply monitored filter if requested
-                    if monitored_only:
-                        filtered_records = [
-                            ep for ep in records
-                            if ep.get('series', {}).get('monitored', False) and ep.get('monitored', False)
-                        ]
-                        sonarr_logger.debug(f"Filtered to {len(filtered_records)} monitored missing episodes")
-                        records = filtered_records
-                    
-                    # Select random episodes from this page
-                    if len(records) > count:
-                        selected_records = random.sample(records, count)
-                        sonarr_logger.debug(f"Randomly selected {len(selected_records)} missing episodes from page {random_page}")
-                        return selected_records
-                    else:
-                        # If we have fewer episodes than requested, return all of them
-                        sonarr_logger.debug(f"Returning all {len(records)} missing episodes from page {random_page} (fewer than requested {count})")
-                        return records
-                        
-                except json.JSONDecodeError as jde:
-                    sonarr_logger.error(f"Failed to decode JSON response for missing episodes page {random_page}: {str(jde)}")
-                    if attempt < retries:
-                        time.sleep(retry_delay)
-                        continue
-                    return []
-                    
-            except json.JSONDecodeError as jde:
-                sonarr_logger.error(f"Failed to decode JSON response for missing episodes count: {str(jde)}")
-                if attempt < retries:
-                    time.sleep(retry_delay)
-                    continue
-                return []
-                
-        except requests.exceptions.RequestException as e:
-            sonarr_logger.error(f"Error getting missing episodes from Sonarr (attempt {attempt+1}): {str(e)}")
-            if attempt < retries:
-                time.sleep(retry_delay)
-                continue
+
+    # Transient failures are retried with backoff by the shared HTTP client
+    try:
+        # Get total record count from a minimal query
+        sonarr_logger.debug("Getting missing episodes count")
+        response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+        response.raise_for_status()
+
+        if not response.content:
+            sonarr_logger.warning("Empty response when getting missing count")
             return []
-            
-        except Exception as e:
-            sonarr_logger.error(f"Unexpected error getting missing episodes (attempt {attempt+1}): {str(e)}", exc_info=True)
-            if attempt < retries:
-                time.sleep(retry_delay)
-                continue
+
+        data = response.json()
+        total_records = data.get('totalRecords', 0)
+
+        if total_records == 0:
+            sonarr_logger.info("No missing episodes found in Sonarr.")
             return []
-    
-    # If we get here, all retries failed
-    sonarr_logger.error("All attempts to get missing episodes failed")
-    return []
 
-def search_episode(api_url: str, api_key: str, api_timeout: int, episode_ids: List[int]) -> Optional[Union[int, str]]:
+        # Calculate total pages with our desired page size
+        total_pages = (total_records + page_size - 1) // page_size
+        sonarr_logger.info(f"Found {total_records} total missing episodes across {total_pages} pages")
+
+        if total_pages == 0:
+            return []
+
+        # Select a random page
+        import random
+        random_page = random.randint(1, total_pages)
+        sonarr_logger.info(f"Selected random page {random_page} of {total_pages} for missing episodes")
+
+        # Get episodes from the random page
+        params = {
+            "page": random_page,
+            "pageSize": page_size,
+            "includeSeries": "true"
+        }
+
+        if series_id is not None:
+            params["seriesId"] = series_id
+
+        response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+        response.raise_for_status()
+
+        if not response.content:
+            sonarr_logger.warning(f"Empty response when getting missing episodes page {random_page}")
+            return []
+
+        data = response.json()
+        records = data.get('records', [])
+        sonarr_logger.info(f"Retrieved {len(records)} missing episodes from page {random_page}")
+
+        # Apply monitored filter if requested
+        if monitored_only:
+            filtered_records = [
+                ep for ep in records
+                if ep.get('series', {}).get('monitored', False) and ep.get('monitored', False)
+            ]
+            sonarr_logger.debug(f"Filtered to {len(filtered_records)} monitored missing episodes")
+            records = filtered_records
+
+        # Select random episodes from this page
+        if len(records) > count:
+            selected_records = random.sample(records, count)
+            sonarr_logger.debug(f"Randomly selected {len(selected_records)} missing episodes from page {random_page}")
+            return selected_records
+        else:
+            # If we have fewer episodes than requested, return all of them
+            sonarr_logger.debug(f"Returning all {len(records)} missing episodes from page {random_page} (fewer than requested {count})")
+            return records
+
+    except json.JSONDecodeError as jde:
+        sonarr_logger.error(f"Failed to decode JSON response for missing episodes: {str(jde)}")
+        return []
+    except requests.exceptions.RequestException as e:
+        sonarr_logger.error(f"Error getting missing episodes from Sonarr: {str(e)}")
+        return []
+    except Exception as e:
+        sonarr_logger.error(f"Unexpected error getting missing episodes: {str(e)}", exc_info=True)
+        return []
+
+def search_episode(api_url: str, api_key: str, api_timeout: int, episode_ids: List[int],
+                   stop_check: Callable[[], bool] = lambda: False) -> Optional[Union[int, str]]:
     """Trigger a search for specific episodes in Sonarr."""
     if not episode_ids:
         sonarr_logger.warning("No episode IDs provided for search.")
         return None
+    # Wait for the hourly API cap to allow these hits
+    if not rate_limiter.acquire("sonarr", api_url, len(episode_ids), stop_check=stop_check):
+        sonarr_logger.warning(f"Rate limit: skipping search for episode IDs {episode_ids}")
+        return None
     try:
         endpoint = f"{api_url}/api/v3/command"
         payload = {
             "name": "EpisodeSearch",
             "episodeIds": episode_ids
         }
-        response = requests.post(endpoint, headers={"X-Api-Key": api_key}, json=payload, timeout=api_timeout)
+        response = http_client.post(endpoint, headers={"X-Api-Key": api_key}, json=payload, timeout=api_timeout)
         response.raise_for_status()
         command_id = response.json().get('id')
         sonarr_logger.info(f"Triggered Sonarr search for episode IDs: {episode_ids}. Command ID: {command_id}")
@@ -774,69 +642,31 @@ def search_episode(api_url: str, api_key: str, api_timeout: int, episode_ids: Li
         sonarr_logger.error(f"An unexpected error occurred while triggering Sonarr search: {e}")
         return None
 
-def get_command_status(api_url: str, api_key: str, api_timeout: int, command_id: Union[int, str]) -> Optional[Dict[str, Any]]:
-    """Get the status of a Sonarr command."""
+def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int:
+    """Get the current size of the Sonarr download queue."""
+    # Transient failures are retried with backoff by the shared HTTP client
     try:
-        endpoint = f"{api_url}/api/v3/command/{command_id}"
-        response = requests.get(endpoint, headers={"X-Api-Key": api_key}, timeout=api_timeout)
+        endpoint = f"{api_url}/api/v3/queue?page=1&pageSize=1" # Just get total count, don't need records
+        response = http_client.get(endpoint, headers={"X-Api-Key": api_key}, params={"includeSeries": "false"}, timeout=api_timeout)
         response.raise_for_status()
-        status = response.json()
-        sonarr_logger.debug(f"Checked Sonarr command status for ID {command_id}: {status.get('status')}")
-        return status
-    except requests.exceptions.RequestException as e:
-        sonarr_logger.error(f"Error getting Sonarr command status for ID {command_id}: {e}")
-        return None
-    except Exception as e:
-        sonarr_logger.error(f"An unexpected error occurred while getting Sonarr command status: {e}")
-        return None
 
-def get_download_queue_size(api_url: str, api_key: str, api_timeout: int) -> int:
-    """Get the current size of the Sonarr download queue."""
-    retries = 2  # Number of retry attempts
-    retry_delay = 3  # Delay between retries in seconds
-    
-    for attempt in range(retries + 1):
-        try:
-            endpoint = f"{api_url}/api/v3/queue?page=1&pageSize=1" # Just get total count, don't need records
-            response = requests.get(endpoint, headers={"X-Api-Key": api_key}, params={"includeSeries": "false"}, timeout=api_timeout)
-            response.raise_for_status()
-            
-            if not response.content:
-                sonarr_logger.warning(f"Empty response when getting queue size (attempt {attempt+1}/{retries+1})")
-                if attempt < retries:
-                    time.sleep(retry_delay)
-                    continue
-                return -1
-                
-            try:
-                queue_data = response.json()
-                queue_size = queue_data.get('totalRecords', 0)
-                sonarr_logger.debug(f"Sonarr download queue size: {queue_size}")
-                return queue_size
-            except json.JSONDecodeError as jde:
-                sonarr_logger.error(f"Failed to decode queue JSON (attempt {attempt+1}/{retries+1}): {jde}")
-                if attempt < retries:
-                    time.sleep(retry_delay)
-                    continue
-                return -1
-                
-        except requests.exceptions.RequestException as e:
-            sonarr_logger.error(f"Error getting Sonarr download queue size (attempt {attempt+1}/{retries+1}): {e}")
-            if attempt < retries:
-                sonarr_logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                continue
-            return -1  # Return -1 to indicate an error
-        except Exception as e:
-            sonarr_logger.error(f"Unexpected error getting queue size (attempt {attempt+1}/{retries+1}): {e}")
-            if attempt < retries:
-                time.sleep(retry_delay)
-                continue
+        if not response.content:
+            sonarr_logger.warning("Empty response when getting queue size")
             return -1
-            
-    # If we get here, all retries failed
-    sonarr_logger.error(f"All {retries+1} attempts to get download queue size failed")
-    return -1
+
+        queue_data = response.json()
+        queue_size = queue_data.get('totalRecords', 0)
+        sonarr_logger.debug(f"Sonarr download queue size: {queue_size}")
+        return queue_size
+    except json.JSONDecodeError as jde:
+        sonarr_logger.error(f"Failed to decode queue JSON: {jde}")
+        return -1
+    except requests.exceptions.RequestException as e:
+        sonarr_logger.error(f"Error getting Sonarr download queue size: {e}")
+        return -1  # Return -1 to indicate an error
+    except Exception as e:
+        sonarr_logger.error(f"Unexpected error getting queue size: {e}")
+        return -1
 
 def refresh_series(api_url: str, api_key: str, api_timeout: int, series_id: int) -> Optional[Union[int, str]]:
     """Refresh functionality has been removed as it was a performance bottleneck.
@@ -850,7 +680,7 @@ def get_series_by_id(api_url: str, api_key: str, api_timeout: int, series_id: in
     """Get series details by ID from Sonarr."""
     try:
         endpoint = f"{api_url}/api/v3/series/{series_id}"
-        response = requests.get(endpoint, headers={"X-Api-Key": api_key}, timeout=api_timeout)
+        response = http_client.get(endpoint, headers={"X-Api-Key": api_key}, timeout=api_timeout)
         response.raise_for_status()
         series_data = response.json()
         sonarr_logger.debug(f"Fetched details for Sonarr series ID: {series_id}")
@@ -862,8 +692,13 @@ def get_series_by_id(api_url: str, api_key: str, api_timeout: int, series_id: in
         sonarr_logger.error(f"An unexpected error occurred while getting Sonarr series details: {e}")
         return None
 
-def search_season(api_url: str, api_key: str, api_timeout: int, series_id: int, season_number: int) -> Optional[Union[int, str]]:
+def search_season(api_url: str, api_key: str, api_timeout: int, series_id: int, season_number: int,
+                  stop_check: Callable[[], bool] = lambda: False) -> Optional[Union[int, str]]:
     """Trigger a search for a specific season in Sonarr."""
+    # Wait for the hourly API cap to allow this hit
+    if not rate_limiter.acquire("sonarr", api_url, 1, stop_check=stop_check):
+        sonarr_logger.warning(f"Rate limit: skipping season search for series ID {series_id}, season {season_number}")
+        return None
     try:
         endpoint = f"{api_url}/api/v3/command"
         payload = {
@@ -871,7 +706,7 @@ def search_season(api_url: str, api_key: str, api_timeout: int, series_id: int,
             "seriesId": series_id,
             "seasonNumber": season_number
         }
-        response = requests.post(endpoint, headers={"X-Api-Key": api_key}, json=payload, timeout=api_timeout)
+        response = http_client.post(endpoint, headers={"X-Api-Key": api_key}, json=payload, timeout=api_timeout)
         response.raise_for_status()
         command_id = response.json().get('id')
         sonarr_logger.info(f"Triggered Sonarr season search for series ID: {series_id}, season: {season_number}. Command ID: {command_id}")
@@ -886,14 +721,14 @@ def search_season(api_url: str, api_key: str, api_timeout: int, series_id: int,
 def get_cutoff_unmet_episodes_for_series(api_url: str, api_key: str, api_timeout: int, series_id: int, monitored_only: bool = True) -> List[Dict[str, Any]]:
     """
     Get all cutoff unmet episodes for a specific series, handling pagination.
-    
+
     Args:
         api_url: The base URL of the Sonarr API
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         series_id: The series ID to fetch cutoff unmet episodes for
         monitored_only: Whether to include only monitored episodes
-        
+
     Returns:
         A list of all cutoff unmet episodes for the specified series
     """
@@ -901,101 +736,63 @@ def get_cutoff_unmet_episodes_for_series(api_url: str, api_key: str, api_timeout
     page = 1
     page_size = 1000 # Sonarr's max page size for this endpoint
     all_cutoff_unmet = []
-    retries_per_page = 2
-    retry_delay = 3
-    
+
     sonarr_logger.debug(f"Fetching cutoff unmet episodes for series ID {series_id} using direct API filter (monitored_only={monitored_only})")
-    
+
     # Use a more targeted approach with a direct endpoint filter
     while True:
-        retry_count = 0
-        success = False
-        records = []
-        
-        while retry_count <= retries_per_page and not success:
-            # Parameters for the request with series ID as a direct filter
-            params = {
-                "page": page,
-                "pageSize": page_size,
-                "includeSeries": "true", # Include series info for filtering
-                "sortKey": "airDateUtc",
-                "sortDir": "asc",
-                "seriesId": series_id  # Filter by series ID - this limits results to only this series
-            }
-            url = f"{api_url}/api/v3/{endpoint}"
-            sonarr_logger.debug(f"Requesting cutoff unmet page {page} for series {series_id} (attempt {retry_count+1}/{retries_per_page+1})")
-            
-            try:
-                response = requests.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
-                sonarr_logger.debug(f"Sonarr API response status code for cutoff unmet page {page}: {response.status_code}")
-                response.raise_for_status() # Check for HTTP errors
-                
-                if not response.content:
-                    sonarr_logger.warning(f"Empty response for cutoff unmet episodes page {page} (attempt {retry_count+1})")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up on empty response after {retries_per_page+1} attempts")
-                        break
-                        
-                try:
-                    data = response.json()
-                    records = data.get('records', [])
-                    total_records_on_page = len(records)
-                    total_records_reported = data.get('totalRecords', 0)
-                    
-                    if page == 1:
-                        # Don't log the total_records_reported as it's the global count, not series-specific
-                        sonarr_logger.info(f"Fetching cutoff unmet records for series {series_id}...")
-                    
-                    sonarr_logger.debug(f"Parsed {total_records_on_page} cutoff unmet records from page {page}")
-                    
-                    if not records: # No more records found
-                        sonarr_logger.debug(f"No more cutoff unmet records found on page {page}. Stopping pagination.")
-                        success = True
-                        break
-                        
-                    all_cutoff_unmet.extend(records)
-                    
-                    # Check if this was the last page
-                    if total_records_on_page < page_size:
-                        sonarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Last page.")
-                        success = True
-                        break
-                    
-                    # Success for this page
-                    success = True
-                    break
-                    
-                except json.JSONDecodeError as e:
-                    sonarr_logger.error(f"Failed to decode JSON for cutoff unmet page {page} (attempt {retry_count+1}): {e}")
-                    if retry_count < retries_per_page:
-                        retry_count += 1
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        sonarr_logger.error(f"Giving up on JSON decode error after {retries_per_page+1} attempts")
-                        break
-                        
-            except requests.exceptions.RequestException as e:
-                sonarr_logger.error(f"Request error for cutoff unmet page {page} (attempt {retry_count+1}): {e}")
-                if retry_count < retries_per_page:
-                    retry_count += 1
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    sonarr_logger.error(f"Giving up after unexpected error and {retries_per_page+1} attempts")
-                    break  # Exit retry loop
-        
-        # If we didn't succeed after all retries or there are no more records, stop pagination
-        if not success or not records:
+        # Parameters for the request with series ID as a direct filter
+        params = {
+            "page": page,
+            "pageSize": page_size,
+            "includeSeries": "true", # Include series info for filtering
+            "sortKey": "airDateUtc",
+            "sortDir": "asc",
+            "seriesId": series_id  # Filter by series ID - this limits results to only this series
+        }
+        url = f"{api_url}/api/v3/{endpoint}"
+        sonarr_logger.debug(f"Requesting cutoff unmet page {page} for series {series_id}")
+
+        # Transient failures are retried with backoff by the shared HTTP client
+        try:
+            response = http_client.get(url, headers={"X-Api-Key": api_key}, params=params, timeout=api_timeout)
+            sonarr_logger.debug(f"Sonarr API response status code for cutoff unmet page {page}: {response.status_code}")
+            response.raise_for_status() # Check for HTTP errors
+
+            if not response.content:
+                sonarr_logger.error(f"Empty response for cutoff unmet episodes page {page}. Stopping pagination.")
+                break
+
+            data = response.json()
+            records = data.get('records', [])
+            total_records_on_page = len(records)
+        except json.JSONDecodeError as e:
+            sonarr_logger.error(f"Failed to decode JSON for cutoff unmet page {page}: {e}")
             break
-            
+        except requests.exceptions.RequestException as e:
+            sonarr_logger.error(f"Request error for cutoff unmet page {page}: {e}")
+            break
+
+        if page == 1:
+            # Don't log the total_records_reported as it's the global count, not series-specific
+            sonarr_logger.info(f"Fetching cutoff unmet records for series {series_id}...")
+
+        sonarr_logger.debug(f"Parsed {total_records_on_page} cutoff unmet records from page {page}")
+
+        if not records: # No more records found
+            sonarr_logger.debug(f"No more cutoff unmet records found on page {page}. Stopping pagination.")
+            break
+
+        all_cutoff_unmet.extend(records)
+
+        # Check if this was the last page
+        if total_records_on_page < page_size:
+            sonarr_logger.debug(f"Received {total_records_on_page} records (less than page size {page_size}). Last page.")
+            break
+
         # Prepare for the next page
         page += 1
-    
+
     # Double-check that all episodes belong to the requested series
     # (sometimes the API can return episodes from other series)
     verified_episodes = []
@@ -1004,14 +801,14 @@ def get_cutoff_unmet_episodes_for_series(api_url: str, api_key: str, api_timeout
             verified_episodes.append(episode)
         else:
             sonarr_logger.warning(f"Filtered out episode that doesn't belong to series {series_id}")
-    
+
     sonarr_logger.info(f"Found {len(verified_episodes)} cutoff unmet episodes for series {series_id}")
-    
+
     # Apply monitored filter after verifying series
     if monitored_only:
         original_count = len(verified_episodes)
         filtered_episodes = [
-            ep for ep in verified_episodes 
+            ep for ep in verified_episodes
             if ep.get('series', {}).get('monitored', False) and ep.get('monitored', False)
         ]
         sonarr_logger.debug(f"Filtered for monitored_only=True: {len(filtered_episodes)} monitored episodes (out of {original_count} total)")
@@ -1019,11 +816,28 @@ def get_cutoff_unmet_episodes_for_series(api_url: str, api_key: str, api_timeout
     else:
         return verified_episodes
 
-def get_series_with_missing_episodes(api_url: str, api_key: str, api_timeout: int, monitored_only: bool = True, limit: int = 50, random_mode: bool = True) -> List[Dict[str, Any]]:
+def _series_signature(series: Dict[str, Any]) -> List[Any]:
+    """Cheap change signal for a series: its episode statistics and monitored flag."""
+    statistics = series.get('statistics') or {}
+    return [
+        series.get('monitored', False),
+        statistics.get('episodeCount'),
+        statistics.get('episodeFileCount'),
+        statistics.get('totalEpisodeCount'),
+        series.get('previousAiring')
+    ]
+
+def get_series_with_missing_episodes(api_url: str, api_key: str, api_timeout: int, monitored_only: bool = True, limit: int = 50, random_mode: bool = True,
+                                     instance_name: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Get a list of series that have missing episodes, along with missing episode counts per season.
     This is much more efficient than fetching all missing episodes for large libraries.
     
+    When an instance name is given, the missing episodes of every series are kept in
+    the instance's library snapshot. A series' episodes are only re-fetched when its
+    statistics changed, so 'limit' caps the number of episode requests per call
+    rather than the number of series examined.
+    
     Args:
         api_url: The base URL of the Sonarr API
         api_key: The API key for authentication
@@ -1031,24 +845,18 @@ def get_series_with_missing_episodes(api_url: str, api_key: str, api_timeout: in
         monitored_only: Whether to only include monitored series
         limit: Maximum number of series to return
         random_mode: Whether to randomly select series
+        instance_name: Optional instance name used to key the library snapshot
         
     Returns:
         A list of series with missing episodes and counts per season
     """
-    result = []
-    
-    # Step 1: Get all series
-    all_series = get_series(api_url, api_key, api_timeout)
-    if not all_series:
+    # Step 1 & 2: Stream all series, keeping only monitored ones if requested
+    series_filter = (lambda s: s.get('monitored', False)) if monitored_only else None
+    filtered_series = get_series(api_url, api_key, api_timeout, predicate=series_filter)
+    if filtered_series is None:
         sonarr_logger.error("Failed to retrieve series list")
         return []
-        
-    # Step 2: Filter to monitored series if requested
-    if monitored_only:
-        filtered_series = [s for s in all_series if s.get('monitored', False)]
-        sonarr_logger.info(f"Filtered from {len(all_series)} total series to {len(filtered_series)} monitored series")
-    else:
-        filtered_series = all_series
+    sonarr_logger.info(f"Retrieved {len(filtered_series)} series (monitored_only={monitored_only})")
         
     # Apply random selection if requested
     if random_mode:
@@ -1057,72 +865,101 @@ def get_series_with_missing_episodes(api_url: str, api_key: str, api_timeout: in
         random.shuffle(filtered_series)
     else:
         sonarr_logger.info(f"Using SEQUENTIAL selection mode for missing episodes")
+    
+    use_snapshot = bool(instance_name) and library_cache.is_snapshot_enabled()
+    snapshot = library_cache.load_snapshot("sonarr", instance_name, "missing_episodes") if use_snapshot else None
+    if use_snapshot and not library_cache.is_fresh(snapshot):
+        snapshot = None
+    cached_items = dict(snapshot["items"]) if snapshot else {}
+    snapshot_changed = False
         
     # Step 3: For each series, check if it has missing episodes using series/id/episodes endpoint
     # This is much more efficient than using the wanted/missing endpoint
     series_with_missing = []
     examined_count = 0
+    fetched_count = 0
     
-    for series in filtered_series[:limit]:
-        examined_count += 1
+    for series in filtered_series:
         series_id = series.get('id')
         series_title = series.get('title', 'Unknown')
         
         if not series_id:
             continue
-            
-        # Get all episodes for this series
-        try:
-            endpoint = f"{api_url}/api/v3/episode?seriesId={series_id}"
-            response = requests.get(endpoint, headers={"X-Api-Key": api_key}, timeout=api_timeout)
-            response.raise_for_status()
-            
-            if not response.content:
+        
+        signature = _series_signature(series)
+        cached = cached_items.get(str(series_id))
+        if cached is not None and cached.get('signature') == signature:
+            # Unchanged since the snapshot - reuse its missing episodes
+            all_missing = cached.get('episodes', [])
+        else:
+            if fetched_count >= limit:
                 continue
-                
-            episodes = response.json()
+            fetched_count += 1
             
-            # Filter to missing episodes
-            missing_episodes = [
-                e for e in episodes 
-                if e.get('hasFile') is False and 
-                (not monitored_only or e.get('monitored', False))
-            ]
-            
-            if not missing_episodes:
-                continue
+            # Get all episodes for this series
+            try:
+                endpoint = f"{api_url}/api/v3/episode?seriesId={series_id}"
+                response = http_client.get(endpoint, headers={"X-Api-Key": api_key}, timeout=api_timeout)
+                response.raise_for_status()
                 
-            # Group by season
-            seasons_dict = {}
-            for episode in missing_episodes:
-                season_number = episode.get('seasonNumber')
-                if season_number is not None:
-                    if season_number not in seasons_dict:
-                        seasons_dict[season_number] = []
-                    seasons_dict[season_number].append(episode)
+                if not response.content:
+                    continue
+                    
+                episodes = response.json()
+            except Exception as e:
+                sonarr_logger.error(f"Error checking missing episodes for series {series_title} (ID: {series_id}): {str(e)}")
+                continue
             
-            # If we have any seasons with missing episodes, add this series to our result
-            if seasons_dict:
-                missing_info = {
-                    'series_id': series_id,
-                    'series_title': series_title,
-                    'seasons': [
-                        {
-                            'season_number': season,
-                            'episode_count': len(episodes),
-                            'episodes': episodes
-                        }
-                        for season, episodes in seasons_dict.items()
-                    ]
-                }
-                series_with_missing.append(missing_info)
-                
-                sonarr_logger.debug(f"Found series {series_title} with {len(missing_episodes)} missing episodes across {len(seasons_dict)} seasons")
-                
-        except Exception as e:
-            sonarr_logger.error(f"Error checking missing episodes for series {series_title} (ID: {series_id}): {str(e)}")
+            all_missing = [e for e in episodes if e.get('hasFile') is False]
+            if use_snapshot:
+                cached_items[str(series_id)] = {'signature': signature, 'episodes': all_missing}
+                snapshot_changed = True
+        
+        examined_count += 1
+        
+        # Filter to missing episodes
+        missing_episodes = [
+            e for e in all_missing
+            if not monitored_only or e.get('monitored', False)
+        ]
+        
+        if not missing_episodes:
             continue
+            
+        # Group by season
+        seasons_dict = {}
+        for episode in missing_episodes:
+            season_number = episode.get('seasonNumber')
+            if season_number is not None:
+                if season_number not in seasons_dict:
+                    seasons_dict[season_number] = []
+                seasons_dict[season_number].append(episode)
+        
+        # If we have any seasons with missing episodes, add this series to our result
+        if seasons_dict:
+            missing_info = {
+                'series_id': series_id,
+                'series_title': series_title,
+                'seasons': [
+                    {
+                        'season_number': season,
+                        'episode_count': len(episodes),
+                        'episodes': episodes
+                    }
+                    for season, episodes in seasons_dict.items()
+                ]
+            }
+            series_with_missing.append(missing_info)
+            
+            sonarr_logger.debug(f"Found series {series_title} with {len(missing_episodes)} missing episodes across {len(seasons_dict)} seasons")
+    
+    if use_snapshot and (snapshot_changed or snapshot is None):
+        # Drop series that no longer exist (or are no longer monitored) from the snapshot
+        current_ids = {str(series.get('id')) for series in filtered_series}
+        cached_items = {series_id: entry for series_id, entry in cached_items.items() if series_id in current_ids}
+        extra = {"refreshed_at": snapshot.get("refreshed_at", snapshot["fetched_at"])} if snapshot else {}
+        library_cache.save_snapshot("sonarr", instance_name, "missing_episodes", cached_items, **extra)
     
     selection_mode = "RANDOM" if random_mode else "SEQUENTIAL"        
-    sonarr_logger.info(f"Examined {examined_count} series ({selection_mode} mode) and found {len(series_with_missing)} with missing episodes")
+    sonarr_logger.info(f"Examined {examined_count} series ({selection_mode} mode, {fetched_count} fetched) and found {len(series_with_missing)} with missing episodes")
     return series_with_missing
\ No newline at end of file
@@ -5,38 +5,57 @@ Sonarr missing episodes processing module for Huntarr
 
 import time
 import random
-from typing import List, Dict, Any, Set, Callable
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
+from src.primary.utils.command_tracker import queue_command
 from src.primary.apps.sonarr import api as sonarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
-from src.primary.utils.history_utils import log_processed_media
-from src.primary.settings_manager import load_settings, get_advanced_setting
+from src.primary.stateful_manager import filter_unprocessed, add_processed_id, mark_processed_many
+from src.primary.utils.history_utils import log_processed_media, log_processed_media_batch
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the Sonarr app
 sonarr_logger = get_logger("sonarr")
 
+def episode_media_name(episode: Dict[str, Any], include_series: bool = True) -> str:
+    """Format an episode as "Series - S01E02 - Title" for history entries."""
+    season_number = episode.get('seasonNumber', 'Unknown Season')
+    episode_number = episode.get('episodeNumber', 'Unknown Episode')
+    try:
+        season_episode = f"S{season_number:02d}E{episode_number:02d}"
+    except (ValueError, TypeError):
+        season_episode = f"S{season_number}E{episode_number}"
+    media_name = f"{season_episode} - {episode.get('title', 'Unknown Episode')}"
+    if include_series:
+        media_name = f"{episode.get('series', {}).get('title', 'Unknown Series')} - {media_name}"
+    return media_name
+
 def process_missing_episodes(
     api_url: str,
     api_key: str,
     instance_name: str,
-    api_timeout: int = get_advanced_setting("api_timeout", 120),
     monitored_only: bool = True,
     skip_future_episodes: bool = True,
 
     hunt_missing_items: int = 5,
     hunt_missing_mode: str = "episodes",
-    command_wait_delay: int = get_advanced_setting("command_wait_delay", 1),
-    command_wait_attempts: int = get_advanced_setting("command_wait_attempts", 600),
-    stop_check: Callable[[], bool] = lambda: False
+    stop_check: Callable[[], bool] = lambda: False,
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process missing episodes in Sonarr and trigger searches
     Added support for multiple missing modes (episodes, seasons, shows)
+    The API timeout and command wait settings come from cycle_settings (built on the spot if not given).
     """
     if hunt_missing_items <= 0:
         sonarr_logger.info("'hunt_missing_items' setting is 0 or less. Skipping missing processing.")
         return False
+
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("sonarr")
+    api_timeout = cycle_settings.api_timeout
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
         
     sonarr_logger.info(f"Checking for {hunt_missing_items} missing episodes in {hunt_missing_mode} mode...")
 
@@ -106,13 +125,8 @@ def process_missing_episodes_mode(
             sonarr_logger.info(f"Skipped {skipped_count} future episodes based on air date.")
     
     # Filter out already processed episodes for random selection approach
-    unprocessed_episodes = []
-    for episode in episodes_to_search:
-        episode_id = str(episode.get("id"))
-        if not is_processed("sonarr", instance_name, episode_id):
-            unprocessed_episodes.append(episode)
-        else:
-            sonarr_logger.debug(f"Skipping already processed episode ID: {episode_id}")
+    unprocessed_ids = set(filter_unprocessed("sonarr", instance_name, [str(episode.get("id")) for episode in episodes_to_search]))
+    unprocessed_episodes = [episode for episode in episodes_to_search if str(episode.get("id")) in unprocessed_ids]
     
     sonarr_logger.info(f"Found {len(unprocessed_episodes)} unprocessed missing episodes out of {len(episodes_to_search)} total.")
     episodes_to_search = unprocessed_episodes
@@ -143,6 +157,7 @@ def process_missing_episodes_mode(
     # Group episodes by series for potential refresh
     series_to_refresh: Dict[int, List[int]] = {}
     series_titles: Dict[int, str] = {} # Store titles for logging
+    episodes_by_id: Dict[int, Dict[str, Any]] = {episode['id']: episode for episode in episodes_to_search}
     for episode in episodes_to_search:
         series_id = episode.get('seriesId')
         if series_id:
@@ -164,59 +179,27 @@ def process_missing_episodes_mode(
 
         # Trigger search for the selected episodes in this series
         sonarr_logger.debug(f"Attempting to search for episode IDs: {episode_ids}")
-        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids)
+        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids, stop_check=stop_check)
 
         if search_command_id:
             # Add episode IDs to stateful manager IMMEDIATELY after processing each batch
-            for episode_id in episode_ids:
-                # Force flush to disk by calling add_processed_id immediately for each ID
-                success = add_processed_id("sonarr", instance_name, str(episode_id))
-                sonarr_logger.debug(f"Added processed ID: {episode_id}, success: {success}")
+            success = mark_processed_many("sonarr", instance_name, episode_ids)
+            sonarr_logger.debug(f"Added processed IDs: {episode_ids}, success: {success}")
             
-            # Wait for search command to complete
-            if wait_for_command(
-                api_url, api_key, api_timeout, search_command_id,
-                command_wait_delay, command_wait_attempts, "Episode Search", stop_check
-            ):
-                # Mark episodes as processed if search command completed successfully
-                processed_any = True # Mark that we did something
-                sonarr_logger.info(f"Successfully processed and searched for {len(episode_ids)} episodes in series {series_id}.")
-                
-                # Add stats incrementing right here - this is the code path that's actually being executed
-                for episode_id in episode_ids:
-                    # Increment stat for each episode individually, just like Radarr
-                    increment_stat("sonarr", "hunted")
-                    sonarr_logger.info(f"*** STATS INCREMENT *** sonarr hunted by 1 for episode ID {episode_id}")
-                
-                # Log to history system
-                # Find the corresponding episode data for this ID
-                for episode in episodes_to_search:
-                    if episode.get('id') == episode_id:
-                        series_title = episode.get('series', {}).get('title', 'Unknown Series')
-                        episode_title = episode.get('title', 'Unknown Episode')
-                        season_number = episode.get('seasonNumber', 'Unknown Season')
-                        episode_number = episode.get('episodeNumber', 'Unknown Episode')
-                        
-                        try:
-                            season_episode = f"S{season_number:02d}E{episode_number:02d}"
-                        except (ValueError, TypeError):
-                            season_episode = f"S{season_number}E{episode_number}"
-                            
-                        media_name = f"{series_title} - {season_episode} - {episode_title}"
-                        process_id = f"{series_id}_{episode_id}"
-                        add_processed_id("sonarr", instance_name, process_id)
-                        log_processed_media("sonarr", media_name, episode_id, instance_name, "missing")
-                        
-                        # Increment the stat for each episode individually (like Radarr does for movies)
-                        increment_stat("sonarr", "hunted")
-                        sonarr_logger.debug(f"Incremented sonarr hunted statistic for episode {episode_id}")
-                        break
-                
-                # The batch increment was causing issues - removing it
-                # increment_stat("sonarr", "hunted", len(episode_ids))
-                # sonarr_logger.debug(f"Incremented sonarr hunted statistics by {len(episode_ids)}")
-            else:
-                sonarr_logger.warning(f"Episode search command (ID: {search_command_id}) for series {series_id} did not complete successfully or timed out. Episodes will not be marked as processed yet.")
+            processed_any = True
+            
+            # Count the batch once and log its episodes to history in a single write
+            increment_stat("sonarr", "hunted", len(episode_ids), instance_name=instance_name)
+            history_items = [(episode_media_name(episodes_by_id[episode_id]), episode_id) for episode_id in episode_ids]
+            log_processed_media_batch("sonarr", history_items, instance_name, "missing")
+            
+            def on_complete(series_title=series_title, episode_ids=episode_ids):
+                # Runs on the tracker thread once the search command completed successfully
+                sonarr_logger.info(f"Search for {len(episode_ids)} missing episodes in {series_title} completed.")
+            
+            # Tracked in the background, on_complete runs once the command completed
+            queue_command("sonarr", api_url, api_key, search_command_id, "Episode Search", on_complete,
+                          wait_delay=command_wait_delay, wait_attempts=command_wait_attempts, api_timeout=api_timeout)
         else:
             sonarr_logger.error(f"Failed to trigger search command for episodes {episode_ids} in series {series_id}.")
 
@@ -275,13 +258,8 @@ def process_missing_seasons_packs_mode(
     seasons_list.sort(key=lambda x: x['episode_count'], reverse=True)
     
     # Filter out already processed seasons
-    unprocessed_seasons = []
-    for season in seasons_list:
-        season_id = f"{season['series_id']}_{season['season_number']}"
-        if not is_processed("sonarr", instance_name, season_id):
-            unprocessed_seasons.append(season)
-        else:
-            sonarr_logger.debug(f"Skipping already processed season ID: {season_id}")
+    unprocessed_ids = set(filter_unprocessed("sonarr", instance_name, [f"{season['series_id']}_{season['season_number']}" for season in seasons_list]))
+    unprocessed_seasons = [season for season in seasons_list if f"{season['series_id']}_{season['season_number']}" in unprocessed_ids]
     
     sonarr_logger.info(f"Found {len(unprocessed_seasons)} unprocessed seasons with missing episodes out of {len(seasons_list)} total.")
     
@@ -321,7 +299,7 @@ def process_missing_seasons_packs_mode(
         sonarr_logger.info(f"Searching for season pack: {series_title} - Season {season_number} (contains {episode_count} missing episodes)")
         
         # Trigger an API call to search for the entire season
-        command_id = sonarr_api.search_season(api_url, api_key, api_timeout, series_id, season_number)
+        command_id = sonarr_api.search_season(api_url, api_key, api_timeout, series_id, season_number, stop_check=stop_check)
         
         if command_id:
             processed_any = True
@@ -339,16 +317,8 @@ def process_missing_seasons_packs_mode(
             
             # Increment stats one by one instead of in a batch
             for i in range(episode_count):
-                increment_stat("sonarr", "hunted")
+                increment_stat("sonarr", "hunted", instance_name=instance_name)
             sonarr_logger.debug(f"Incremented sonarr hunted statistics for {episode_count} episodes in season pack")
-            
-            # Wait for command to complete if configured
-            if command_wait_delay > 0 and command_wait_attempts > 0:
-                if wait_for_command(
-                    api_url, api_key, api_timeout, command_id, 
-                    command_wait_delay, command_wait_attempts, "Season Search", stop_check
-                ):
-                    pass
         else:
             sonarr_logger.error(f"Failed to trigger search for {series_title}.")
     
@@ -373,20 +343,15 @@ def process_missing_shows_mode(
     # Get series with missing episodes
     sonarr_logger.info("Retrieving series with missing episodes...")
     series_with_missing = sonarr_api.get_series_with_missing_episodes(
-        api_url, api_key, api_timeout, monitored_only, random_mode=True)
+        api_url, api_key, api_timeout, monitored_only, random_mode=True, instance_name=instance_name)
     
     if not series_with_missing:
         sonarr_logger.info("No series with missing episodes found.")
         return False
     
     # Filter out shows that have been processed
-    unprocessed_series = []
-    for series in series_with_missing:
-        series_id = str(series.get("series_id"))
-        if not is_processed("sonarr", instance_name, series_id):
-            unprocessed_series.append(series)
-        else:
-            sonarr_logger.debug(f"Skipping already processed series ID: {series_id}")
+    unprocessed_ids = set(filter_unprocessed("sonarr", instance_name, [str(series.get("series_id")) for series in series_with_missing]))
+    unprocessed_series = [series for series in series_with_missing if str(series.get("series_id")) in unprocessed_ids]
     
     sonarr_logger.info(f"Found {len(unprocessed_series)} unprocessed series with missing episodes out of {len(series_with_missing)} total.")
     
@@ -463,35 +428,21 @@ def process_missing_shows_mode(
         
         # Search for all episodes in the show
         sonarr_logger.info(f"Searching for {len(episode_ids)} missing episodes for {show_title}...")
-        search_successful = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids)
+        search_successful = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids, stop_check=stop_check)
         
         if search_successful:
             processed_any = True
             sonarr_logger.info(f"Successfully processed {len(episode_ids)} missing episodes in {show_title}")
             
             # Add episode IDs to stateful manager IMMEDIATELY after processing each batch
-            for episode_id in episode_ids:
-                # Force flush to disk by calling add_processed_id immediately for each ID
-                success = add_processed_id("sonarr", instance_name, str(episode_id))
-                sonarr_logger.debug(f"Added processed ID: {episode_id}, success: {success}")
-                
-                # Log each episode to history
-                # Find the corresponding episode data 
-                for episode in missing_episodes:
-                    if episode.get('id') == episode_id:
-                        season = episode.get('seasonNumber', 'Unknown')
-                        ep_num = episode.get('episodeNumber', 'Unknown')
-                        title = episode.get('title', 'Unknown Title')
-                        
-                        try:
-                            season_episode = f"S{season:02d}E{ep_num:02d}"
-                        except (ValueError, TypeError):
-                            season_episode = f"S{season}E{ep_num}"
-                            
-                        media_name = f"{show_title} - {season_episode} - {title}"
-                        log_processed_media("sonarr", media_name, str(episode_id), instance_name, "missing")
-                        sonarr_logger.debug(f"Logged history entry for episode: {media_name}")
-                        break
+            success = mark_processed_many("sonarr", instance_name, episode_ids)
+            sonarr_logger.debug(f"Added processed IDs: {episode_ids}, success: {success}")
+
+            # Log the episodes to history with a single write
+            history_items = [(f"{show_title} - {episode_media_name(episode, include_series=False)}", str(episode['id']))
+                             for episode in missing_episodes if episode.get('id')]
+            log_processed_media_batch("sonarr", history_items, instance_name, "missing")
+            sonarr_logger.debug(f"Logged history entries for {len(history_items)} episodes of {show_title}")
             
             # Add series ID to processed list
             success = add_processed_id("sonarr", instance_name, str(show_id))
@@ -503,72 +454,10 @@ def process_missing_shows_mode(
             sonarr_logger.debug(f"Logged history entry for complete series: {media_name}")
             
             # Increment the hunted statistics
-            increment_stat("sonarr", "hunted", len(episode_ids))
+            increment_stat("sonarr", "hunted", len(episode_ids), instance_name=instance_name)
             sonarr_logger.debug(f"Incremented sonarr hunted statistics by {len(episode_ids)}")
         else:
             sonarr_logger.error(f"Failed to trigger search for {show_title}.")
     
     sonarr_logger.info("Show-based missing episode processing complete.")
     return processed_any
-
-def wait_for_command(
-    api_url: str,
-    api_key: str,
-    api_timeout: int,
-    command_id: int,
-    wait_delay: int,
-    max_attempts: int,
-    command_name: str = "Command",
-    stop_check: Callable[[], bool] = lambda: False
-) -> bool:
-    """
-    Wait for a Sonarr command to complete or timeout.
-    
-    Args:
-        api_url: The Sonarr API URL
-        api_key: The Sonarr API key
-        api_timeout: API request timeout
-        command_id: The ID of the command to monitor
-        wait_delay: Seconds to wait between status checks
-        max_attempts: Maximum number of status check attempts
-        command_name: Name of the command (for logging)
-        stop_check: Optional function to check if operation should be aborted
-        
-    Returns:
-        True if command completed successfully, False otherwise
-    """
-    if wait_delay <= 0 or max_attempts <= 0:
-        sonarr_logger.debug(f"Not waiting for command to complete (wait_delay={wait_delay}, max_attempts={max_attempts})")
-        return True  # Return as if successful since we're not checking
-    
-    sonarr_logger.debug(f"Waiting for {command_name} to complete (command ID: {command_id}). Checking every {wait_delay}s for up to {max_attempts} attempts")
-    
-    # Wait for command completion
-    attempts = 0
-    while attempts < max_attempts:
-        if stop_check():
-            sonarr_logger.info(f"Stopping wait for {command_name} due to stop request")
-            return False
-            
-        command_status = sonarr_api.get_command_status(api_url, api_key, api_timeout, command_id)
-        if not command_status:
-            sonarr_logger.warning(f"Failed to get status for {command_name} (ID: {command_id}), attempt {attempts+1}")
-            attempts += 1
-            time.sleep(wait_delay)
-            continue
-            
-        status = command_status.get('status')
-        if status == 'completed':
-            sonarr_logger.debug(f"Sonarr {command_name} (ID: {command_id}) completed successfully")
-            return True
-        elif status in ['failed', 'aborted']:
-            sonarr_logger.warning(f"Sonarr {command_name} (ID: {command_id}) {status}")
-            return False
-        
-        sonarr_logger.debug(f"Sonarr {command_name} (ID: {command_id}) status: {status}, attempt {attempts+1}/{max_attempts}")
-        
-        attempts += 1
-        time.sleep(wait_delay)
-    
-    sonarr_logger.error(f"Sonarr command '{command_name}' (ID: {command_id}) timed out after {max_attempts} attempts.")
-    return False
\ No newline at end of file
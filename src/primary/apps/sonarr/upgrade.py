@@ -5,13 +5,15 @@ Sonarr cutoff upgrade processing module for Huntarr
 
 import time
 import random
-from typing import List, Dict, Any, Set, Callable, Union
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
+from src.primary.utils.command_tracker import queue_command
 from src.primary.apps.sonarr import api as sonarr_api
 from src.primary.stats_manager import increment_stat
-from src.primary.stateful_manager import is_processed, add_processed_id
-from src.primary.utils.history_utils import log_processed_media
-from src.primary.settings_manager import get_advanced_setting
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
+from src.primary.utils.history_utils import log_processed_media, log_processed_media_batch
+from src.primary.apps.sonarr.missing import episode_media_name
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the Sonarr app
 sonarr_logger = get_logger("sonarr")
@@ -20,22 +22,27 @@ def process_cutoff_upgrades(
     api_url: str,
     api_key: str,
     instance_name: str,
-    api_timeout: int = get_advanced_setting("api_timeout", 120),
     monitored_only: bool = True,
     # series_type: str = "standard",  # TODO: Add series type filtering (standard, daily, anime)
     hunt_upgrade_items: int = 5,
     upgrade_mode: str = "episodes",
-    command_wait_delay: int = get_advanced_setting("command_wait_delay", 1),
-    command_wait_attempts: int = get_advanced_setting("command_wait_attempts", 600),
-    stop_check: Callable[[], bool] = lambda: False
+    stop_check: Callable[[], bool] = lambda: False,
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process quality cutoff upgrades for Sonarr.
     This can use either episodes mode or shows mode for upgrades based on the upgrade_mode setting.
+    The API timeout and command wait settings come from cycle_settings (built on the spot if not given).
     """
     if hunt_upgrade_items <= 0:
         sonarr_logger.info("'hunt_upgrade_items' setting is 0 or less. Skipping upgrade processing.")
         return False
+
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("sonarr")
+    api_timeout = cycle_settings.api_timeout
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
         
     sonarr_logger.info(f"Checking for {hunt_upgrade_items} quality upgrades...")
     
@@ -68,9 +75,6 @@ def process_upgrade_episodes_mode(
     """Process upgrades in episode mode (original implementation)."""
     processed_any = False
     
-    # For episodes mode, we want individual episode history entries
-    skip_episode_history = False
-    
     # Always use the efficient random page selection method
     sonarr_logger.debug(f"Using random selection for cutoff unmet episodes")
     episodes_to_search = sonarr_api.get_cutoff_unmet_episodes_random_page(
@@ -97,13 +101,8 @@ def process_upgrade_episodes_mode(
         sonarr_logger.info(f"Skipped {skipped_count} future episodes based on air date for upgrades.")
     
     # Filter out already processed episodes for random selection approach
-    unprocessed_episodes = []
-    for episode in episodes_to_search:
-        episode_id = str(episode.get("id"))
-        if not is_processed("sonarr", instance_name, episode_id):
-            unprocessed_episodes.append(episode)
-        else:
-            sonarr_logger.debug(f"Skipping already processed episode ID for upgrade: {episode_id}")
+    unprocessed_ids = set(filter_unprocessed("sonarr", instance_name, [str(episode.get("id")) for episode in episodes_to_search]))
+    unprocessed_episodes = [episode for episode in episodes_to_search if str(episode.get("id")) in unprocessed_ids]
         
     sonarr_logger.info(f"Found {len(unprocessed_episodes)} unprocessed cutoff unmet episodes out of {len(episodes_to_search)} total.")
     episodes_to_search = unprocessed_episodes
@@ -139,6 +138,7 @@ def process_upgrade_episodes_mode(
     # Group episodes by series for potential refresh
     series_to_process: Dict[int, List[int]] = {}
     series_titles: Dict[int, str] = {} # Store titles for logging
+    episodes_by_id: Dict[int, Dict[str, Any]] = {episode['id']: episode for episode in episodes_to_search}
     for episode in episodes_to_search:
         series_id = episode.get('seriesId')
         if series_id:
@@ -163,86 +163,49 @@ def process_upgrade_episodes_mode(
 
         # Trigger search for the selected episodes in this series
         sonarr_logger.debug(f"Attempting upgrade search for episode IDs: {episode_ids}")
-        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids)
+        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids, stop_check=stop_check)
 
         if search_command_id:
-            # Wait for search command to complete
-            if wait_for_command(
-                api_url, api_key, api_timeout, search_command_id,
-                command_wait_delay, command_wait_attempts, "Episode Upgrade Search", stop_check
-            ):
-                # Mark episodes as processed if search command completed successfully
-                processed_any = True # Mark that we did something
-                sonarr_logger.info(f"Successfully processed and searched for {len(episode_ids)} episodes in series {series_id}.")
-                
-                # Add stats incrementing right here - this is the code path that's actually being executed
-                for episode_id in episode_ids:
-                    # Increment stat for each episode individually, just like Radarr
-                    increment_stat("sonarr", "upgraded")
-                    sonarr_logger.info(f"*** STATS INCREMENT *** sonarr upgraded by 1 for episode ID {episode_id}")
-                
-                # Mark episodes as processed using stateful management
-                for episode_id in episode_ids:
-                    add_processed_id("sonarr", instance_name, str(episode_id))
-                    sonarr_logger.debug(f"Marked episode ID {episode_id} as processed for upgrades")
-                    
-                    # Find the episode information for history logging
-                    # We need to get the episode details from the API to include proper info in history
-                    try:
-                        episode_details = sonarr_api.get_episode(api_url, api_key, api_timeout, episode_id)
-                        if episode_details:
-                            series_title = episode_details.get('series', {}).get('title', 'Unknown Series')
-                            episode_title = episode_details.get('title', 'Unknown Episode')
-                            season_number = episode_details.get('seasonNumber', 'Unknown Season')
-                            episode_number = episode_details.get('episodeNumber', 'Unknown Episode')
-                            
-                            try:
-                                season_episode = f"S{season_number:02d}E{episode_number:02d}"
-                            except (ValueError, TypeError):
-                                season_episode = f"S{season_number}E{episode_number}"
-                                
-                            # Record the upgrade in history with quality upgrade identifier
-                            media_name = f"{series_title} - {season_episode} - {episode_title}"
-                            # Skip logging individual episodes since we log the season pack
-                            if not skip_episode_history:
-                                log_processed_media("sonarr", media_name, episode_id, instance_name, "upgrade")
-                            sonarr_logger.debug(f"Logged quality upgrade to history for episode ID {episode_id}")
-                    except Exception as e:
-                        sonarr_logger.error(f"Failed to log history for episode ID {episode_id}: {str(e)}")
-            else:
-                sonarr_logger.warning(f"Episode upgrade search command (ID: {search_command_id}) for series {series_id} did not complete successfully or timed out. Episodes will not be marked as processed yet.")
+            processed_any = True
+            
+            # Count the batch once, mark it and log its episodes to history in a single write
+            increment_stat("sonarr", "upgraded", len(episode_ids), instance_name=instance_name)
+            mark_processed_many("sonarr", instance_name, episode_ids, "upgrade")
+            sonarr_logger.debug(f"Marked episode IDs {episode_ids} as processed for upgrades")
+            history_items = [(episode_media_name(episodes_by_id[episode_id]), episode_id) for episode_id in episode_ids]
+            log_processed_media_batch("sonarr", history_items, instance_name, "upgrade")
+            
+            def on_complete(series_title=series_title, episode_ids=episode_ids):
+                # Runs on the tracker thread once the search command completed successfully
+                sonarr_logger.info(f"Upgrade search for {len(episode_ids)} episodes in {series_title} completed.")
+            
+            # Tracked in the background, on_complete runs once the command completed
+            queue_command("sonarr", api_url, api_key, search_command_id, "Episode Upgrade Search", on_complete,
+                          wait_delay=command_wait_delay, wait_attempts=command_wait_attempts, api_timeout=api_timeout)
         else:
             sonarr_logger.error(f"Failed to trigger upgrade search command for episodes {episode_ids} in series {series_id}.")
 
     sonarr_logger.info("Finished quality cutoff upgrades processing cycle for Sonarr.")
     return processed_any
 
-def log_season_pack_upgrade(api_url: str, api_key: str, api_timeout: int, series_id: int, season_number: int, instance_name: str):
+def log_season_pack_upgrade(series_id: int, series_title: str, season_number: int, instance_name: str):
     """Log a season pack upgrade to the history."""
+    # Format season number for display
     try:
-        # Get series details for better history logging
-        series_details = sonarr_api.get_series(api_url, api_key, api_timeout, series_id)
-        if series_details:
-            series_title = series_details.get('title', f"Series ID {series_id}")
-            
-            # Format season number for display
-            try:
-                season_id = f"S{season_number:02d}" if isinstance(season_number, int) else f"S{season_number}"
-            except (ValueError, TypeError):
-                season_id = f"S{season_number}"
-            
-            # Use the season ID directly - format as series_id + season number
-            # This matches how Sonarr would identify a season
-            season_id_num = f"{series_id}_{season_number}"
-            
-            # Create a descriptive name for the history entry
-            media_name = f"{series_title} - {season_id} - COMPLETE SEASON PACK"
-            
-            # Log the season pack upgrade to history with normal 'upgrade' operation type
-            log_processed_media("sonarr", media_name, season_id_num, instance_name, "upgrade")
-            sonarr_logger.debug(f"Logged season pack upgrade to history for {series_title} Season {season_number}")
-    except Exception as e:
-        sonarr_logger.error(f"Failed to log season pack upgrade to history: {str(e)}")
+        season_id = f"S{season_number:02d}" if isinstance(season_number, int) else f"S{season_number}"
+    except (ValueError, TypeError):
+        season_id = f"S{season_number}"
+    
+    # Use the season ID directly - format as series_id + season number
+    # This matches how Sonarr would identify a season
+    season_id_num = f"{series_id}_{season_number}"
+    
+    # Create a descriptive name for the history entry
+    media_name = f"{series_title} - {season_id} - COMPLETE SEASON PACK"
+    
+    # Log the season pack upgrade to history with normal 'upgrade' operation type
+    log_processed_media("sonarr", media_name, season_id_num, instance_name, "upgrade")
+    sonarr_logger.debug(f"Logged season pack upgrade to history for {series_title} Season {season_number}")
 
 def process_upgrade_seasons_mode(
     api_url: str,
@@ -259,9 +222,6 @@ def process_upgrade_seasons_mode(
     """Process upgrades in season mode - groups episodes by season."""
     processed_any = False
     
-    # Flag to skip individual episode history logging since we log the whole season pack
-    skip_episode_history = True
-    
     # Use the efficient random page selection method to get a sample of cutoff unmet episodes
     sonarr_logger.debug(f"Using random page selection for cutoff unmet episodes")
     # Request slightly more episodes than needed to ensure we have enough for a few seasons
@@ -345,59 +305,24 @@ def process_upgrade_seasons_mode(
             
         # Trigger search for the entire season instead of individual episodes
         sonarr_logger.debug(f"Attempting to search for entire Season {season_number} of {series_title} for upgrades")
-        search_command_id = sonarr_api.search_season(api_url, api_key, api_timeout, series_id, season_number)
+        search_command_id = sonarr_api.search_season(api_url, api_key, api_timeout, series_id, season_number, stop_check=stop_check)
         
         if search_command_id:
-            # Wait for search command to complete
-            if wait_for_command(
-                api_url, api_key, api_timeout, search_command_id,
-                command_wait_delay, command_wait_attempts, "Episode Upgrade Search", stop_check
-            ):
-                # Mark as processed if search command completed successfully
-                processed_any = True
-                sonarr_logger.info(f"Successfully triggered season pack search for {series_title} Season {season_number} with {len(episode_ids)} cutoff unmet episodes")
-                
-                # Log this as a season pack upgrade in the history
-                log_season_pack_upgrade(api_url, api_key, api_timeout, series_id, season_number, instance_name)
-                
-                # We'll increment stats individually for each episode instead of in batch
-                # increment_stat("sonarr", "upgraded", len(episode_ids))
-                # sonarr_logger.debug(f"Incremented sonarr upgraded statistics by {len(episode_ids)}")
-                
-                # Mark episodes as processed using stateful management
-                for episode_id in episode_ids:
-                    add_processed_id("sonarr", instance_name, str(episode_id))
-                    sonarr_logger.debug(f"Marked episode ID {episode_id} as processed for upgrades")
-                    
-                    # Increment stats for this episode (consistent with Radarr's approach)
-                    increment_stat("sonarr", "upgraded")
-                    sonarr_logger.debug(f"Incremented sonarr upgraded statistic for episode {episode_id}")
-                    
-                    # Find the episode information for history logging
-                    # We need to get the episode details from the API to include proper info in history
-                    try:
-                        episode_details = sonarr_api.get_episode(api_url, api_key, api_timeout, episode_id)
-                        if episode_details:
-                            series_title = episode_details.get('series', {}).get('title', 'Unknown Series')
-                            episode_title = episode_details.get('title', 'Unknown Episode')
-                            season_number = episode_details.get('seasonNumber', 'Unknown Season')
-                            episode_number = episode_details.get('episodeNumber', 'Unknown Episode')
-                            
-                            try:
-                                season_episode = f"S{season_number:02d}E{episode_number:02d}"
-                            except (ValueError, TypeError):
-                                season_episode = f"S{season_number}E{episode_number}"
-                                
-                            # Record the upgrade in history with quality upgrade identifier
-                            media_name = f"{series_title} - {season_episode} - {episode_title}"
-                            # Skip logging individual episodes since we log the season pack
-                            if not skip_episode_history:
-                                log_processed_media("sonarr", media_name, episode_id, instance_name, "upgrade")
-                            sonarr_logger.debug(f"Logged quality upgrade to history for episode ID {episode_id}")
-                    except Exception as e:
-                        sonarr_logger.error(f"Failed to log history for episode ID {episode_id}: {str(e)}")
-            else:
-                sonarr_logger.warning(f"Season pack search command for {series_title} Season {season_number} did not complete successfully")
+            processed_any = True
+            
+            # Count the batch once, mark it and log the season pack to history
+            increment_stat("sonarr", "upgraded", len(episode_ids), instance_name=instance_name)
+            mark_processed_many("sonarr", instance_name, episode_ids, "upgrade")
+            sonarr_logger.debug(f"Marked episode IDs {episode_ids} as processed for upgrades")
+            log_season_pack_upgrade(series_id, series_title, season_number, instance_name)
+            
+            def on_complete(series_title=series_title, season_number=season_number, episode_ids=episode_ids):
+                # Runs on the tracker thread once the search command completed successfully
+                sonarr_logger.info(f"Season pack search for {series_title} Season {season_number} ({len(episode_ids)} cutoff unmet episodes) completed.")
+            
+            # Tracked in the background, on_complete runs once the command completed
+            queue_command("sonarr", api_url, api_key, search_command_id, "Episode Upgrade Search", on_complete,
+                          wait_delay=command_wait_delay, wait_attempts=command_wait_attempts, api_timeout=api_timeout)
         else:
             sonarr_logger.error(f"Failed to trigger season pack search command for {series_title} Season {season_number}")
     
@@ -419,9 +344,6 @@ def process_upgrade_shows_mode(
     """Process upgrades in show mode - gets all cutoff unmet episodes for entire shows."""
     processed_any = False
     
-    # For shows mode, we want individual episode history entries
-    skip_episode_history = False
-    
     # Use the efficient random page selection method to get a sample of cutoff unmet episodes
     sonarr_logger.debug(f"Using random page selection for cutoff unmet episodes in shows mode")
     # Request slightly more episodes than needed to ensure we have enough for a few shows
@@ -518,122 +440,27 @@ def process_upgrade_shows_mode(
             
         # Trigger search for all cutoff unmet episodes in this series
         sonarr_logger.debug(f"Attempting to search for {len(episode_ids)} episodes in {series_title} for upgrades")
-        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids)
+        search_command_id = sonarr_api.search_episode(api_url, api_key, api_timeout, episode_ids, stop_check=stop_check)
         
         if search_command_id:
-            # Wait for search command to complete
-            if wait_for_command(
-                api_url, api_key, api_timeout, search_command_id,
-                command_wait_delay, command_wait_attempts, "Episode Upgrade Search", stop_check
-            ):
-                # Mark as processed if search command completed successfully
-                processed_any = True
-                sonarr_logger.info(f"Successfully processed {len(episode_ids)} cutoff unmet episodes in {series_title}")
-                
-                # We'll increment stats individually for each episode instead of in batch
-                # increment_stat("sonarr", "upgraded", len(episode_ids))
-                # sonarr_logger.debug(f"Incremented sonarr upgraded statistics by {len(episode_ids)}")
-                
-                # Mark episodes as processed using stateful management
-                for episode_id in episode_ids:
-                    add_processed_id("sonarr", instance_name, str(episode_id))
-                    sonarr_logger.debug(f"Marked episode ID {episode_id} as processed for upgrades")
-                    
-                    # Increment stats for this episode (consistent with Radarr's approach)
-                    increment_stat("sonarr", "upgraded")
-                    sonarr_logger.debug(f"Incremented sonarr upgraded statistic for episode {episode_id}")
-                    
-                    # Find the episode information for history logging
-                    # We need to get the episode details from the API to include proper info in history
-                    try:
-                        episode_details = sonarr_api.get_episode(api_url, api_key, api_timeout, episode_id)
-                        if episode_details:
-                            series_title = episode_details.get('series', {}).get('title', 'Unknown Series')
-                            episode_title = episode_details.get('title', 'Unknown Episode')
-                            season_number = episode_details.get('seasonNumber', 'Unknown Season')
-                            episode_number = episode_details.get('episodeNumber', 'Unknown Episode')
-                            
-                            try:
-                                season_episode = f"S{season_number:02d}E{episode_number:02d}"
-                            except (ValueError, TypeError):
-                                season_episode = f"S{season_number}E{episode_number}"
-                                
-                            # Record the upgrade in history with quality upgrade identifier
-                            media_name = f"{series_title} - {season_episode} - {episode_title}"
-                            # Skip logging individual episodes since we log the season pack
-                            if not skip_episode_history:
-                                log_processed_media("sonarr", media_name, episode_id, instance_name, "upgrade")
-                            sonarr_logger.debug(f"Logged quality upgrade to history for episode ID {episode_id}")
-                    except Exception as e:
-                        sonarr_logger.error(f"Failed to log history for episode ID {episode_id}: {str(e)}")
-            else:
-                sonarr_logger.warning(f"Episode upgrade search command for {series_title} did not complete successfully")
+            processed_any = True
+            
+            # Count the batch once, mark it and log its episodes to history in a single write
+            increment_stat("sonarr", "upgraded", len(episode_ids), instance_name=instance_name)
+            mark_processed_many("sonarr", instance_name, episode_ids, "upgrade")
+            sonarr_logger.debug(f"Marked episode IDs {episode_ids} as processed for upgrades")
+            history_items = [(episode_media_name(episode), episode["id"]) for episode in all_series_episodes]
+            log_processed_media_batch("sonarr", history_items, instance_name, "upgrade")
+            
+            def on_complete(series_title=series_title, episode_ids=episode_ids):
+                # Runs on the tracker thread once the search command completed successfully
+                sonarr_logger.info(f"Upgrade search for {len(episode_ids)} cutoff unmet episodes in {series_title} completed.")
+            
+            # Tracked in the background, on_complete runs once the command completed
+            queue_command("sonarr", api_url, api_key, search_command_id, "Episode Upgrade Search", on_complete,
+                          wait_delay=command_wait_delay, wait_attempts=command_wait_attempts, api_timeout=api_timeout)
         else:
             sonarr_logger.error(f"Failed to trigger upgrade search command for {series_title}")
     
     sonarr_logger.info("Finished quality cutoff upgrades processing cycle (show mode) for Sonarr.")
     return processed_any
-
-def wait_for_command(
-    api_url: str,
-    api_key: str,
-    api_timeout: int,
-    command_id: Union[int, str],
-    wait_delay: int,
-    max_attempts: int,
-    command_name: str = "Command",
-    stop_check: Callable[[], bool] = lambda: False
-) -> bool:
-    """
-    Wait for a Sonarr command to complete or timeout.
-    
-    Args:
-        api_url: The Sonarr API URL
-        api_key: The Sonarr API key
-        api_timeout: API request timeout
-        command_id: The ID of the command to monitor
-        wait_delay: Seconds to wait between status checks
-        max_attempts: Maximum number of status check attempts
-        command_name: Name of the command (for logging)
-        stop_check: Optional function to check if operation should be aborted
-        
-    Returns:
-        True if command completed successfully, False otherwise
-    """
-    if wait_delay <= 0 or max_attempts <= 0:
-        sonarr_logger.debug(f"Not waiting for command to complete (wait_delay={wait_delay}, max_attempts={max_attempts})")
-        return True  # Return as if successful since we're not checking
-    
-    sonarr_logger.debug(f"Waiting for {command_name} to complete (command ID: {command_id}). Checking every {wait_delay}s for up to {max_attempts} attempts")
-    
-    # Wait for command completion
-    attempts = 0
-    while attempts < max_attempts:
-        if stop_check():
-            sonarr_logger.info(f"Stopping wait for {command_name} due to stop request")
-            return False
-            
-        command_status = sonarr_api.get_command_status(api_url, api_key, api_timeout, command_id)
-        
-        if command_status is None: 
-            sonarr_logger.warning(
-                f"Failed to get status for {command_name} (ID: {command_id}), attempt {attempts+1}. "
-                f"Command may have already completed or the ID is no longer valid."
-            )
-            return False # Stop polling if command ID is not found or error occurs
-            
-        status = command_status.get('status')
-        if status == 'completed':
-            sonarr_logger.debug(f"Sonarr {command_name} (ID: {command_id}) completed successfully")
-            return True
-        elif status in ['failed', 'aborted']:
-            sonarr_logger.warning(f"Sonarr {command_name} (ID: {command_id}) {status}")
-            return False
-        
-        sonarr_logger.debug(f"Sonarr {command_name} (ID: {command_id}) status: {status}, attempt {attempts+1}/{max_attempts}")
-        
-        attempts += 1
-        time.sleep(wait_delay)
-    
-    sonarr_logger.error(f"Sonarr command '{command_name}' (ID: {command_id}) timed out after {max_attempts} attempts.")
-    return False
\ No newline at end of file
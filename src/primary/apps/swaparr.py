@@ -4,11 +4,12 @@ Handles stalled downloads in Starr apps based on the original Swaparr applicatio
 """
 
 from flask import Blueprint, request, jsonify
-import os
-import json
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import load_settings, save_settings
 from src.primary.apps.swaparr.handler import process_stalled_downloads
+from src.primary.apps.swaparr.strike_engine import strike_engine
+from src.primary.repositories import swaparr_repository
+from src.primary.cycle_settings import SwaparrSettings
 from src.primary.apps.radarr import get_configured_instances as get_radarr_instances
 from src.primary.apps.sonarr import get_configured_instances as get_sonarr_instances
 from src.primary.apps.lidarr import get_configured_instances as get_lidarr_instances
@@ -50,35 +51,8 @@ def get_status():
     settings = load_settings("swaparr")
     enabled = settings.get("enabled", False)
     
-    # Get strike statistics from all app state directories
-    statistics = {}
-    # Use the cross-platform path from handler module
-    from src.primary.apps.swaparr.handler import SWAPARR_STATE_DIR
-    state_dir = SWAPARR_STATE_DIR
-    
-    if os.path.exists(state_dir):
-        for app_name in os.listdir(state_dir):
-            app_dir = os.path.join(state_dir, app_name)
-            if os.path.isdir(app_dir):
-                strike_file = os.path.join(app_dir, "strikes.json")
-                if os.path.exists(strike_file):
-                    try:
-                        with open(strike_file, 'r') as f:
-                            strike_data = json.load(f)
-                            
-                        total_items = len(strike_data)
-                        removed_items = sum(1 for item in strike_data.values() if item.get("removed", False))
-                        striked_items = sum(1 for item in strike_data.values() 
-                                          if item.get("strikes", 0) > 0 and not item.get("removed", False))
-                        
-                        statistics[app_name] = {
-                            "total_tracked": total_items,
-                            "currently_striked": striked_items,
-                            "removed": removed_items
-                        }
-                    except (json.JSONDecodeError, IOError) as e:
-                        swaparr_logger.error(f"Error reading strike data for {app_name}: {str(e)}")
-                        statistics[app_name] = {"error": str(e)}
+    # Get strike statistics of every app from the runtime database
+    statistics = swaparr_repository.get_statistics()
     
     return jsonify({
         "enabled": enabled,
@@ -127,42 +101,20 @@ def reset_strikes():
     data = request.json
     app_name = data.get('app_name') if data else None
     
-    # Use the cross-platform path from handler module
-    from src.primary.apps.swaparr.handler import SWAPARR_STATE_DIR
-    state_dir = SWAPARR_STATE_DIR
-    
-    if not os.path.exists(state_dir):
-        return jsonify({"success": True, "message": "No strike data to reset"})
+    deleted = strike_engine.reset_strikes(app_name)
+    if deleted is None:
+        target = app_name or "all apps"
+        return jsonify({"success": False, "message": f"Failed to reset strikes for {target}"}), 500
     
     if app_name:
         # Reset strikes for a specific app
-        app_dir = os.path.join(state_dir, app_name)
-        if os.path.exists(app_dir):
-            strike_file = os.path.join(app_dir, "strikes.json")
-            if os.path.exists(strike_file):
-                try:
-                    os.remove(strike_file)
-                    swaparr_logger.info(f"Reset strikes for {app_name}")
-                    return jsonify({"success": True, "message": f"Strikes reset for {app_name}"})
-                except IOError as e:
-                    swaparr_logger.error(f"Error resetting strikes for {app_name}: {str(e)}")
-                    return jsonify({"success": False, "message": f"Failed to reset strikes for {app_name}: {str(e)}"}), 500
-        return jsonify({"success": False, "message": f"No strike data found for {app_name}"}), 404
-    else:
-        # Reset strikes for all apps
-        try:
-            for app_name in os.listdir(state_dir):
-                app_dir = os.path.join(state_dir, app_name)
-                if os.path.isdir(app_dir):
-                    strike_file = os.path.join(app_dir, "strikes.json")
-                    if os.path.exists(strike_file):
-                        os.remove(strike_file)
-            
-            swaparr_logger.info("Reset all strikes")
-            return jsonify({"success": True, "message": "All strikes reset"})
-        except IOError as e:
-            swaparr_logger.error(f"Error resetting all strikes: {str(e)}")
-            return jsonify({"success": False, "message": f"Failed to reset all strikes: {str(e)}"}), 500
+        if not deleted:
+            return jsonify({"success": False, "message": f"No strike data found for {app_name}"}), 404
+        swaparr_logger.info(f"Reset strikes for {app_name}")
+        return jsonify({"success": True, "message": f"Strikes reset for {app_name}"})
+    
+    swaparr_logger.info("Reset all strikes")
+    return jsonify({"success": True, "message": "All strikes reset"})
 
 def is_configured():
     """Check if Swaparr has any configured Starr app instances"""
@@ -179,7 +131,10 @@ def run_swaparr():
     
     instances = get_configured_instances()
     
+    # Parse the settings once for all instances
+    swaparr_settings = SwaparrSettings.from_settings(settings)
+    
     # Process stalled downloads for each app type and instance
     for app_name, app_instances in instances.items():
         for app_settings in app_instances:
-            process_stalled_downloads(app_name, app_settings, settings)
+            process_stalled_downloads(app_name, app_settings, swaparr_settings)
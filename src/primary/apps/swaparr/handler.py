@@ -3,85 +3,25 @@ Implementation of the swaparr functionality to detect and remove stalled downloa
 Based on the functionality provided by https://github.com/ThijmenGThN/swaparr
 """
 
-import os
-import json
 import time
 import hashlib
-from datetime import datetime, timedelta
 import requests
 
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import load_settings
-from src.primary.state import get_state_file_path
+from src.primary.cycle_settings import SwaparrSettings
+from src.primary.utils import http_client
+from src.primary import queue_cache
+from src.primary.apps.swaparr.strike_engine import strike_engine, REREMOVE_WINDOW
 
 # Create logger
 swaparr_logger = get_logger("swaparr")
 
-# Use the centralized path configuration
-from src.primary.utils.config_paths import SWAPARR_DIR
-
-# Use cross-platform path for state directory
-SWAPARR_STATE_DIR = str(SWAPARR_DIR)  # Convert to string for compatibility with os.path
-
-def ensure_state_directory(app_name):
-    """Ensure the state directory exists for tracking strikes for a specific app"""
-    app_state_dir = os.path.join(SWAPARR_STATE_DIR, app_name)
-    if not os.path.exists(app_state_dir):
-        os.makedirs(app_state_dir, exist_ok=True)
-        swaparr_logger.info(f"Created swaparr state directory for {app_name}: {app_state_dir}")
-    return app_state_dir
-
-def load_strike_data(app_name):
-    """Load strike data for a specific app"""
-    app_state_dir = ensure_state_directory(app_name)
-    strike_file = os.path.join(app_state_dir, "strikes.json")
-    
-    if not os.path.exists(strike_file):
-        return {}
-    
-    try:
-        with open(strike_file, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError) as e:
-        swaparr_logger.error(f"Error loading strike data for {app_name}: {str(e)}")
-        return {}
-
-def save_strike_data(app_name, strike_data):
-    """Save strike data for a specific app"""
-    app_state_dir = ensure_state_directory(app_name)
-    strike_file = os.path.join(app_state_dir, "strikes.json")
-    
-    try:
-        with open(strike_file, 'w') as f:
-            json.dump(strike_data, f, indent=2)
-    except IOError as e:
-        swaparr_logger.error(f"Error saving strike data for {app_name}: {str(e)}")
-
-def load_removed_items(app_name):
-    """Load list of permanently removed items"""
-    app_state_dir = ensure_state_directory(app_name)
-    removed_file = os.path.join(app_state_dir, "removed_items.json")
-    
-    if not os.path.exists(removed_file):
-        return {}
-    
-    try:
-        with open(removed_file, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError) as e:
-        swaparr_logger.error(f"Error loading removed items for {app_name}: {str(e)}")
-        return {}
-
-def save_removed_items(app_name, removed_items):
-    """Save list of permanently removed items"""
-    app_state_dir = ensure_state_directory(app_name)
-    removed_file = os.path.join(app_state_dir, "removed_items.json")
-    
-    try:
-        with open(removed_file, 'w') as f:
-            json.dump(removed_items, f, indent=2)
-    except IOError as e:
-        swaparr_logger.error(f"Error saving removed items for {app_name}: {str(e)}")
+# What a pass does with a queue item (see classify_item)
+VERDICT_IGNORE_SIZE = "Ignored (Size)"
+VERDICT_DELAYED = "Ignored (Delayed)"
+VERDICT_QUEUED = "Queued"
+VERDICT_ACTIVE = "Active"
 
 def generate_item_hash(item):
     """Generate a unique hash for an item based on its name and size.
@@ -143,54 +83,10 @@ def parse_size_string_to_bytes(size_string):
         return 25 * 1024 * 1024 * 1024
 
 def get_queue_items(app_name, api_url, api_key, api_timeout=120):
-    """Get download queue items from a Starr app API with pagination support"""
-    api_version_map = {
-        "radarr": "v3",
-        "sonarr": "v3",
-        "lidarr": "v1",
-        "readarr": "v1",
-        "whisparr": "v3"
-    }
-    
-    api_version = api_version_map.get(app_name, "v3")
-    
-    # Initialize an empty list to store all records
-    all_records = []
-    
-    # Start with page 1
-    page = 1
-    page_size = 100  # Request a large page size to reduce API calls
-    
-    while True:
-        # Add pagination parameters
-        queue_url = f"{api_url.rstrip('/')}/api/{api_version}/queue?page={page}&pageSize={page_size}"
-        headers = {'X-Api-Key': api_key}
-        
-        try:
-            response = requests.get(queue_url, headers=headers, timeout=api_timeout)
-            response.raise_for_status()
-            queue_data = response.json()
-            
-            if api_version in ["v3"]:  # Radarr, Sonarr, Whisparr use v3
-                records = queue_data.get("records", [])
-                total_records = queue_data.get("totalRecords", 0)
-            else:  # Lidarr, Readarr use v1
-                records = queue_data
-                total_records = len(records)
-            
-            # Add this page's records to our collection
-            all_records.extend(records)
-            
-            # If we've fetched all records or there are no more, break the loop
-            if len(all_records) >= total_records or len(records) == 0:
-                break
-            
-            # Otherwise, move to the next page
-            page += 1
-            
-        except requests.exceptions.RequestException as e:
-            swaparr_logger.error(f"Error fetching queue for {app_name} (page {page}): {str(e)}")
-            break
+    """Get download queue items from a Starr app API.
+    Reuses the queue snapshot the hunt loop's queue size check took this cycle, if any."""
+    snapshot = queue_cache.get_queue(app_name, api_url, api_key, api_timeout)
+    all_records = snapshot.records if snapshot is not None else []
     
     swaparr_logger.info(f"Fetched {len(all_records)} queue items for {app_name}")
     
@@ -257,20 +153,12 @@ def parse_queue_items(records, item_type, app_name):
 
 def delete_download(app_name, api_url, api_key, download_id, remove_from_client=True, api_timeout=120):
     """Delete a download from a Starr app"""
-    api_version_map = {
-        "radarr": "v3",
-        "sonarr": "v3",
-        "lidarr": "v1",
-        "readarr": "v1",
-        "whisparr": "v3"
-    }
-    
-    api_version = api_version_map.get(app_name, "v3")
+    api_version = queue_cache.get_queue_api_version(app_name)
     delete_url = f"{api_url.rstrip('/')}/api/{api_version}/queue/{download_id}?removeFromClient={str(remove_from_client).lower()}&blocklist=true"
     headers = {'X-Api-Key': api_key}
     
     try:
-        response = requests.delete(delete_url, headers=headers, timeout=api_timeout)
+        response = http_client.delete(delete_url, headers=headers, timeout=api_timeout)
         response.raise_for_status()
         swaparr_logger.info(f"Successfully removed download {download_id} from {app_name}")
         return True
@@ -278,24 +166,67 @@ def delete_download(app_name, api_url, api_key, download_id, remove_from_client=
         swaparr_logger.error(f"Error removing download {download_id} from {app_name}: {str(e)}")
         return False
 
+def delete_downloads(app_name, api_url, api_key, download_ids, remove_from_client=True, api_timeout=120):
+    """Delete several downloads from a Starr app with one request to the queue/bulk endpoint.
+    Falls back to one request per download if the bulk request fails.
+    Returns the set of download IDs that were removed."""
+    download_ids = list(download_ids)
+    if len(download_ids) <= 1:
+        return {download_id for download_id in download_ids
+                if delete_download(app_name, api_url, api_key, download_id, remove_from_client, api_timeout)}
+    
+    api_version = queue_cache.get_queue_api_version(app_name)
+    bulk_url = f"{api_url.rstrip('/')}/api/{api_version}/queue/bulk?removeFromClient={str(remove_from_client).lower()}&blocklist=true"
+    headers = {'X-Api-Key': api_key}
+    
+    try:
+        response = http_client.delete(bulk_url, headers=headers, json={"ids": download_ids}, timeout=api_timeout)
+        response.raise_for_status()
+        swaparr_logger.info(f"Successfully removed {len(download_ids)} downloads from {app_name}")
+        return set(download_ids)
+    except requests.exceptions.RequestException as e:
+        swaparr_logger.warning(f"Bulk removal from {app_name} failed, removing downloads one at a time: {str(e)}")
+    
+    return {download_id for download_id in download_ids
+            if delete_download(app_name, api_url, api_key, download_id, remove_from_client, api_timeout)}
+
+def classify_item(item, ignore_above_size, max_download_time):
+    """Decide what a pass does with a queue item, from the item alone.
+    Returns a (verdict, strike reason) tuple; the strike reason is None if the item is not stalled."""
+    if item["size"] >= ignore_above_size:
+        return VERDICT_IGNORE_SIZE, None
+    
+    # Handle delayed items - we'll skip these
+    if item["status"] == "delay":
+        return VERDICT_DELAYED, None
+    
+    # Special handling for "queued" status
+    # We only skip truly queued items, not those with metadata issues
+    metadata_issue = "metadata" in item["status"].lower() or "metadata" in item["error_message"].lower()
+    if item["status"] == "queued" and not metadata_issue:
+        return VERDICT_QUEUED, None
+    
+    # Strike if metadata issue, eta too long, or no progress (eta = 0 and not queued)
+    if metadata_issue:
+        return VERDICT_ACTIVE, "Metadata"
+    if item["eta"] >= max_download_time:
+        return VERDICT_ACTIVE, "ETA too long"
+    if item["eta"] == 0 and item["status"] not in ["queued", "delay"]:
+        return VERDICT_ACTIVE, "No progress"
+    return VERDICT_ACTIVE, None
+
 def process_stalled_downloads(app_name, app_settings, swaparr_settings=None):
-    """Process stalled downloads for a specific app instance"""
-    if not swaparr_settings:
-        swaparr_settings = load_settings("swaparr")
+    """Process stalled downloads for a specific app instance.
+    swaparr_settings can be a SwaparrSettings from the cycle snapshot or a raw settings dict."""
+    if not isinstance(swaparr_settings, SwaparrSettings):
+        swaparr_settings = SwaparrSettings.from_settings(swaparr_settings or load_settings("swaparr"))
     
-    if not swaparr_settings or not swaparr_settings.get("enabled", False):
+    if not swaparr_settings.enabled:
         swaparr_logger.debug(f"Swaparr is disabled, skipping {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
         return
     
     swaparr_logger.info(f"Processing stalled downloads for {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
     
-    # Get settings
-    max_strikes = swaparr_settings.get("max_strikes", 3)
-    max_download_time = parse_time_string_to_seconds(swaparr_settings.get("max_download_time", "2h"))
-    ignore_above_size = parse_size_string_to_bytes(swaparr_settings.get("ignore_above_size", "25GB"))
-    remove_from_client = swaparr_settings.get("remove_from_client", True)
-    dry_run = swaparr_settings.get("dry_run", False)
-    
     api_url = app_settings.get("api_url")
     api_key = app_settings.get("api_key")
     api_timeout = app_settings.get("api_timeout", 120)
@@ -304,133 +235,141 @@ def process_stalled_downloads(app_name, app_settings, swaparr_settings=None):
         swaparr_logger.error(f"Missing API URL or API Key for {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
         return
     
-    # Load existing strike data
-    strike_data = load_strike_data(app_name)
+    instance_name = app_settings.get("instance_name", "Default")
+    store = strike_engine.get_store(app_name, instance_name)
+    if store is None:
+        swaparr_logger.error(f"Could not load strike data for {app_name} instance: {instance_name}")
+        return
+    
+    with store.lock:
+        _process_queue(store, app_name, api_url, api_key, api_timeout, swaparr_settings)
+        
+        # Write only the records that changed during this pass
+        if not store.persist():
+            swaparr_logger.error(f"Error saving strike data for {app_name} instance: {instance_name}")
+    
+    # The queue changes from here on; the next cycle fetches it again
+    queue_cache.invalidate(app_name, api_url, api_key)
+    
+    swaparr_logger.info(f"Finished processing stalled downloads for {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
+
+def _process_queue(store, app_name, api_url, api_key, api_timeout, swaparr_settings):
+    """Strike and remove the stalled downloads of one instance's queue. Caller holds store.lock.
     
-    # Load list of permanently removed items
-    removed_items = load_removed_items(app_name)
+    Queue entries whose fingerprint did not change since the last pass keep their
+    cached item hash and verdict. A stalled download is one that does not change,
+    so an unchanged entry with a strike reason still gets its strike every pass.
+    Downloads to remove are collected and removed with one bulk request."""
+    # Get settings (durations and sizes are parsed once per cycle)
+    max_strikes = swaparr_settings.max_strikes
+    max_download_time = swaparr_settings.max_download_time
+    ignore_above_size = swaparr_settings.ignore_above_size
+    remove_from_client = swaparr_settings.remove_from_client
+    dry_run = swaparr_settings.dry_run
     
-    # Clean up expired removed items (older than 30 days)
-    now = datetime.utcnow()
-    for item_hash in list(removed_items.keys()):
-        removed_date = datetime.fromisoformat(removed_items[item_hash]["removed_time"].replace('Z', '+00:00'))
-        if (now - removed_date) > timedelta(days=30):
-            swaparr_logger.debug(f"Removing expired entry from removed items list: {removed_items[item_hash]['name']}")
-            del removed_items[item_hash]
+    now = time.time()
+    
+    # Forget removed items older than 30 days
+    store.evict_expired(now)
     
     # Get current queue items
     queue_items = get_queue_items(app_name, api_url, api_key, api_timeout)
     
     if not queue_items:
-        swaparr_logger.info(f"No queue items found for {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
+        swaparr_logger.info(f"No queue items found for {app_name} instance: {store.instance_name}")
+        store.queue_entries = {}
         return
     
-    # Keep track of items still in queue for cleanup
-    current_item_ids = set(item["id"] for item in queue_items)
+    # Cached verdicts are only valid for the settings they were made with
+    rules = (ignore_above_size, max_download_time)
+    if store.queue_rules != rules:
+        store.queue_entries = {}
+        store.queue_rules = rules
+    previous_entries = store.queue_entries
+    queue_entries = {}
     
-    # Clean up items that are no longer in the queue
-    for item_id in list(strike_data.keys()):
-        if int(item_id) not in current_item_ids:
-            swaparr_logger.debug(f"Removing item {item_id} from strike list as it's no longer in the queue")
-            del strike_data[item_id]
+    # (item, item hash, reason, strike record or None if re-removed) of the downloads to remove
+    removals = []
+    unchanged = 0
     
     # Process each queue item
     for item in queue_items:
-        item_id = str(item["id"])
         item_state = "Normal"
-        item_hash = generate_item_hash(item)
+        fingerprint = (item["name"], item["size"], item["status"], item["eta"], item["error_message"])
+        cached = previous_entries.get(item["id"])
+        if cached is not None and cached[0] == fingerprint:
+            _, item_hash, (verdict, strike_reason) = cached
+            unchanged += 1
+        else:
+            item_hash = generate_item_hash(item)
+            verdict, strike_reason = classify_item(item, ignore_above_size, max_download_time)
+            cached = None
+        if item["id"] is not None:
+            queue_entries[item["id"]] = (fingerprint, item_hash, (verdict, strike_reason))
+        
+        record = store.get_record(item_hash)
+        if record is not None:
+            # Seen this pass; not worth a write on its own
+            record.last_seen = now
         
         # Check if this item has been previously removed
-        if item_hash in removed_items:
-            last_removed_date = datetime.fromisoformat(removed_items[item_hash]["removed_time"].replace('Z', '+00:00'))
-            days_since_removal = (now - last_removed_date).days
+        removed_item = store.get_removed(item_hash)
+        if removed_item is not None:
+            seconds_since_removal = now - removed_item.removed_time
             
             # Re-remove it automatically if it's been less than 7 days since last removal
-            if days_since_removal < 7:
+            if seconds_since_removal < REREMOVE_WINDOW:
+                days_since_removal = int(seconds_since_removal // 86400)
                 swaparr_logger.warning(f"Found previously removed download that reappeared: {item['name']} (removed {days_since_removal} days ago)")
                 
                 if not dry_run:
-                    if delete_download(app_name, api_url, api_key, item["id"], remove_from_client, api_timeout):
-                        swaparr_logger.info(f"Re-removed previously removed download: {item['name']}")
-                        # Update the removal time
-                        removed_items[item_hash]["removed_time"] = datetime.utcnow().isoformat()
+                    removals.append((item, item_hash, removed_item.reason, None))
                 else:
                     swaparr_logger.info(f"DRY RUN: Would have re-removed previously removed download: {item['name']}")
                 
                 item_state = "Re-removed" if not dry_run else "Would Re-remove (Dry Run)"
                 continue
         
-        # Skip large files if configured
-        if item["size"] >= ignore_above_size:
-            swaparr_logger.debug(f"Ignoring large download: {item['name']} ({item['size']} bytes > {ignore_above_size} bytes)")
-            item_state = "Ignored (Size)"
-            continue
-        
-        # Handle delayed items - we'll skip these
-        if item["status"] == "delay":
-            swaparr_logger.debug(f"Ignoring delayed download: {item['name']}")
-            item_state = "Ignored (Delayed)"
+        # Skip large and delayed downloads (logged only when the entry changed)
+        if verdict in (VERDICT_IGNORE_SIZE, VERDICT_DELAYED):
+            if cached is None:
+                if verdict == VERDICT_IGNORE_SIZE:
+                    swaparr_logger.debug(f"Ignoring large download: {item['name']} ({item['size']} bytes > {ignore_above_size} bytes)")
+                else:
+                    swaparr_logger.debug(f"Ignoring delayed download: {item['name']}")
             continue
         
-        # Special handling for "queued" status
-        # We only skip truly queued items, not those with metadata issues
-        metadata_issue = "metadata" in item["status"].lower() or "metadata" in item["error_message"].lower()
-        
-        if item["status"] == "queued" and not metadata_issue:
+        if verdict == VERDICT_QUEUED:
             # For regular queued items, check how long they've been in strike data
-            if item_id in strike_data and "first_strike_time" in strike_data[item_id]:
-                first_strike = datetime.fromisoformat(strike_data[item_id]["first_strike_time"].replace('Z', '+00:00'))
-                if (now - first_strike) < timedelta(hours=1):
+            if record is not None and record.first_strike_time is not None:
+                if now - record.first_strike_time < 3600:
                     # Skip if it's been less than 1 hour since first seeing it
                     swaparr_logger.debug(f"Ignoring recently queued download: {item['name']}")
                     item_state = "Ignored (Recently Queued)"
                     continue
             else:
                 # Initialize with first strike time for queued items
-                if item_id not in strike_data:
-                    strike_data[item_id] = {
-                        "strikes": 0,
-                        "name": item["name"],
-                        "first_strike_time": datetime.utcnow().isoformat(),
-                        "last_strike_time": None
-                    }
+                if record is None:
+                    store.add_record(item_hash, item["id"], item["name"], now)
                 swaparr_logger.debug(f"Monitoring new queued download: {item['name']}")
                 item_state = "Monitoring (Queued)"
                 continue
         
         # Initialize strike count if not already in strike data
-        if item_id not in strike_data:
-            strike_data[item_id] = {
-                "strikes": 0,
-                "name": item["name"],
-                "first_strike_time": datetime.utcnow().isoformat(),
-                "last_strike_time": None
-            }
-        
-        # Check if download should be striked
-        should_strike = False
-        strike_reason = ""
-        
-        # Strike if metadata issue, eta too long, or no progress (eta = 0 and not queued)
-        if metadata_issue:
-            should_strike = True
-            strike_reason = "Metadata"
-        elif item["eta"] >= max_download_time:
-            should_strike = True
-            strike_reason = "ETA too long"
-        elif item["eta"] == 0 and item["status"] not in ["queued", "delay"]:
-            should_strike = True
-            strike_reason = "No progress"
+        if record is None:
+            record = store.add_record(item_hash, item["id"], item["name"], now)
         
         # If we should strike this item, add a strike
-        if should_strike:
-            strike_data[item_id]["strikes"] += 1
-            strike_data[item_id]["last_strike_time"] = datetime.utcnow().isoformat()
+        if strike_reason:
+            record.strikes += 1
+            record.last_strike_time = time.time()
+            record.item_id = item["id"]
             
-            if strike_data[item_id]["first_strike_time"] is None:
-                strike_data[item_id]["first_strike_time"] = datetime.utcnow().isoformat()
+            if record.first_strike_time is None:
+                record.first_strike_time = record.last_strike_time
+            store.mark_dirty(item_hash)
             
-            current_strikes = strike_data[item_id]["strikes"]
+            current_strikes = record.strikes
             swaparr_logger.info(f"Added strike ({current_strikes}/{max_strikes}) to {item['name']} - Reason: {strike_reason}")
             
             # If max strikes reached, remove the download
@@ -438,20 +377,7 @@ def process_stalled_downloads(app_name, app_settings, swaparr_settings=None):
                 swaparr_logger.warning(f"Max strikes reached for {item['name']}, removing download")
                 
                 if not dry_run:
-                    if delete_download(app_name, api_url, api_key, item["id"], remove_from_client, api_timeout):
-                        swaparr_logger.info(f"Successfully removed {item['name']} after {max_strikes} strikes")
-                        
-                        # Keep the item in strike data for reference but mark as removed
-                        strike_data[item_id]["removed"] = True
-                        strike_data[item_id]["removed_time"] = datetime.utcnow().isoformat()
-                        
-                        # Add to removed items list for persistent tracking
-                        removed_items[item_hash] = {
-                            "name": item["name"],
-                            "size": item["size"],
-                            "removed_time": datetime.utcnow().isoformat(),
-                            "reason": strike_reason
-                        }
+                    removals.append((item, item_hash, strike_reason, record))
                 else:
                     swaparr_logger.info(f"DRY RUN: Would have removed {item['name']} after {max_strikes} strikes")
                 
@@ -459,12 +385,30 @@ def process_stalled_downloads(app_name, app_settings, swaparr_settings=None):
             else:
                 item_state = f"Striked ({current_strikes}/{max_strikes})"
         
-        swaparr_logger.debug(f"Processed download: {item['name']} - State: {item_state}")
-    
-    # Save updated strike data
-    save_strike_data(app_name, strike_data)
-    
-    # Save updated removed items list
-    save_removed_items(app_name, removed_items)
+        if cached is None or strike_reason:
+            swaparr_logger.debug(f"Processed download: {item['name']} - State: {item_state}")
+    
+    store.queue_entries = queue_entries
+    swaparr_logger.debug(f"{unchanged} of {len(queue_items)} queue items unchanged since the last pass")
+    
+    # Remove every download that is due in one request
+    if removals:
+        removed_ids = delete_downloads(app_name, api_url, api_key, [item["id"] for item, _, _, _ in removals],
+                                       remove_from_client, api_timeout)
+        removed_time = time.time()
+        for item, item_hash, reason, record in removals:
+            if item["id"] not in removed_ids:
+                continue
+            if record is None:
+                swaparr_logger.info(f"Re-removed previously removed download: {item['name']}")
+            else:
+                swaparr_logger.info(f"Successfully removed {item['name']} after {max_strikes} strikes")
+                # Keep the item in strike data for reference but mark as removed
+                record.removed_time = removed_time
+                store.mark_dirty(item_hash)
+            
+            # Add to removed items list for persistent tracking (or update the removal time)
+            store.mark_removed(item_hash, item["name"], item["size"], reason, removed_time)
     
-    swaparr_logger.info(f"Finished processing stalled downloads for {app_name} instance: {app_settings.get('instance_name', 'Unknown')}")
+    # Clean up items that are no longer in the queue
+    store.forget_unseen(now)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Swaparr strike engine
+Keeps the strike records and removed downloads of every app instance in
+memory, keyed by item hash. A pass over an instance's queue only touches its
+own store; at the end of the pass the records that changed are written to the
+runtime database in one transaction. Removed downloads expire from a heap
+ordered by removal time, so expiry never scans the whole list. Each store
+also remembers a fingerprint of every queue entry it evaluated, so entries
+that did not change since the last pass are not hashed or classified again.
+"""
+
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.primary.utils.logger import get_logger
+from src.primary.repositories import swaparr_repository
+
+swaparr_logger = get_logger("swaparr")
+
+# Removed downloads are remembered for 30 days...
+REMOVED_ITEM_TTL = 30 * 86400
+# ...and removed again automatically if they reappear within 7 days
+REREMOVE_WINDOW = 7 * 86400
+
+
+class StrikeRecord:
+    """Strikes of one queued download. Times are epoch seconds."""
+
+    __slots__ = ("item_id", "name", "strikes", "first_strike_time", "last_strike_time", "last_seen", "removed_time")
+
+    def __init__(self, item_id: Optional[int], name: Optional[str], strikes: int = 0,
+                 first_strike_time: Optional[float] = None, last_strike_time: Optional[float] = None,
+                 last_seen: float = 0.0, removed_time: Optional[float] = None):
+        self.item_id = item_id
+        self.name = name
+        self.strikes = strikes
+        self.first_strike_time = first_strike_time
+        self.last_strike_time = last_strike_time
+        self.last_seen = last_seen
+        self.removed_time = removed_time
+
+
+class RemovedItem:
+    """A download Swaparr removed, remembered so it is removed again if it comes back."""
+
+    __slots__ = ("name", "size", "removed_time", "reason")
+
+    def __init__(self, name: Optional[str], size: int, removed_time: float, reason: Optional[str]):
+        self.name = name
+        self.size = size
+        self.removed_time = removed_time
+        self.reason = reason
+
+
+class InstanceStrikeStore:
+    """
+    Strike records and removed downloads of one app instance.
+
+    Changes are tracked per item hash and written by persist(). Callers hold
+    lock for the whole of a pass over the queue.
+    """
+
+    def __init__(self, app_name: str, instance_name: str):
+        self.app_name = app_name
+        self.instance_name = instance_name
+        self.lock = threading.Lock()
+        self.records: Dict[str, StrikeRecord] = {}
+        self.removed: Dict[str, RemovedItem] = {}
+        # (removed_time, item_hash); entries whose time no longer matches the item are stale and skipped
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._dirty_records: Set[str] = set()
+        self._deleted_records: Set[str] = set()
+        self._dirty_removed: Set[str] = set()
+        self._deleted_removed: Set[str] = set()
+        # Queue id -> (fingerprint, item hash, verdict) of the last pass; memory only
+        self.queue_entries: Dict[Any, Tuple[tuple, str, tuple]] = {}
+        # The settings the cached verdicts were made with
+        self.queue_rules: Optional[tuple] = None
+
+    def load(self) -> bool:
+        """Fill the store from the runtime database. Returns False if it could not be read."""
+        rows = swaparr_repository.load_instance(self.app_name, self.instance_name)
+        if rows is None:
+            return False
+        for item_hash, *fields in rows["strikes"]:
+            self.records[item_hash] = StrikeRecord(*fields)
+        for item_hash, name, size, removed_time, reason in rows["removed"]:
+            self.removed[item_hash] = RemovedItem(name, size, removed_time, reason)
+            self._expiry_heap.append((removed_time, item_hash))
+        heapq.heapify(self._expiry_heap)
+        return True
+
+    # Strike records
+
+    def get_record(self, item_hash: str) -> Optional[StrikeRecord]:
+        return self.records.get(item_hash)
+
+    def add_record(self, item_hash: str, item_id: Optional[int], name: Optional[str], now: float) -> StrikeRecord:
+        """Start tracking a download, first seen at now."""
+        record = self.records[item_hash] = StrikeRecord(item_id, name, first_strike_time=now, last_seen=now)
+        self.mark_dirty(item_hash)
+        return record
+
+    def mark_dirty(self, item_hash: str) -> None:
+        """Queue a changed record for the next persist()."""
+        self._dirty_records.add(item_hash)
+        self._deleted_records.discard(item_hash)
+
+    def forget_unseen(self, since: float) -> int:
+        """
+        Drop the records of downloads that were not seen since a time (they left the queue).
+
+        Returns:
+            The number of records dropped
+        """
+        gone = [item_hash for item_hash, record in self.records.items() if record.last_seen < since]
+        for item_hash in gone:
+            swaparr_logger.debug(f"Removing {self.records[item_hash].name} from strike list as it's no longer in the queue")
+            del self.records[item_hash]
+            self._dirty_records.discard(item_hash)
+            self._deleted_records.add(item_hash)
+        return len(gone)
+
+    # Removed downloads
+
+    def get_removed(self, item_hash: str) -> Optional[RemovedItem]:
+        return self.removed.get(item_hash)
+
+    def mark_removed(self, item_hash: str, name: Optional[str], size: int, reason: Optional[str], now: float) -> None:
+        """Remember a removed download (or restart the window of one removed again)."""
+        item = self.removed.get(item_hash)
+        if item is None:
+            item = self.removed[item_hash] = RemovedItem(name, size, now, reason)
+        else:
+            item.removed_time = now
+        heapq.heappush(self._expiry_heap, (now, item_hash))
+        self._dirty_removed.add(item_hash)
+        self._deleted_removed.discard(item_hash)
+
+    def evict_expired(self, now: float) -> int:
+        """
+        Forget removed downloads older than REMOVED_ITEM_TTL.
+
+        Returns:
+            The number of removed downloads forgotten
+        """
+        cutoff = now - REMOVED_ITEM_TTL
+        evicted = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] < cutoff:
+            removed_time, item_hash = heapq.heappop(heap)
+            item = self.removed.get(item_hash)
+            if item is None or item.removed_time != removed_time:
+                # Superseded by a later removal
+                continue
+            swaparr_logger.debug(f"Removing expired entry from removed items list: {item.name}")
+            del self.removed[item_hash]
+            self._dirty_removed.discard(item_hash)
+            self._deleted_removed.add(item_hash)
+            evicted += 1
+        return evicted
+
+    # Persistence
+
+    def reset_strikes(self) -> None:
+        """Forget every strike record (already deleted from the database by the caller)."""
+        self.records.clear()
+        self._dirty_records.clear()
+        self._deleted_records.clear()
+
+    def persist(self) -> bool:
+        """
+        Write the records changed since the last persist in one transaction.
+
+        Returns:
+            True if successful (or nothing changed), False otherwise
+        """
+        if not (self._dirty_records or self._deleted_records or self._dirty_removed or self._deleted_removed):
+            return True
+
+        strikes = []
+        for item_hash in self._dirty_records:
+            record = self.records[item_hash]
+            strikes.append((item_hash, record.item_id, record.name, record.strikes, record.first_strike_time,
+                            record.last_strike_time, record.last_seen, record.removed_time))
+        removed = []
+        for item_hash in self._dirty_removed:
+            item = self.removed[item_hash]
+            removed.append((item_hash, item.name, item.size, item.removed_time, item.reason))
+
+        if not swaparr_repository.save_changes(self.app_name, self.instance_name, strikes, list(self._deleted_records),
+                                               removed, list(self._deleted_removed)):
+            # Keep the changes queued for the next pass
+            return False
+        self._dirty_records.clear()
+        self._deleted_records.clear()
+        self._dirty_removed.clear()
+        self._deleted_removed.clear()
+        return True
+
+
+class StrikeEngine:
+    """The resident InstanceStrikeStore of every (app, instance)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores: Dict[Tuple[str, str], InstanceStrikeStore] = {}
+
+    def get_store(self, app_name: str, instance_name: str) -> Optional[InstanceStrikeStore]:
+        """Get the store of an instance, loading it on first use. Returns None if it could not be loaded."""
+        key = (app_name, instance_name)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = InstanceStrikeStore(app_name, instance_name)
+                if not store.load():
+                    return None
+                self._stores[key] = store
+            return store
+
+    def reset_strikes(self, app_name: Optional[str] = None) -> Optional[int]:
+        """
+        Forget the strikes of one app, or of every app, in memory and in the database.
+
+        Returns:
+            The number of strike records deleted from the database, or None on error
+        """
+        with self._lock:
+            stores = [store for (store_app, _), store in self._stores.items() if app_name in (None, store_app)]
+        for store in stores:
+            store.lock.acquire()
+        try:
+            deleted = swaparr_repository.reset_strikes(app_name)
+            if deleted is not None:
+                for store in stores:
+                    store.reset_strikes()
+            return deleted
+        finally:
+            for store in stores:
+                store.lock.release()
+
+
+# Process-wide engine used by the Swaparr handler and routes
+strike_engine = StrikeEngine()
@@ -3,13 +3,11 @@ Route definitions for Swaparr API endpoints.
 """
 
 from flask import Blueprint, request, jsonify
-import os
-import json
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import load_settings, save_settings
 from src.primary.apps.swaparr.handler import process_stalled_downloads
-# Import centralized path configuration
-from src.primary.utils.config_paths import CONFIG_PATH, SWAPARR_STATE_DIR
+from src.primary.apps.swaparr.strike_engine import strike_engine
+from src.primary.repositories import swaparr_repository
 
 # Create the blueprint directly in this file
 swaparr_bp = Blueprint('swaparr', __name__)
@@ -21,33 +19,8 @@ def get_status():
     settings = load_settings("swaparr")
     enabled = settings.get("enabled", False)
     
-    # Get strike statistics from all app state directories
-    statistics = {}
-    state_dir = SWAPARR_STATE_DIR
-    
-    if os.path.exists(state_dir):
-        for app_name in os.listdir(state_dir):
-            app_dir = os.path.join(state_dir, app_name)
-            if os.path.isdir(app_dir):
-                strike_file = os.path.join(app_dir, "strikes.json")
-                if os.path.exists(strike_file):
-                    try:
-                        with open(strike_file, 'r') as f:
-                            strike_data = json.load(f)
-                            
-                        total_items = len(strike_data)
-                        removed_items = sum(1 for item in strike_data.values() if item.get("removed", False))
-                        striked_items = sum(1 for item in strike_data.values() 
-                                          if item.get("strikes", 0) > 0 and not item.get("removed", False))
-                        
-                        statistics[app_name] = {
-                            "total_tracked": total_items,
-                            "currently_striked": striked_items,
-                            "removed": removed_items
-                        }
-                    except (json.JSONDecodeError, IOError) as e:
-                        swaparr_logger.error(f"Error reading strike data for {app_name}: {str(e)}")
-                        statistics[app_name] = {"error": str(e)}
+    # Get strike statistics of every app from the runtime database
+    statistics = swaparr_repository.get_statistics()
     
     return jsonify({
         "enabled": enabled,
@@ -96,40 +69,20 @@ def reset_strikes():
     data = request.json
     app_name = data.get('app_name') if data else None
     
-    state_dir = SWAPARR_STATE_DIR
-    
-    if not os.path.exists(state_dir):
-        return jsonify({"success": True, "message": "No strike data to reset"})
+    deleted = strike_engine.reset_strikes(app_name)
+    if deleted is None:
+        target = app_name or "all apps"
+        return jsonify({"success": False, "message": f"Failed to reset strikes for {target}"}), 500
     
     if app_name:
         # Reset strikes for a specific app
-        app_dir = os.path.join(state_dir, app_name)
-        if os.path.exists(app_dir):
-            strike_file = os.path.join(app_dir, "strikes.json")
-            if os.path.exists(strike_file):
-                try:
-                    os.remove(strike_file)
-                    swaparr_logger.info(f"Reset strikes for {app_name}")
-                    return jsonify({"success": True, "message": f"Strikes reset for {app_name}"})
-                except IOError as e:
-                    swaparr_logger.error(f"Error resetting strikes for {app_name}: {str(e)}")
-                    return jsonify({"success": False, "message": f"Failed to reset strikes for {app_name}: {str(e)}"}), 500
-        return jsonify({"success": False, "message": f"No strike data found for {app_name}"}), 404
-    else:
-        # Reset strikes for all apps
-        try:
-            for app_name in os.listdir(state_dir):
-                app_dir = os.path.join(state_dir, app_name)
-                if os.path.isdir(app_dir):
-                    strike_file = os.path.join(app_dir, "strikes.json")
-                    if os.path.exists(strike_file):
-                        os.remove(strike_file)
-            
-            swaparr_logger.info("Reset all strikes")
-            return jsonify({"success": True, "message": "All strikes reset"})
-        except IOError as e:
-            swaparr_logger.error(f"Error resetting all strikes: {str(e)}")
-            return jsonify({"success": False, "message": f"Failed to reset all strikes: {str(e)}"}), 500
+        if not deleted:
+            return jsonify({"success": False, "message": f"No strike data found for {app_name}"}), 404
+        swaparr_logger.info(f"Reset strikes for {app_name}")
+        return jsonify({"success": True, "message": f"Strikes reset for {app_name}"})
+    
+    swaparr_logger.info("Reset all strikes")
+    return jsonify({"success": True, "message": "All strikes reset"})
 
 def register_routes(app):
     """Register Swaparr routes with the Flask app."""
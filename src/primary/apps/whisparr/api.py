@@ -12,17 +12,16 @@ import time
 import datetime
 import traceback
 import sys
-from typing import List, Dict, Any, Optional, Union, Callable
+from typing import List, Dict, Any, Union, Callable
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_ssl_verify_setting
+from src.primary.utils import http_client, rate_limiter
 
 # Get logger for the Whisparr app
 whisparr_logger = get_logger("whisparr")
 
-# Use a session for better performance
-session = requests.Session()
-
-def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None) -> Any:
+def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, method: str = "GET", data: Dict = None,
+                retries: bool = True) -> Any:
     """
     Make a request to the Whisparr API.
     
@@ -33,6 +32,7 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         endpoint: The API endpoint to call
         method: HTTP method (GET, POST, PUT, DELETE)
         data: Optional data payload for POST/PUT requests
+        retries: Whether to retry transient failures (False for status checks)
     
     Returns:
         The parsed JSON response or None if the request failed
@@ -67,13 +67,13 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
         
         try:
             if method.upper() == "GET":
-                response = session.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.get(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl, retries=retries)
             elif method.upper() == "POST":
-                response = session.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.post(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "PUT":
-                response = session.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.put(full_url, headers=headers, json=data, timeout=api_timeout, verify=verify_ssl)
             elif method.upper() == "DELETE":
-                response = session.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
+                response = http_client.delete(full_url, headers=headers, timeout=api_timeout, verify=verify_ssl)
             else:
                 whisparr_logger.error(f"Unsupported HTTP method: {method}")
                 return None
@@ -85,13 +85,13 @@ def arr_request(api_url: str, api_key: str, api_timeout: int, endpoint: str, met
                 whisparr_logger.debug(f"Standard path returned 404, trying with V3 path: {v3_url}")
                 
                 if method == "GET":
-                    response = session.get(v3_url, headers=headers, timeout=api_timeout)
+                    response = http_client.get(v3_url, headers=headers, timeout=api_timeout, retries=retries)
                 elif method == "POST":
-                    response = session.post(v3_url, headers=headers, json=data, timeout=api_timeout)
+                    response = http_client.post(v3_url, headers=headers, json=data, timeout=api_timeout)
                 elif method == "PUT":
-                    response = session.put(v3_url, headers=headers, json=data, timeout=api_timeout)
+                    response = http_client.put(v3_url, headers=headers, json=data, timeout=api_timeout)
                 elif method == "DELETE":
-                    response = session.delete(v3_url, headers=headers, timeout=api_timeout)
+                    response = http_client.delete(v3_url, headers=headers, timeout=api_timeout)
                 
                 whisparr_logger.debug(f"V3 path request returned status code: {response.status_code}")
             
@@ -248,7 +248,8 @@ def refresh_item(api_url: str, api_key: str, api_timeout: int, item_id: int) ->
     # Return a placeholder command ID to simulate success without actually refreshing
     return 123
 
-def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int]) -> int:
+def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int],
+                stop_check: Callable[[], bool] = lambda: False) -> int:
     """
     Trigger a search for one or more items.
     
@@ -257,6 +258,7 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
         api_key: The API key for authentication
         api_timeout: Timeout for the API request
         item_ids: A list of item IDs to search for
+        stop_check: Function returning True if the rate limit wait should be aborted
         
     Returns:
         The command ID if the search command was triggered successfully, None otherwise
@@ -264,6 +266,11 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
     try:
         whisparr_logger.debug(f"Searching for items with IDs: {item_ids}")
         
+        # Wait for the hourly API cap to allow these hits
+        if not rate_limiter.acquire("whisparr", api_url, len(item_ids), stop_check=stop_check):
+            whisparr_logger.warning(f"Rate limit: skipping search for item IDs {item_ids}")
+            return None
+        
         # Always use the same payload format since we're always using v2 API
         payload = {
             "name": "EpisodeSearch",
@@ -283,11 +290,11 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
         # Try standard API path first
         whisparr_logger.debug(f"Attempting command with standard API path: {url}")
         try:
-            response = session.post(url, headers=headers, json=payload, timeout=api_timeout)
+            response = http_client.post(url, headers=headers, json=payload, timeout=api_timeout)
             # If we get a 404 or 405, try the v3 path
             if response.status_code in [404, 405]:
                 whisparr_logger.debug(f"Standard path returned {response.status_code}, trying with V3 path: {backup_url}")
-                response = session.post(backup_url, headers=headers, json=payload, timeout=api_timeout)
+                response = http_client.post(backup_url, headers=headers, json=payload, timeout=api_timeout)
                 
             response.raise_for_status()
             result = response.json()
@@ -311,60 +318,6 @@ def item_search(api_url: str, api_key: str, api_timeout: int, item_ids: List[int
         whisparr_logger.error(f"Error searching for items: {str(e)}")
         return None
 
-def get_command_status(api_url: str, api_key: str, api_timeout: int, command_id: int) -> Optional[Dict]:
-    """
-    Get the status of a specific command.
-
-    Args:
-        api_url: The base URL of the Whisparr API
-        api_key: The API key for authentication
-        api_timeout: Timeout for the API request
-        command_id: The ID of the command to check
-
-    Returns:
-        A dictionary containing the command status, or None if the request failed.
-    """
-    if not command_id:
-        whisparr_logger.error("No command ID provided for status check.")
-        return None
-        
-    try:
-        # For commands, we need to directly try both path formats
-        command_endpoint = f"command/{command_id}"
-        url = f"{api_url.rstrip('/')}/api/{command_endpoint}"
-        backup_url = f"{api_url.rstrip('/')}/api/v3/{command_endpoint}"
-        
-        headers = {
-            "X-Api-Key": api_key,
-            "Content-Type": "application/json"
-        }
-        
-        # Try standard API path first
-        whisparr_logger.debug(f"Checking command status with standard API path: {url}")
-        try:
-            response = session.get(url, headers=headers, timeout=api_timeout)
-            # If we get a 404, try the v3 path
-            if response.status_code == 404:
-                whisparr_logger.debug(f"Standard path returned 404, trying with V3 path: {backup_url}")
-                response = session.get(backup_url, headers=headers, timeout=api_timeout)
-                
-            response.raise_for_status()
-            result = response.json()
-            
-            whisparr_logger.debug(f"Command {command_id} status: {result.get('status', 'unknown')}")
-            return result
-        except requests.exceptions.HTTPError as e:
-            whisparr_logger.error(f"HTTP error getting command status: {e}, Status Code: {response.status_code}")
-            whisparr_logger.debug(f"Response content: {response.text[:200]}")
-            return None
-        except Exception as e:
-            whisparr_logger.error(f"Error getting command status: {e}")
-            return None
-            
-    except Exception as e:
-        whisparr_logger.error(f"Error getting command status for ID {command_id}: {e}")
-        return None
-
 def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
     """
     Check the connection to Whisparr V2 API.
@@ -383,7 +336,7 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
         
         # First try with standard path
         endpoint = "system/status"
-        response = arr_request(api_url, api_key, api_timeout, endpoint)
+        response = arr_request(api_url, api_key, api_timeout, endpoint, retries=False)
         
         # If that failed, try with v3 path format
         if response is None:
@@ -393,7 +346,7 @@ def check_connection(api_url: str, api_key: str, api_timeout: int) -> bool:
             headers = {'X-Api-Key': api_key}
             
             try:
-                resp = session.get(url, headers=headers, timeout=api_timeout)
+                resp = http_client.get(url, headers=headers, timeout=api_timeout, retries=False)
                 resp.raise_for_status()
                 response = resp.json()
             except Exception as e:
@@ -9,21 +9,23 @@ Supports both v2 (legacy) and v3 (Eros) API versions
 import time
 import random
 import datetime
-from typing import List, Dict, Any, Set, Callable
+from typing import List, Dict, Any, Set, Callable, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.apps.whisparr import api as whisparr_api
-from src.primary.settings_manager import load_settings, get_advanced_setting
-from src.primary.stateful_manager import is_processed, add_processed_id
+from src.primary.settings_manager import load_settings
+from src.primary.stateful_manager import filter_unprocessed, mark_processed_many
 from src.primary.stats_manager import increment_stat
-from src.primary.utils.history_utils import log_processed_media
+from src.primary.utils.history_utils import log_processed_media_batch
 from src.primary.state import check_state_reset
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 
 # Get logger for the app
 whisparr_logger = get_logger("whisparr")
 
 def process_missing_items(
     app_settings: Dict[str, Any],
-    stop_check: Callable[[], bool] # Function to check if stop is requested
+    stop_check: Callable[[], bool], # Function to check if stop is requested
+    cycle_settings: Optional[CycleSettings] = None # Settings snapshot for this cycle
 ) -> bool:
     """
     Process missing items in Whisparr based on provided settings.
@@ -31,10 +33,14 @@ def process_missing_items(
     Args:
         app_settings: Dictionary containing all settings for Whisparr
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle. Built on the spot if not given.
     
     Returns:
         True if any items were processed, False otherwise.
     """
+    if cycle_settings is None:
+        cycle_settings = build_cycle_settings("whisparr")
+
     whisparr_logger.info("Starting missing items processing cycle for Whisparr.")
     processed_any = False
     
@@ -44,11 +50,11 @@ def process_missing_items(
     # Extract necessary settings
     api_url = app_settings.get("api_url", "").strip()
     api_key = app_settings.get("api_key", "").strip()
-    api_timeout = get_advanced_setting("api_timeout", 120)  # Use general.json value
+    api_timeout = cycle_settings.api_timeout  # Use general.json value
     instance_name = app_settings.get("instance_name", "Whisparr Default")
     
     # Use the centralized advanced setting for stateful management hours
-    stateful_management_hours = get_advanced_setting("stateful_management_hours", 168)
+    stateful_management_hours = cycle_settings.stateful_management_hours
     
     monitored_only = app_settings.get("monitored_only", True)
     skip_future_releases = app_settings.get("skip_future_releases", True)
@@ -58,8 +64,8 @@ def process_missing_items(
     hunt_missing_items = app_settings.get("hunt_missing_items", app_settings.get("hunt_missing_scenes", 0))
     
     # Use advanced settings from general.json for command operations
-    command_wait_delay = get_advanced_setting("command_wait_delay", 1)
-    command_wait_attempts = get_advanced_setting("command_wait_attempts", 600)
+    command_wait_delay = cycle_settings.command_wait_delay
+    command_wait_attempts = cycle_settings.command_wait_attempts
     
     # Log that we're using Whisparr V2 API
     whisparr_logger.debug(f"Using Whisparr V2 API for instance: {instance_name}")
@@ -114,13 +120,8 @@ def process_missing_items(
         return False
         
     # Filter out already processed items using stateful management
-    unprocessed_items = []
-    for item in missing_items:
-        item_id = str(item.get("id"))
-        if not is_processed("whisparr", instance_name, item_id):
-            unprocessed_items.append(item)
-        else:
-            whisparr_logger.debug(f"Skipping already processed item ID: {item_id}")
+    unprocessed_ids = set(filter_unprocessed("whisparr", instance_name, [str(item.get("id")) for item in missing_items]))
+    unprocessed_items = [item for item in missing_items if str(item.get("id")) in unprocessed_ids]
     
     whisparr_logger.info(f"Found {len(unprocessed_items)} unprocessed items out of {len(missing_items)} total items with missing files.")
     
@@ -137,9 +138,10 @@ def process_missing_items(
     
     whisparr_logger.info(f"Selected {len(items_to_search)} missing items to search.")
 
-    # Process selected items
-    for item in items_to_search:
-        # Check for stop signal before each item
+    # Search the selected items in batches - one search command per batch
+    batch_size = cycle_settings.search_batch_size
+    for batch_start in range(0, len(items_to_search), batch_size):
+        # Check for stop signal before each batch
         if stop_check():
             whisparr_logger.info("Stop requested during item processing. Aborting...")
             break
@@ -147,51 +149,45 @@ def process_missing_items(
         # Re-check limit in case it changed
         current_limit = app_settings.get("hunt_missing_items", app_settings.get("hunt_missing_scenes", 1))
         if items_processed >= current_limit:
-             whisparr_logger.info(f"Reached HUNT_MISSING_ITEMS limit ({current_limit}) for this cycle.")
-             break
-
-        item_id = item.get("id")
-        title = item.get("title", "Unknown Title")
-        season_episode = f"S{item.get('seasonNumber', 0):02d}E{item.get('episodeNumber', 0):02d}"
+            whisparr_logger.info(f"Reached HUNT_MISSING_ITEMS limit ({current_limit}) for this cycle.")
+            break
         
-        whisparr_logger.info(f"Processing missing item: \"{title}\" - {season_episode} (Item ID: {item_id})")
+        batch = items_to_search[batch_start:batch_start + min(batch_size, current_limit - items_processed)]
+        batch_media = []
+        for item in batch:
+            title = item.get("title", "Unknown Title")
+            item_info = f"{title} - S{item.get('seasonNumber', 0):02d}E{item.get('episodeNumber', 0):02d}"
+            whisparr_logger.info(f"Processing missing item: \"{item_info}\" (Item ID: {item.get('id')})")
+            batch_media.append((item_info, item.get("id")))
+        item_ids = [item.get("id") for item in batch]
         
-        # Refresh functionality has been removed as it was identified as a performance bottleneck
+        # Mark the items as processed BEFORE triggering any searches
+        mark_processed_many("whisparr", instance_name, item_ids)
+        whisparr_logger.debug(f"Added item IDs {item_ids} to processed list for {instance_name}")
         
-        # Mark the item as processed BEFORE triggering any searches
-        add_processed_id("whisparr", instance_name, str(item_id))
-        whisparr_logger.debug(f"Added item ID {item_id} to processed list for {instance_name}")
-        
-        # Check for stop signal before searching
-        if stop_check():
-            whisparr_logger.info(f"Stop requested before searching for {title}. Aborting...")
-            break
+        # Refresh functionality has been removed as it was identified as a performance bottleneck
         
-        # Search for the item
-        whisparr_logger.info(" - Searching for missing item...")
-        search_command_id = whisparr_api.item_search(api_url, api_key, api_timeout, [item_id])
+        # Search for the items
+        whisparr_logger.info(f" - Searching for missing items ({len(batch)} items)...")
+        search_command_id = whisparr_api.item_search(api_url, api_key, api_timeout, item_ids, stop_check=stop_check)
         if search_command_id:
-            whisparr_logger.info(f"Triggered search command {search_command_id}. Assuming success for now.")
+            whisparr_logger.info(f"Triggered search command {search_command_id}.")
             
             # Log to history system
-            media_name = f"{title} - {season_episode}"
-            log_processed_media("whisparr", media_name, item_id, instance_name, "missing")
-            whisparr_logger.debug(f"Logged history entry for item: {media_name}")
+            log_processed_media_batch("whisparr", batch_media, instance_name, "missing")
+            whisparr_logger.debug(f"Logged history entries for item IDs: {item_ids}")
             
-            items_processed += 1
+            items_processed += len(batch)
             processing_done = True
             
-            # Increment the hunted statistics for Whisparr
-            increment_stat("whisparr", "hunted", 1)
-            whisparr_logger.debug(f"Incremented whisparr hunted statistics by 1")
+            # Increment the hunted statistics once per batch
+            increment_stat("whisparr", "hunted", len(batch), instance_name=instance_name)
+            whisparr_logger.debug(f"Incremented whisparr hunted statistics by {len(batch)}")
 
             # Log progress
-            current_limit = app_settings.get("hunt_missing_items", app_settings.get("hunt_missing_scenes", 1))
             whisparr_logger.info(f"Processed {items_processed}/{current_limit} missing items this cycle.")
         else:
-            whisparr_logger.warning(f"Failed to trigger search command for item ID {item_id}.")
-            # Do not mark as processed if search couldn't be triggered
-            continue
+            whisparr_logger.warning(f"Failed to trigger search command for item IDs {item_ids}.")
     
     # Log final status
     if items_processed > 0:
@@ -202,15 +198,16 @@ def process_missing_items(
     return processing_done
 
 # For backward compatibility with the background processing system
-def process_missing_scenes(app_settings, stop_check):
+def process_missing_scenes(app_settings, stop_check, cycle_settings=None):
     """
     Backwards compatibility function that calls process_missing_items.
     
     Args:
         app_settings: Dictionary containing all settings for Whisparr
         stop_check: A function that returns True if the process should stop
+        cycle_settings: Settings snapshot for this cycle
     
     Returns:
         Result from process_missing_items
     """
-    return process_missing_items(app_settings, stop_check)
\ No newline at end of file
+    return process_missing_items(app_settings, stop_check, cycle_settings)
\ No newline at end of file
@@ -10,6 +10,7 @@ import traceback
 import socket
 from urllib.parse import urlparse
 from src.primary.apps.whisparr import api as whisparr_api
+from src.primary.utils import instance_health
 
 whisparr_bp = Blueprint('whisparr', __name__)
 whisparr_logger = get_logger("whisparr")
@@ -33,8 +34,8 @@ def get_status():
             api_url = instance.get("api_url")
             api_key = instance.get("api_key")
             if api_url and api_key and instance.get("enabled", True):
-                # Use a short timeout for status checks
-                if whisparr_api.check_connection(api_url, api_key, 5):
+                # Cached health, refreshed in the background with a short timeout
+                if instance_health.get_status("whisparr", api_url, api_key, whisparr_api.check_connection, 5):
                     connected_count += 1
         
         return jsonify({
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Asyncio hunting engine for Huntarr
+Optional execution mode that runs every (app, instance) pipeline as its own task
+on a single event loop, so one slow instance no longer delays the others.
+The hunt modules stay synchronous: each pipeline runs on a bounded thread pool
+and the event loop only schedules them and limits how many run per instance.
+
+Enabled with the 'async_engine_enabled' advanced setting. The threaded
+per-app loops in background.py remain the default.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Dict, Any, Optional, Callable
+
+from src.primary import settings_manager
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
+from src.primary.utils.logger import get_logger
+from src.primary.utils import instance_health
+from src.primary.state import check_state_reset
+
+logger = get_logger("huntarr")
+
+# Apps hunted by the engine
+HUNT_APP_TYPES = ["sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros"]
+
+
+class AsyncHuntEngine:
+    """
+    Schedules the hunting pipeline of every configured instance on one event loop.
+
+    Every *arr instance gets a semaphore, so no more than 'async_instance_concurrency'
+    pipelines (of different apps pointing at the same URL) run against it at once.
+    """
+
+    def __init__(self, stop_event: threading.Event, background_module: ModuleType):
+        self.stop_event = stop_event
+        # The background module shares its pipeline helpers with the threaded loops.
+        # It is passed in rather than imported because main.py loads it as 'primary.background'.
+        self.background = background_module
+        self.max_workers = int(settings_manager.get_advanced_setting("async_max_workers", 16))
+        self.instance_concurrency = int(settings_manager.get_advanced_setting("async_instance_concurrency", 2))
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._instance_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Only one pipeline per instance may run at a time
+        self._pipeline_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _run_blocking(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call (settings, files or a whole hunt) on the pool instead of the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+    def _get_instance_semaphore(self, instance_key: str) -> asyncio.Semaphore:
+        semaphore = self._instance_semaphores.get(instance_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, self.instance_concurrency))
+            self._instance_semaphores[instance_key] = semaphore
+        return semaphore
+
+    async def _sleep(self, app_type: str, seconds: int, app_logger) -> None:
+        """Sleep until the next cycle, waking early on stop or a manual reset."""
+        elapsed = 0
+        while elapsed < seconds and not self.stop_event.is_set():
+            if await self._run_blocking(self.background.consume_reset_file, app_type, app_logger):
+                return
+            await asyncio.sleep(1)
+            elapsed += 1
+
+    async def _run_pipeline(self, app_type: str, app_modules: Dict, cycle_settings: CycleSettings,
+                            instance_details: Dict, app_logger) -> bool:
+        """Run the hunting pipeline for a single instance."""
+        instance_name = instance_details.get("instance_name", "Default")
+        api_url = instance_details.get("api_url", "")
+        api_key = instance_details.get("api_key", "")
+        # Requests are limited per *arr instance, whichever app entry points at it
+        instance_key = api_url.rstrip("/").lower()
+
+        lock = self._pipeline_locks.setdefault(f"{app_type}:{instance_name}", asyncio.Lock())
+        async with lock:
+            if self.stop_event.is_set():
+                return False
+
+            if not api_url or not api_key:
+                app_logger.warning(f"Missing API URL or Key for instance '{instance_name}'. Skipping.")
+                return False
+
+            # The connection check and the hunt hold one instance slot together
+            async with self._get_instance_semaphore(instance_key):
+                try:
+                    connected = await self._run_blocking(instance_health.check_instance, app_type, api_url, api_key,
+                                                         app_modules["check_connection"], cycle_settings.api_timeout)
+                except Exception as e:
+                    app_logger.error(f"Error connecting to {app_type} instance '{instance_name}': {e}", exc_info=True)
+                    return False
+                if not connected:
+                    app_logger.warning(f"Failed to connect to {app_type} instance '{instance_name}' at {api_url}. Skipping.")
+                    return False
+                app_logger.info(f"Successfully connected to {app_type} instance: {instance_name}")
+
+                # The hunt modules are synchronous; run the rest of the pipeline on the pool
+                return await self._run_blocking(self.background.process_instance, app_type, app_modules,
+                                                cycle_settings, instance_details, app_logger, connection_checked=True)
+
+    async def _app_loop(self, app_type: str) -> None:
+        """Cycle loop for one app. All of its instances are processed concurrently."""
+        app_logger = get_logger(app_type)
+        app_logger.info(f"=== [{app_type.upper()}] Async pipeline starting ===")
+
+        app_modules = await self._run_blocking(self.background.load_app_modules, app_type, app_logger)
+        if not app_modules:
+            return
+
+        while not self.stop_event.is_set():
+            try:
+                cycle_settings = await self._run_blocking(build_cycle_settings, app_type)
+                if not cycle_settings.app:
+                    app_logger.error("Failed to load settings. Skipping cycle.")
+                    await self._sleep(app_type, 60, app_logger)
+                    continue
+                sleep_duration = cycle_settings.sleep_duration
+            except Exception as e:
+                app_logger.error(f"Error loading settings for cycle: {e}", exc_info=True)
+                await self._sleep(app_type, 60, app_logger)
+                continue
+
+            await self._run_blocking(check_state_reset, app_type)
+            app_logger.info(f"=== Starting {app_type.upper()} cycle ===")
+
+            instances_to_process = await self._run_blocking(self.background.get_instances_to_process, app_type,
+                                                            cycle_settings, app_modules, app_logger)
+            if instances_to_process is None:
+                await self._sleep(app_type, 60, app_logger)
+                continue
+            if not instances_to_process:
+                await self._sleep(app_type, sleep_duration, app_logger)
+                continue
+
+            results = await asyncio.gather(
+                *(self._run_pipeline(app_type, app_modules, cycle_settings, instance_details, app_logger)
+                  for instance_details in instances_to_process),
+                return_exceptions=True
+            )
+
+            processed_any_items = False
+            for instance_details, result in zip(instances_to_process, results):
+                if isinstance(result, Exception):
+                    app_logger.error(f"Error processing {app_type} instance '{instance_details.get('instance_name', 'Default')}': {result}")
+                elif result:
+                    processed_any_items = True
+
+            if self.stop_event.is_set():
+                break
+
+            sleep_seconds = await self._run_blocking(self.background.log_cycle_end, app_type, cycle_settings,
+                                                     processed_any_items, app_logger)
+            await self._sleep(app_type, sleep_seconds, app_logger)
+
+        app_logger.info(f"=== [{app_type.upper()}] Async pipeline stopped ===")
+
+    async def _supervise(self) -> None:
+        """Start a loop task per configured app and keep them running until stop."""
+        tasks: Dict[str, asyncio.Task] = {}
+
+        while not self.stop_event.is_set():
+            configured_apps = [app for app in await self._run_blocking(settings_manager.get_configured_apps)
+                               if app in HUNT_APP_TYPES]
+            for app_type in configured_apps:
+                task = tasks.get(app_type)
+                if task is None or task.done():
+                    if task is not None:
+                        logger.warning(f"{app_type} async pipeline stopped unexpectedly, restarting...")
+                    else:
+                        logger.info(f"Starting async pipeline for {app_type}...")
+                    tasks[app_type] = asyncio.create_task(self._app_loop(app_type), name=f"{app_type}-Pipeline")
+
+            # Check for stop signal every 15 seconds, matching the threaded supervisor
+            for _ in range(15):
+                if self.stop_event.is_set():
+                    break
+                await asyncio.sleep(1)
+
+        # Let running pipelines observe the stop event and finish their current step
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    def run(self) -> None:
+        """Run the engine on a new event loop until the stop event is set."""
+        logger.info(f"--- Starting async hunting engine ({self.max_workers} workers, {self.instance_concurrency} requests per instance) ---")
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="HuntWorker")
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            logger.exception(f"Async hunting engine failed: {e}")
+        finally:
+            self.executor.shutdown(wait=True)
+            logger.info("--- Async hunting engine stopped ---")
+
+    async def _run(self) -> None:
+        await self._supervise()
+
+
+def is_async_engine_enabled() -> bool:
+    """Return True if the asyncio hunting engine is enabled in the general settings."""
+    return bool(settings_manager.get_advanced_setting("async_engine_enabled", False))
+
+
+def start_async_engine(stop_event: threading.Event, background_module: ModuleType) -> threading.Thread:
+    """
+    Start the asyncio hunting engine in its own thread.
+
+    Args:
+        stop_event: The shared background stop event
+        background_module: The background module providing the per-instance pipeline
+
+    Returns:
+        The thread running the engine
+    """
+    engine = AsyncHuntEngine(stop_event, background_module)
+    thread = threading.Thread(target=engine.run, name="AsyncHuntEngine", daemon=True)
+    thread.start()
+    return thread
@@ -23,6 +23,7 @@ from .utils.logger import logger # Ensure logger is imported
 # User directory setup
 # Use the centralized path configuration
 from src.primary.utils.config_paths import USER_DIR
+from src.primary.utils.durable_store import write_json
 
 # User directory is already created by config_paths module
 USER_FILE = USER_DIR / "credentials.json"
@@ -57,8 +58,8 @@ def save_user_data(user_data: Dict[str, Any]) -> bool:
         # Ensure directory exists (though it should from startup)
         USER_DIR.mkdir(parents=True, exist_ok=True)
         
-        with open(USER_FILE, 'w') as f:
-            json.dump(user_data, f, indent=4) # Add indent for readability
+        if not write_json(USER_FILE, user_data, indent=4):
+            raise OSError(f"Could not write {USER_FILE}")
         
         # Set permissions after writing
         try:
@@ -146,8 +147,8 @@ def create_user(username: str, password: str) -> bool:
     
     try:
         logger.info(f"Writing user file: {USER_FILE}")
-        with open(USER_FILE, 'w') as f:
-            json.dump(user_data, f)
+        if not write_json(USER_FILE, user_data):
+            raise OSError(f"Could not write {USER_FILE}")
         # Set appropriate permissions on the file
         try:
             logger.info(f"Setting permissions on file: {USER_FILE}")
@@ -286,13 +287,8 @@ def authenticate_request():
     local_access_bypass = False
     proxy_auth_bypass = False
     try:
-        # Force reload settings from disk to ensure we have the latest
+        # The settings cache reloads the file whenever it changes, so this is always current
         from src.primary.settings_manager import load_settings
-        from src.primary import settings_manager
-        
-        # Ensure we're getting fresh settings by clearing any cache
-        if hasattr(settings_manager, 'settings_cache'):
-            settings_manager.settings_cache = {}
             
         settings = load_settings("general")  # Specify 'general' as the app_type
         general_settings = settings
@@ -24,11 +24,13 @@ from src.primary.utils.logger import setup_main_logger, get_logger # Import get_
 logger = setup_main_logger()
 
 # Import necessary modules
-from src.primary import config, settings_manager
+from src.primary import config, settings_manager, library_cache, queue_cache
+from src.primary.cycle_settings import CycleSettings, build_cycle_settings
 # Removed keys_manager import as settings_manager handles API details
 from src.primary.state import check_state_reset, calculate_reset_time
 from src.primary.stats_manager import check_hourly_cap_exceeded
 from src.primary.utils.instance_list_generator import generate_instance_list
+from src.primary.utils import instance_health
 from src.primary.scheduler_engine import start_scheduler, stop_scheduler
 from src.primary.migrate_configs import migrate_json_configs  # Import the migration function
 # from src.primary.utils.app_utils import get_ip_address # No longer used here
@@ -37,22 +39,20 @@ from src.primary.migrate_configs import migrate_json_configs  # Import the migra
 app_threads: Dict[str, threading.Thread] = {}
 stop_event = threading.Event() # Use an event for clearer stop signaling
 
-# Hourly cap scheduler thread
-hourly_cap_scheduler_thread = None
-
 # Instance list generator thread
 instance_list_generator_thread = None
 
-def app_specific_loop(app_type: str) -> None:
+def load_app_modules(app_type: str, app_logger: logging.Logger) -> Optional[Dict]:
     """
-    Main processing loop for a specific Arr application.
+    Dynamically import the modules and functions used to hunt a specific Arr application.
 
     Args:
-        app_type: The type of Arr application (sonarr, radarr, lidarr, readarr)
-    """
-    app_logger = get_logger(app_type)
-    app_logger.info(f"=== [{app_type.upper()}] Thread starting ===")
+        app_type: The type of Arr application (sonarr, radarr, lidarr, readarr, whisparr, eros)
+        app_logger: Logger for the app
 
+    Returns:
+        A dict with the processing functions and hunt setting names, or None if loading failed
+    """
     # Dynamically import app-specific modules
     process_missing = None
     process_upgrades = None
@@ -99,11 +99,11 @@ def app_specific_loop(app_type: str) -> None:
             missing_module = importlib.import_module('src.primary.apps.lidarr.missing')
             upgrade_module = importlib.import_module('src.primary.apps.lidarr.upgrade')
             # Use process_missing_albums as the function name
-            process_missing = getattr(missing_module, 'process_missing_albums') 
+            process_missing = getattr(missing_module, 'process_missing_albums')
             process_upgrades = getattr(upgrade_module, 'process_cutoff_upgrades')
             hunt_missing_setting = "hunt_missing_items"
             # Use hunt_upgrade_items
-            hunt_upgrade_setting = "hunt_upgrade_items" 
+            hunt_upgrade_setting = "hunt_upgrade_items"
         elif app_type == "readarr":
             missing_module = importlib.import_module('src.primary.apps.readarr.missing')
             upgrade_module = importlib.import_module('src.primary.apps.readarr.upgrade')
@@ -127,28 +127,355 @@ def app_specific_loop(app_type: str) -> None:
             hunt_upgrade_setting = "hunt_upgrade_items"
         else:
             app_logger.error(f"Unsupported app_type: {app_type}")
-            return # Exit thread if app type is invalid
+            return None # Caller exits if app type is invalid
 
     except (ImportError, AttributeError) as e:
         app_logger.error(f"Failed to import modules or functions for {app_type}: {e}", exc_info=True)
+        return None # Caller exits if essential modules fail to load
+
+    return {
+        "process_missing": process_missing,
+        "process_upgrades": process_upgrades,
+        "get_queue_size": get_queue_size,
+        "check_connection": check_connection,
+        "get_instances_func": get_instances_func,
+        "hunt_missing_setting": hunt_missing_setting,
+        "hunt_upgrade_setting": hunt_upgrade_setting
+    }
+
+def get_instances_to_process(app_type: str, cycle_settings: CycleSettings, app_modules: Dict, app_logger: logging.Logger) -> Optional[List[Dict]]:
+    """
+    Get the instance dictionaries to process for this cycle.
+
+    Args:
+        app_type: The type of Arr application
+        cycle_settings: The settings snapshot for this cycle
+        app_modules: The dict returned by load_app_modules
+        app_logger: Logger for the app
+
+    Returns:
+        A list of instance dicts (empty if nothing is configured), or None if looking them up failed
+    """
+    get_instances_func = app_modules["get_instances_func"]
+
+    # Use the dynamically loaded function (if found)
+    if get_instances_func:
+        # Multi-instance mode supported
+        try:
+            instances_to_process = get_instances_func() # Call the dynamically loaded function
+            if instances_to_process:
+                app_logger.info(f"Found {len(instances_to_process)} configured {app_type} instances to process")
+            else:
+                # No instances found via get_configured_instances
+                app_logger.warning(f"No configured {app_type} instances found. Skipping cycle.")
+            return instances_to_process or []
+        except Exception as e:
+            app_logger.error(f"Error calling get_configured_instances function: {e}", exc_info=True)
+            return None
+
+    # get_instances_func is None (either not defined in app module or import failed earlier)
+    # Fallback to single instance mode using base settings if available
+    api_url = cycle_settings.app.get("api_url")
+    api_key = cycle_settings.app.get("api_key")
+    instance_name = cycle_settings.app.get("name", f"{app_type.capitalize()} Default") # Use 'name' or default
+
+    if api_url and api_key:
+        app_logger.info(f"Processing {app_type} as single instance: {instance_name}")
+        # Create a list with a single dict matching the multi-instance structure
+        return [{
+            "instance_name": instance_name,
+            "api_url": api_url,
+            "api_key": api_key
+        }]
+
+    app_logger.warning(f"No 'get_configured_instances' function found and no valid single instance config (URL/Key) for {app_type}. Skipping cycle.")
+    return []
+
+def process_instance(app_type: str, app_modules: Dict, cycle_settings: CycleSettings, instance_details: Dict,
+                     app_logger: logging.Logger, connection_checked: bool = False) -> bool:
+    """
+    Run the full hunting pipeline (connection, cap and queue checks, missing, upgrades, Swaparr)
+    for a single instance.
+
+    Args:
+        app_type: The type of Arr application
+        app_modules: The dict returned by load_app_modules
+        cycle_settings: The settings snapshot for this cycle
+        instance_details: The instance dict returned by get_instances_to_process
+        app_logger: Logger for the app
+        connection_checked: True if the caller already verified the connection
+
+    Returns:
+        True if any items were processed for this instance, False otherwise
+    """
+    check_connection = app_modules["check_connection"]
+    get_queue_size = app_modules["get_queue_size"]
+    process_missing = app_modules["process_missing"]
+    process_upgrades = app_modules["process_upgrades"]
+    processed_any_items = False
+
+    instance_name = instance_details.get("instance_name", "Default") # Use the dict from get_configured_instances
+    app_logger.info(f"Processing {app_type} instance: {instance_name}")
+
+    # Get instance-specific settings from the instance_details dict
+    api_url = instance_details.get("api_url", "")
+    api_key = instance_details.get("api_key", "")
+
+    # Get global/shared settings from the snapshot taken at the start of the cycle
+    # Example: monitored_only = cycle_settings.app.get("monitored_only", True)
+    api_timeout = cycle_settings.api_timeout
+
+    # --- Connection Check --- #
+    if not api_url or not api_key:
+        app_logger.warning(f"Missing API URL or Key for instance '{instance_name}'. Skipping.")
+        return False
+    if not connection_checked:
+        try:
+            # Use instance details for connection check
+            app_logger.debug(f"Checking connection to {app_type} instance '{instance_name}' at {api_url} with timeout {api_timeout}s")
+            # Shared with the web status API - dead instances are skipped without waiting for a timeout
+            connected = instance_health.check_instance(app_type, api_url, api_key, check_connection, api_timeout)
+            if not connected:
+                app_logger.warning(f"Failed to connect to {app_type} instance '{instance_name}' at {api_url}. Skipping.")
+                return False
+            app_logger.info(f"Successfully connected to {app_type} instance: {instance_name}")
+        except Exception as e:
+            app_logger.error(f"Error connecting to {app_type} instance '{instance_name}': {e}", exc_info=True)
+            return False # Skip this instance if connection fails
+
+    # --- API Cap Check --- #
+    try:
+        # Check if hourly API cap is exceeded
+        if check_hourly_cap_exceeded(app_type):
+            # Get the current cap status for logging
+            from src.primary.stats_manager import get_hourly_cap_status
+            cap_status = get_hourly_cap_status(app_type)
+            app_logger.warning(f"{app_type.upper()} hourly cap reached {cap_status['current_usage']} of {cap_status['limit']} (app-specific limit). Skipping cycle!")
+            return False # Skip this instance if API cap is exceeded
+    except Exception as e:
+        app_logger.error(f"Error checking hourly API cap for {app_type}: {e}", exc_info=True)
+        # Continue with the cycle even if cap check fails - safer than skipping
+
+    # --- Check if Hunt Modes are Enabled --- #
+    # These checks use the hunt_missing_setting/hunt_upgrade_setting from load_app_modules
+    # which correspond to keys in the app settings (e.g., 'hunt_missing_items')
+    hunt_missing_value = cycle_settings.app.get(app_modules["hunt_missing_setting"], 0)
+    hunt_upgrade_value = cycle_settings.app.get(app_modules["hunt_upgrade_setting"], 0)
+
+    hunt_missing_enabled = hunt_missing_value > 0
+    hunt_upgrade_enabled = hunt_upgrade_value > 0
+
+    # --- Queue Size Check --- #
+    # Get maximum_download_queue_size from general settings (still using minimum_download_queue_size key for backward compatibility)
+    max_queue_size = cycle_settings.max_queue_size
+    app_logger.info(f"Using maximum download queue size: {max_queue_size} from general settings")
+
+    if max_queue_size >= 0:
+        try:
+            if cycle_settings.swaparr.enabled:
+                # Fetch the whole queue once; the Swaparr pass below reuses it
+                snapshot = queue_cache.fetch_queue(app_type, api_url, api_key, api_timeout)
+                current_queue_size = snapshot.total if snapshot is not None else -1
+            else:
+                # Use instance details for queue check
+                current_queue_size = get_queue_size(api_url, api_key, api_timeout)
+            if current_queue_size >= max_queue_size:
+                app_logger.info(f"Download queue size ({current_queue_size}) meets or exceeds maximum ({max_queue_size}) for {instance_name}. Skipping cycle for this instance.")
+                return False # Skip processing for this instance
+            else:
+                app_logger.info(f"Queue size ({current_queue_size}) is below maximum ({max_queue_size}). Proceeding.")
+        except Exception as e:
+            app_logger.warning(f"Could not get download queue size for {instance_name}. Proceeding anyway. Error: {e}", exc_info=False) # Log less verbosely
+
+    # Prepare args dictionary for processing functions
+    # Combine instance details with the app settings, plus the settings from general.json used by all apps
+    combined_settings = cycle_settings.instance_settings(instance_details)
+
+    # Define the stop check function. A pending manual reset also stops the hunt (e.g. a
+    # rate limit wait), so the loop can pick it up and start the new cycle right away.
+    from src.primary.utils.config_paths import get_reset_path
+    reset_file_path = get_reset_path(app_type)
+
+    def stop_check_func() -> bool:
+        return stop_event.is_set() or reset_file_path.exists()
+
+    # --- Process Missing --- #
+    if hunt_missing_enabled and process_missing:
+        try:
+            # Extract settings for direct function calls
+            api_url = combined_settings.get("api_url", "").strip()
+            api_key = combined_settings.get("api_key", "").strip()
+            monitored_only = combined_settings.get("monitored_only", True)
+            skip_future_episodes = combined_settings.get("skip_future_episodes", True)
+            hunt_missing_items = combined_settings.get("hunt_missing_items", 0)
+            hunt_missing_mode = combined_settings.get("hunt_missing_mode", "episodes")
+
+            if app_type == "sonarr":
+                processed_missing = process_missing(
+                    api_url=api_url,
+                    api_key=api_key,
+                    instance_name=instance_name,  # Added the required instance_name parameter
+                    monitored_only=monitored_only,
+                    skip_future_episodes=skip_future_episodes,
+                    hunt_missing_items=hunt_missing_items,
+                    hunt_missing_mode=hunt_missing_mode,
+                    stop_check=stop_check_func,
+                    cycle_settings=cycle_settings
+                )
+            else:
+                # For other apps that still use the old signature
+                processed_missing = process_missing(app_settings=combined_settings, stop_check=stop_check_func,
+                                                    cycle_settings=cycle_settings)
+
+            if processed_missing:
+                processed_any_items = True
+        except Exception as e:
+            app_logger.error(f"Error during missing processing for {instance_name}: {e}", exc_info=True)
+
+    # --- Process Upgrades --- #
+    if hunt_upgrade_enabled and process_upgrades:
+        try:
+            # Extract settings for direct function calls (only for Sonarr)
+            if app_type == "sonarr":
+                api_url = combined_settings.get("api_url", "").strip()
+                api_key = combined_settings.get("api_key", "").strip()
+                monitored_only = combined_settings.get("monitored_only", True)
+                hunt_upgrade_items = combined_settings.get("hunt_upgrade_items", 0)
+                upgrade_mode = combined_settings.get("upgrade_mode", "episodes")
+
+                processed_upgrades = process_upgrades(
+                    api_url=api_url,
+                    api_key=api_key,
+                    instance_name=instance_name,  # Added the required instance_name parameter
+                    monitored_only=monitored_only,
+                    hunt_upgrade_items=hunt_upgrade_items,
+                    upgrade_mode=upgrade_mode,
+                    stop_check=stop_check_func,
+                    cycle_settings=cycle_settings
+                )
+            else:
+                # For other apps that still use the old signature
+                processed_upgrades = process_upgrades(app_settings=combined_settings, stop_check=stop_check_func,
+                                                      cycle_settings=cycle_settings)
+
+            if processed_upgrades:
+                processed_any_items = True
+        except Exception as e:
+            app_logger.error(f"Error during upgrade processing for {instance_name}: {e}", exc_info=True)
+
+    # --- Process Swaparr (stalled downloads) --- #
+    try:
+        # Import directly from handler module to avoid circular imports
+        try:
+            from src.primary.apps.swaparr.handler import process_stalled_downloads
+        except (ImportError, AttributeError) as e:
+            app_logger.debug(f"Swaparr module not available or missing functions: {e}")
+            process_stalled_downloads = None
+
+        # Check if Swaparr is enabled
+        if cycle_settings.swaparr.enabled and process_stalled_downloads:
+            app_logger.info(f"Running Swaparr on {app_type} instance: {instance_name}")
+            process_stalled_downloads(app_type, combined_settings, cycle_settings.swaparr)
+            app_logger.info(f"Completed Swaparr processing for {app_type} instance: {instance_name}")
+    except Exception as e:
+        app_logger.error(f"Error during Swaparr processing for {instance_name}: {e}", exc_info=True)
+
+    return processed_any_items
+
+def consume_reset_file(app_type: str, app_logger: logging.Logger) -> bool:
+    """
+    Check for a manual cycle reset file and remove it if present.
+
+    Args:
+        app_type: The type of Arr application
+        app_logger: Logger for the app
+
+    Returns:
+        True if a reset was requested and the next cycle should start now, False otherwise
+    """
+    # Use cross-platform path for reset file
+    from src.primary.utils.config_paths import get_reset_path
+    reset_file_path = get_reset_path(app_type)
+
+    if not os.path.exists(reset_file_path):
+        return False
+
+    try:
+        # Read timestamp from the file (if it exists)
+        with open(reset_file_path, 'r') as f:
+            timestamp = f.read().strip()
+        app_logger.info(f"!!! RESET FILE DETECTED !!! Manual cycle reset triggered for {app_type} (timestamp: {timestamp}). Starting new cycle immediately.")
+
+        # Delete the reset file
+        os.remove(reset_file_path)
+        app_logger.info(f"Reset file removed for {app_type}. Starting new cycle now.")
+
+        # A manual reset also rebuilds the library snapshots from scratch and re-probes every instance
+        library_cache.clear_snapshots(app_type)
+        instance_health.reset_health(app_type)
+    except Exception as e:
+        app_logger.error(f"Error processing reset file for {app_type}: {e}", exc_info=True)
+        # Try to remove the file even if reading failed
+        try:
+            os.remove(reset_file_path)
+        except:
+            pass
+    return True
+
+def log_cycle_end(app_type: str, cycle_settings: CycleSettings, processed_any_items: bool, app_logger: logging.Logger) -> int:
+    """
+    Finish a cycle: update the reset time and log the result and the next cycle time.
+
+    Returns:
+        The number of seconds to sleep before the next cycle
+    """
+    calculate_reset_time(app_type) # Pass app_type here if needed by the function
+
+    # Log cycle completion
+    if processed_any_items:
+        app_logger.info(f"=== {app_type.upper()} cycle finished. Processed items across instances. ===")
+    else:
+        app_logger.info(f"=== {app_type.upper()} cycle finished. No items processed in any instance. ===")
+
+    # Calculate sleep duration (use configured or default value)
+    sleep_seconds = cycle_settings.sleep_duration  # Default to 15 minutes
+
+    # Calculate and format the time when the next cycle will begin
+    next_cycle_time = datetime.datetime.now() + datetime.timedelta(seconds=sleep_seconds)
+    next_cycle_time_str = next_cycle_time.strftime("%Y-%m-%d %H:%M:%S")
+    app_logger.info(f"Next {app_type.upper()} cycle will begin at {next_cycle_time_str}")
+    app_logger.debug(f"Sleeping for {sleep_seconds} seconds before next cycle...")
+    return sleep_seconds
+
+def app_specific_loop(app_type: str) -> None:
+    """
+    Main processing loop for a specific Arr application.
+
+    Args:
+        app_type: The type of Arr application (sonarr, radarr, lidarr, readarr)
+    """
+    app_logger = get_logger(app_type)
+    app_logger.info(f"=== [{app_type.upper()}] Thread starting ===")
+
+    app_modules = load_app_modules(app_type, app_logger)
+    if not app_modules:
         return # Exit thread if essential modules fail to load
 
     # Create app-specific logger using provided function
     app_logger = logging.getLogger(f"huntarr.{app_type}")
-    
+
     while not stop_event.is_set():
         # --- Load Settings for this Cycle --- #
         try:
-            # Load all settings for this app for the current cycle
-            app_settings = settings_manager.load_settings(app_type) # Corrected function name
-            if not app_settings: # Handle case where loading fails
+            # Snapshot all settings used by this app for the current cycle
+            cycle_settings = build_cycle_settings(app_type)
+            if not cycle_settings.app: # Handle case where loading fails
                 app_logger.error("Failed to load settings. Skipping cycle.")
                 stop_event.wait(60) # Wait a minute before retrying
                 continue
 
             # Get global settings needed for cycle timing
-            sleep_duration = app_settings.get("sleep_duration", 900)
-            api_timeout = app_settings.get("api_timeout", 120) # Default to 120 seconds
+            sleep_duration = cycle_settings.sleep_duration
 
         except Exception as e:
             app_logger.error(f"Error loading settings for cycle: {e}", exc_info=True)
@@ -161,295 +488,54 @@ def app_specific_loop(app_type: str) -> None:
         app_logger.info(f"=== Starting {app_type.upper()} cycle ===")
 
         # Check if we need to use multi-instance mode
-        instances_to_process = []
-        
-        # Use the dynamically loaded function (if found)
-        if get_instances_func:
-            # Multi-instance mode supported
-            try:
-                instances_to_process = get_instances_func() # Call the dynamically loaded function
-                if instances_to_process:
-                    app_logger.info(f"Found {len(instances_to_process)} configured {app_type} instances to process")
-                else:
-                    # No instances found via get_configured_instances
-                    app_logger.warning(f"No configured {app_type} instances found. Skipping cycle.")
-                    stop_event.wait(sleep_duration)
-                    continue
-            except Exception as e:
-                app_logger.error(f"Error calling get_configured_instances function: {e}", exc_info=True)
-                stop_event.wait(60)
-                continue
-        else:
-            # get_instances_func is None (either not defined in app module or import failed earlier)
-            # Fallback to single instance mode using base settings if available
-            api_url = app_settings.get("api_url")
-            api_key = app_settings.get("api_key")
-            instance_name = app_settings.get("name", f"{app_type.capitalize()} Default") # Use 'name' or default
-            
-            if api_url and api_key:
-                app_logger.info(f"Processing {app_type} as single instance: {instance_name}")
-                # Create a list with a single dict matching the multi-instance structure
-                instances_to_process = [{
-                    "instance_name": instance_name, 
-                    "api_url": api_url, 
-                    "api_key": api_key
-                }]
-            else:
-                app_logger.warning(f"No 'get_configured_instances' function found and no valid single instance config (URL/Key) for {app_type}. Skipping cycle.")
-                stop_event.wait(sleep_duration)
-                continue
-            
+        instances_to_process = get_instances_to_process(app_type, cycle_settings, app_modules, app_logger)
+        if instances_to_process is None:
+            stop_event.wait(60)
+            continue
+
         # If after all checks, instances_to_process is still empty
         if not instances_to_process:
-            app_logger.warning(f"No valid {app_type} instances to process this cycle (unexpected state). Skipping.")
             stop_event.wait(sleep_duration)
             continue
-            
+
         # Process each instance dictionary returned by get_configured_instances
         processed_any_items = False
         for instance_details in instances_to_process:
             if stop_event.is_set():
                 break
-                
-            instance_name = instance_details.get("instance_name", "Default") # Use the dict from get_configured_instances
-            app_logger.info(f"Processing {app_type} instance: {instance_name}")
-            
-            # Get instance-specific settings from the instance_details dict
-            api_url = instance_details.get("api_url", "")
-            api_key = instance_details.get("api_key", "")
 
-            # Get global/shared settings from app_settings loaded at the start of the loop
-            # Example: monitored_only = app_settings.get("monitored_only", True)
-
-            # --- Connection Check --- #
-            if not api_url or not api_key:
-                app_logger.warning(f"Missing API URL or Key for instance '{instance_name}'. Skipping.")
-                continue
-            try:
-                # Use instance details for connection check
-                app_logger.debug(f"Checking connection to {app_type} instance '{instance_name}' at {api_url} with timeout {api_timeout}s")
-                connected = check_connection(api_url, api_key, api_timeout=api_timeout)
-                if not connected:
-                    app_logger.warning(f"Failed to connect to {app_type} instance '{instance_name}' at {api_url}. Skipping.")
-                    continue
-                app_logger.info(f"Successfully connected to {app_type} instance: {instance_name}")
-            except Exception as e:
-                app_logger.error(f"Error connecting to {app_type} instance '{instance_name}': {e}", exc_info=True)
-                continue # Skip this instance if connection fails
-                
-            # --- API Cap Check --- #
-            try:
-                # Check if hourly API cap is exceeded
-                if check_hourly_cap_exceeded(app_type):
-                    # Get the current cap status for logging
-                    from src.primary.stats_manager import get_hourly_cap_status
-                    cap_status = get_hourly_cap_status(app_type)
-                    app_logger.warning(f"{app_type.upper()} hourly cap reached {cap_status['current_usage']} of {cap_status['limit']} (app-specific limit). Skipping cycle!")
-                    continue # Skip this instance if API cap is exceeded
-            except Exception as e:
-                app_logger.error(f"Error checking hourly API cap for {app_type}: {e}", exc_info=True)
-                # Continue with the cycle even if cap check fails - safer than skipping
-
-            # --- Check if Hunt Modes are Enabled --- #
-            # These checks use the hunt_missing_setting/hunt_upgrade_setting defined earlier
-            # which correspond to keys in the main app_settings dict (e.g., 'hunt_missing_items')
-            hunt_missing_value = app_settings.get(hunt_missing_setting, 0)
-            hunt_upgrade_value = app_settings.get(hunt_upgrade_setting, 0)
-
-            hunt_missing_enabled = hunt_missing_value > 0
-            hunt_upgrade_enabled = hunt_upgrade_value > 0
-
-            # --- Queue Size Check --- # Moved inside loop
-            # Get maximum_download_queue_size from general settings (still using minimum_download_queue_size key for backward compatibility)
-            general_settings = settings_manager.load_settings('general')
-            max_queue_size = general_settings.get("minimum_download_queue_size", -1)
-            app_logger.info(f"Using maximum download queue size: {max_queue_size} from general settings")
-            
-            if max_queue_size >= 0:
-                try:
-                    # Use instance details for queue check
-                    current_queue_size = get_queue_size(api_url, api_key, api_timeout)
-                    if current_queue_size >= max_queue_size:
-                        app_logger.info(f"Download queue size ({current_queue_size}) meets or exceeds maximum ({max_queue_size}) for {instance_name}. Skipping cycle for this instance.")
-                        continue # Skip processing for this instance
-                    else:
-                        app_logger.info(f"Queue size ({current_queue_size}) is below maximum ({max_queue_size}). Proceeding.")
-                except Exception as e:
-                    app_logger.warning(f"Could not get download queue size for {instance_name}. Proceeding anyway. Error: {e}", exc_info=False) # Log less verbosely
-            
-            # Prepare args dictionary for processing functions
-            # Combine instance details with general app settings for the processing functions
-            # Assuming app_settings already contains most general settings, add instance specifics
-            combined_settings = app_settings.copy() # Start with general settings
-            combined_settings.update(instance_details) # Add/overwrite with instance specifics (name, url, key)
-            
-            # Ensure settings from general.json are consistently used for all apps
-            combined_settings["api_timeout"] = settings_manager.get_advanced_setting("api_timeout", 120)
-            combined_settings["command_wait_delay"] = settings_manager.get_advanced_setting("command_wait_delay", 1)
-            combined_settings["command_wait_attempts"] = settings_manager.get_advanced_setting("command_wait_attempts", 600)
-            
-            # Define the stop check function
-            stop_check_func = stop_event.is_set
-
-            # --- Process Missing --- #
-            if hunt_missing_enabled and process_missing:
-                try:
-                    # Extract settings for direct function calls
-                    api_url = combined_settings.get("api_url", "").strip()
-                    api_key = combined_settings.get("api_key", "").strip()
-                    api_timeout = combined_settings.get("api_timeout", 120)
-                    monitored_only = combined_settings.get("monitored_only", True)
-                    skip_future_episodes = combined_settings.get("skip_future_episodes", True)
-                    hunt_missing_items = combined_settings.get("hunt_missing_items", 0)
-                    hunt_missing_mode = combined_settings.get("hunt_missing_mode", "episodes")
-                    command_wait_delay = combined_settings.get("command_wait_delay", 1)
-                    command_wait_attempts = combined_settings.get("command_wait_attempts", 600)
-                    
-                    if app_type == "sonarr":
-                        processed_missing = process_missing(
-                            api_url=api_url,
-                            api_key=api_key,
-                            instance_name=instance_name,  # Added the required instance_name parameter
-                            api_timeout=api_timeout,
-                            monitored_only=monitored_only,
-                            skip_future_episodes=skip_future_episodes,
-                            hunt_missing_items=hunt_missing_items,
-                            hunt_missing_mode=hunt_missing_mode,
-                            command_wait_delay=command_wait_delay,
-                            command_wait_attempts=command_wait_attempts,
-                            stop_check=stop_check_func
-                        )
-                    else:
-                        # For other apps that still use the old signature
-                        processed_missing = process_missing(app_settings=combined_settings, stop_check=stop_check_func)
-                        
-                    if processed_missing:
-                        processed_any_items = True
-                except Exception as e:
-                    app_logger.error(f"Error during missing processing for {instance_name}: {e}", exc_info=True)
-
-            # --- Process Upgrades --- #
-            if hunt_upgrade_enabled and process_upgrades:
-                try:
-                    # Extract settings for direct function calls (only for Sonarr)
-                    if app_type == "sonarr":
-                        api_url = combined_settings.get("api_url", "").strip()
-                        api_key = combined_settings.get("api_key", "").strip()
-                        api_timeout = combined_settings.get("api_timeout", 120)
-                        monitored_only = combined_settings.get("monitored_only", True)
-                        hunt_upgrade_items = combined_settings.get("hunt_upgrade_items", 0)
-                        upgrade_mode = combined_settings.get("upgrade_mode", "episodes")
-                        command_wait_delay = combined_settings.get("command_wait_delay", 1)
-                        command_wait_attempts = combined_settings.get("command_wait_attempts", 600)
-                        
-                        processed_upgrades = process_upgrades(
-                            api_url=api_url,
-                            api_key=api_key,
-                            instance_name=instance_name,  # Added the required instance_name parameter
-                            api_timeout=api_timeout,
-                            monitored_only=monitored_only,
-                            hunt_upgrade_items=hunt_upgrade_items,
-                            upgrade_mode=upgrade_mode,
-                            command_wait_delay=command_wait_delay,
-                            command_wait_attempts=command_wait_attempts,
-                            stop_check=stop_check_func
-                        )
-                    else:
-                        # For other apps that still use the old signature
-                        processed_upgrades = process_upgrades(app_settings=combined_settings, stop_check=stop_check_func)
-                    
-                    if processed_upgrades:
-                        processed_any_items = True
-                except Exception as e:
-                    app_logger.error(f"Error during upgrade processing for {instance_name}: {e}", exc_info=True)
+            if process_instance(app_type, app_modules, cycle_settings, instance_details, app_logger):
+                processed_any_items = True
 
             # Small delay between instances if needed (optional)
             if not stop_event.is_set():
                  time.sleep(1) # Short pause
 
-            # --- Process Swaparr (stalled downloads) --- #
-            try:
-                # Try to import Swaparr module
-                if not 'process_stalled_downloads' in locals():
-                    try:
-                        # Import directly from handler module to avoid circular imports
-                        from src.primary.apps.swaparr.handler import process_stalled_downloads
-                        swaparr_logger = get_logger("swaparr")
-                        swaparr_logger.debug(f"Successfully imported Swaparr module")
-                    except (ImportError, AttributeError) as e:
-                        app_logger.debug(f"Swaparr module not available or missing functions: {e}")
-                        process_stalled_downloads = None
-                
-                # Check if Swaparr is enabled
-                swaparr_settings = settings_manager.load_settings("swaparr")
-                if swaparr_settings and swaparr_settings.get("enabled", False) and process_stalled_downloads:
-                    app_logger.info(f"Running Swaparr on {app_type} instance: {instance_name}")
-                    process_stalled_downloads(app_type, combined_settings, swaparr_settings)
-                    app_logger.info(f"Completed Swaparr processing for {app_type} instance: {instance_name}")
-            except Exception as e:
-                app_logger.error(f"Error during Swaparr processing for {instance_name}: {e}", exc_info=True)
-
         # --- Cycle End & Sleep --- #
-        calculate_reset_time(app_type) # Pass app_type here if needed by the function
+        sleep_seconds = log_cycle_end(app_type, cycle_settings, processed_any_items, app_logger)
 
-        # Log cycle completion
-        if processed_any_items:
-            app_logger.info(f"=== {app_type.upper()} cycle finished. Processed items across instances. ===")
-        else:
-            app_logger.info(f"=== {app_type.upper()} cycle finished. No items processed in any instance. ===")
-            
-        # Calculate sleep duration (use configured or default value)
-        sleep_seconds = app_settings.get("sleep_duration", 900)  # Default to 15 minutes
-                
-        # Sleep with periodic checks for reset file
-        # Calculate and format the time when the next cycle will begin
-        next_cycle_time = datetime.datetime.now() + datetime.timedelta(seconds=sleep_seconds)
-        next_cycle_time_str = next_cycle_time.strftime("%Y-%m-%d %H:%M:%S")
-        app_logger.info(f"Next {app_type.upper()} cycle will begin at {next_cycle_time_str}")
-        app_logger.debug(f"Sleeping for {sleep_seconds} seconds before next cycle...")
-                
         # Use shorter sleep intervals and check for reset file
         wait_interval = 1  # Check every second to be more responsive
         elapsed = 0
-        # Use cross-platform path for reset file
-        from src.primary.utils.config_paths import get_reset_path
-        reset_file_path = get_reset_path(app_type)
-                
+
         while elapsed < sleep_seconds:
             # Check if stop event is set
             if stop_event.is_set():
                 app_logger.info("Stop event detected during sleep. Breaking out of sleep cycle.")
                 break
-                        
+
             # Check if reset file exists
-            if os.path.exists(reset_file_path):
-                try:
-                    # Read timestamp from the file (if it exists)
-                    with open(reset_file_path, 'r') as f:
-                        timestamp = f.read().strip()
-                    app_logger.info(f"!!! RESET FILE DETECTED !!! Manual cycle reset triggered for {app_type} (timestamp: {timestamp}). Starting new cycle immediately.")
-                        
-                    # Delete the reset file
-                    os.remove(reset_file_path)
-                    app_logger.info(f"Reset file removed for {app_type}. Starting new cycle now.")
-                    break
-                except Exception as e:
-                    app_logger.error(f"Error processing reset file for {app_type}: {e}", exc_info=True)
-                    # Try to remove the file even if reading failed
-                    try:
-                        os.remove(reset_file_path)
-                    except:
-                        pass
-                    break
-                        
+            if consume_reset_file(app_type, app_logger):
+                break
+
             # Sleep for a short interval
             stop_event.wait(wait_interval)
             elapsed += wait_interval
-                    
+
             # If we've slept for at least 30 seconds, update the logger message every 30 seconds
             if elapsed > 0 and elapsed % 30 == 0:
                 app_logger.debug(f"Still sleeping, {sleep_seconds - elapsed} seconds remaining before next cycle...")
-                
+
     app_logger.info(f"=== [{app_type.upper()}] Thread stopped ====")
 
 def reset_app_cycle(app_type: str) -> bool:
@@ -512,12 +598,27 @@ def start_app_threads():
             # logger.debug(f"{app_type} is not configured. No thread started.")
         pass # Corrected indentation
 
+def start_async_engine_thread():
+    """Start the asyncio hunting engine, or restart it if its thread died."""
+    from src.primary.async_engine import start_async_engine
+
+    thread = app_threads.get("async_engine")
+    if thread is not None and thread.is_alive():
+        return
+    if thread is not None:
+        logger.warning("Async hunting engine thread died, restarting...")
+    else:
+        logger.info("Starting async hunting engine...")
+    app_threads["async_engine"] = start_async_engine(stop_event, sys.modules[__name__])
+
 def check_and_restart_threads():
     """Check if any threads have died and restart them if the app is still configured."""
     configured_apps_list = settings_manager.get_configured_apps() # Corrected function name
     configured_apps = {app: True for app in configured_apps_list} # Convert list to dict format expected below
 
     for app_type, thread in list(app_threads.items()):
+        if app_type == "async_engine":
+            continue # Restarted by start_async_engine_thread(), it is not an app loop
         if not thread.is_alive():
             logger.warning(f"{app_type} thread died unexpectedly.")
             del app_threads[app_type] # Remove dead thread
@@ -539,17 +640,6 @@ def shutdown_threads():
     """Wait for all threads to finish."""
     logger.info("Waiting for all app threads to stop...")
     
-    # Stop the hourly API cap scheduler
-    global hourly_cap_scheduler_thread
-    if hourly_cap_scheduler_thread and hourly_cap_scheduler_thread.is_alive():
-        # The thread should exit naturally due to the stop_event being set
-        logger.info("Waiting for hourly API cap scheduler to stop...")
-        hourly_cap_scheduler_thread.join(timeout=5.0)
-        if hourly_cap_scheduler_thread.is_alive():
-            logger.warning("Hourly API cap scheduler did not stop gracefully")
-        else:
-            logger.info("Hourly API cap scheduler stopped")
-    
     # Stop the scheduler engine
     try:
         logger.info("Stopping schedule action engine...")
@@ -558,59 +648,61 @@ def shutdown_threads():
     except Exception as e:
         logger.error(f"Error stopping schedule action engine: {e}")
     
+    # Release threads waiting on the API rate limiter
+    try:
+        from src.primary.utils.rate_limiter import cancel_waits
+        cancel_waits()
+    except Exception as e:
+        logger.error(f"Error releasing API rate limiter waits: {e}")
+    
     # Wait for all threads to terminate
     for thread in app_threads.values():
         if thread.is_alive():
             thread.join(timeout=10.0)
     
-    logger.info("All app threads stopped.")
-
-def hourly_cap_scheduler_loop():
-    """Main loop for the hourly API cap scheduler thread
-    Checks time every 30 seconds and resets caps if needed at the top of the hour
-    """
-    logger.info("Starting hourly API cap scheduler loop")
+    # Flush processed IDs still buffered by the stateful backend
+    try:
+        from src.primary.stateful_manager import compact_processed_ids
+        compact_processed_ids()
+    except Exception as e:
+        logger.error(f"Error compacting processed IDs: {e}")
     
+    # Write stats counters still waiting for the flusher
     try:
-        from src.primary.stats_manager import reset_hourly_caps
-        
-        # Initial check in case we're starting right at the top of an hour
-        current_time = datetime.datetime.now()
-        if current_time.minute == 0:
-            logger.info(f"Initial hourly reset triggered at {current_time.hour}:00")
-            reset_hourly_caps()
-        
-        # Main monitoring loop
-        while not stop_event.is_set():
-            try:
-                # Sleep for 30 seconds between checks
-                # This ensures we won't miss the top of the hour
-                stop_event.wait(30)
-                
-                if stop_event.is_set():
-                    break
-                    
-                # Check if it's the top of the hour (00 minute mark)
-                current_time = datetime.datetime.now()
-                if current_time.minute == 0:
-                    logger.info(f"Hourly reset triggered at {current_time.hour}:00")
-                    success = reset_hourly_caps()
-                    if success:
-                        logger.info(f"Successfully reset hourly API caps at {current_time.hour}:00")
-                    else:
-                        logger.error(f"Failed to reset hourly API caps at {current_time.hour}:00")
-                
-            except Exception as e:
-                logger.error(f"Error in hourly cap scheduler: {e}")
-                logger.error(traceback.format_exc())
-                # Sleep briefly to avoid spinning in case of repeated errors
-                time.sleep(5)
-                
+        from src.primary.stats_manager import flush_stats
+        flush_stats()
+    except Exception as e:
+        logger.error(f"Error flushing stats: {e}")
+    
+    # Fsync history entries still waiting for the batched fsync
+    try:
+        from src.primary.history_manager import flush_history
+        flush_history()
     except Exception as e:
-        logger.error(f"Fatal error in hourly cap scheduler: {e}")
-        logger.error(traceback.format_exc())
+        logger.error(f"Error flushing history: {e}")
     
-    logger.info("Hourly API cap scheduler stopped")
+    # Write coalesced files and fsync everything the fsync policy deferred
+    try:
+        from src.primary.utils.durable_store import flush_durable_writes
+        flush_durable_writes()
+    except Exception as e:
+        logger.error(f"Error flushing durable writes: {e}")
+    
+    # Checkpoint the runtime database so its WAL is folded in and synced
+    try:
+        from src.primary.datastore import close_datastore
+        close_datastore()
+    except Exception as e:
+        logger.error(f"Error closing runtime database: {e}")
+    
+    # Release pooled *arr connections
+    try:
+        from src.primary.utils.http_client import close_all_sessions
+        close_all_sessions()
+    except Exception as e:
+        logger.error(f"Error closing pooled HTTP sessions: {e}")
+    
+    logger.info("All app threads stopped.")
 
 def instance_list_generator_loop():
     """
@@ -652,24 +744,6 @@ def start_instance_list_generator():
     
     logger.debug(f"Instance list generator started. Thread is alive: {instance_list_generator_thread.is_alive()}")
 
-def start_hourly_cap_scheduler():
-    """Start the hourly API cap scheduler thread"""
-    global hourly_cap_scheduler_thread
-    
-    if hourly_cap_scheduler_thread and hourly_cap_scheduler_thread.is_alive():
-        logger.info("Hourly API cap scheduler already running")
-        return
-    
-    # Create and start the scheduler thread
-    hourly_cap_scheduler_thread = threading.Thread(
-        target=hourly_cap_scheduler_loop, 
-        name="HourlyCapScheduler", 
-        daemon=True
-    )
-    hourly_cap_scheduler_thread.start()
-    
-    logger.info(f"Hourly API cap scheduler started. Thread is alive: {hourly_cap_scheduler_thread.is_alive()}")
-
 def start_huntarr():
     """Main entry point for Huntarr background tasks."""
     logger.info(f"--- Starting Huntarr Background Tasks v{__version__} --- ")
@@ -687,12 +761,24 @@ def start_huntarr():
         logger.info("Running settings migration from huntarr.json (if found)...")
         settings_manager.migrate_from_huntarr_json()
         
-    # Start the hourly API cap scheduler
+    # Apply the durable write policy before the background threads start writing
+    try:
+        from src.primary.utils.durable_store import durable_store
+        durable_store.configure(
+            fsync_policy=settings_manager.get_advanced_setting("durable_fsync_policy", "always"),
+            coalesce_seconds=settings_manager.get_advanced_setting("durable_write_coalesce_seconds", 2),
+            fsync_interval_seconds=settings_manager.get_advanced_setting("durable_fsync_interval_seconds", 5)
+        )
+    except Exception as e:
+        logger.error(f"Error configuring durable writes: {e}")
+    
+    # Open the runtime database, applying any pending schema migrations
     try:
-        start_hourly_cap_scheduler()
-        logger.info("Hourly API cap scheduler started successfully")
+        from src.primary.datastore import get_datastore
+        get_datastore()
     except Exception as e:
-        logger.error(f"Failed to start hourly API cap scheduler: {e}")
+        logger.error(f"Error opening runtime database: {e}")
+        logger.debug(traceback.format_exc())
         
     # Start the scheduler engine
     try:
@@ -718,10 +804,21 @@ def start_huntarr():
         except Exception as e:
             logger.error(f"Error logging initial configuration for {app_name}: {e}")
 
+    # Use the asyncio hunting engine instead of one thread per app if enabled
+    use_async_engine = False
+    try:
+        from src.primary.async_engine import is_async_engine_enabled
+        use_async_engine = is_async_engine_enabled()
+    except Exception as e:
+        logger.error(f"Error checking async engine setting: {e}")
+
     try:
         # Main loop: Start and monitor app threads
         while not stop_event.is_set():
-            start_app_threads() # Start/Restart threads for configured apps
+            if use_async_engine:
+                start_async_engine_thread() # Start/Restart the async engine
+            else:
+                start_app_threads() # Start/Restart threads for configured apps
             # check_and_restart_threads() # This is implicitly handled by start_app_threads checking is_alive
             stop_event.wait(15) # Check for stop signal every 15 seconds
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Per-cycle settings snapshot for Huntarr
+An app thread builds one CycleSettings at the start of each hunt cycle and
+passes it down the whole pipeline (instance checks, missing, upgrades,
+Swaparr), so every stage of the cycle sees the same settings and nothing
+in the pipeline goes back to the settings manager for a lookup.
+"""
+
+import copy
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
+
+from src.primary import settings_manager
+
+
+def _freeze(settings: Dict[str, Any]) -> Mapping[str, Any]:
+    """Read-only view of a private copy of a settings dict."""
+    return MappingProxyType(copy.deepcopy(settings or {}))
+
+
+@dataclass(frozen=True)
+class SwaparrSettings:
+    """Swaparr settings with the duration and size strings already parsed."""
+
+    __slots__ = ("enabled", "max_strikes", "max_download_time", "ignore_above_size",
+                 "remove_from_client", "dry_run", "raw")
+
+    enabled: bool
+    max_strikes: int
+    max_download_time: int  # seconds
+    ignore_above_size: int  # bytes
+    remove_from_client: bool
+    dry_run: bool
+    raw: Mapping[str, Any]
+
+    @classmethod
+    def from_settings(cls, swaparr_settings: Dict[str, Any]) -> "SwaparrSettings":
+        # Imported here to avoid circular imports
+        from src.primary.apps.swaparr.handler import parse_time_string_to_seconds, parse_size_string_to_bytes
+
+        swaparr_settings = swaparr_settings or {}
+        return cls(
+            enabled=bool(swaparr_settings.get("enabled", False)),
+            max_strikes=swaparr_settings.get("max_strikes", 3),
+            max_download_time=parse_time_string_to_seconds(swaparr_settings.get("max_download_time", "2h")),
+            ignore_above_size=parse_size_string_to_bytes(swaparr_settings.get("ignore_above_size", "25GB")),
+            remove_from_client=swaparr_settings.get("remove_from_client", True),
+            dry_run=swaparr_settings.get("dry_run", False),
+            raw=_freeze(swaparr_settings)
+        )
+
+
+@dataclass(frozen=True)
+class CycleSettings:
+    """
+    Immutable settings for one hunt cycle of one app.
+
+    app, general and swaparr.raw are read-only copies of the settings files
+    as they were when the cycle started; the remaining fields are the values
+    the pipeline reads, resolved once.
+    """
+
+    __slots__ = ("app_type", "app", "general", "swaparr", "api_timeout", "command_wait_delay",
+                 "command_wait_attempts", "stateful_management_hours", "search_batch_size",
+                 "max_queue_size", "sleep_duration")
+
+    app_type: str
+    app: Mapping[str, Any]
+    general: Mapping[str, Any]
+    swaparr: SwaparrSettings
+    api_timeout: int
+    command_wait_delay: int
+    command_wait_attempts: int
+    stateful_management_hours: int
+    search_batch_size: int
+    max_queue_size: int
+    sleep_duration: int
+
+    def instance_settings(self, instance_details: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the settings dict handed to the processing functions for one instance.
+
+        Args:
+            instance_details: The instance dict returned by get_configured_instances
+
+        Returns:
+            A new dict with the app settings, the instance details and the advanced settings shared by all apps
+        """
+        combined_settings = copy.deepcopy(dict(self.app))
+        combined_settings.update(instance_details)
+        combined_settings["api_timeout"] = self.api_timeout
+        combined_settings["command_wait_delay"] = self.command_wait_delay
+        combined_settings["command_wait_attempts"] = self.command_wait_attempts
+        return combined_settings
+
+
+def build_cycle_settings(app_type: str) -> CycleSettings:
+    """
+    Read every settings file a hunt cycle needs and freeze them.
+
+    Args:
+        app_type: The type of Arr application
+
+    Returns:
+        The CycleSettings for a new cycle (app is empty if the app settings could not be loaded)
+    """
+    app_settings = settings_manager.load_settings(app_type)
+    general_settings = settings_manager.load_settings("general")
+    swaparr_settings = settings_manager.load_settings("swaparr")
+
+    return CycleSettings(
+        app_type=app_type,
+        app=_freeze(app_settings),
+        general=_freeze(general_settings),
+        swaparr=SwaparrSettings.from_settings(swaparr_settings),
+        api_timeout=general_settings.get("api_timeout", 120),
+        command_wait_delay=general_settings.get("command_wait_delay", 1),
+        command_wait_attempts=general_settings.get("command_wait_attempts", 600),
+        stateful_management_hours=general_settings.get("stateful_management_hours", 168),
+        search_batch_size=max(1, int(general_settings.get("search_batch_size", 10))),
+        # Still stored under the minimum_download_queue_size key for backward compatibility
+        max_queue_size=general_settings.get("minimum_download_queue_size", -1),
+        sleep_duration=app_settings.get("sleep_duration", 900)
+    )
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Embedded runtime database for Huntarr
+Processed IDs, the stateful lock, stats counters, hourly cap hits, Swaparr
+strikes, legacy app state and the schedule all live in one WAL-mode SQLite
+database under the config directory. Every thread gets its own connection,
+closed again when the thread exits, and writes go through transaction(), which serializes writers and commits a whole
+batch at once. The schema is brought up to date by the migrations in
+migrate_configs the first time the database is opened.
+"""
+
+import pathlib
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.config_paths import CONFIG_PATH
+from src.primary.utils.durable_store import durable_store, FSYNC_ALWAYS
+from src.primary.migrate_configs import SCHEMA_MIGRATIONS
+
+logger = get_logger("huntarr")
+
+DATABASE_FILE = CONFIG_PATH / "huntarr.db"
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class _ThreadConnection:
+    """Holds one thread's connection. Only the thread-local refers to it, so it goes away with the thread."""
+
+    __slots__ = ("connection", "__weakref__")
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+
+class Datastore:
+    """A SQLite database with one connection per thread and serialized write transactions."""
+
+    def __init__(self, db_path: pathlib.Path = DATABASE_FILE):
+        self.db_path = pathlib.Path(db_path)
+        self._local = threading.local()
+        # Reentrant, so a repository call may run inside a caller's transaction
+        self._write_lock = threading.RLock()
+        self._connections_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transaction() issues BEGIN/COMMIT itself. Connections
+        # stay on their own thread, the flag only lets the finalizer of an exited
+        # thread close its connection from whichever thread collects it.
+        connection = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_SECONDS,
+                                     isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    def _release(self, connection: sqlite3.Connection) -> None:
+        """Close the connection of a thread that exited, unless it was closed already."""
+        with self._connections_lock:
+            if connection not in self._connections:
+                return
+            self._connections.remove(connection)
+        try:
+            connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Error closing runtime database connection: {e}")
+
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        local = self._local
+        holder = getattr(local, "holder", None)
+        if holder is None:
+            holder = local.holder = _ThreadConnection(self._open())
+            # Hunt and web request threads come and go, close their connection when they do
+            local.finalizer = weakref.finalize(holder, self._release, holder.connection)
+            local.synchronous = None
+            local.depth = 0
+        connection = holder.connection
+
+        # Follow the durable write policy: fsync every commit only under 'always',
+        # otherwise commits are made durable by WAL checkpoints
+        synchronous = "FULL" if durable_store.fsync_policy == FSYNC_ALWAYS else "NORMAL"
+        if local.synchronous != synchronous:
+            connection.execute(f"PRAGMA synchronous={synchronous}")
+            local.synchronous = synchronous
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a batch of writes as one transaction.
+
+        Nested transactions on the same thread join the outer one. The batch
+        is rolled back if the block raises.
+        """
+        connection = self.connection()
+        with self._write_lock:
+            depth = self._local.depth
+            if depth:
+                self._local.depth = depth + 1
+                try:
+                    yield connection
+                finally:
+                    self._local.depth = depth
+                return
+
+            connection.execute("BEGIN IMMEDIATE")
+            self._local.depth = 1
+            try:
+                yield connection
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.depth = 0
+
+    def migrate(self) -> int:
+        """
+        Apply the schema migrations the database has not seen yet.
+
+        Returns:
+            The schema version of the database
+        """
+        with self._write_lock:
+            version = self.connection().execute("PRAGMA user_version").fetchone()[0]
+            for target, description, migration in SCHEMA_MIGRATIONS:
+                if target <= version:
+                    continue
+                logger.info(f"Migrating runtime database {self.db_path} to version {target}: {description}")
+                with self.transaction() as connection:
+                    migration(connection)
+                    connection.execute(f"PRAGMA user_version = {int(target)}")
+                version = target
+        return version
+
+    def close(self) -> None:
+        """
+        Checkpoint the WAL into the database file and close this thread's connection.
+
+        Connections of other threads are left alone, they are closed by their
+        finalizers when those threads exit. Using the datastore again on this
+        thread opens a new connection.
+        """
+        with self._write_lock:
+            connection = self.connection()
+            try:
+                connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.warning(f"Error checkpointing runtime database: {e}")
+            # Runs at most once, so the holder's own finalizer won't close it again
+            self._local.finalizer()
+            self._local.holder = None
+
+
+_datastore: Optional[Datastore] = None
+_datastore_lock = threading.Lock()
+
+
+def get_datastore() -> Datastore:
+    """Get the runtime database, creating and migrating it on first use."""
+    global _datastore
+    if _datastore is not None:
+        return _datastore
+
+    with _datastore_lock:
+        if _datastore is None:
+            datastore = Datastore()
+            datastore.migrate()
+            _datastore = datastore
+        return _datastore
+
+
+def close_datastore() -> None:
+    """Checkpoint and close the runtime database. Called on shutdown."""
+    if _datastore is not None:
+        _datastore.close()
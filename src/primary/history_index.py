@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+In-memory history index for Huntarr
+Keeps the newest history entries in time order, per app and across all apps, so
+the history API can serve a page by slicing instead of reading and sorting every
+segment. Pages can be addressed by number or by a keyset cursor, and searches
+go through a token index over processed_info, instance_name and id.
+
+The index holds at most 'history_index_max_entries' rows. Older entries stay in
+the segments on disk (until retention drops them) but are not served by the
+history page. Entries removed by retention leave the index as well.
+"""
+
+import re
+import sys
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.primary.utils.logger import get_logger
+
+logger = get_logger("huntarr")
+
+# Row layout: tuples compare by (date_time, row_id), which is unique, so rows
+# sort in time order without comparing the remaining fields
+ROW_TIME = 0
+ROW_ID = 1
+ROW_INFO = 2
+ROW_MEDIA_ID = 3
+ROW_INSTANCE = 4
+ROW_OPERATION = 5
+ROW_APP = 6
+
+Row = Tuple[int, int, str, Any, str, str, str]
+
+# Runs of letters and digits. A search query matches a field only if each of
+# its runs is a substring of one of the field's runs.
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Number of search results kept between appends
+MAX_CACHED_SEARCHES = 32
+
+# Default number of rows kept in the index
+DEFAULT_MAX_ROWS = 100000
+
+
+def tokenize(text: str) -> List[str]:
+    """Split lowercase text into letter/digit tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _matches(row: Row, search_query: str) -> bool:
+    """The history page's original filter: a substring of name, instance or ID."""
+    return (search_query in row[ROW_INFO].lower() or
+            search_query in row[ROW_INSTANCE].lower() or
+            search_query in str(row[ROW_MEDIA_ID]).lower())
+
+
+def encode_cursor(row: Row) -> str:
+    return f"{row[ROW_TIME]}:{row[ROW_ID]}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, int]]:
+    try:
+        date_time, row_id = cursor.split(":", 1)
+        return int(date_time), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+class HistoryIndex:
+    """
+    Time-ordered history rows with a token index.
+
+    Every view (one app, all apps, a search result) is a list of rows in
+    ascending time order, so the newest page is the tail of the list and a
+    cursor is a binary search away.
+    """
+
+    def __init__(self, max_rows: int = DEFAULT_MAX_ROWS):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.max_rows = max_rows
+        self._clear()
+
+    def _clear(self) -> None:
+        self._rows: List[Row] = []
+        self._rows_by_app: Dict[str, List[Row]] = {}
+        self._postings: Dict[str, List[Row]] = {}
+        self._search_cache: Dict[Tuple[str, str], List[Row]] = {}
+        self._next_row_id = 0
+
+    def _make_row(self, entry: Dict[str, Any]) -> Row:
+        row = (
+            int(entry.get("date_time", 0)),
+            self._next_row_id,
+            str(entry.get("processed_info", "")),
+            entry.get("id", ""),
+            sys.intern(str(entry.get("instance_name", ""))),
+            sys.intern(str(entry.get("operation_type", "missing"))),
+            sys.intern(str(entry.get("app_type", "")))
+        )
+        self._next_row_id += 1
+        return row
+
+    def _index_row(self, row: Row) -> None:
+        tokens = set(tokenize(row[ROW_INFO]))
+        tokens.update(tokenize(row[ROW_INSTANCE]))
+        tokens.update(tokenize(str(row[ROW_MEDIA_ID])))
+        for token in tokens:
+            self._postings.setdefault(token, []).append(row)
+
+    def load(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Build the index from the newest max_rows of the stored entries (in any order)."""
+        with self._lock:
+            self._clear()
+            # Only max_rows entries are held while reading. The position breaks
+            # ties, so entries logged in the same second keep their order.
+            newest = heapq.nlargest(self.max_rows, enumerate(entries),
+                                    key=lambda item: (item[1].get("date_time", 0), item[0]))
+            newest.reverse()
+            for _, entry in newest:
+                row = self._make_row(entry)
+                self._rows.append(row)
+                self._rows_by_app.setdefault(row[ROW_APP], []).append(row)
+                self._index_row(row)
+            self.loaded = True
+            logger.debug(f"Indexed {len(self._rows)} history entries ({len(self._postings)} search tokens)")
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Index newly appended entries. Does nothing until the index has been loaded."""
+        with self._lock:
+            if not self.loaded:
+                return
+            for entry in entries:
+                row = self._make_row(entry)
+                for rows in (self._rows, self._rows_by_app.setdefault(row[ROW_APP], [])):
+                    if rows and rows[-1] > row:
+                        # The clock went backwards - keep the list sorted
+                        insort(rows, row)
+                    else:
+                        rows.append(row)
+                self._index_row(row)
+            # Trim in steps of a tenth of the limit, so the lists are not rebuilt on every append
+            if len(self._rows) > self.max_rows + max(1, self.max_rows // 10):
+                self._drop_rows(self._rows[:len(self._rows) - self.max_rows])
+            # Cached search results and their counts are stale now
+            self._search_cache.clear()
+
+    def remove_oldest(self, app_type: str, is_instance: Callable[[str], bool], count: int) -> None:
+        """
+        Drop the oldest rows of one instance, after retention removed them from disk.
+
+        Args:
+            app_type: The app type of the instance
+            is_instance: Returns True for the instance_name values of the instance
+            count: Number of rows to drop
+        """
+        with self._lock:
+            if not self.loaded or count <= 0:
+                return
+            removed = {}
+            for row in self._rows_by_app.get(app_type, []):
+                if is_instance(row[ROW_INSTANCE]):
+                    removed[row[ROW_ID]] = row
+                    if len(removed) >= count:
+                        break
+            if not removed:
+                return
+            self._drop_rows(removed.values())
+            self._search_cache.clear()
+
+    def _drop_rows(self, rows_to_drop: Iterable[Row]) -> None:
+        """Remove rows from every list and posting. Caller must hold the lock."""
+        removed = set()
+        apps = set()
+        tokens = set()
+        for row in rows_to_drop:
+            removed.add(row[ROW_ID])
+            apps.add(row[ROW_APP])
+            tokens.update(tokenize(row[ROW_INFO]))
+            tokens.update(tokenize(row[ROW_INSTANCE]))
+            tokens.update(tokenize(str(row[ROW_MEDIA_ID])))
+
+        self._rows = [row for row in self._rows if row[ROW_ID] not in removed]
+        for app in apps:
+            self._rows_by_app[app] = [row for row in self._rows_by_app[app] if row[ROW_ID] not in removed]
+        for token in tokens:
+            rows = [row for row in self._postings.get(token, []) if row[ROW_ID] not in removed]
+            if rows:
+                self._postings[token] = rows
+            else:
+                self._postings.pop(token, None)
+
+    def invalidate(self) -> None:
+        """Drop the index so the next query reloads it from disk."""
+        with self._lock:
+            self._clear()
+            self.loaded = False
+
+    def _search(self, app_type: str, search_query: str) -> List[Row]:
+        """Get the rows matching a search, in ascending time order. Caller must hold the lock."""
+        cache_key = (app_type, search_query)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        query_tokens = tokenize(search_query)
+        if len(query_tokens) >= 3:
+            # Tokens inside the query are whole tokens of any match - use the rarest one
+            candidates = min((self._postings.get(token, []) for token in query_tokens[1:-1]), key=len)
+        elif query_tokens:
+            # Any match contains the query's longest token inside one of its own tokens
+            longest = max(query_tokens, key=len)
+            candidates = {}
+            for token, rows in self._postings.items():
+                if longest in token:
+                    for row in rows:
+                        candidates[row[ROW_ID]] = row
+            candidates = candidates.values()
+        else:
+            candidates = self._rows if app_type == "all" else self._rows_by_app.get(app_type, [])
+
+        result = sorted(
+            row for row in candidates
+            if (app_type == "all" or row[ROW_APP] == app_type) and _matches(row, search_query)
+        )
+        if len(self._search_cache) >= MAX_CACHED_SEARCHES:
+            self._search_cache.pop(next(iter(self._search_cache)))
+        self._search_cache[cache_key] = result
+        return result
+
+    def query(self, app_type: str, search_query: Optional[str] = None, page: int = 1, page_size: int = 20,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of history, newest first.
+
+        Args:
+            app_type: The app type, or "all"
+            search_query: Optional search query to filter results
+            page: Page number (1-based), used when no cursor is given
+            page_size: Number of entries per page
+            cursor: Optional next_cursor of the previous page
+
+        Returns:
+            dict with entries, total_entries, total_pages, current_page and next_cursor
+        """
+        with self._lock:
+            if search_query and search_query.strip():
+                rows = self._search(app_type, search_query.lower())
+            elif app_type == "all":
+                rows = self._rows
+            else:
+                rows = self._rows_by_app.get(app_type, [])
+
+            total_entries = len(rows)
+            total_pages = (total_entries + page_size - 1) // page_size if total_entries > 0 else 1
+
+            position = decode_cursor(cursor) if cursor else None
+            if position is not None:
+                # Keyset pagination: the page ends just before the cursor row
+                end_idx = bisect_left(rows, position)
+                page = max(1, min(page, total_pages))
+            else:
+                # Adjust page if out of bounds
+                page = max(1, min(page, total_pages))
+                end_idx = max(0, total_entries - (page - 1) * page_size)
+            start_idx = max(0, end_idx - page_size)
+            page_rows = rows[start_idx:end_idx]
+
+        page_rows.reverse()
+        return {
+            "entries": [self.row_to_entry(row) for row in page_rows],
+            "total_entries": total_entries,
+            "total_pages": total_pages,
+            "current_page": page,
+            "next_cursor": encode_cursor(page_rows[-1]) if page_rows and start_idx > 0 else None
+        }
+
+    @staticmethod
+    def row_to_entry(row: Row) -> Dict[str, Any]:
+        """Turn a row back into the entry dict served by the history API."""
+        return {
+            "date_time": row[ROW_TIME],
+            "date_time_readable": datetime.fromtimestamp(row[ROW_TIME]).strftime('%Y-%m-%d %H:%M:%S'),
+            "processed_info": row[ROW_INFO],
+            "id": row[ROW_MEDIA_ID],
+            "instance_name": row[ROW_INSTANCE],
+            "operation_type": row[ROW_OPERATION],
+            "app_type": row[ROW_APP]
+        }
+
+
+# Process-wide index used by history_manager
+history_index = HistoryIndex()
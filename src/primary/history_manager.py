@@ -1,6 +1,7 @@
 import os
 import json
 import time
+import shutil
 from datetime import datetime
 import threading
 import logging
@@ -12,10 +13,37 @@ logger = logging.getLogger(__name__)
 # Path will be /config/history in production
 # Use the centralized path configuration
 from src.primary.utils.config_paths import HISTORY_DIR
+from src.primary.utils.durable_store import write_text
+
+from src.primary.settings_manager import get_advanced_setting, load_settings
+from src.primary.history_index import history_index
+from src.primary.history_rollups import history_rollups
 
 # Use the cross-platform path
 HISTORY_BASE_PATH = HISTORY_DIR
 
+# Each instance keeps its history in HISTORY_DIR/<app>/<instance>/ as numbered
+# JSON Lines segments, one event per line, appended oldest first. Only the
+# highest numbered segment is written to; older ones are sealed.
+SEGMENT_SUFFIX = ".jsonl"
+
+# Fsync an active segment once this many entries are waiting, even before the timer
+FSYNC_BATCH_SIZE = 256
+
+# Start a new segment at least once a day so retention can drop whole segments
+SEGMENT_MAX_AGE_SECONDS = 86400
+
+# Defaults for the advanced settings
+DEFAULT_FSYNC_INTERVAL = 2
+DEFAULT_SEGMENT_MAX_BYTES = 1048576
+DEFAULT_COMPACT_INTERVAL = 300
+DEFAULT_RETENTION_DAYS = 0
+DEFAULT_MAX_ENTRIES = 0
+DEFAULT_INDEX_MAX_ENTRIES = 100000
+
+# Rollup counts that survive retention, see history_rollups.py
+ROLLUPS_FILE = HISTORY_BASE_PATH / "rollups.json"
+
 # Lock to prevent race conditions during file operations
 history_locks = {
     "sonarr": threading.Lock(),
@@ -43,20 +71,439 @@ def ensure_history_dir():
         logger.error(f"Failed to create history directory: {str(e)}")
         return False
 
+def get_safe_instance_name(instance_name):
+    """Create a safe file name from an instance name (same as in stateful_manager.py)"""
+    return "".join([c if c.isalnum() else "_" for c in instance_name])
+
 def get_history_file_path(app_type, instance_name=None):
-    """Get the appropriate history file path based on app type and instance name"""
+    """Get the legacy single-file history path of an instance (migrated to segments on first use)"""
     # If no instance name is provided, use "Default"
     if instance_name is None:
         instance_name = "Default"
     
-    # Create safe filename from instance name (same as in stateful_manager.py)
-    safe_instance_name = "".join([c if c.isalnum() else "_" for c in instance_name])
-    return HISTORY_BASE_PATH / app_type / f"{safe_instance_name}.json"
+    return HISTORY_BASE_PATH / app_type / f"{get_safe_instance_name(instance_name)}.json"
+
+def get_history_segment_dir(app_type, instance_name=None):
+    """Get the directory holding the JSON Lines segments of an instance"""
+    if instance_name is None:
+        instance_name = "Default"
+    
+    return HISTORY_BASE_PATH / app_type / get_safe_instance_name(instance_name)
+
+def _segment_path(segment_dir, seq):
+    return segment_dir / f"{seq:08d}{SEGMENT_SUFFIX}"
+
+def list_segments(segment_dir):
+    """
+    List the segments of an instance, oldest first
+    
+    Returns:
+    - list of (sequence number, path) tuples
+    """
+    segments = []
+    try:
+        for segment_file in segment_dir.glob(f"*{SEGMENT_SUFFIX}"):
+            if segment_file.stem.isdigit():
+                segments.append((int(segment_file.stem), segment_file))
+    except OSError:
+        return []
+    return sorted(segments)
+
+def _read_first_entry_time(segment_file):
+    """Read the timestamp of the first entry of a segment (None if it is empty)"""
+    try:
+        with open(segment_file, 'r') as f:
+            first_line = f.readline()
+        return json.loads(first_line).get("date_time") if first_line.strip() else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _read_last_entry_time(segment_file):
+    """Read the timestamp of the last complete entry of a segment (None if there is none)"""
+    try:
+        with open(segment_file, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            block_size = 4096
+            while True:
+                start = max(0, end - block_size)
+                f.seek(start)
+                lines = f.read(end - start).splitlines()
+                # The first line may be cut off unless the block starts the file;
+                # a torn last line left by a crash is skipped by json.loads failing
+                candidates = lines if start == 0 else lines[1:]
+                for line in reversed(candidates):
+                    if line.strip():
+                        try:
+                            return json.loads(line).get("date_time")
+                        except ValueError:
+                            continue
+                if start == 0:
+                    return None
+                block_size *= 2
+    except (OSError, AttributeError):
+        return None
+
+def read_segment(segment_file):
+    """
+    Read the entries of one segment, oldest first
+    
+    A torn last line left by a crash mid-append is skipped.
+    """
+    entries = []
+    try:
+        with open(segment_file, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable history line in {segment_file}")
+    except FileNotFoundError:
+        # Dropped by the compactor while we were listing
+        pass
+    except OSError as e:
+        logger.warning(f"Error reading history segment {segment_file}: {e}")
+    return entries
+
+def iter_instance_history(segment_dir):
+    """Yield the entries of an instance newest first, reading one segment at a time"""
+    for _, segment_file in reversed(list_segments(segment_dir)):
+        yield from reversed(read_segment(segment_file))
+
+def _write_segment(segment_file, entries):
+    """Write a complete segment atomically"""
+    data = "".join(json.dumps(entry) + "\n" for entry in entries)
+    if not write_text(segment_file, data):
+        raise OSError(f"Could not write history segment {segment_file}")
+
+def _migrate_legacy_file(app_type, instance_name):
+    """Convert an instance's legacy JSON list into its first segment. Caller must hold the app lock."""
+    legacy_file = get_history_file_path(app_type, instance_name)
+    if not legacy_file.exists():
+        return
+    
+    segment_dir = get_history_segment_dir(app_type, instance_name)
+    try:
+        with open(legacy_file, 'r') as f:
+            legacy_entries = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"Error reading legacy history file {legacy_file}: {e}")
+        legacy_entries = []
+    
+    try:
+        segment_dir.mkdir(exist_ok=True, parents=True)
+        if legacy_entries:
+            # Legacy files are newest first, segments are appended oldest first
+            legacy_entries = sorted(legacy_entries, key=lambda x: x.get("date_time", 0))
+            segments = list_segments(segment_dir)
+            if segments:
+                # Older than anything already appended, so it goes in front of the existing segments
+                existing = [entry for _, segment_file in segments for entry in read_segment(segment_file)]
+                for _, segment_file in segments:
+                    segment_file.unlink()
+                legacy_entries.extend(existing)
+            _write_segment(_segment_path(segment_dir, 1), legacy_entries)
+        legacy_file.unlink()
+        history_index.invalidate()
+        logger.info(f"Migrated {len(legacy_entries)} history entries from {legacy_file} to {segment_dir}")
+    except Exception as e:
+        logger.error(f"Error migrating legacy history file {legacy_file}: {e}")
+
+class _SegmentWriter:
+    """Open append handle on the active segment of one instance"""
+    
+    def __init__(self, segment_dir):
+        self.segment_dir = segment_dir
+        segments = list_segments(segment_dir)
+        self.seq = segments[-1][0] if segments else 1
+        self.path = _segment_path(segment_dir, self.seq)
+        self.file = open(self.path, 'a')
+        self.size = self.file.tell()
+        self.first_time = _read_first_entry_time(self.path) if self.size else None
+        self.unsynced = 0
+    
+    def append(self, entries):
+        """Append entries, flushed to the OS right away and fsynced in batches"""
+        if self.first_time is None:
+            self.first_time = entries[0]["date_time"]
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        self.unsynced += len(entries)
+        if self.unsynced >= FSYNC_BATCH_SIZE:
+            self.sync()
+    
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+    
+    def should_roll(self, now):
+        max_bytes = int(get_advanced_setting("history_segment_max_bytes", DEFAULT_SEGMENT_MAX_BYTES))
+        if self.size >= max_bytes:
+            return True
+        # Roll at least daily so retention can drop old history a segment at a time
+        return self.first_time is not None and now - self.first_time >= SEGMENT_MAX_AGE_SECONDS
+    
+    def roll(self):
+        """Seal the active segment and start the next one"""
+        self.close()
+        self.seq += 1
+        self.path = _segment_path(self.segment_dir, self.seq)
+        self.file = open(self.path, 'a')
+        self.size = 0
+        self.first_time = None
+    
+    def close(self):
+        try:
+            self.sync()
+        finally:
+            self.file.close()
+
+# Segment writers keyed by (app_type, safe instance name), guarded by history_locks[app_type]
+_writers = {}
+# Entry counts of segments keyed by path, with the (size, mtime) they were counted at
+_segment_counts = {}
+_writer_thread = None
+_writer_thread_lock = threading.Lock()
+
+def _get_writer(app_type, instance_name):
+    """Get the writer of an instance, migrating a legacy history file first. Caller must hold the app lock."""
+    key = (app_type, get_safe_instance_name(instance_name))
+    writer = _writers.get(key)
+    if writer is None:
+        _migrate_legacy_file(app_type, instance_name)
+        segment_dir = get_history_segment_dir(app_type, instance_name)
+        segment_dir.mkdir(exist_ok=True, parents=True)
+        writer = _SegmentWriter(segment_dir)
+        _writers[key] = writer
+    return writer
+
+def _close_writers(app_type):
+    """Close the writers of an app. Caller must hold the app lock."""
+    for key in [key for key in _writers if key[0] == app_type]:
+        try:
+            _writers.pop(key).close()
+        except Exception as e:
+            logger.error(f"Error closing history segment for {key[0]}/{key[1]}: {e}")
+
+def _append_entries(app_type, instance_name, entries):
+    """Append entries to the active segment of an instance. Caller must hold the app lock."""
+    writer = _get_writer(app_type, instance_name)
+    if writer.should_roll(entries[0]["date_time"]):
+        writer.roll()
+    writer.append(entries)
+    history_index.add_entries(entries)
+    history_rollups.add_entries(entries)
+
+def _ensure_writer_thread():
+    global _writer_thread
+    with _writer_thread_lock:
+        if _writer_thread is not None and _writer_thread.is_alive():
+            return
+        _writer_thread = threading.Thread(target=_writer_loop, name="HistoryWriter", daemon=True)
+        _writer_thread.start()
+
+def _writer_loop():
+    """Fsync appended entries in batches and run the compactor on a timer"""
+    last_compaction = time.time()
+    while True:
+        interval = max(0.1, float(get_advanced_setting("history_fsync_interval_seconds", DEFAULT_FSYNC_INTERVAL)))
+        time.sleep(interval)
+        try:
+            sync_history()
+            compact_interval = max(10, int(get_advanced_setting("history_compact_interval_seconds", DEFAULT_COMPACT_INTERVAL)))
+            if time.time() - last_compaction >= compact_interval:
+                last_compaction = time.time()
+                compact_history()
+        except Exception as e:
+            logger.error(f"Error in history writer: {e}")
+
+def sync_history():
+    """Fsync every history segment with unsynced entries"""
+    for app_type, lock in history_locks.items():
+        with lock:
+            for key, writer in list(_writers.items()):
+                if key[0] == app_type:
+                    try:
+                        writer.sync()
+                    except Exception as e:
+                        logger.error(f"Error syncing history segment {writer.path}: {e}")
+    history_rollups.save(ROLLUPS_FILE)
+
+def get_retention_policy(app_type, safe_instance_name):
+    """
+    Get the retention policy of an instance
+    
+    'history_retention_days' and 'history_max_entries' are read from the
+    instance's settings, then the app's settings, then the advanced settings.
+    0 means unlimited.
+    
+    Returns:
+    - tuple of (retention days, maximum number of entries)
+    """
+    retention_days = float(get_advanced_setting("history_retention_days", DEFAULT_RETENTION_DAYS))
+    max_entries = int(get_advanced_setting("history_max_entries", DEFAULT_MAX_ENTRIES))
+    try:
+        app_settings = load_settings(app_type)
+    except Exception:
+        app_settings = {}
+    
+    overrides = [app_settings]
+    for instance in app_settings.get("instances", []):
+        if isinstance(instance, dict) and get_safe_instance_name(str(instance.get("name", "Default"))) == safe_instance_name:
+            overrides.append(instance)
+    for override in overrides:
+        retention_days = float(override.get("history_retention_days", retention_days))
+        max_entries = int(override.get("history_max_entries", max_entries))
+    return retention_days, max_entries
+
+def _count_segment_entries(segment_file):
+    """Count the entries of a segment, cached until the file changes"""
+    stat = segment_file.stat()
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _segment_counts.get(segment_file)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(segment_file, 'rb') as f:
+        count = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(65536), b""))
+    _segment_counts[segment_file] = (signature, count)
+    return count
+
+def _apply_retention(app_type, segment_dir, now):
+    """
+    Apply the retention policy to one instance. Caller must hold the app lock.
+    
+    Whole segments are dropped while they are entirely expired or not needed to
+    keep 'history_max_entries', then the oldest remaining segment is trimmed, so
+    each pass only touches the oldest end of the history.
+    
+    Returns:
+    - int - Number of entries dropped
+    """
+    retention_days, max_entries = get_retention_policy(app_type, segment_dir.name)
+    if retention_days <= 0 and max_entries <= 0:
+        return 0
+    cutoff = now - retention_days * 86400 if retention_days > 0 else None
+    
+    segments = [segment_file for _, segment_file in list_segments(segment_dir)]
+    counts = [_count_segment_entries(segment_file) for segment_file in segments]
+    total = sum(counts)
+    dropped = 0
+    
+    def drop_segment():
+        segment_file = segments.pop(0)
+        count = counts.pop(0)
+        writer = _writers.get((app_type, segment_dir.name))
+        if writer is not None and writer.path == segment_file:
+            _writers.pop((app_type, segment_dir.name)).close()
+        segment_file.unlink()
+        _segment_counts.pop(segment_file, None)
+        return count
+    
+    # Entries are appended oldest first, so the last entry of a segment is its newest.
+    # The mtime can't be used: trimming the front of a segment rewrites it.
+    while segments and cutoff is not None and (_read_last_entry_time(segments[0]) or 0) < cutoff:
+        count = drop_segment()
+        total -= count
+        dropped += count
+    while segments and max_entries > 0 and total - counts[0] >= max_entries:
+        count = drop_segment()
+        total -= count
+        dropped += count
+    
+    if not segments:
+        return dropped
+    
+    excess = total - max_entries if max_entries > 0 else 0
+    first_time = _read_first_entry_time(segments[0])
+    if excess <= 0 and (cutoff is None or first_time is None or first_time >= cutoff):
+        return dropped
+    
+    # Trim the front of the oldest segment
+    entries = read_segment(segments[0])
+    trim = excess
+    if cutoff is not None:
+        while trim < len(entries) and entries[trim].get("date_time", 0) < cutoff:
+            trim += 1
+    trim = min(trim, len(entries))
+    if trim >= len(entries):
+        dropped += drop_segment()
+        return dropped
+    
+    writer = _writers.get((app_type, segment_dir.name))
+    if writer is not None and writer.path == segments[0]:
+        # Reopened by the next append
+        _writers.pop((app_type, segment_dir.name)).close()
+    _write_segment(segments[0], entries[trim:])
+    return dropped + trim
+
+def compact_history():
+    """
+    Roll idle segments past their maximum age and apply the retention policies
+    
+    Returns:
+    - int - Number of entries dropped
+    """
+    now = time.time()
+    dropped = 0
+    
+    for app_type, lock in history_locks.items():
+        app_dir = HISTORY_BASE_PATH / app_type
+        if not app_dir.exists():
+            continue
+        with lock:
+            for segment_dir in app_dir.iterdir():
+                if not segment_dir.is_dir():
+                    continue
+                writer = _writers.get((app_type, segment_dir.name))
+                if writer is not None and writer.size and writer.should_roll(now):
+                    writer.roll()
+                
+                try:
+                    instance_dropped = _apply_retention(app_type, segment_dir, now)
+                except Exception as e:
+                    logger.warning(f"Error applying history retention to {segment_dir}: {e}")
+                    # Whatever was dropped before the error is unknown to the index now
+                    history_index.invalidate()
+                    continue
+                if instance_dropped:
+                    safe_name = segment_dir.name
+                    history_index.remove_oldest(app_type, lambda name: get_safe_instance_name(name) == safe_name, instance_dropped)
+                    logger.debug(f"History retention dropped {instance_dropped} entries for {app_type}/{safe_name}")
+                    dropped += instance_dropped
+    
+    if dropped:
+        logger.info(f"History retention removed {dropped} expired entries")
+    return dropped
+
+def flush_history():
+    """Fsync and close every open history segment and save the rollups (called on shutdown)"""
+    for app_type, lock in history_locks.items():
+        with lock:
+            _close_writers(app_type)
+    history_rollups.save(ROLLUPS_FILE)
+
+def _build_entry(app_type, entry_data, timestamp, date_time_readable):
+    return {
+        "date_time": timestamp,
+        "date_time_readable": date_time_readable,
+        "processed_info": entry_data["name"],
+        "id": entry_data["id"],
+        "instance_name": entry_data["instance_name"],
+        "operation_type": entry_data.get("operation_type", "missing"),  # Default to "missing" if not specified
+        "app_type": app_type  # Include app_type in the entry for display in UI
+    }
 
 def add_history_entry(app_type, entry_data):
     """
     Add a new history entry
     
+    The entry is appended as one line to the instance's active segment, so the
+    cost does not depend on how much history the instance already has.
+    
     Parameters:
     - app_type: str - The app type (sonarr, radarr, etc)
     - entry_data: dict with required fields:
@@ -84,143 +531,157 @@ def add_history_entry(app_type, entry_data):
     
     # Create the entry with timestamp
     timestamp = int(time.time())
-    entry = {
-        "date_time": timestamp,
-        "date_time_readable": datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
-        "processed_info": entry_data["name"],
-        "id": entry_data["id"],
-        "instance_name": instance_name,  # Use the instance_name we extracted above
-        "operation_type": entry_data.get("operation_type", "missing"),  # Default to "missing" if not specified
-        "app_type": app_type  # Include app_type in the entry for display in UI
-    }
-    
-    history_file = get_history_file_path(app_type, instance_name)
-    logger.debug(f"Writing to history file: {history_file}")
-    
-    # Make sure the parent directory exists
-    history_file.parent.mkdir(exist_ok=True, parents=True)
+    entry = _build_entry(app_type, entry_data, timestamp, datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'))
     
     # Thread-safe file operation
     with history_locks[app_type]:
         try:
-            if history_file.exists():
-                with open(history_file, 'r') as f:
-                    history_data = json.load(f)
-            else:
-                history_data = []
-        except (json.JSONDecodeError, FileNotFoundError):
-            # If file doesn't exist or is corrupt, start with empty list
-            history_data = []
-        
-        # Add new entry at the beginning for most recent first
-        history_data.insert(0, entry)
-        
-        # Write back to file
-        with open(history_file, 'w') as f:
-            json.dump(history_data, f, indent=2)
+            _append_entries(app_type, instance_name, [entry])
+        except Exception as e:
+            logger.error(f"Error writing history for {app_type}-{instance_name}: {e}")
+            return None
     
+    _ensure_writer_thread()
     logger.info(f"Added history entry for {app_type}-{instance_name}: {entry_data['name']}")
     return entry
 
-def get_history(app_type, search_query=None, page=1, page_size=20):
+def add_history_entries(app_type, entries_data):
+    """
+    Add several history entries for one app with a single append per instance
+    
+    Parameters:
+    - app_type: str - The app type (sonarr, radarr, etc)
+    - entries_data: list of dicts with the same fields as add_history_entry
+    
+    Returns:
+    - list of the added entries (empty on failure)
+    """
+    if not entries_data:
+        return []
+    
+    if not ensure_history_dir():
+        logger.error("Could not ensure history directory exists")
+        return []
+    
+    if app_type not in history_locks:
+        logger.error(f"Invalid app type: {app_type}")
+        return []
+    
+    timestamp = int(time.time())
+    date_time_readable = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Group the entries per instance since each instance has its own segments
+    entries_by_instance = {}
+    for entry_data in entries_data:
+        if any(field not in entry_data for field in ("name", "instance_name", "id")):
+            logger.error(f"Skipping history entry with missing required fields: {entry_data}")
+            continue
+        entries_by_instance.setdefault(entry_data["instance_name"], []).append(
+            _build_entry(app_type, entry_data, timestamp, date_time_readable)
+        )
+    
+    added = []
+    with history_locks[app_type]:
+        for instance_name, entries in entries_by_instance.items():
+            try:
+                _append_entries(app_type, instance_name, entries)
+                # Most recent first, keeping the batch in its original order
+                added[:0] = entries
+            except Exception as e:
+                logger.error(f"Error writing history for {app_type}-{instance_name}: {e}")
+    
+    _ensure_writer_thread()
+    logger.info(f"Added {len(added)} history entries for {app_type}")
+    return added
+
+def _load_history_index():
+    """Read every segment into the history index (once, or again after it was invalidated)"""
+    # Hold every app lock so no entry is appended between reading the segments and indexing them
+    locks = list(history_locks.values())
+    for lock in locks:
+        lock.acquire()
+    try:
+        if history_index.loaded:
+            return
+        
+        def iter_all_entries():
+            for app in history_locks.keys():
+                app_dir = HISTORY_BASE_PATH / app
+                if not app_dir.exists():
+                    continue
+                for segment_dir in app_dir.iterdir():
+                    if not segment_dir.is_dir():
+                        continue
+                    # Oldest first, so entries logged in the same second keep their order
+                    for _, segment_file in list_segments(segment_dir):
+                        for entry in read_segment(segment_file):
+                            entry.setdefault("app_type", app)
+                            yield entry
+        
+        start_time = time.time()
+        history_index.max_rows = max(1, int(get_advanced_setting("history_index_max_entries", DEFAULT_INDEX_MAX_ENTRIES)))
+        history_index.load(iter_all_entries())
+        logger.debug(f"Loaded history index in {time.time() - start_time:.2f}s")
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def get_history_rollups(app_type, granularity="day", instance_name=None, days=None):
+    """
+    Get pre-aggregated history counts
+    
+    Parameters:
+    - app_type: str - The app type (sonarr, radarr, etc) or "all"
+    - granularity: str - "day" or "hour"
+    - instance_name: str - Optional instance to restrict the counts to
+    - days: int - Optional number of days to go back
+    
+    Returns:
+    - list of dicts with period, app_type, instance_name, operation_type and count, oldest first
+    """
+    if app_type not in history_locks and app_type != "all":
+        logger.error(f"Invalid app type: {app_type}")
+        return []
+    
+    return history_rollups.get_rollups(granularity, app_type, instance_name, days)
+
+def get_history(app_type, search_query=None, page=1, page_size=20, cursor=None):
     """
     Get history entries for an app
     
+    Pages are served from the in-memory history index, which is loaded from the
+    segments on first use and kept up to date as entries are appended.
+    
     Parameters:
     - app_type: str - The app type (sonarr, radarr, etc)
     - search_query: str - Optional search query to filter results
     - page: int - Page number (1-based)
     - page_size: int - Number of entries per page
+    - cursor: str - Optional next_cursor of the previous page (keyset pagination)
     
     Returns:
-    - dict with entries, total_entries, and total_pages
+    - dict with entries, total_entries, total_pages, current_page and next_cursor
     """
     if not ensure_history_dir():
         logger.error("Could not ensure history directory exists")
-        return {"entries": [], "total_entries": 0, "total_pages": 0, "current_page": 1}
+        return {"entries": [], "total_entries": 0, "total_pages": 0, "current_page": 1, "next_cursor": None}
     
     if app_type not in history_locks and app_type != "all":
         logger.error(f"Invalid app type: {app_type}")
-        return {"entries": [], "total_entries": 0, "total_pages": 0, "current_page": 1}
+        return {"entries": [], "total_entries": 0, "total_pages": 0, "current_page": 1, "next_cursor": None}
     
-    result = []
+    if not history_index.loaded:
+        _load_history_index()
     
-    if app_type == "all":
-        # Combine histories from all apps and their instances
-        for app in history_locks.keys():
-            app_dir = HISTORY_BASE_PATH / app
-            
-            # Find and read all instance files
-            if app_dir.exists():
-                for history_file in app_dir.glob("*.json"):
-                    try:
-                        with open(history_file, 'r') as f:
-                            instance_history = json.load(f)
-                            result.extend(instance_history)
-                            logger.debug(f"Read {len(instance_history)} entries from {history_file}")
-                    except (json.JSONDecodeError, FileNotFoundError) as e:
-                        logger.warning(f"Error reading instance history file {history_file}: {str(e)}")
-    else:
-        # Get history for specific app - combine all instances
-        app_dir = HISTORY_BASE_PATH / app_type
-        
-        # Make sure app directory exists
-        app_dir.mkdir(exist_ok=True, parents=True)
-        
-        # Read from all instance files
-        if app_dir.exists():
-            instance_files = list(app_dir.glob("*.json"))
-            logger.debug(f"Found {len(instance_files)} instance files for {app_type}: {[f.name for f in instance_files]}")
-            
-            for history_file in instance_files:
-                try:
-                    with open(history_file, 'r') as f:
-                        instance_history = json.load(f)
-                        result.extend(instance_history)
-                        logger.debug(f"Read {len(instance_history)} entries from {history_file}")
-                except (json.JSONDecodeError, FileNotFoundError) as e:
-                    logger.warning(f"Error reading instance history file {history_file}: {e}")
-    
-    # Sort by date_time in descending order
-    result = sorted(result, key=lambda x: x["date_time"], reverse=True)
-    
-    # Apply search filter if provided
-    if search_query and search_query.strip():
-        search_query = search_query.lower()
-        result = [
-            entry for entry in result if 
-            search_query in entry.get("processed_info", "").lower() or
-            search_query in entry.get("instance_name", "").lower() or
-            search_query in str(entry.get("id", "")).lower()
-        ]
-    
-    # Calculate pagination
-    total_entries = len(result)
-    total_pages = (total_entries + page_size - 1) // page_size if total_entries > 0 else 1
-    
-    # Adjust page if out of bounds
-    if page < 1:
-        page = 1
-    elif page > total_pages:
-        page = total_pages
-    
-    # Get entries for the current page
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    paginated_entries = result[start_idx:end_idx]
+    result = history_index.query(app_type, search_query, page, page_size, cursor)
     
     # Calculate "how long ago" for each entry
     current_time = int(time.time())
-    for entry in paginated_entries:
+    for entry in result["entries"]:
         seconds_ago = current_time - entry["date_time"]
         entry["how_long_ago"] = format_time_ago(seconds_ago)
     
-    return {
-        "entries": paginated_entries,
-        "total_entries": total_entries,
-        "total_pages": total_pages,
-        "current_page": page
-    }
+    return result
 
 def format_time_ago(seconds):
     """Format seconds into a human-readable 'time ago' string"""
@@ -256,37 +717,28 @@ def clear_history(app_type):
         return False
     
     try:
-        if app_type == "all":
-            # Clear all history files for all apps
-            for app in history_locks.keys():
-                # Clear all instance files
-                app_dir = HISTORY_BASE_PATH / app
-                # Ensure directory exists
-                app_dir.mkdir(exist_ok=True, parents=True)
-                
-                if app_dir.exists():
-                    instance_files = list(app_dir.glob("*.json"))
-                    logger.debug(f"Found {len(instance_files)} instance files to clear for {app}")
-                    
-                    for history_file in instance_files:
-                        with open(history_file, 'w') as f:
-                            json.dump([], f)
-                            logger.debug(f"Cleared instance history file: {history_file}")
-        else:
-            # Clear all instance files for specific app
-            app_dir = HISTORY_BASE_PATH / app_type
+        apps = list(history_locks.keys()) if app_type == "all" else [app_type]
+        for app in apps:
+            app_dir = HISTORY_BASE_PATH / app
             # Ensure directory exists
             app_dir.mkdir(exist_ok=True, parents=True)
             
-            if app_dir.exists():
-                instance_files = list(app_dir.glob("*.json"))
-                logger.debug(f"Found {len(instance_files)} instance files to clear for {app_type}")
+            with history_locks[app]:
+                # Close the active segments before deleting them
+                _close_writers(app)
+                
+                instance_histories = [path for path in app_dir.iterdir() if path.is_dir() or path.suffix == ".json"]
+                logger.debug(f"Found {len(instance_histories)} instance histories to clear for {app}")
                 
-                for history_file in instance_files:
-                    with open(history_file, 'w') as f:
-                        json.dump([], f)
-                        logger.debug(f"Cleared instance history file: {history_file}")
+                for history_path in instance_histories:
+                    if history_path.is_dir():
+                        shutil.rmtree(history_path)
+                    else:
+                        history_path.unlink()
+                    logger.debug(f"Cleared instance history: {history_path}")
         
+        history_index.invalidate()
+        history_rollups.clear(None if app_type == "all" else app_type)
         logger.info(f"Successfully cleared history for {app_type}")
         return True
     except Exception as e:
@@ -319,39 +771,30 @@ def handle_instance_rename(app_type, old_instance_name, new_instance_name):
     
     logger.info(f"Handling instance rename for {app_type}: {old_instance_name} -> {new_instance_name}")
     
-    # Get paths for old and new history files
-    old_file = get_history_file_path(app_type, old_instance_name)
-    new_file = get_history_file_path(app_type, new_instance_name)
-    
-    # Ensure parent directories exist
-    new_file.parent.mkdir(exist_ok=True, parents=True)
+    old_dir = get_history_segment_dir(app_type, old_instance_name)
+    new_dir = get_history_segment_dir(app_type, new_instance_name)
     
     # Thread-safe operation
     with history_locks[app_type]:
         try:
+            for instance_name in (old_instance_name, new_instance_name):
+                _migrate_legacy_file(app_type, instance_name)
+            for segment_dir in (old_dir, new_dir):
+                writer = _writers.pop((app_type, segment_dir.name), None)
+                if writer is not None:
+                    writer.close()
+            
             # Load old data if it exists
-            old_data = []
-            if old_file.exists():
-                try:
-                    with open(old_file, 'r') as f:
-                        old_data = json.load(f)
-                    logger.info(f"Loaded {len(old_data)} history entries from {old_file}")
-                except (json.JSONDecodeError, FileNotFoundError) as e:
-                    logger.warning(f"Error reading old history file {old_file}: {e}")
+            old_data = [entry for _, segment_file in list_segments(old_dir) for entry in read_segment(segment_file)]
+            logger.info(f"Loaded {len(old_data)} history entries from {old_dir}")
             
             # Update instance_name in all entries
             for entry in old_data:
                 entry["instance_name"] = new_instance_name
             
-            # Create or load new file
-            new_data = []
-            if new_file.exists():
-                try:
-                    with open(new_file, 'r') as f:
-                        new_data = json.load(f)
-                    logger.info(f"Loaded {len(new_data)} existing history entries from {new_file}")
-                except (json.JSONDecodeError, FileNotFoundError) as e:
-                    logger.warning(f"Error reading new history file {new_file}: {e}")
+            new_data = [entry for _, segment_file in list_segments(new_dir) for entry in read_segment(segment_file)]
+            if new_data:
+                logger.info(f"Loaded {len(new_data)} existing history entries from {new_dir}")
             
             # Merge data, avoiding duplicates
             existing_keys = {(entry.get("id", ""), entry.get("date_time", 0)) for entry in new_data}
@@ -360,19 +803,25 @@ def handle_instance_rename(app_type, old_instance_name, new_instance_name):
                 if entry_key not in existing_keys:
                     new_data.append(entry)
             
-            # Sort by timestamp
-            new_data = sorted(new_data, key=lambda x: x.get("date_time", 0), reverse=True)
+            # Segments are appended oldest first
+            new_data = sorted(new_data, key=lambda x: x.get("date_time", 0))
             
-            # Save merged data to new file
-            with open(new_file, 'w') as f:
-                json.dump(new_data, f, indent=2)
-            logger.info(f"Saved {len(new_data)} history entries to {new_file}")
+            # Save merged data as a single segment of the new instance
+            new_dir.mkdir(exist_ok=True, parents=True)
+            _write_segment(_segment_path(new_dir, 0), new_data)
+            for seq, segment_file in list_segments(new_dir):
+                if seq > 0:
+                    segment_file.unlink()
+            os.replace(_segment_path(new_dir, 0), _segment_path(new_dir, 1))
+            logger.info(f"Saved {len(new_data)} history entries to {new_dir}")
             
-            # Optionally delete old file if it exists
-            if old_file.exists():
-                old_file.unlink()
-                logger.info(f"Deleted old history file {old_file}")
+            # Delete the old segments
+            if old_dir.exists() and old_dir != new_dir:
+                shutil.rmtree(old_dir)
+                logger.info(f"Deleted old history segments {old_dir}")
             
+            history_index.invalidate()
+            history_rollups.rename_instance(app_type, old_instance_name, new_instance_name)
             return True
         except Exception as e:
             logger.error(f"Error renaming instance history: {e}")
@@ -380,7 +829,7 @@ def handle_instance_rename(app_type, old_instance_name, new_instance_name):
 
 def initialize_instance_history(app_type, instance_name):
     """
-    Initialize or ensure history file exists for a specific instance.
+    Initialize or ensure the history segments exist for a specific instance.
     This should be called whenever an instance is created or configured.
     
     Parameters:
@@ -388,7 +837,7 @@ def initialize_instance_history(app_type, instance_name):
     - instance_name: str - Name of the instance
     
     Returns:
-    - str - Path to the history file
+    - str - Path to the history segment directory
     """
     if not ensure_history_dir():
         logger.error("Could not ensure history directory exists")
@@ -399,19 +848,17 @@ def initialize_instance_history(app_type, instance_name):
         return None
     
     try:
-        # Get the history file path
-        history_file = get_history_file_path(app_type, instance_name)
-        
-        # Ensure parent directory exists
-        history_file.parent.mkdir(exist_ok=True, parents=True)
+        segment_dir = get_history_segment_dir(app_type, instance_name)
         
-        # Create the file if it doesn't exist
-        if not history_file.exists():
-            with open(history_file, 'w') as f:
-                json.dump([], f)
-            logger.info(f"Created history file for {app_type}/{instance_name}: {history_file}")
+        with history_locks[app_type]:
+            _migrate_legacy_file(app_type, instance_name)
+            
+            # Create the directory if it doesn't exist
+            if not segment_dir.exists():
+                segment_dir.mkdir(parents=True)
+                logger.info(f"Created history segments for {app_type}/{instance_name}: {segment_dir}")
         
-        return str(history_file)
+        return str(segment_dir)
     except Exception as e:
         logger.error(f"Error initializing history for {app_type}/{instance_name}: {e}")
         return None
@@ -442,6 +889,11 @@ def sync_history_files_with_instances():
             
             result["app_instances"][app_type] = []
             
+            # Convert any history still stored as a single JSON list
+            with history_locks[app_type]:
+                for legacy_file in app_dir.glob("*.json"):
+                    _migrate_legacy_file(app_type, legacy_file.stem)
+            
             # Let's check for instance settings from settings directory
             from src.primary.utils.config_paths import CONFIG_PATH
             instances_dir = CONFIG_PATH / app_type
@@ -453,17 +905,27 @@ def sync_history_files_with_instances():
                         result["app_instances"][app_type].append(instance_name)
                         logger.info(f"Found instance for {app_type}: {instance_name}")
                         
-                        # Create history file for this instance if it doesn't exist
-                        history_file = get_history_file_path(app_type, instance_name)
-                        if not history_file.exists():
-                            history_file.parent.mkdir(exist_ok=True, parents=True)
-                            with open(history_file, 'w') as f:
-                                json.dump([], f)
-                            logger.info(f"Created history file for {app_type}/{instance_name}: {history_file}")
-                            result["created_files"].append(str(history_file))
+                        # Create the history segments for this instance if they don't exist
+                        segment_dir = get_history_segment_dir(app_type, instance_name)
+                        if not segment_dir.exists():
+                            segment_dir.mkdir(parents=True)
+                            logger.info(f"Created history segments for {app_type}/{instance_name}: {segment_dir}")
+                            result["created_files"].append(str(segment_dir))
                     except Exception as e:
                         logger.error(f"Error processing instance file {instance_file}: {e}")
         
+        # Count the existing history once if there are no saved rollups yet
+        if not history_rollups.load(ROLLUPS_FILE):
+            history_rollups.rebuild(
+                entry
+                for app_type in history_locks.keys()
+                for segment_dir in (HISTORY_BASE_PATH / app_type).iterdir() if segment_dir.is_dir()
+                for _, segment_file in list_segments(segment_dir)
+                for entry in read_segment(segment_file)
+            )
+            history_rollups.save(ROLLUPS_FILE)
+            logger.info("Built history rollups from the existing history")
+        
         result["success"] = True
         return result
     except Exception as e:
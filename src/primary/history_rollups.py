@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+History rollups for Huntarr
+Pre-aggregated counts of history entries per day and per hour, by app,
+instance and operation type. They are updated as entries are added and
+outlive the raw entries dropped by history retention, so activity charts
+never have to scan the history segments.
+"""
+
+import json
+import time
+import pathlib
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.durable_store import write_text
+
+logger = get_logger("huntarr")
+
+GRANULARITY_DAY = "day"
+GRANULARITY_HOUR = "hour"
+
+# Bucket keys in local time, matching date_time_readable
+BUCKET_FORMATS = {
+    GRANULARITY_DAY: "%Y-%m-%d",
+    GRANULARITY_HOUR: "%Y-%m-%d %H:00"
+}
+
+# How long buckets are kept
+MAX_BUCKET_AGE_DAYS = {
+    GRANULARITY_DAY: 730,
+    GRANULARITY_HOUR: 30
+}
+
+
+class HistoryRollups:
+    """
+    Counts keyed by granularity -> bucket -> app -> instance -> operation type.
+
+    Changes are kept in memory and written to a JSON file by save(), which the
+    history writer thread calls when the rollups are dirty.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, Dict[str, Dict[str, Dict[str, int]]]]] = {
+            granularity: {} for granularity in BUCKET_FORMATS
+        }
+        self.loaded = False
+        self.dirty = False
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        """Count one entry. Caller must hold the lock."""
+        moment = datetime.fromtimestamp(int(entry.get("date_time", 0)))
+        app_type = str(entry.get("app_type", ""))
+        instance_name = str(entry.get("instance_name", ""))
+        operation_type = str(entry.get("operation_type", "missing"))
+        for granularity, bucket_format in BUCKET_FORMATS.items():
+            counts = (self._buckets[granularity]
+                      .setdefault(moment.strftime(bucket_format), {})
+                      .setdefault(app_type, {})
+                      .setdefault(instance_name, {}))
+            counts[operation_type] = counts.get(operation_type, 0) + 1
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Count newly added history entries."""
+        with self._lock:
+            for entry in entries:
+                self._add(entry)
+            self.dirty = True
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Recount the rollups from scratch."""
+        with self._lock:
+            for buckets in self._buckets.values():
+                buckets.clear()
+            for entry in entries:
+                self._add(entry)
+            self._prune()
+            self.loaded = True
+            self.dirty = True
+
+    def clear(self, app_type: Optional[str] = None) -> None:
+        """Forget the counts of one app, or of every app."""
+        with self._lock:
+            for buckets in self._buckets.values():
+                for period in list(buckets):
+                    if app_type is None:
+                        del buckets[period]
+                        continue
+                    buckets[period].pop(app_type, None)
+                    if not buckets[period]:
+                        del buckets[period]
+            self.dirty = True
+
+    def rename_instance(self, app_type: str, old_instance_name: str, new_instance_name: str) -> None:
+        """Move the counts of a renamed instance to its new name."""
+        with self._lock:
+            for buckets in self._buckets.values():
+                for apps in buckets.values():
+                    instances = apps.get(app_type)
+                    if not instances or old_instance_name not in instances:
+                        continue
+                    old_counts = instances.pop(old_instance_name)
+                    new_counts = instances.setdefault(new_instance_name, {})
+                    for operation_type, count in old_counts.items():
+                        new_counts[operation_type] = new_counts.get(operation_type, 0) + count
+            self.dirty = True
+
+    def _prune(self) -> None:
+        """Drop buckets older than their maximum age. Caller must hold the lock."""
+        now = datetime.now()
+        for granularity, bucket_format in BUCKET_FORMATS.items():
+            oldest = (now - timedelta(days=MAX_BUCKET_AGE_DAYS[granularity])).strftime(bucket_format)
+            buckets = self._buckets[granularity]
+            for period in [period for period in buckets if period < oldest]:
+                del buckets[period]
+
+    def get_rollups(self, granularity: str, app_type: str = "all", instance_name: Optional[str] = None,
+                    days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get the rollup buckets, oldest first.
+
+        Args:
+            granularity: "day" or "hour"
+            app_type: The app type, or "all"
+            instance_name: Optional instance to restrict the counts to
+            days: Optional number of days to go back
+
+        Returns:
+            list of dicts with period, app_type, instance_name, operation_type and count
+        """
+        bucket_format = BUCKET_FORMATS[granularity]
+        oldest = (datetime.now() - timedelta(days=days)).strftime(bucket_format) if days else ""
+        result = []
+        with self._lock:
+            buckets = self._buckets[granularity]
+            for period in sorted(period for period in buckets if period >= oldest):
+                for app, instances in buckets[period].items():
+                    if app_type != "all" and app != app_type:
+                        continue
+                    for instance, counts in instances.items():
+                        if instance_name is not None and instance != instance_name:
+                            continue
+                        for operation_type, count in counts.items():
+                            result.append({
+                                "period": period,
+                                "app_type": app,
+                                "instance_name": instance,
+                                "operation_type": operation_type,
+                                "count": count
+                            })
+        return result
+
+    def load(self, path: pathlib.Path) -> bool:
+        """
+        Load the rollups saved by save().
+
+        Returns:
+            True if the file was loaded, False if it is missing or invalid
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Error reading history rollups {path}: {e}")
+            return False
+
+        with self._lock:
+            for granularity in BUCKET_FORMATS:
+                self._buckets[granularity] = data.get(granularity, {})
+            self._prune()
+            self.loaded = True
+        return True
+
+    def save(self, path: pathlib.Path) -> bool:
+        """
+        Write the rollups if they changed since the last save.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._lock:
+            if not self.dirty:
+                return True
+            self._prune()
+            data = json.dumps(dict(self._buckets, last_updated=int(time.time())))
+            self.dirty = False
+
+        if write_text(path, data):
+            return True
+        logger.error(f"Error writing history rollups {path}")
+        with self._lock:
+            self.dirty = True
+        return False
+
+
+# Process-wide rollups used by history_manager
+history_rollups = HistoryRollups()
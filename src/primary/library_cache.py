@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Library snapshot cache for Huntarr
+Keeps the last-known library (movies, series episodes, profiles, ...) of every
+instance on disk so hunting cycles only re-fetch what actually changed.
+
+Snapshots are opt-in ('library_snapshot_enabled'). Changes the *arr apps do
+not record as history events, such as newly added movies or a toggled
+monitored flag, only show up at the next full refresh, so the maximum age
+is kept short.
+"""
+
+import re
+import json
+import time
+import pathlib
+import threading
+from typing import Dict, Any, Optional, Iterable
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.config_paths import LIBRARY_DIR
+from src.primary.utils.durable_store import write_json, discard_pending
+from src.primary.settings_manager import get_advanced_setting
+
+logger = get_logger("huntarr")
+
+# Default maximum snapshot age before a full refresh (1 hour)
+DEFAULT_MAX_AGE_MINUTES = 60
+
+# Large fields the hunting modules never read - dropped before a record is cached
+HEAVY_FIELDS = ("images", "alternateTitles", "overview", "ratings", "genres", "tags",
+                "collection", "credits", "originalLanguage", "links", "remotePoster")
+
+# In-memory copies of the snapshots, keyed by file path
+_snapshots: Dict[str, Dict[str, Any]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def is_snapshot_enabled() -> bool:
+    """Return True if hunting should run against cached library snapshots."""
+    return bool(get_advanced_setting("library_snapshot_enabled", False))
+
+
+def get_max_age() -> int:
+    """Return the maximum snapshot age in seconds before a full refresh is forced."""
+    return int(get_advanced_setting("library_snapshot_max_age_minutes", DEFAULT_MAX_AGE_MINUTES)) * 60
+
+
+def _snapshot_path(app_type: str, instance_name: str, kind: str) -> pathlib.Path:
+    """Get the snapshot file for an app instance. Instance names are made filesystem safe."""
+    safe_instance = re.sub(r"[^A-Za-z0-9_.-]", "_", instance_name or "Default")
+    return LIBRARY_DIR / app_type / safe_instance / f"{kind}.json"
+
+
+def compact_record(record: Dict[str, Any], drop_fields: Iterable[str] = HEAVY_FIELDS) -> Dict[str, Any]:
+    """Return a copy of an API record without the fields that are never used for hunting."""
+    return {key: value for key, value in record.items() if key not in drop_fields}
+
+
+def load_snapshot(app_type: str, instance_name: str, kind: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a library snapshot.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        instance_name: The name of the instance
+        kind: What the snapshot holds (e.g. "movies", "profiles", "missing_episodes")
+
+    Returns:
+        The snapshot dict with 'fetched_at' and 'items', or None if there is none
+    """
+    path = _snapshot_path(app_type, instance_name, kind)
+    key = str(path)
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+        if not isinstance(snapshot, dict) or "items" not in snapshot:
+            logger.warning(f"Ignoring malformed library snapshot at {path}")
+            return None
+    except Exception as e:
+        logger.error(f"Error loading library snapshot {path}: {e}")
+        return None
+
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def save_snapshot(app_type: str, instance_name: str, kind: str, items: Dict[str, Any],
+                  fetched_at: Optional[float] = None, **extra: Any) -> Dict[str, Any]:
+    """
+    Save a library snapshot to memory and disk.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        instance_name: The name of the instance
+        kind: What the snapshot holds
+        items: The cached records keyed by ID
+        fetched_at: When the data was fetched. Defaults to now.
+        **extra: Additional fields to store with the snapshot
+
+    Returns:
+        The saved snapshot
+    """
+    snapshot = {"fetched_at": fetched_at if fetched_at is not None else time.time(), "items": items}
+    snapshot.update(extra)
+
+    path = _snapshot_path(app_type, instance_name, kind)
+    with _snapshots_lock:
+        _snapshots[str(path)] = snapshot
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Only needed after a restart, so repeated refreshes within the coalescing window are written once
+        write_json(path, snapshot, coalesce=True)
+    except Exception as e:
+        # The in-memory copy is still used; only restart persistence is lost
+        logger.error(f"Error saving library snapshot {path}: {e}")
+
+    return snapshot
+
+
+def is_fresh(snapshot: Optional[Dict[str, Any]]) -> bool:
+    """
+    Return True if a snapshot exists and its last full refresh is younger than the maximum age.
+
+    Incrementally updated snapshots carry 'refreshed_at' (the last full refresh) next
+    to 'fetched_at' (the last incremental update), so they are still rebuilt periodically.
+    """
+    if not snapshot:
+        return False
+    refreshed_at = snapshot.get("refreshed_at", snapshot.get("fetched_at", 0))
+    return time.time() - refreshed_at < get_max_age()
+
+
+def clear_snapshots(app_type: Optional[str] = None) -> None:
+    """Drop cached snapshots for one app, or for every app if none is given."""
+    with _snapshots_lock:
+        for key in list(_snapshots.keys()):
+            if app_type is None or pathlib.Path(key).parent.parent.name == app_type:
+                _snapshots.pop(key, None)
+
+    base = LIBRARY_DIR / app_type if app_type else LIBRARY_DIR
+    # A queued write would bring a cleared snapshot back
+    discard_pending(base)
+    if not base.exists():
+        return
+    for path in base.rglob("*.json"):
+        try:
+            path.unlink()
+        except Exception as e:
+            logger.error(f"Error removing library snapshot {path}: {e}")
@@ -4,11 +4,19 @@ Huntarr Configuration Migration Script
 
 This module is responsible for migrating legacy JSON configuration files 
 from the old location (/config/) to the new settings directory (/config/settings/)
+It also holds the schema migrations of the runtime database (see datastore.py),
+including the one-time import of the JSON state files it replaces
 """
 
 import os
+import json
 import shutil
+import sqlite3
 import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.primary.utils.config_paths import CONFIG_PATH, STATEFUL_DIR, TALLY_DIR, SWAPARR_DIR, SCHEDULER_DIR
 
 # Get the logger
 logger = logging.getLogger('huntarr')
@@ -89,6 +97,282 @@ def migrate_json_configs():
     
     return files_migrated
 
+# Processed IDs database used by the stateful backend before the unified datastore
+LEGACY_STATEFUL_DATABASE = STATEFUL_DIR / "stateful.db"
+
+def _create_runtime_tables(connection: sqlite3.Connection) -> None:
+    """Schema version 1: the tables holding Huntarr's runtime state."""
+    statements = [
+        # Processed media IDs of the 'sqlite' stateful backend
+        """CREATE TABLE IF NOT EXISTS processed_ids (
+            app_type TEXT NOT NULL,
+            instance_name TEXT NOT NULL,
+            media_id TEXT NOT NULL,
+            processed_at INTEGER NOT NULL,
+            operation_type TEXT NOT NULL DEFAULT 'missing',
+            PRIMARY KEY (app_type, instance_name, media_id)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_processed_ids_processed_at ON processed_ids (processed_at)",
+        # The stateful management window (formerly stateful/lock.json)
+        """CREATE TABLE IF NOT EXISTS stateful_lock (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        )""",
+        # Hunted/upgraded counters (formerly tally/media_stats.json)
+        """CREATE TABLE IF NOT EXISTS app_stats (
+            app_type TEXT NOT NULL,
+            stat_type TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (app_type, stat_type)
+        ) WITHOUT ROWID""",
+        # API hits per minute inside the hourly cap window (formerly tally/hourly_cap.json)
+        """CREATE TABLE IF NOT EXISTS hourly_cap_hits (
+            app_type TEXT NOT NULL,
+            minute INTEGER NOT NULL,
+            hits INTEGER NOT NULL,
+            PRIMARY KEY (app_type, minute)
+        ) WITHOUT ROWID""",
+        # Swaparr strikes and removed downloads (formerly swaparr/<app>/strikes.json and removed_items.json)
+        """CREATE TABLE IF NOT EXISTS swaparr_strikes (
+            app_type TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            strikes INTEGER NOT NULL DEFAULT 0,
+            removed INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL,
+            PRIMARY KEY (app_type, item_id)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS swaparr_removed (
+            app_type TEXT NOT NULL,
+            item_hash TEXT NOT NULL,
+            removed_time TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (app_type, item_hash)
+        ) WITHOUT ROWID""",
+        # Values of the legacy state module (formerly state/<app>/<name>.json)
+        """CREATE TABLE IF NOT EXISTS app_state (
+            app_type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (app_type, name)
+        ) WITHOUT ROWID""",
+        # Scheduled actions per app (formerly scheduler/schedule.json)
+        """CREATE TABLE IF NOT EXISTS schedules (
+            app_type TEXT PRIMARY KEY,
+            entries TEXT NOT NULL
+        )""",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+    ]
+    for statement in statements:
+        connection.execute(statement)
+
+def _read_legacy_json(path: Any) -> Optional[Any]:
+    """Load a legacy state file, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Skipping unreadable legacy state file {path}: {e}")
+        return None
+
+def _legacy_rows(source: Any, entries: Any, make_row: Callable[[Any], Optional[Tuple]]) -> List[Optional[Tuple]]:
+    """Convert legacy state entries to rows, skipping malformed ones with a warning instead of failing the migration."""
+    rows = []
+    for entry in entries:
+        try:
+            rows.append(make_row(entry))
+        except (TypeError, ValueError, KeyError, IndexError, AttributeError) as e:
+            logger.warning(f"Skipping malformed legacy entry in {source}: {entry!r} ({e})")
+    return rows
+
+def _import_legacy_stateful_database(connection: sqlite3.Connection) -> int:
+    """Copy the processed IDs out of the old stateful/stateful.db."""
+    if not LEGACY_STATEFUL_DATABASE.exists():
+        return 0
+    try:
+        legacy = sqlite3.connect(str(LEGACY_STATEFUL_DATABASE), timeout=30)
+        try:
+            rows = legacy.execute(
+                "SELECT app_type, instance_name, media_id, processed_at, operation_type FROM processed_ids").fetchall()
+            meta_rows = legacy.execute("SELECT key, value FROM meta").fetchall()
+        finally:
+            legacy.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Skipping unreadable legacy stateful database {LEGACY_STATEFUL_DATABASE}: {e}")
+        return 0
+    connection.executemany(
+        "INSERT OR IGNORE INTO processed_ids (app_type, instance_name, media_id, processed_at, operation_type) VALUES (?, ?, ?, ?, ?)",
+        rows)
+    # Carries over 'json_imported', so the JSON files are not imported a second time
+    connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta_rows)
+    return len(rows)
+
+def _import_legacy_state_files(connection: sqlite3.Connection) -> None:
+    """
+    Schema version 2: import the JSON state files replaced by the database.
+
+    The files are left in place, so an older Huntarr version can still be started.
+    """
+    imported = []
+
+    processed_ids = _import_legacy_stateful_database(connection)
+    if processed_ids:
+        imported.append(f"{processed_ids} processed IDs")
+
+    lock_file = STATEFUL_DIR / "lock.json"
+    lock_info = _read_legacy_json(lock_file)
+    if isinstance(lock_info, dict) and "created_at" in lock_info and lock_info.get("expires_at") is not None:
+        lock_rows = _legacy_rows(lock_file, [lock_info],
+                                 lambda info: (int(info["created_at"]), int(info["expires_at"])))
+        if lock_rows:
+            connection.execute("INSERT OR REPLACE INTO stateful_lock (id, created_at, expires_at) VALUES (1, ?, ?)",
+                               lock_rows[0])
+            imported.append("stateful lock")
+
+    stats_file = TALLY_DIR / "media_stats.json"
+    stats = _read_legacy_json(stats_file)
+    if isinstance(stats, dict):
+        connection.executemany(
+            "INSERT OR REPLACE INTO app_stats (app_type, stat_type, value) VALUES (?, ?, ?)",
+            _legacy_rows(stats_file,
+                         [(app_type, stat_type, value)
+                          for app_type, values in stats.items() if isinstance(values, dict)
+                          for stat_type, value in values.items()],
+                         lambda entry: (entry[0], entry[1], int(entry[2]))))
+        imported.append("media stats")
+
+    hourly_cap_file = TALLY_DIR / "hourly_cap.json"
+    caps = _read_legacy_json(hourly_cap_file)
+    if isinstance(caps, dict):
+        rows = []
+        for app_type, data in caps.items():
+            if not isinstance(data, dict):
+                continue
+            if isinstance(data.get("minutes"), list):
+                rows.extend(_legacy_rows(hourly_cap_file, data["minutes"],
+                                         lambda entry, app_type=app_type: (app_type, int(entry[0]), int(entry[1]))))
+            elif data.get("api_hits"):
+                # Files written before the sliding window only have the total, count it at the save time
+                rows.extend(_legacy_rows(hourly_cap_file, [data["api_hits"]],
+                                         lambda hits, app_type=app_type: (app_type, int(os.path.getmtime(hourly_cap_file)) // 60, int(hits))))
+        connection.executemany("INSERT OR REPLACE INTO hourly_cap_hits (app_type, minute, hits) VALUES (?, ?, ?)", rows)
+        imported.append("hourly caps")
+
+    if SWAPARR_DIR.exists():
+        for app_dir in sorted(path for path in SWAPARR_DIR.iterdir() if path.is_dir()):
+            strikes_file = app_dir / "strikes.json"
+            strikes = _read_legacy_json(strikes_file)
+            if isinstance(strikes, dict):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO swaparr_strikes (app_type, item_id, strikes, removed, data) VALUES (?, ?, ?, ?, ?)",
+                    _legacy_rows(strikes_file,
+                                 [(item_id, record) for item_id, record in strikes.items() if isinstance(record, dict)],
+                                 lambda entry, app_name=app_dir.name: (
+                                     app_name, str(entry[0]), int(entry[1].get("strikes", 0)),
+                                     int(bool(entry[1].get("removed", False))), json.dumps(entry[1]))))
+                imported.append(f"{app_dir.name} Swaparr strikes")
+            removed_items = _read_legacy_json(app_dir / "removed_items.json")
+            if isinstance(removed_items, dict):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO swaparr_removed (app_type, item_hash, removed_time, data) VALUES (?, ?, ?, ?)",
+                    [(app_dir.name, item_hash, record["removed_time"], json.dumps(record))
+                     for item_hash, record in removed_items.items()
+                     if isinstance(record, dict) and record.get("removed_time")])
+                imported.append(f"{app_dir.name} Swaparr removed items")
+
+    state_dir = CONFIG_PATH / "state"
+    if state_dir.exists():
+        for state_file in sorted(state_dir.glob("*/*.json")):
+            try:
+                text = state_file.read_text().strip()
+            except OSError as e:
+                logger.warning(f"Skipping unreadable legacy state file {state_file}: {e}")
+                continue
+            try:
+                value = json.loads(text)
+            except ValueError:
+                # last_reset files hold a bare ISO timestamp
+                value = text
+            connection.execute("INSERT OR REPLACE INTO app_state (app_type, name, value) VALUES (?, ?, ?)",
+                               (state_file.parent.name, state_file.stem, json.dumps(value)))
+        imported.append("legacy app state")
+
+    schedule = _read_legacy_json(SCHEDULER_DIR / "schedule.json")
+    if isinstance(schedule, dict):
+        connection.executemany("INSERT OR REPLACE INTO schedules (app_type, entries) VALUES (?, ?)",
+                               [(app_type, json.dumps(entries)) for app_type, entries in schedule.items()])
+        imported.append("schedule")
+
+    if imported:
+        logger.info(f"Imported legacy state files into the runtime database: {', '.join(imported)}")
+
+def _legacy_utc_timestamp(iso_time: Optional[str]) -> Optional[float]:
+    """Convert a naive UTC ISO time written by the old Swaparr code to epoch seconds."""
+    if not iso_time:
+        return None
+    try:
+        return datetime.fromisoformat(iso_time.replace('Z', '+00:00')).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+def _create_swaparr_instance_tables(connection: sqlite3.Connection) -> None:
+    """
+    Schema version 3: Swaparr strikes and removed items per instance, keyed by item hash.
+
+    Removed items keep their app and are claimed by the first instance of it
+    that runs (instance_name ''). Strike records were keyed by queue ID, not
+    by item hash, so they are dropped and counting starts over.
+    """
+    connection.execute("""CREATE TABLE IF NOT EXISTS swaparr_strike_records (
+        app_type TEXT NOT NULL,
+        instance_name TEXT NOT NULL,
+        item_hash TEXT NOT NULL,
+        item_id INTEGER,
+        name TEXT,
+        strikes INTEGER NOT NULL DEFAULT 0,
+        first_strike_time REAL,
+        last_strike_time REAL,
+        last_seen REAL NOT NULL,
+        removed_time REAL,
+        PRIMARY KEY (app_type, instance_name, item_hash)
+    ) WITHOUT ROWID""")
+    connection.execute("""CREATE TABLE IF NOT EXISTS swaparr_removed_items (
+        app_type TEXT NOT NULL,
+        instance_name TEXT NOT NULL,
+        item_hash TEXT NOT NULL,
+        name TEXT,
+        size INTEGER NOT NULL DEFAULT 0,
+        removed_time REAL NOT NULL,
+        reason TEXT,
+        PRIMARY KEY (app_type, instance_name, item_hash)
+    ) WITHOUT ROWID""")
+
+    def removed_item_row(entry):
+        app_type, item_hash, data = entry
+        record = json.loads(data)
+        removed_time = _legacy_utc_timestamp(record.get("removed_time"))
+        if removed_time is None:
+            return None
+        return (app_type, item_hash, record.get("name"), int(record.get("size") or 0), removed_time, record.get("reason"))
+
+    legacy_items = connection.execute("SELECT app_type, item_hash, data FROM swaparr_removed").fetchall()
+    rows = [row for row in _legacy_rows("swaparr_removed", legacy_items, removed_item_row) if row is not None]
+    connection.executemany(
+        "INSERT OR REPLACE INTO swaparr_removed_items (app_type, instance_name, item_hash, name, size, removed_time, reason) "
+        "VALUES (?, '', ?, ?, ?, ?, ?)", rows)
+    connection.execute("DROP TABLE IF EXISTS swaparr_strikes")
+    connection.execute("DROP TABLE IF EXISTS swaparr_removed")
+
+# Schema migrations of the runtime database: (version, description, migration).
+# Each one runs once, in its own transaction, and versions must only ever be appended.
+SCHEMA_MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "create runtime state tables", _create_runtime_tables),
+    (2, "import legacy JSON state files", _import_legacy_state_files),
+    (3, "track Swaparr strikes per instance", _create_swaparr_instance_tables)
+]
+
 if __name__ == "__main__":
     # Setup basic logging if run directly
     logging.basicConfig(
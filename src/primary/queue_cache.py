@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Download queue snapshots for Huntarr
+The whole download queue of an instance is fetched once, in large pages, and
+shared by the hunt loop's queue size check and the Swaparr pass that follows
+it in the same cycle. Snapshots live in memory only.
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils import http_client
+from src.primary.settings_manager import get_advanced_setting
+
+logger = get_logger("huntarr")
+
+# Queue API version of each app type
+QUEUE_API_VERSIONS = {
+    "radarr": "v3",
+    "sonarr": "v3",
+    "lidarr": "v1",
+    "readarr": "v1",
+    "whisparr": "v3",
+    "eros": "v3"
+}
+
+# The queue endpoints accept large pages, so even a 2k item queue takes a couple of requests
+QUEUE_PAGE_SIZE = 1000
+
+# Default age after which a snapshot is fetched again instead of reused
+DEFAULT_MAX_AGE_SECONDS = 600
+
+
+class QueueSnapshot:
+    """The queue records of one instance, as fetched at fetched_at (monotonic time)."""
+
+    __slots__ = ("records", "total", "fetched_at")
+
+    def __init__(self, records: List[Dict[str, Any]], total: int, fetched_at: float):
+        self.records = records
+        self.total = total
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+# Latest snapshot per (app type, api url, api key)
+_snapshots: Dict[Tuple[str, str, str], QueueSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_queue_api_version(app_type: str) -> str:
+    """Return the API version that serves the queue endpoints of an app type."""
+    return QUEUE_API_VERSIONS.get(app_type, "v3")
+
+
+def get_max_age() -> int:
+    """Return how many seconds a snapshot may be reused before the queue is fetched again."""
+    return int(get_advanced_setting("queue_snapshot_max_age_seconds", DEFAULT_MAX_AGE_SECONDS))
+
+
+def _snapshot_key(app_type: str, api_url: str, api_key: str) -> Tuple[str, str, str]:
+    return (app_type, api_url.rstrip('/'), api_key)
+
+
+def fetch_queue(app_type: str, api_url: str, api_key: str, api_timeout: int = 120) -> Optional[QueueSnapshot]:
+    """
+    Fetch the whole download queue of an instance and keep it as the current snapshot.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        api_url: The base URL of the instance
+        api_key: The API key of the instance
+        api_timeout: Timeout for each page request
+
+    Returns:
+        The new snapshot, or None if the first page could not be fetched
+    """
+    endpoint = f"{api_url.rstrip('/')}/api/{get_queue_api_version(app_type)}/queue"
+    headers = {'X-Api-Key': api_key}
+
+    def fetch_page(page):
+        try:
+            response = http_client.get(f"{endpoint}?page={page}&pageSize={QUEUE_PAGE_SIZE}",
+                                       headers=headers, timeout=api_timeout)
+            response.raise_for_status()
+            # v3 apps return records/totalRecords; older v1 apps may return a plain list
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error fetching {app_type} queue (page {page}): {e}")
+            return None
+
+    # Remaining pages are fetched concurrently once page 1 reports the total
+    records, total = http_client.fetch_all_pages(api_url, fetch_page, QUEUE_PAGE_SIZE)
+    if records is None:
+        return None
+
+    snapshot = QueueSnapshot(records, total or len(records), time.monotonic())
+    with _snapshots_lock:
+        _snapshots[_snapshot_key(app_type, api_url, api_key)] = snapshot
+    logger.debug(f"Fetched {len(records)} of {snapshot.total} queue items from {app_type}")
+    return snapshot
+
+
+def get_queue(app_type: str, api_url: str, api_key: str, api_timeout: int = 120,
+              max_age: Optional[float] = None) -> Optional[QueueSnapshot]:
+    """
+    Get the download queue of an instance, reusing a snapshot younger than max_age.
+
+    Args:
+        max_age: Oldest snapshot to reuse, in seconds (defaults to 'queue_snapshot_max_age_seconds')
+
+    Returns:
+        The snapshot, or None if the queue could not be fetched
+    """
+    if max_age is None:
+        max_age = get_max_age()
+    with _snapshots_lock:
+        snapshot = _snapshots.get(_snapshot_key(app_type, api_url, api_key))
+    if snapshot is not None and snapshot.age <= max_age:
+        return snapshot
+    return fetch_queue(app_type, api_url, api_key, api_timeout)
+
+
+def invalidate(app_type: str, api_url: str, api_key: str) -> None:
+    """Drop the snapshot of an instance, e.g. after downloads were removed from its queue."""
+    with _snapshots_lock:
+        _snapshots.pop(_snapshot_key(app_type, api_url, api_key), None)
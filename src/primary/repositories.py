@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Repositories over the runtime database
+One class per kind of runtime state, replacing the JSON file functions the
+modules used to have. Every method returns a default (or False) and logs the
+error instead of raising when the database cannot be read or written.
+"""
+
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from src.primary.utils.logger import get_logger
+from src.primary.datastore import Datastore, get_datastore
+
+logger = get_logger("huntarr")
+
+
+class Repository:
+    """Base class: resolves the datastore lazily, so importing a repository opens nothing."""
+
+    def __init__(self, datastore: Optional[Datastore] = None):
+        self._datastore = datastore
+
+    @property
+    def datastore(self) -> Datastore:
+        return self._datastore or get_datastore()
+
+
+class StatefulLockRepository(Repository):
+    """The stateful management window (created_at/expires_at)."""
+
+    def get(self) -> Optional[Dict[str, int]]:
+        """Get the lock, or None if there is none yet (or it could not be read)."""
+        try:
+            row = self.datastore.connection().execute(
+                "SELECT created_at, expires_at FROM stateful_lock WHERE id = 1").fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the stateful lock: {e}")
+            return None
+        if row is None:
+            return None
+        return {"created_at": row[0], "expires_at": row[1]}
+
+    def set(self, created_at: int, expires_at: int) -> bool:
+        try:
+            with self.datastore.transaction() as connection:
+                connection.execute("INSERT OR REPLACE INTO stateful_lock (id, created_at, expires_at) VALUES (1, ?, ?)",
+                                   (int(created_at), int(expires_at)))
+        except sqlite3.Error as e:
+            logger.error(f"Error writing the stateful lock: {e}")
+            return False
+        return True
+
+
+class StatsRepository(Repository):
+    """Hunted/upgraded counters per app."""
+
+    def load(self) -> Dict[str, Dict[str, int]]:
+        """Get every stored counter as {app_type: {stat_type: value}}."""
+        stats: Dict[str, Dict[str, int]] = {}
+        try:
+            rows = self.datastore.connection().execute("SELECT app_type, stat_type, value FROM app_stats").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading stats: {e}")
+            return stats
+        for app_type, stat_type, value in rows:
+            stats.setdefault(app_type, {})[stat_type] = value
+        return stats
+
+    def save(self, stats: Dict[str, Dict[str, int]]) -> bool:
+        try:
+            with self.datastore.transaction() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO app_stats (app_type, stat_type, value) VALUES (?, ?, ?)",
+                    [(app_type, stat_type, int(value))
+                     for app_type, values in stats.items() for stat_type, value in values.items()])
+        except sqlite3.Error as e:
+            logger.error(f"Error saving stats: {e}")
+            return False
+        return True
+
+
+class HourlyCapRepository(Repository):
+    """API hits per minute inside the hourly cap window of each app."""
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Get {app_type: {"api_hits": total, "minutes": [[minute, hits], ...]}}."""
+        caps: Dict[str, Dict[str, Any]] = {}
+        try:
+            rows = self.datastore.connection().execute(
+                "SELECT app_type, minute, hits FROM hourly_cap_hits ORDER BY app_type, minute").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading hourly caps: {e}")
+            return caps
+        for app_type, minute, hits in rows:
+            cap = caps.setdefault(app_type, {"api_hits": 0, "minutes": []})
+            cap["api_hits"] += hits
+            cap["minutes"].append([minute, hits])
+        return caps
+
+    def save(self, caps: Dict[str, Dict[str, Any]]) -> bool:
+        """Replace the stored minutes of every app in caps (as serialized by MinuteWindow.to_dict)."""
+        try:
+            with self.datastore.transaction() as connection:
+                connection.executemany("DELETE FROM hourly_cap_hits WHERE app_type = ?", [(app_type,) for app_type in caps])
+                connection.executemany(
+                    "INSERT INTO hourly_cap_hits (app_type, minute, hits) VALUES (?, ?, ?)",
+                    [(app_type, int(minute), int(hits))
+                     for app_type, cap in caps.items() for minute, hits in cap.get("minutes", [])])
+        except sqlite3.Error as e:
+            logger.error(f"Error saving hourly caps: {e}")
+            return False
+        return True
+
+
+class SwaparrRepository(Repository):
+    """Swaparr strike records and the downloads it removed, per app instance and item hash."""
+
+    STRIKE_COLUMNS = ("item_hash", "item_id", "name", "strikes", "first_strike_time", "last_strike_time",
+                      "last_seen", "removed_time")
+    REMOVED_COLUMNS = ("item_hash", "name", "size", "removed_time", "reason")
+
+    def load_instance(self, app_name: str, instance_name: str) -> Optional[Dict[str, List[tuple]]]:
+        """
+        Get the strike and removed item rows of one instance.
+
+        Removed items migrated from before per-instance tracking are claimed by
+        the first instance of their app that loads.
+
+        Returns:
+            {"strikes": [rows in STRIKE_COLUMNS order], "removed": [rows in REMOVED_COLUMNS order]},
+            or None on error
+        """
+        try:
+            with self.datastore.transaction() as connection:
+                connection.execute(
+                    "UPDATE OR IGNORE swaparr_removed_items SET instance_name = ? WHERE app_type = ? AND instance_name = ''",
+                    (instance_name, app_name))
+                strikes = connection.execute(
+                    f"SELECT {', '.join(self.STRIKE_COLUMNS)} FROM swaparr_strike_records WHERE app_type = ? AND instance_name = ?",
+                    (app_name, instance_name)).fetchall()
+                removed = connection.execute(
+                    f"SELECT {', '.join(self.REMOVED_COLUMNS)} FROM swaparr_removed_items WHERE app_type = ? AND instance_name = ?",
+                    (app_name, instance_name)).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading Swaparr state for {app_name}/{instance_name}: {e}")
+            return None
+        return {"strikes": strikes, "removed": removed}
+
+    def save_changes(self, app_name: str, instance_name: str, strikes: List[tuple], deleted_strikes: List[str],
+                     removed: List[tuple], deleted_removed: List[str]) -> bool:
+        """
+        Write the records of one instance that changed, in one transaction.
+
+        Args:
+            app_name: The app type
+            instance_name: The instance the records belong to
+            strikes: Changed strike rows, in STRIKE_COLUMNS order
+            deleted_strikes: Item hashes of strike records to delete
+            removed: Changed removed item rows, in REMOVED_COLUMNS order
+            deleted_removed: Item hashes of removed items to delete
+
+        Returns:
+            True if successful, False otherwise
+        """
+        key = (app_name, instance_name)
+        try:
+            with self.datastore.transaction() as connection:
+                connection.executemany(
+                    "DELETE FROM swaparr_strike_records WHERE app_type = ? AND instance_name = ? AND item_hash = ?",
+                    [key + (item_hash,) for item_hash in deleted_strikes])
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO swaparr_strike_records (app_type, instance_name, {', '.join(self.STRIKE_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * (len(self.STRIKE_COLUMNS) + 2))})",
+                    [key + tuple(row) for row in strikes])
+                connection.executemany(
+                    "DELETE FROM swaparr_removed_items WHERE app_type = ? AND instance_name = ? AND item_hash = ?",
+                    [key + (item_hash,) for item_hash in deleted_removed])
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO swaparr_removed_items (app_type, instance_name, {', '.join(self.REMOVED_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * (len(self.REMOVED_COLUMNS) + 2))})",
+                    [key + tuple(row) for row in removed])
+        except sqlite3.Error as e:
+            logger.error(f"Error saving Swaparr state for {app_name}/{instance_name}: {e}")
+            return False
+        return True
+
+    def reset_strikes(self, app_name: Optional[str] = None) -> Optional[int]:
+        """
+        Forget the strikes of one app, or of every app.
+
+        Returns:
+            The number of strike records deleted, or None on error
+        """
+        try:
+            with self.datastore.transaction() as connection:
+                if app_name:
+                    cursor = connection.execute("DELETE FROM swaparr_strike_records WHERE app_type = ?", (app_name,))
+                else:
+                    cursor = connection.execute("DELETE FROM swaparr_strike_records")
+        except sqlite3.Error as e:
+            logger.error(f"Error resetting strike data: {e}")
+            return None
+        return cursor.rowcount
+
+    def get_statistics(self) -> Dict[str, Dict[str, int]]:
+        """Get the number of tracked, currently striked and removed downloads per app."""
+        try:
+            rows = self.datastore.connection().execute("""
+                SELECT app_type, COUNT(*), SUM(strikes > 0 AND removed_time IS NULL), SUM(removed_time IS NOT NULL)
+                FROM swaparr_strike_records GROUP BY app_type
+            """).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading strike statistics: {e}")
+            return {}
+        return {
+            app_type: {"total_tracked": total, "currently_striked": striked or 0, "removed": removed or 0}
+            for app_type, total, striked, removed in rows
+        }
+
+
+class AppStateRepository(Repository):
+    """Named JSON values per app, used by the legacy state module."""
+
+    def get(self, app_type: str, name: str, default: Any = None) -> Any:
+        try:
+            row = self.datastore.connection().execute(
+                "SELECT value FROM app_state WHERE app_type = ? AND name = ?", (app_type, name)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading {name} state for {app_type}: {e}")
+            return default
+        return default if row is None else json.loads(row[0])
+
+    def set(self, app_type: str, name: str, value: Any) -> bool:
+        try:
+            with self.datastore.transaction() as connection:
+                connection.execute("INSERT OR REPLACE INTO app_state (app_type, name, value) VALUES (?, ?, ?)",
+                                   (app_type, name, json.dumps(value)))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error writing {name} state for {app_type}: {e}")
+            return False
+        return True
+
+
+class ScheduleRepository(Repository):
+    """Scheduled actions, as the {app_type: [entries]} dict the scheduler UI edits."""
+
+    def load(self) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Get the schedule, or None if none was ever saved (or it could not be read)."""
+        try:
+            rows = self.datastore.connection().execute("SELECT app_type, entries FROM schedules").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading schedule: {e}")
+            return None
+        if not rows:
+            return None
+        return {app_type: json.loads(entries) for app_type, entries in rows}
+
+    def save(self, schedule: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Replace the whole schedule."""
+        try:
+            with self.datastore.transaction() as connection:
+                connection.execute("DELETE FROM schedules")
+                connection.executemany("INSERT INTO schedules (app_type, entries) VALUES (?, ?)",
+                                       [(app_type, json.dumps(entries)) for app_type, entries in schedule.items()])
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error saving schedule: {e}")
+            return False
+        return True
+
+
+# Process-wide repositories
+stateful_lock_repository = StatefulLockRepository()
+stats_repository = StatsRepository()
+hourly_cap_repository = HourlyCapRepository()
+swaparr_repository = SwaparrRepository()
+app_state_repository = AppStateRepository()
+schedule_repository = ScheduleRepository()
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 import logging
 
-from src.primary.history_manager import get_history, clear_history, add_history_entry
+from src.primary.history_manager import get_history, clear_history, add_history_entry, get_history_rollups
 
 logger = logging.getLogger("huntarr")
 history_blueprint = Blueprint('history', __name__)
@@ -13,6 +13,7 @@ def get_app_history(app_type):
         search_query = request.args.get('search', '')
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
+        cursor = request.args.get('cursor') or None
         
         # Validate page_size to be one of the allowed values
         allowed_page_sizes = [10, 20, 30, 50, 100, 250, 1000]
@@ -24,13 +25,37 @@ def get_app_history(app_type):
         if app_type not in valid_app_types:
             return jsonify({"error": f"Invalid app type: {app_type}"}), 400
         
-        result = get_history(app_type, search_query, page, page_size)
+        result = get_history(app_type, search_query, page, page_size, cursor)
         return jsonify(result), 200
     
     except Exception as e:
         logger.error(f"Error getting history for {app_type}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@history_blueprint.route('/<app_type>/rollups', methods=['GET'])
+def get_app_history_rollups(app_type):
+    """Get daily or hourly history counts for a specific app or all apps"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        instance_name = request.args.get('instance') or None
+        days = request.args.get('days')
+        days = int(days) if days else None
+        
+        if granularity not in ("day", "hour"):
+            return jsonify({"error": f"Invalid granularity: {granularity}"}), 400
+        
+        # Validate app_type
+        valid_app_types = ["all", "sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros", "swaparr"]
+        if app_type not in valid_app_types:
+            return jsonify({"error": f"Invalid app type: {app_type}"}), 400
+        
+        rollups = get_history_rollups(app_type, granularity, instance_name, days)
+        return jsonify({"granularity": granularity, "rollups": rollups}), 200
+    
+    except Exception as e:
+        logger.error(f"Error getting history rollups for {app_type}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @history_blueprint.route('/<app_type>', methods=['DELETE'])
 def clear_app_history(app_type):
     """Clear history for a specific app or all apps"""
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from src.primary.stats_manager import get_stats, reset_stats, load_hourly_caps, get_default_hourly_caps
+from src.primary.stats_manager import get_stats, reset_stats, get_hourly_caps, get_default_hourly_caps
 from src.primary.settings_manager import get_general_settings, load_settings
 import logging
 from flask_jwt_extended import jwt_required
@@ -62,7 +62,7 @@ def api_get_hourly_caps():
     """Get hourly API usage caps for each app"""
     try:
         # Load the current hourly caps
-        caps = load_hourly_caps()
+        caps = get_hourly_caps()
         
         # Get app-specific hourly cap limits
         app_limits = {}
@@ -4,7 +4,6 @@ Scheduler API Routes
 Handles API endpoints for scheduler management
 """
 
-import os
 import json
 import logging
 from flask import Blueprint, jsonify, request, Response
@@ -24,24 +23,12 @@ from src.primary.utils.instance_list_generator import generate_instance_list
 
 # Configuration file path
 # Use the centralized path configuration
-from src.primary.utils.config_paths import SCHEDULER_DIR
-
-# Convert Path object to string for compatibility with os.path functions
-CONFIG_DIR = str(SCHEDULER_DIR)
-SCHEDULE_FILE = os.path.join(CONFIG_DIR, "schedule.json")
-
-def ensure_config_dir():
-    """Ensure the config directory exists"""
-    if not os.path.exists(CONFIG_DIR):
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        scheduler_logger.info(f"Created config directory: {CONFIG_DIR}")
+from src.primary.repositories import schedule_repository
 
 @scheduler_api.route('/api/scheduler/load', methods=['GET'])
 def load_schedules():
-    """Load schedules from the JSON file"""
+    """Load schedules from the runtime database"""
     try:
-        ensure_config_dir()
-        
         # Default empty schedules
         schedules = {
             "global": [],
@@ -51,16 +38,14 @@ def load_schedules():
             "readarr": []
         }
         
-        # Load from file if it exists
-        if os.path.exists(SCHEDULE_FILE):
-            with open(SCHEDULE_FILE, 'r') as f:
-                loaded_data = json.load(f)
-                if loaded_data and isinstance(loaded_data, dict):
-                    # Update with data from file, keeping default structure
-                    schedules.update(loaded_data)
-            scheduler_logger.info(f"Loaded schedules from {SCHEDULE_FILE}")
+        # Load the saved schedules if there are any
+        loaded_data = schedule_repository.load()
+        if loaded_data:
+            # Update with the saved data, keeping default structure
+            schedules.update(loaded_data)
+            scheduler_logger.info("Loaded schedules")
         else:
-            scheduler_logger.info(f"No schedule file found at {SCHEDULE_FILE}, returning empty schedules")
+            scheduler_logger.info("No saved schedules found, returning empty schedules")
         
         # Add CORS headers
         response = Response(json.dumps(schedules))
@@ -111,28 +96,25 @@ def get_scheduler_instance_list():
 
 @scheduler_api.route('/api/scheduler/save', methods=['POST'])
 def save_schedules():
-    """Save schedules to the JSON file"""
+    """Save schedules to the runtime database"""
     try:
-        ensure_config_dir()
-        
         # Get schedule data from request
         schedules = request.json
         
         if not schedules or not isinstance(schedules, dict):
             return jsonify({"error": "Invalid schedule data format"}), 400
         
-        # Save to file
-        with open(SCHEDULE_FILE, 'w') as f:
-            json.dump(schedules, f, indent=2)
+        # Save to the database
+        if not schedule_repository.save(schedules):
+            return jsonify({"error": "Could not save the schedules"}), 500
         
-        scheduler_logger.info(f"Saved schedules to {SCHEDULE_FILE}")
+        scheduler_logger.info("Saved schedules")
         
         # Add timestamp to response
         response_data = {
             "success": True,
             "message": "Schedules saved successfully",
-            "timestamp": datetime.now().isoformat(),
-            "file": SCHEDULE_FILE
+            "timestamp": datetime.now().isoformat()
         }
         
         # Add CORS headers
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Scheduler Engine for Huntarr
-Handles execution of scheduled actions from schedule.json
+Handles execution of scheduled actions stored in the runtime database
 """
 
 import os
@@ -25,10 +25,11 @@ scheduler_logger = get_logger("scheduler")
 SCHEDULE_CHECK_INTERVAL = 60  # Check schedule every minute
 # Use the centralized path configuration
 from src.primary.utils.config_paths import SCHEDULER_DIR, CONFIG_PATH
+from src.primary.utils.durable_store import write_json
+from src.primary.repositories import schedule_repository
 
 # Convert Path object to string for compatibility with os.path functions
 SCHEDULE_DIR = str(SCHEDULER_DIR)
-SCHEDULE_FILE = os.path.join(SCHEDULE_DIR, "schedule.json")
 
 # Track last executed actions to prevent duplicates
 last_executed_actions = {}
@@ -41,55 +42,21 @@ stop_event = threading.Event()
 scheduler_thread = None
 
 def load_schedule():
-    """Load the schedule configuration from file"""
-    try:
-        os.makedirs(SCHEDULE_DIR, exist_ok=True)  # Ensure directory exists
-        
-        if os.path.exists(SCHEDULE_FILE):
-            try:
-                # Check if file is empty
-                if os.path.getsize(SCHEDULE_FILE) == 0:
-                    return {"global": [], "sonarr": [], "radarr": [], "lidarr": [], "readarr": [], "whisparr": [], "eros": []}
-                
-                # Attempt to load JSON
-                with open(SCHEDULE_FILE, 'r') as f:
-                    content = f.read()
-                    scheduler_logger.debug(f"Schedule file content (first 100 chars): {content[:100]}...")
-                    schedule_data = json.loads(content)
-                    
-                    # Ensure the schedule data has the expected structure
-                    for app_type in ["global", "sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros"]:
-                        if app_type not in schedule_data:
-                            schedule_data[app_type] = []
-                    
-                    return schedule_data
-            except json.JSONDecodeError as json_err:
-                scheduler_logger.error(f"Invalid JSON in schedule file: {json_err}")
-                scheduler_logger.error(f"Attempting to repair JSON file...")
-                
-                # Backup the corrupted file
-                backup_file = f"{SCHEDULE_FILE}.backup.{int(time.time())}"
-                os.rename(SCHEDULE_FILE, backup_file)
-                scheduler_logger.info(f"Backed up corrupted file to {backup_file}")
-                
-                # Create a new empty schedule file
-                default_schedule = {"global": [], "sonarr": [], "radarr": [], "lidarr": [], "readarr": [], "whisparr": [], "eros": []}
-                with open(SCHEDULE_FILE, 'w') as f:
-                    json.dump(default_schedule, f, indent=2)
-                scheduler_logger.info(f"Created new empty schedule file")
-                
-                return default_schedule
-        else:
-            # Create the default schedule file
-            default_schedule = {"global": [], "sonarr": [], "radarr": [], "lidarr": [], "readarr": [], "whisparr": [], "eros": []}
-            with open(SCHEDULE_FILE, 'w') as f:
-                json.dump(default_schedule, f, indent=2)
-            scheduler_logger.info(f"Created new schedule file with default structure")
-            return default_schedule
-    except Exception as e:
-        scheduler_logger.error(f"Error loading schedule: {e}")
-        scheduler_logger.error(traceback.format_exc())
-        return {"global": [], "sonarr": [], "radarr": [], "lidarr": [], "readarr": [], "whisparr": [], "eros": []}
+    """Load the schedule configuration from the runtime database"""
+    schedule_data = schedule_repository.load()
+    if schedule_data is None:
+        # Create the default schedule
+        schedule_data = {"global": [], "sonarr": [], "radarr": [], "lidarr": [], "readarr": [], "whisparr": [], "eros": []}
+        if schedule_repository.save(schedule_data):
+            scheduler_logger.info(f"Created new schedule with default structure")
+        return schedule_data
+    
+    # Ensure the schedule data has the expected structure
+    for app_type in ["global", "sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros"]:
+        if app_type not in schedule_data:
+            schedule_data[app_type] = []
+    
+    return schedule_data
 
 def add_to_history(action_entry, status, message):
     """Add an action execution to the history log"""
@@ -146,8 +113,8 @@ def execute_action(action_entry):
                                 for instance in config_data['instances']:
                                     if isinstance(instance, dict):
                                         instance['enabled'] = False
-                            with open(config_file, 'w') as f:
-                                json.dump(config_data, f, indent=2)
+                            if not write_json(config_file, config_data, indent=2):
+                                raise OSError(f"Could not write {config_file}")
                             # Clear cache for this app to ensure the UI refreshes
                             clear_cache(app)
                     result_message = "All apps disabled successfully"
@@ -173,8 +140,8 @@ def execute_action(action_entry):
                             for instance in config_data['instances']:
                                 if isinstance(instance, dict):
                                     instance['enabled'] = False
-                        with open(config_file, 'w') as f:
-                            json.dump(config_data, f, indent=2)
+                        if not write_json(config_file, config_data, indent=2):
+                            raise OSError(f"Could not write {config_file}")
                         # Clear cache for this app to ensure the UI refreshes
                         clear_cache(app_type)
                     result_message = f"{app_type} disabled successfully"
@@ -206,8 +173,8 @@ def execute_action(action_entry):
                                 for instance in config_data['instances']:
                                     if isinstance(instance, dict):
                                         instance['enabled'] = True
-                            with open(config_file, 'w') as f:
-                                json.dump(config_data, f, indent=2)
+                            if not write_json(config_file, config_data, indent=2):
+                                raise OSError(f"Could not write {config_file}")
                             # Clear cache for this app to ensure the UI refreshes
                             clear_cache(app)
                     result_message = "All apps enabled successfully"
@@ -233,8 +200,8 @@ def execute_action(action_entry):
                             for instance in config_data['instances']:
                                 if isinstance(instance, dict):
                                     instance['enabled'] = True
-                        with open(config_file, 'w') as f:
-                            json.dump(config_data, f, indent=2)
+                        if not write_json(config_file, config_data, indent=2):
+                            raise OSError(f"Could not write {config_file}")
                         # Clear cache for this app to ensure the UI refreshes
                         clear_cache(app_type)
                     result_message = f"{app_type} enabled successfully"
@@ -267,8 +234,8 @@ def execute_action(action_entry):
                                 with open(config_file, 'r') as f:
                                     config_data = json.load(f)
                                 config_data['hourly_cap'] = api_limit
-                                with open(config_file, 'w') as f:
-                                    json.dump(config_data, f, indent=2)
+                                if not write_json(config_file, config_data, indent=2):
+                                    raise OSError(f"Could not write {config_file}")
                         result_message = f"API cap set to {api_limit} for all apps"
                         scheduler_logger.info(result_message)
                         add_to_history(action_entry, "success", result_message)
@@ -286,8 +253,8 @@ def execute_action(action_entry):
                             with open(config_file, 'r') as f:
                                 config_data = json.load(f)
                             config_data['hourly_cap'] = api_limit
-                            with open(config_file, 'w') as f:
-                                json.dump(config_data, f, indent=2)
+                            if not write_json(config_file, config_data, indent=2):
+                                raise OSError(f"Could not write {config_file}")
                         result_message = f"API cap set to {api_limit} for {app_type}"
                         scheduler_logger.info(result_message)
                         add_to_history(action_entry, "success", result_message)
@@ -417,14 +384,6 @@ def check_and_execute_schedules():
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         scheduler_logger.debug(f"Checking schedules at {current_time}")
         
-        # Check if schedule file exists and log its status
-        if not os.path.exists(SCHEDULE_FILE):
-            scheduler_logger.debug(f"Schedule file does not exist: {SCHEDULE_FILE}")
-            add_to_history({"action": "check"}, "debug", f"Schedule file not found at {SCHEDULE_FILE}")
-            return
-        
-        scheduler_logger.debug(f"Schedule file exists at {SCHEDULE_FILE} with size {os.path.getsize(SCHEDULE_FILE)} bytes")
-        
         # Load the schedule
         schedule_data = load_schedule()
         if not schedule_data:
@@ -9,9 +9,8 @@ import os
 import json
 import pathlib
 import logging
-import shutil
+import copy
 import subprocess
-import time
 from typing import Dict, Any, Optional, List
 
 # Create a simple logger for settings_manager
@@ -21,6 +20,7 @@ settings_logger = logging.getLogger("settings_manager")
 # Settings directory setup - Root config directory
 # Use the centralized path configuration
 from src.primary.utils.config_paths import SETTINGS_DIR
+from src.primary.utils.durable_store import write_bytes, write_json
 
 # Settings directory is already created by config_paths module
 
@@ -30,20 +30,31 @@ DEFAULT_CONFIGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'd
 # Update or add this as a class attribute or constant
 KNOWN_APP_TYPES = ["sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros", "general", "swaparr"]
 
-# Add a settings cache with timestamps to avoid excessive disk reads
-settings_cache = {}  # Format: {app_name: {'timestamp': timestamp, 'data': settings_dict}}
-CACHE_TTL = 5  # Cache time-to-live in seconds
+# Settings cache, kept until the file changes. Saves through save_settings()
+# invalidate an entry directly; edits made outside this process are noticed
+# because the file's stat signature no longer matches the cached one.
+settings_cache = {}  # Format: {app_name: {'signature': (mtime_ns, size, inode), 'data': settings_dict}}
+
+# Parsed default configs. They ship with the code and never change at runtime.
+default_settings_cache = {}
 
 def clear_cache(app_name=None):
     """Clear the settings cache for a specific app or all apps."""
-    global settings_cache
     if app_name:
         if app_name in settings_cache:
             settings_logger.debug(f"Clearing cache for {app_name}")
             settings_cache.pop(app_name, None)
     else:
         settings_logger.debug("Clearing entire settings cache")
-        settings_cache = {}
+        settings_cache.clear()
+
+def _get_file_signature(path: pathlib.Path) -> Optional[tuple]:
+    """Get the (mtime_ns, size, inode) of a file, or None if it cannot be read."""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
 
 def get_settings_file_path(app_name: str) -> pathlib.Path:
     """Get the path to the settings file for a specific app."""
@@ -59,17 +70,19 @@ def get_default_config_path(app_name: str) -> pathlib.Path:
 # Helper function to load default settings for a specific app
 def load_default_app_settings(app_name: str) -> Dict[str, Any]:
     """Load default settings for a specific app from its JSON file."""
-    default_file = get_default_config_path(app_name)
-    if default_file.exists():
+    if app_name not in default_settings_cache:
+        default_file = get_default_config_path(app_name)
+        if not default_file.exists():
+            settings_logger.warning(f"Default settings file not found for {app_name}: {default_file}")
+            return {}
         try:
             with open(default_file, 'r') as f:
-                return json.load(f)
+                default_settings_cache[app_name] = json.load(f)
         except Exception as e:
             settings_logger.error(f"Error loading default settings for {app_name} from {default_file}: {e}")
             return {}
-    else:
-        settings_logger.warning(f"Default settings file not found for {app_name}: {default_file}")
-        return {}
+    # Callers may modify the result, so never hand out the cached dict itself
+    return copy.deepcopy(default_settings_cache[app_name])
 
 def _ensure_config_exists(app_name: str) -> None:
     """Ensure the config file exists for an app, copying from default if not."""
@@ -78,18 +91,15 @@ def _ensure_config_exists(app_name: str) -> None:
         default_file = get_default_config_path(app_name)
         if default_file.exists():
             try:
-                shutil.copyfile(default_file, settings_file)
-                settings_logger.info(f"Created default settings file for {app_name} at {settings_file}")
+                if write_bytes(settings_file, default_file.read_bytes()):
+                    settings_logger.info(f"Created default settings file for {app_name} at {settings_file}")
             except Exception as e:
                 settings_logger.error(f"Error copying default settings for {app_name}: {e}")
         else:
             # Create an empty file if no default exists
             settings_logger.warning(f"No default config found for {app_name}. Creating empty settings file.")
-            try:
-                with open(settings_file, 'w') as f:
-                    json.dump({}, f)
-            except Exception as e:
-                settings_logger.error(f"Error creating empty settings file for {app_name}: {e}")
+            if not write_json(settings_file, {}):
+                settings_logger.error(f"Error creating empty settings file for {app_name}")
 
 
 def load_settings(app_type, use_cache=True):
@@ -98,58 +108,65 @@ def load_settings(app_type, use_cache=True):
     
     Args:
         app_type: The app type to load settings for
-        use_cache: Whether to use the cached settings if available and recent
+        use_cache: Whether to use the cached settings if the file has not changed since they were read
         
     Returns:
-        Dict containing the app settings
+        Dict containing the app settings. It is a copy, callers may modify it freely.
+    """
+    return copy.deepcopy(_load_cached_settings(app_type, use_cache))
+
+
+def _load_cached_settings(app_type, use_cache=True):
     """
-    global settings_cache
+    Load settings for a specific app type, returning the cached dict itself.
     
+    Only for read-only lookups inside this module; the result must not be modified.
+    """
     # Only log unexpected app types that are not 'general'
     if app_type not in KNOWN_APP_TYPES and app_type != "general":
         settings_logger.warning(f"load_settings called with unexpected app_type: {app_type}")
     
-    # Check if we have a valid cache entry
+    settings_file = get_settings_file_path(app_type)
+    
+    # A cache entry stays valid for as long as the file is unchanged on disk
     if use_cache and app_type in settings_cache:
         cache_entry = settings_cache[app_type]
-        cache_age = time.time() - cache_entry.get('timestamp', 0)
-        
-        if cache_age < CACHE_TTL:
-            settings_logger.debug(f"Using cached settings for {app_type} (age: {cache_age:.1f}s)")
+        if cache_entry['signature'] is not None and cache_entry['signature'] == _get_file_signature(settings_file):
             return cache_entry['data']
-        else:
-            settings_logger.debug(f"Cache expired for {app_type} (age: {cache_age:.1f}s)")
+        settings_logger.debug(f"Settings file changed for {app_type}, reloading")
     
     # No valid cache entry, load from disk
     _ensure_config_exists(app_type)
-    settings_file = get_settings_file_path(app_type)
     try:
+        # Take the signature before reading so a write racing with the read is picked up next time
+        signature = _get_file_signature(settings_file)
         with open(settings_file, 'r') as f:
             # Load existing settings
             current_settings = json.load(f)
             
-            # Load defaults to check for missing keys
-            default_settings = load_default_app_settings(app_type)
-            
-            # Add missing keys from defaults without overwriting existing values
-            updated = False
-            for key, value in default_settings.items():
-                if key not in current_settings:
-                    current_settings[key] = value
-                    updated = True
-            
-            # If keys were added, save the updated file
-            if updated:
-                settings_logger.info(f"Added missing default keys to {app_type}.json")
-                save_settings(app_type, current_settings) # Use save_settings to handle writing
+        # Load defaults to check for missing keys
+        default_settings = load_default_app_settings(app_type)
+        
+        # Add missing keys from defaults without overwriting existing values
+        updated = False
+        for key, value in default_settings.items():
+            if key not in current_settings:
+                current_settings[key] = value
+                updated = True
+        
+        # If keys were added, save the updated file
+        if updated:
+            settings_logger.info(f"Added missing default keys to {app_type}.json")
+            save_settings(app_type, current_settings) # Use save_settings to handle writing
+            signature = _get_file_signature(settings_file)
+        
+        # Update cache
+        settings_cache[app_type] = {
+            'signature': signature,
+            'data': current_settings
+        }
             
-            # Update cache
-            settings_cache[app_type] = {
-                'timestamp': time.time(),
-                'data': current_settings
-            }
-                
-            return current_settings
+        return current_settings
             
     except json.JSONDecodeError:
         settings_logger.error(f"Error decoding JSON from {settings_file}. Restoring from default.")
@@ -159,7 +176,7 @@ def load_settings(app_type, use_cache=True):
         
         # Update cache with defaults
         settings_cache[app_type] = {
-            'timestamp': time.time(),
+            'signature': _get_file_signature(settings_file),
             'data': default_settings
         }
         
@@ -180,9 +197,9 @@ def save_settings(app_name: str, settings_data: Dict[str, Any]) -> bool:
         # Ensure the directory exists (though it should from the top-level check)
         settings_file.parent.mkdir(parents=True, exist_ok=True)
         
-        # Write the provided settings data directly
-        with open(settings_file, 'w') as f:
-            json.dump(settings_data, f, indent=2)
+        # Replace the file atomically so readers never see a partly written file
+        if not write_json(settings_file, settings_data, indent=2):
+            return False
         settings_logger.info(f"Settings saved successfully for {app_name} to {settings_file}")
         
         # Clear cache for this app to ensure fresh reads
@@ -195,8 +212,8 @@ def save_settings(app_name: str, settings_data: Dict[str, Any]) -> bool:
 
 def get_setting(app_name: str, key: str, default: Optional[Any] = None) -> Any:
     """Get a specific setting value for an app."""
-    settings = load_settings(app_name)
-    return settings.get(key, default)
+    settings = _load_cached_settings(app_name)
+    return copy.deepcopy(settings.get(key, default))
 
 def get_api_url(app_name: str) -> Optional[str]:
     """Get the API URL for a specific app."""
@@ -221,7 +238,7 @@ def get_configured_apps() -> List[str]:
     """Return a list of app names that have basic configuration (API URL and Key)."""
     configured = []
     for app_name in KNOWN_APP_TYPES:
-        settings = load_settings(app_name)
+        settings = _load_cached_settings(app_name)
         
         # First check if there are valid instances configured (multi-instance mode)
         if "instances" in settings and isinstance(settings["instances"], list) and settings["instances"]:
@@ -284,7 +301,39 @@ ADVANCED_SETTINGS = [
     "debug_mode",
     "stateful_management_hours",
     "hourly_cap",
-    "ssl_verify"  # Add SSL verification setting
+    "ssl_verify",  # Add SSL verification setting
+    "http_pool_connections",
+    "http_pool_maxsize",
+    "http_max_retries",
+    "http_backoff_factor",
+    "http_page_concurrency",
+    "library_snapshot_enabled",
+    "library_snapshot_max_age_minutes",
+    "search_batch_size",
+    "stateful_compact_interval_seconds",
+    "stateful_backend",
+    "api_rate_limit_enabled",
+    "api_rate_limit_burst",
+    "api_rate_limit_max_wait",
+    "health_cache_seconds",
+    "health_failure_threshold",
+    "health_backoff_seconds",
+    "health_max_backoff_seconds",
+    "async_engine_enabled",
+    "async_max_workers",
+    "async_instance_concurrency",
+    "history_fsync_interval_seconds",
+    "history_segment_max_bytes",
+    "history_compact_interval_seconds",
+    "history_retention_days",
+    "history_max_entries",
+    "history_index_max_entries",
+    "stats_flush_interval_seconds",
+    "stats_flush_threshold",
+    "durable_fsync_policy",
+    "durable_write_coalesce_seconds",
+    "durable_fsync_interval_seconds",
+    "queue_snapshot_max_age_seconds"
 ]
 
 def get_advanced_setting(setting_name, default_value=None):
@@ -306,8 +355,8 @@ def get_advanced_setting(setting_name, default_value=None):
         settings_logger.warning(f"Requested unknown advanced setting: {setting_name}")
     
     # Get from general settings
-    general_settings = load_settings('general', use_cache=True)
-    return general_settings.get(setting_name, default_value)
+    general_settings = _load_cached_settings('general', use_cache=True)
+    return copy.deepcopy(general_settings.get(setting_name, default_value))
 
 def get_ssl_verify_setting():
     """
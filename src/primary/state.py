@@ -2,17 +2,19 @@
 """
 State management module for Huntarr
 Handles all persistence of program state
+Values are stored in the runtime database; a state "file path" only names
+the value (state/<app_type>/<state_name>.json) and no file is written.
 """
 
 import os
 import datetime
 import time
-import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from src.primary import settings_manager
 
 # Use the centralized path configuration
 from src.primary.utils.config_paths import CONFIG_PATH
+from src.primary.repositories import app_state_repository
 
 # Define the config directory - using cross-platform path
 CONFIG_DIR = str(CONFIG_PATH)  # Convert to string for compatibility
@@ -23,14 +25,14 @@ logger = get_logger("huntarr")
 
 def get_state_file_path(app_type, state_name):
     """
-    Get the path to a state file for a specific app type and state name.
+    Get the path naming a state value for a specific app type and state name.
     
     Args:
         app_type: The application type (sonarr, radarr, etc.)
-        state_name: The name of the state file
+        state_name: The name of the state value
         
     Returns:
-        The path to the state file
+        The path identifying the state value
     """
     # Define known app types
     known_app_types = ["sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros", "swaparr"]
@@ -39,12 +41,13 @@ def get_state_file_path(app_type, state_name):
     if app_type not in known_app_types and app_type != "general":
         logger.warning(f"get_state_file_path called with unexpected app_type: {app_type}")
     
-    # Create the state directory if it doesn't exist
-    state_dir = os.path.join(CONFIG_DIR, "state", app_type)
-    os.makedirs(state_dir, exist_ok=True)
-    
-    # Return the path to the state file
-    return os.path.join(state_dir, f"{state_name}.json")
+    return os.path.join(CONFIG_DIR, "state", app_type, f"{state_name}.json")
+
+def _state_key(filepath: str) -> Tuple[str, str]:
+    """Get the (app_type, state_name) a path from get_state_file_path stands for."""
+    app_type = os.path.basename(os.path.dirname(filepath))
+    state_name = os.path.splitext(os.path.basename(filepath))[0]
+    return app_type, state_name
 
 def get_last_reset_time(app_type: str = None) -> datetime.datetime:
     """
@@ -61,13 +64,11 @@ def get_last_reset_time(app_type: str = None) -> datetime.datetime:
         return datetime.datetime.fromtimestamp(0)
         
     current_app_type = app_type
-    reset_file = get_state_file_path(current_app_type, "last_reset")
     
     try:
-        if os.path.exists(reset_file):
-            with open(reset_file, "r") as f:
-                reset_time_str = f.read().strip()
-                return datetime.datetime.fromisoformat(reset_time_str)
+        reset_time_str = app_state_repository.get(current_app_type, "last_reset")
+        if reset_time_str:
+            return datetime.datetime.fromisoformat(reset_time_str)
     except Exception as e:
         logger.error(f"Error reading last reset time for {current_app_type}: {e}")
     
@@ -86,13 +87,9 @@ def set_last_reset_time(reset_time: datetime.datetime, app_type: str = None) ->
         return
         
     current_app_type = app_type
-    reset_file = get_state_file_path(current_app_type, "last_reset")
     
-    try:
-        with open(reset_file, "w") as f:
-            f.write(reset_time.isoformat())
-    except Exception as e:
-        logger.error(f"Error writing last reset time for {current_app_type}: {e}")
+    if not app_state_repository.set(current_app_type, "last_reset", reset_time.isoformat()):
+        logger.error(f"Error writing last reset time for {current_app_type}")
 
 def check_state_reset(app_type: str = None) -> bool:
     """
@@ -155,23 +152,15 @@ def clear_processed_ids(app_type: str = None) -> None:
         
     current_app_type = app_type
     
-    missing_file = get_state_file_path(current_app_type, "processed_missing")
-    try:
-        if os.path.exists(missing_file):
-            with open(missing_file, "w") as f:
-                f.write("[]")
-            logger.info(f"Cleared processed missing IDs for {current_app_type}")
-    except Exception as e:
-        logger.error(f"Error clearing processed missing IDs for {current_app_type}: {e}")
+    if app_state_repository.set(current_app_type, "processed_missing", []):
+        logger.info(f"Cleared processed missing IDs for {current_app_type}")
+    else:
+        logger.error(f"Error clearing processed missing IDs for {current_app_type}")
     
-    upgrades_file = get_state_file_path(current_app_type, "processed_upgrades")
-    try:
-        if os.path.exists(upgrades_file):
-            with open(upgrades_file, "w") as f:
-                f.write("[]")
-            logger.info(f"Cleared processed upgrade IDs for {current_app_type}")
-    except Exception as e:
-        logger.error(f"Error clearing processed upgrade IDs for {current_app_type}: {e}")
+    if app_state_repository.set(current_app_type, "processed_upgrades", []):
+        logger.info(f"Cleared processed upgrade IDs for {current_app_type}")
+    else:
+        logger.error(f"Error clearing processed upgrade IDs for {current_app_type}")
 
 def calculate_reset_time(app_type: str = None) -> str:
     """
@@ -212,51 +201,37 @@ def calculate_reset_time(app_type: str = None) -> str:
 
 def load_processed_ids(filepath: str) -> List[int]:
     """
-    Load processed IDs from a file.
+    Load processed IDs.
     
     Args:
-        filepath: The path to the file
+        filepath: The path from get_state_file_path naming the IDs
         
     Returns:
         A list of processed IDs
     """
-    try:
-        if os.path.exists(filepath):
-            with open(filepath, "r") as f:
-                loaded_data = json.load(f)
-                if isinstance(loaded_data, list):
-                    return loaded_data
-                else:
-                    logger.error(f"Invalid data type loaded from {filepath}. Expected list, got {type(loaded_data)}. Returning empty list.")
-                    return []
-        return []
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON from {filepath}: {e}. Returning empty list.")
-        return [] # Ensure list is returned even on JSON error
-    except Exception as e:
-        logger.error(f"Error loading processed IDs from {filepath}: {e}")
-        return []
+    loaded_data = app_state_repository.get(*_state_key(filepath), default=[])
+    if isinstance(loaded_data, list):
+        return loaded_data
+    logger.error(f"Invalid data type loaded for {filepath}. Expected list, got {type(loaded_data)}. Returning empty list.")
+    return []
 
 def save_processed_ids(filepath: str, ids: List[int]) -> None:
     """
-    Save processed IDs to a file.
+    Save processed IDs.
     
     Args:
-        filepath: The path to the file
+        filepath: The path from get_state_file_path naming the IDs
         ids: The list of IDs to save
     """
-    try:
-        with open(filepath, "w") as f:
-            json.dump(ids, f)
-    except Exception as e:
-        logger.error(f"Error saving processed IDs to {filepath}: {e}")
+    if not app_state_repository.set(*_state_key(filepath), ids):
+        logger.error(f"Error saving processed IDs to {filepath}")
 
 def save_processed_id(filepath: str, item_id: int) -> None:
     """
-    Add a single ID to a processed IDs file.
+    Add a single ID to a processed IDs list.
     
     Args:
-        filepath: The path to the file
+        filepath: The path from get_state_file_path naming the IDs
         item_id: The ID to add
     """
     processed_ids = load_processed_ids(filepath)
@@ -293,10 +268,10 @@ def reset_state_file(app_type: str, state_type: str) -> bool:
 def truncate_processed_list(filepath: str, max_items: int = 1000) -> None:
     """
     Truncate a processed IDs list to a maximum number of items.
-    This helps prevent the file from growing too large over time.
+    This helps prevent the list from growing too large over time.
     
     Args:
-        filepath: The path to the file
+        filepath: The path from get_state_file_path naming the IDs
         max_items: The maximum number of items to keep
     """
     processed_ids = load_processed_ids(filepath)
@@ -307,19 +282,15 @@ def truncate_processed_list(filepath: str, max_items: int = 1000) -> None:
         logger.debug(f"Truncated {filepath} to {max_items} items")
 
 def init_state_files() -> None:
-    """Initialize state files for all app types"""
+    """Initialize the state values for all app types"""
     app_types = settings_manager.KNOWN_APP_TYPES 
     
     for app_type in app_types:
-        missing_file = get_state_file_path(app_type, "processed_missing")
-        upgrades_file = get_state_file_path(app_type, "processed_upgrades")
-        reset_file = get_state_file_path(app_type, "last_reset")
-        
-        for filepath in [missing_file, upgrades_file]:
-            if not os.path.exists(filepath):
-                save_processed_ids(filepath, [])
+        for state_name in ["processed_missing", "processed_upgrades"]:
+            if app_state_repository.get(app_type, state_name) is None:
+                app_state_repository.set(app_type, state_name, [])
         
-        if not os.path.exists(reset_file):
+        if app_state_repository.get(app_type, "last_reset") is None:
              set_last_reset_time(datetime.datetime.fromtimestamp(0), app_type)
 
 init_state_files()
\ No newline at end of file
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Stateful storage backends for Huntarr
+Stores the processed media IDs used by stateful_manager. Two backends exist:
+- "json": one JSON snapshot per instance plus an append-only journal, indexed in memory
+- "sqlite": rows in the runtime database (see datastore.py) with per-item expiry
+"""
+
+import json
+import time
+import pathlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Set, Tuple, Optional
+
+from src.primary.utils.config_paths import STATEFUL_DIR
+from src.primary.utils.durable_store import write_json
+from src.primary.settings_manager import get_advanced_setting
+from src.primary.utils.id_set import CompactIdSet
+from src.primary.datastore import Datastore, get_datastore
+
+stateful_logger = logging.getLogger("stateful_manager")
+
+APP_TYPES = ["sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros"]
+
+JOURNAL_SUFFIX = ".journal"
+SIDECAR_SUFFIX = ".ids"  # Binary copy of a snapshot that is memory-mapped instead of parsed
+DEFAULT_COMPACT_INTERVAL = 300  # Fold journals into the snapshot files every 5 minutes
+MAX_JOURNAL_ENTRIES = 1000  # Compact early once a journal holds this many IDs
+
+PRUNE_INTERVAL = 3600  # Delete expired rows at most once an hour
+LOOKUP_CHUNK_SIZE = 500  # IDs per membership query
+
+
+def safe_instance_name(instance_name: str) -> str:
+    """Create a safe filename from an instance name."""
+    return "".join([c if c.isalnum() else "_" for c in instance_name])
+
+
+class StatefulBackend:
+    """
+    Interface of a processed-ID store.
+
+    Media IDs are always passed as strings. 'max_age' is the number of seconds
+    an ID stays processed; backends without per-item expiry ignore it.
+    """
+
+    name = "base"
+    supports_item_expiry = False
+
+    def get_ids(self, app_type: str, instance_name: str, max_age: Optional[float] = None) -> Set[str]:
+        raise NotImplementedError
+
+    def contains(self, app_type: str, instance_name: str, media_id: str, max_age: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def filter_unprocessed(self, app_type: str, instance_name: str, media_ids: List[str],
+                           max_age: Optional[float] = None) -> Set[str]:
+        """Return the IDs from media_ids that have not been processed."""
+        return set(media_ids) - self.get_ids(app_type, instance_name, max_age)
+
+    def add_many(self, app_type: str, instance_name: str, media_ids: List[str], operation_type: str = "missing") -> bool:
+        raise NotImplementedError
+
+    def expire(self, max_age: float) -> int:
+        """Delete IDs older than max_age seconds. Returns the number of IDs removed."""
+        return 0
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> bool:
+        """Persist anything still buffered in memory."""
+        return True
+
+
+class JsonStatefulBackend(StatefulBackend):
+    """
+    Processed IDs in <instance>.json files, indexed in memory.
+
+    The index of an instance is loaded once and reloaded only if the snapshot
+    mtime or journal size show the files were changed outside this process.
+    Integer IDs are held in a CompactIdSet, memory-mapped from the
+    <instance>.ids sidecar when it matches the snapshot. New IDs are appended
+    to <instance>.journal and folded into the snapshot by a compactor thread.
+    """
+
+    name = "json"
+
+    def __init__(self):
+        self._index: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._compactor_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def get_state_paths(app_type: str, instance_name: str) -> Tuple[pathlib.Path, pathlib.Path]:
+        """Get the snapshot file and the journal file of an app instance."""
+        safe_name = safe_instance_name(instance_name)
+        app_dir = STATEFUL_DIR / app_type
+        return app_dir / f"{safe_name}.json", app_dir / f"{safe_name}{JOURNAL_SUFFIX}"
+
+    @staticmethod
+    def _get_file_signature(file_path: pathlib.Path, journal_path: pathlib.Path) -> Tuple[int, int]:
+        """Return (snapshot mtime, journal size), used to notice changes made outside this process."""
+        try:
+            snapshot_mtime = file_path.stat().st_mtime_ns
+        except OSError:
+            snapshot_mtime = 0
+        try:
+            journal_size = journal_path.stat().st_size
+        except OSError:
+            journal_size = 0
+        return snapshot_mtime, journal_size
+
+    @staticmethod
+    def read_instance_files(file_path: pathlib.Path, journal_path: pathlib.Path) -> Tuple[Set[str], int, Optional[int]]:
+        """
+        Read a snapshot file and replay its journal.
+
+        Returns:
+            A tuple of (processed IDs, number of journal entries, snapshot 'last_updated' timestamp)
+        """
+        processed_ids: Set[str] = set()
+        last_updated = None
+
+        if file_path.exists():
+            try:
+                with open(file_path, 'r') as f:
+                    data = json.load(f)
+                processed_ids.update(str(media_id) for media_id in data.get("processed_ids", []))
+                last_updated = data.get("last_updated")
+            except Exception as e:
+                stateful_logger.error(f"Error reading processed IDs from {file_path}: {e}")
+
+        journal_ids = JsonStatefulBackend.read_journal(journal_path)
+        processed_ids.update(journal_ids)
+        return processed_ids, len(journal_ids), last_updated
+
+    @staticmethod
+    def read_journal(journal_path: pathlib.Path) -> List[str]:
+        """Read the IDs appended to a journal file."""
+        journal_ids = []
+        if journal_path.exists():
+            try:
+                with open(journal_path, 'r') as f:
+                    for line in f:
+                        media_id = line.strip()
+                        if media_id:
+                            journal_ids.append(media_id)
+            except Exception as e:
+                stateful_logger.error(f"Error replaying processed ID journal {journal_path}: {e}")
+        return journal_ids
+
+    def _load_entry(self, app_type: str, instance_name: str) -> Dict[str, Any]:
+        file_path, journal_path = self.get_state_paths(app_type, instance_name)
+        sidecar_path = file_path.with_suffix(SIDECAR_SUFFIX)
+        signature = self._get_file_signature(file_path, journal_path)
+
+        # Memory-map the sidecar if it was written for the current snapshot, otherwise parse the JSON once
+        processed_ids = CompactIdSet.load(sidecar_path, signature[0]) if signature[0] else None
+        if processed_ids is not None:
+            journal_ids = self.read_journal(journal_path)
+            processed_ids.update(journal_ids)
+            journal_entries = len(journal_ids)
+        else:
+            snapshot_ids, journal_entries, _ = self.read_instance_files(file_path, journal_path)
+            processed_ids = CompactIdSet(snapshot_ids)
+            if signature[0] and not journal_entries:
+                processed_ids.save(sidecar_path, signature[0])
+        stateful_logger.debug(f"Loaded {len(processed_ids)} processed IDs for {app_type}/{instance_name} ({journal_entries} from journal)")
+        return {
+            "ids": processed_ids,
+            "file_path": file_path,
+            "journal_path": journal_path,
+            "signature": signature,
+            "journal_entries": journal_entries
+        }
+
+    def _get_entry(self, app_type: str, instance_name: str) -> Dict[str, Any]:
+        """Get the index entry of an app instance. Caller must hold the lock."""
+        key = (app_type, instance_name)
+        entry = self._index.get(key)
+        if entry is not None:
+            if self._get_file_signature(entry["file_path"], entry["journal_path"]) == entry["signature"]:
+                return entry
+            entry["ids"].close()
+
+        entry = self._load_entry(app_type, instance_name)
+        self._index[key] = entry
+        return entry
+
+    def _compact_entry(self, entry: Dict[str, Any]) -> bool:
+        """Fold the journal of an index entry into its snapshot file. Caller must hold the lock."""
+        if not entry["journal_entries"]:
+            return True
+
+        file_path = entry["file_path"]
+        journal_path = entry["journal_path"]
+        try:
+            if not write_json(file_path, {
+                "processed_ids": sorted(entry["ids"]),
+                "last_updated": int(time.time())
+            }, indent=2):
+                return False
+            if journal_path.exists():
+                journal_path.unlink()
+        except Exception as e:
+            stateful_logger.error(f"Error compacting processed IDs into {file_path}: {e}")
+            return False
+
+        entry["ids"].save(file_path.with_suffix(SIDECAR_SUFFIX), file_path.stat().st_mtime_ns)
+
+        entry["journal_entries"] = 0
+        entry["signature"] = self._get_file_signature(file_path, journal_path)
+        stateful_logger.debug(f"Compacted {len(entry['ids'])} processed IDs into {file_path}")
+        return True
+
+    def _compactor_loop(self) -> None:
+        """Compact the journals on a timer."""
+        while True:
+            interval = max(10, int(get_advanced_setting("stateful_compact_interval_seconds", DEFAULT_COMPACT_INTERVAL)))
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                stateful_logger.error(f"Error in processed ID compactor: {e}")
+
+    def _ensure_compactor(self) -> None:
+        if self._compactor_thread is not None and self._compactor_thread.is_alive():
+            return
+        self._compactor_thread = threading.Thread(target=self._compactor_loop, name="StatefulCompactor", daemon=True)
+        self._compactor_thread.start()
+
+    def get_ids(self, app_type: str, instance_name: str, max_age: Optional[float] = None) -> Set[str]:
+        with self._lock:
+            return set(self._get_entry(app_type, instance_name)["ids"])
+
+    def contains(self, app_type: str, instance_name: str, media_id: str, max_age: Optional[float] = None) -> bool:
+        with self._lock:
+            return media_id in self._get_entry(app_type, instance_name)["ids"]
+
+    def filter_unprocessed(self, app_type: str, instance_name: str, media_ids: List[str],
+                           max_age: Optional[float] = None) -> Set[str]:
+        with self._lock:
+            return self._get_entry(app_type, instance_name)["ids"].difference(media_ids)
+
+    def add_many(self, app_type: str, instance_name: str, media_ids: List[str], operation_type: str = "missing") -> bool:
+        with self._lock:
+            entry = self._get_entry(app_type, instance_name)
+            processed_ids = entry["ids"]
+
+            new_ids = []
+            for media_id in media_ids:
+                if media_id not in processed_ids:
+                    processed_ids.add(media_id)
+                    new_ids.append(media_id)
+
+            if not new_ids:
+                # No need to write if every ID is already present
+                return True
+
+            journal_path = entry["journal_path"]
+            try:
+                journal_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(journal_path, 'a') as f:
+                    f.write("".join(f"{media_id}\n" for media_id in new_ids))
+            except Exception as e:
+                stateful_logger.error(f"Error adding {len(new_ids)} media IDs to {journal_path}: {e}")
+                return False
+
+            entry["journal_entries"] += len(new_ids)
+            entry["signature"] = self._get_file_signature(entry["file_path"], journal_path)
+
+            # Don't let a busy instance grow its journal without bound between timer runs
+            if entry["journal_entries"] >= MAX_JOURNAL_ENTRIES:
+                self._compact_entry(entry)
+
+        self._ensure_compactor()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            # Release the memory maps before deleting the sidecars they point at
+            for entry in self._index.values():
+                entry["ids"].close()
+            self._index.clear()
+            for app_type in APP_TYPES:
+                app_dir = STATEFUL_DIR / app_type
+                if app_dir.exists():
+                    state_files = list(app_dir.glob("*.json")) + list(app_dir.glob(f"*{JOURNAL_SUFFIX}")) + list(app_dir.glob(f"*{SIDECAR_SUFFIX}"))
+                    for state_file in state_files:
+                        try:
+                            state_file.unlink()
+                            stateful_logger.debug(f"Deleted {state_file}")
+                        except Exception as e:
+                            stateful_logger.error(f"Error deleting {state_file}: {e}")
+
+    def flush(self) -> bool:
+        success = True
+        with self._lock:
+            for entry in list(self._index.values()):
+                if not self._compact_entry(entry):
+                    success = False
+        return success
+
+
+class SqliteStatefulBackend(StatefulBackend):
+    """
+    Processed IDs in the runtime database, one row per ID.
+
+    Each row records when it was processed, so IDs expire individually once
+    they are older than 'stateful_management_hours' instead of the whole store
+    being wiped at once. Existing JSON files are imported on first use.
+    """
+
+    name = "sqlite"
+    supports_item_expiry = True
+
+    def __init__(self, datastore: Optional[Datastore] = None):
+        self.datastore = datastore or get_datastore()
+        self.db_path = self.datastore.db_path
+        self._last_prune = 0.0
+        self._import_json_files()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the database."""
+        return self.datastore.connection()
+
+    def _import_json_files(self) -> None:
+        """Import the JSON snapshot and journal files once, the first time the database is used."""
+        connection = self._connect()
+        if connection.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone():
+            return
+
+        imported = 0
+        now = int(time.time())
+        with self.datastore.transaction() as connection:
+            for app_type in APP_TYPES:
+                app_dir = STATEFUL_DIR / app_type
+                if not app_dir.exists():
+                    continue
+                instance_names = {path.stem for path in app_dir.glob("*.json")}
+                instance_names.update(path.stem for path in app_dir.glob(f"*{JOURNAL_SUFFIX}"))
+                for instance_key in sorted(instance_names):
+                    processed_ids, _, last_updated = JsonStatefulBackend.read_instance_files(
+                        app_dir / f"{instance_key}.json", app_dir / f"{instance_key}{JOURNAL_SUFFIX}")
+                    processed_at = int(last_updated or now)
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO processed_ids (app_type, instance_name, media_id, processed_at) VALUES (?, ?, ?, ?)",
+                        [(app_type, instance_key, media_id, processed_at) for media_id in processed_ids])
+                    imported += len(processed_ids)
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (str(now),))
+
+        if imported:
+            stateful_logger.info(f"Imported {imported} processed IDs from JSON files into {self.db_path}")
+
+    @staticmethod
+    def _cutoff(max_age: Optional[float]) -> int:
+        return int(time.time() - max_age) if max_age is not None else 0
+
+    def get_ids(self, app_type: str, instance_name: str, max_age: Optional[float] = None) -> Set[str]:
+        rows = self._connect().execute(
+            "SELECT media_id FROM processed_ids WHERE app_type = ? AND instance_name = ? AND processed_at >= ?",
+            (app_type, safe_instance_name(instance_name), self._cutoff(max_age))).fetchall()
+        return {row[0] for row in rows}
+
+    def contains(self, app_type: str, instance_name: str, media_id: str, max_age: Optional[float] = None) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM processed_ids WHERE app_type = ? AND instance_name = ? AND media_id = ? AND processed_at >= ?",
+            (app_type, safe_instance_name(instance_name), media_id, self._cutoff(max_age))).fetchone()
+        return row is not None
+
+    def filter_unprocessed(self, app_type: str, instance_name: str, media_ids: List[str],
+                           max_age: Optional[float] = None) -> Set[str]:
+        unprocessed = set(media_ids)
+        candidates = list(unprocessed)
+        connection = self._connect()
+        params = (app_type, safe_instance_name(instance_name), self._cutoff(max_age))
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(candidates), LOOKUP_CHUNK_SIZE):
+            chunk = candidates[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT media_id FROM processed_ids WHERE app_type = ? AND instance_name = ? AND processed_at >= ? AND media_id IN ({placeholders})",
+                params + tuple(chunk)).fetchall()
+            unprocessed.difference_update(row[0] for row in rows)
+        return unprocessed
+
+    def add_many(self, app_type: str, instance_name: str, media_ids: List[str], operation_type: str = "missing") -> bool:
+        if not media_ids:
+            return True
+        now = int(time.time())
+        instance_key = safe_instance_name(instance_name)
+        try:
+            with self.datastore.transaction() as connection:
+                # Re-processing an ID restarts its expiry window
+                connection.executemany(
+                    "INSERT OR REPLACE INTO processed_ids (app_type, instance_name, media_id, processed_at, operation_type) VALUES (?, ?, ?, ?, ?)",
+                    [(app_type, instance_key, media_id, now, operation_type) for media_id in media_ids])
+        except sqlite3.Error as e:
+            stateful_logger.error(f"Error adding {len(media_ids)} media IDs for {app_type}/{instance_name} to {self.db_path}: {e}")
+            return False
+
+        if now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            hours = get_advanced_setting("stateful_management_hours", 168)
+            self.expire(float(hours) * 3600)
+        return True
+
+    def expire(self, max_age: float) -> int:
+        try:
+            with self.datastore.transaction() as connection:
+                cursor = connection.execute("DELETE FROM processed_ids WHERE processed_at < ?", (self._cutoff(max_age),))
+        except sqlite3.Error as e:
+            stateful_logger.error(f"Error expiring processed IDs in {self.db_path}: {e}")
+            return 0
+        if cursor.rowcount:
+            stateful_logger.info(f"Expired {cursor.rowcount} processed IDs older than {max_age / 3600:.0f} hours")
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self.datastore.transaction() as connection:
+            connection.execute("DELETE FROM processed_ids")
+
+
+_backend: Optional[StatefulBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StatefulBackend:
+    """
+    Get the configured stateful backend ('stateful_backend' advanced setting).
+
+    Falls back to the JSON backend if the SQLite database cannot be opened.
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            backend_name = str(get_advanced_setting("stateful_backend", "sqlite")).lower()
+            if backend_name == "sqlite":
+                try:
+                    _backend = SqliteStatefulBackend()
+                except Exception as e:
+                    stateful_logger.error(f"Could not open the runtime database, falling back to JSON files: {e}")
+            if _backend is None:
+                _backend = JsonStatefulBackend()
+            stateful_logger.info(f"Using '{_backend.name}' stateful backend")
+        return _backend
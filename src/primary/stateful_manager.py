@@ -5,12 +5,11 @@ Handles storing and retrieving processed media IDs to prevent reprocessing
 """
 
 import os
-import json
 import time
 import pathlib
 import datetime
 import logging
-from typing import Dict, Any, List, Optional, Set
+from typing import Dict, Any, List, Optional, Set, Iterable
 
 # Create logger for stateful_manager
 stateful_logger = logging.getLogger("stateful_manager")
@@ -18,7 +17,7 @@ stateful_logger = logging.getLogger("stateful_manager")
 # Constants
 # Use the centralized path configuration
 from src.primary.utils.config_paths import STATEFUL_DIR
-LOCK_FILE = STATEFUL_DIR / "lock.json"
+from src.primary.repositories import stateful_lock_repository
 DEFAULT_HOURS = 168  # Default 7 days (168 hours)
 
 # Ensure the stateful directory exists
@@ -35,67 +34,38 @@ for app_type in APP_TYPES:
 
 # Add import for get_advanced_setting
 from src.primary.settings_manager import get_advanced_setting
+from src.primary.stateful_backends import get_backend
 
 def initialize_lock_file() -> None:
-    """Initialize the lock file with the current timestamp if it doesn't exist."""
-    # Ensure directory exists - we don't need to log this again
-    try:
-        STATEFUL_DIR.mkdir(parents=True, exist_ok=True)
-    except Exception as e:
-        stateful_logger.error(f"Error creating stateful directory: {e}")
+    """Initialize the lock with the current timestamp if it doesn't exist."""
+    if stateful_lock_repository.get() is None:
+        current_time = int(time.time())
+        # Get the expiration hours setting
+        expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
         
-    if not LOCK_FILE.exists():
-        try:
-            current_time = int(time.time())
-            # Get the expiration hours setting
-            expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
-            
-            expires_at = current_time + (expiration_hours * 3600)
-            
-            with open(LOCK_FILE, 'w') as f:
-                json.dump({
-                    "created_at": current_time,
-                    "expires_at": expires_at
-                }, f, indent=2)
-            stateful_logger.info(f"Initialized lock file at {LOCK_FILE} with expiration in {expiration_hours} hours")
-        except Exception as e:
-            stateful_logger.error(f"Error initializing lock file: {e}")
+        expires_at = current_time + (expiration_hours * 3600)
+        
+        if stateful_lock_repository.set(current_time, expires_at):
+            stateful_logger.info(f"Initialized stateful lock with expiration in {expiration_hours} hours")
+        else:
+            stateful_logger.error("Error initializing stateful lock")
             
 def get_lock_info() -> Dict[str, Any]:
     """Get the current lock information."""
     initialize_lock_file()
-    try:
-        with open(LOCK_FILE, 'r') as f:
-            lock_info = json.load(f)
-        
-        # Validate the structure and ensure required fields exist
-        if not isinstance(lock_info, dict):
-            raise ValueError("Lock info is not a dictionary")
-            
-        if "created_at" not in lock_info:
-            lock_info["created_at"] = int(time.time())
-            
-        if "expires_at" not in lock_info or lock_info["expires_at"] is None:
-            # Recalculate expiration if missing
-            expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
-            lock_info["expires_at"] = lock_info["created_at"] + (expiration_hours * 3600)
-            
-            # Save the updated info
-            with open(LOCK_FILE, 'w') as f:
-                json.dump(lock_info, f, indent=2)
-            
+    lock_info = stateful_lock_repository.get()
+    if lock_info is not None:
         return lock_info
-    except Exception as e:
-        stateful_logger.error(f"Error reading lock file: {e}")
-        # Return default values if there's an error
-        current_time = int(time.time())
-        expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
-        expires_at = current_time + (expiration_hours * 3600)
-        
-        return {
-            "created_at": current_time,
-            "expires_at": expires_at
-        }
+    
+    # Return default values if the lock could not be read
+    current_time = int(time.time())
+    expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
+    expires_at = current_time + (expiration_hours * 3600)
+    
+    return {
+        "created_at": current_time,
+        "expires_at": expires_at
+    }
 
 def update_lock_expiration(hours: int = None) -> bool:
     """Update the lock expiration based on the hours setting."""
@@ -110,52 +80,38 @@ def update_lock_expiration(hours: int = None) -> bool:
     
     lock_info["expires_at"] = expires_at
     
-    try:
-        with open(LOCK_FILE, 'w') as f:
-            json.dump(lock_info, f, indent=2)
-        stateful_logger.info(f"Updated lock expiration to {datetime.datetime.fromtimestamp(expires_at)}")
-        return True
-    except Exception as e:
-        stateful_logger.error(f"Error updating lock expiration: {e}")
+    if not stateful_lock_repository.set(created_at, expires_at):
+        stateful_logger.error("Error updating lock expiration")
         return False
+    stateful_logger.info(f"Updated lock expiration to {datetime.datetime.fromtimestamp(expires_at)}")
+    return True
 
 def reset_stateful_management() -> bool:
     """
     Reset the stateful management system.
 
     This involves:
-    1. Creating a new lock file with the current timestamp and a calculated expiration time
+    1. Creating a new lock with the current timestamp and a calculated expiration time
        based on the 'stateful_management_hours' setting.
-    2. Deleting all stored processed ID files (*.json) within each app-specific
-       subdirectory under the STATEFUL_DIR.
+    2. Deleting all stored processed IDs from the stateful backend.
 
     Returns:
         bool: True if the reset was successful, False otherwise.
     """
     try:
-        # Get the expiration hours setting BEFORE writing the lock file
+        # Get the expiration hours setting BEFORE writing the lock
         expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
         
-        # Create new lock file with calculated expiration
+        # Create new lock with calculated expiration
         current_time = int(time.time())
         expires_at = current_time + (expiration_hours * 3600)
         
-        with open(LOCK_FILE, 'w') as f:
-            json.dump({
-                "created_at": current_time,
-                "expires_at": expires_at # Write the calculated expiration time directly
-            }, f, indent=2)
+        if not stateful_lock_repository.set(current_time, expires_at):
+            stateful_logger.error("Error resetting stateful management: could not write the lock")
+            return False
         
         # Delete all stored IDs
-        for app_type in APP_TYPES:
-            app_dir = STATEFUL_DIR / app_type
-            if app_dir.exists():
-                for json_file in app_dir.glob("*.json"):
-                    try:
-                        json_file.unlink()
-                        stateful_logger.debug(f"Deleted {json_file}")
-                    except Exception as e:
-                        stateful_logger.error(f"Error deleting {json_file}: {e}")
+        get_backend().clear()
         
         # No need to call update_lock_expiration() again as we wrote it directly
         stateful_logger.info(f"Successfully reset stateful management. New expiration: {datetime.datetime.fromtimestamp(expires_at)}")
@@ -168,6 +124,9 @@ def check_expiration() -> bool:
     """
     Check if the stateful management has expired.
     
+    Backends with per-item expiry only delete the IDs that are older than
+    'stateful_management_hours'; the JSON backend resets everything at once.
+    
     Returns:
         bool: True if expired, False otherwise
     """
@@ -182,6 +141,16 @@ def check_expiration() -> bool:
     
     current_time = int(time.time())
     
+    backend = get_backend()
+    if backend.supports_item_expiry:
+        # IDs expire one by one - drop the old ones and roll the window forward instead of wiping everything
+        backend.expire(_get_max_age())
+        if current_time >= expires_at:
+            expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
+            if not stateful_lock_repository.set(current_time, current_time + (expiration_hours * 3600)):
+                stateful_logger.error("Error renewing stateful lock")
+        return False
+    
     if current_time >= expires_at:
         stateful_logger.info("Stateful management has expired, resetting...")
         reset_stateful_management()
@@ -189,6 +158,21 @@ def check_expiration() -> bool:
     
     return False
 
+def _get_max_age() -> float:
+    """Seconds a processed ID stays processed, from 'stateful_management_hours'."""
+    return float(get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)) * 3600
+
+def compact_processed_ids() -> bool:
+    """
+    Persist processed IDs still buffered by the backend (e.g. pending JSON journals).
+    
+    Should be called at shutdown.
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return get_backend().flush()
+
 def get_processed_ids(app_type: str, instance_name: str) -> Set[str]:
     """
     Get the set of processed media IDs for a specific app instance.
@@ -204,27 +188,9 @@ def get_processed_ids(app_type: str, instance_name: str) -> Set[str]:
         stateful_logger.warning(f"Unknown app type: {app_type}")
         return set()
     
-    # Create safe filename from instance name
-    safe_instance_name = "".join([c if c.isalnum() else "_" for c in instance_name])
-    
-    file_path = STATEFUL_DIR / app_type / f"{safe_instance_name}.json"
-    stateful_logger.debug(f"[get_processed_ids] Checking file: {file_path} for {app_type}/{instance_name}") # DEBUG LOG
-    
-    if not file_path.exists():
-        stateful_logger.debug(f"[get_processed_ids] File not found: {file_path}") # DEBUG LOG
-        return set()
-    
-    try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            processed_ids_set = set(data.get("processed_ids", [])) # Convert list to set
-            stateful_logger.debug(f"[get_processed_ids] Read {len(processed_ids_set)} IDs from {file_path}: {processed_ids_set}") # DEBUG LOG
-            return processed_ids_set
-    except Exception as e:
-        stateful_logger.error(f"Error reading processed IDs for {instance_name} from {file_path}: {e}") # Updated log
-        return set()
+    return get_backend().get_ids(app_type, instance_name, _get_max_age())
 
-def add_processed_id(app_type: str, instance_name: str, media_id: str) -> bool:
+def add_processed_id(app_type: str, instance_name: str, media_id: str, operation_type: str = "missing") -> bool:
     """
     Add a media ID to the processed list for a specific app instance.
     
@@ -232,6 +198,22 @@ def add_processed_id(app_type: str, instance_name: str, media_id: str) -> bool:
         app_type: The type of app (sonarr, radarr, etc.)
         instance_name: The name of the instance
         media_id: The ID of the processed media
+        operation_type: The hunt that processed it ("missing" or "upgrade")
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return mark_processed_many(app_type, instance_name, [media_id], operation_type)
+
+def mark_processed_many(app_type: str, instance_name: str, media_ids: Iterable[Any], operation_type: str = "missing") -> bool:
+    """
+    Add several media IDs to the processed list for an app instance with a single write.
+    
+    Args:
+        app_type: The type of app (sonarr, radarr, etc.)
+        instance_name: The name of the instance
+        media_ids: The IDs of the processed media
+        operation_type: The hunt that processed them ("missing" or "upgrade")
         
     Returns:
         bool: True if successful, False otherwise
@@ -240,39 +222,37 @@ def add_processed_id(app_type: str, instance_name: str, media_id: str) -> bool:
         stateful_logger.warning(f"Unknown app type: {app_type}")
         return False
     
-    # Create safe filename from instance name
-    safe_instance_name = "".join([c if c.isalnum() else "_" for c in instance_name])
+    # Converting IDs to strings since some callers pass integers
+    media_ids = [str(media_id) for media_id in media_ids]
+    stateful_logger.debug(f"[mark_processed_many] Adding {len(media_ids)} IDs for {app_type}/{instance_name}")
+    return get_backend().add_many(app_type, instance_name, media_ids, operation_type)
+
+def filter_unprocessed(app_type: str, instance_name: str, media_ids: Iterable[Any]) -> List[Any]:
+    """
+    Filter a list of candidate media IDs down to the ones not processed yet.
     
-    file_path = STATEFUL_DIR / app_type / f"{safe_instance_name}.json"
+    Resolves the whole list with a single lookup instead of one is_processed
+    call per candidate.
     
-    # Get existing processed IDs using the get function (which includes logging)
-    current_processed_ids_set = get_processed_ids(app_type, instance_name)
+    Args:
+        app_type: The type of app (sonarr, radarr, etc.)
+        instance_name: The name of the instance
+        media_ids: The candidate media IDs
+        
+    Returns:
+        List[Any]: The unprocessed IDs, in their original order and type
+    """
+    media_ids = list(media_ids)
+    if app_type not in APP_TYPES:
+        stateful_logger.warning(f"Unknown app type: {app_type}")
+        return media_ids
     
-    # Convert set back to list for appending and saving
-    processed_ids_list = list(current_processed_ids_set)
+    unprocessed = get_backend().filter_unprocessed(app_type, instance_name, [str(media_id) for media_id in media_ids], _get_max_age())
+    result = [media_id for media_id in media_ids if str(media_id) in unprocessed]
     
-    # Add the new ID if it's not already there
-    if media_id not in current_processed_ids_set:
-        processed_ids_list.append(media_id)
-        stateful_logger.debug(f"[add_processed_id] Adding ID {media_id} to list for {app_type}/{instance_name}") # DEBUG LOG
-    else:
-        stateful_logger.debug(f"[add_processed_id] ID {media_id} already in list for {app_type}/{instance_name}") # DEBUG LOG
-        # No need to write if the ID is already present
-        return True
-        
-    # Write the updated list back to the file
-    stateful_logger.debug(f"[add_processed_id] Writing {len(processed_ids_list)} IDs to {file_path}: {processed_ids_list}") # DEBUG LOG
-    try:
-        with open(file_path, 'w') as f:
-            json.dump({
-                "processed_ids": processed_ids_list,
-                "last_updated": int(time.time())
-            }, f, indent=2)
-        # Removed redundant log here, previous debug log is sufficient
-        return True
-    except Exception as e:
-        stateful_logger.error(f"Error adding media ID {media_id} to {file_path}: {e}")
-        return False
+    stateful_logger.debug(f"filter_unprocessed: {app_type}/{instance_name}, {len(result)} of {len(media_ids)} IDs unprocessed")
+    
+    return result
 
 def is_processed(app_type: str, instance_name: str, media_id: str) -> bool:
     """
@@ -286,19 +266,15 @@ def is_processed(app_type: str, instance_name: str, media_id: str) -> bool:
     Returns:
         bool: True if already processed, False otherwise
     """
-    # Create safe filename for logging
-    safe_instance = "".join([c if c.isalnum() else "_" for c in instance_name])
-    file_path = STATEFUL_DIR / app_type / f"{safe_instance}.json"
-    
-    # Get processed IDs for this app/instance
-    processed_ids = get_processed_ids(app_type, instance_name)
+    if app_type not in APP_TYPES:
+        stateful_logger.warning(f"Unknown app type: {app_type}")
+        return False
     
-    # Log what we're checking and the result
     # Converting media_id to string since some callers might pass an integer
     media_id_str = str(media_id)
-    is_in_set = media_id_str in processed_ids
+    is_in_set = get_backend().contains(app_type, instance_name, media_id_str, _get_max_age())
     
-    stateful_logger.info(f"is_processed check: {app_type}/{instance_name}, ID:{media_id_str}, Found:{is_in_set}, File:{file_path}, Total IDs:{len(processed_ids)}")
+    stateful_logger.debug(f"is_processed check: {app_type}/{instance_name}, ID:{media_id_str}, Found:{is_in_set}")
     
     return is_in_set
 
@@ -330,15 +306,15 @@ def initialize_stateful_system():
     except Exception as e:
         stateful_logger.error(f"Failed to create stateful directories: {e}")
     
-    # Initialize the lock file with proper expiration
+    # Initialize the lock with proper expiration
     try:
         initialize_lock_file()
         # Update expiration time
         expiration_hours = get_advanced_setting("stateful_management_hours", DEFAULT_HOURS)
         update_lock_expiration(expiration_hours)
-        stateful_logger.info(f"Stateful lock file initialized with {expiration_hours} hour expiration")
+        stateful_logger.info(f"Stateful lock initialized with {expiration_hours} hour expiration")
     except Exception as e:
-        stateful_logger.error(f"Failed to initialize lock file: {e}")
+        stateful_logger.error(f"Failed to initialize stateful lock: {e}")
     
     # Check for existing processed IDs
     try:
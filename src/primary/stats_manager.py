@@ -6,13 +6,13 @@ and monitoring hourly API usage for rate limiting
 """
 
 import os
-import json
 import time
-import datetime
 import threading
 from typing import Dict, Any, Optional
 from src.primary.utils.logger import get_logger
 from src.primary.settings_manager import get_advanced_setting
+from src.primary.stats_timeseries import timeseries_store
+from src.primary.repositories import stats_repository, hourly_cap_repository
 # Import centralized path configuration
 from src.primary.utils.config_paths import CONFIG_PATH
 
@@ -29,6 +29,21 @@ STATS_DIRS = [
 stats_lock = threading.Lock()
 hourly_lock = threading.Lock()
 
+# Defaults for the advanced settings
+DEFAULT_FLUSH_INTERVAL = 30
+DEFAULT_FLUSH_THRESHOLD = 100
+
+# Counters are kept in memory (loaded from the runtime database on first use)
+# and written behind by the flusher thread, so incrementing them costs no I/O
+_stats = None
+_cap_windows = None
+_stats_dirty = False
+_caps_dirty = False
+_pending_changes = 0
+_flush_event = threading.Event()
+_flusher_thread = None
+_flusher_lock = threading.Lock()
+
 def find_writable_stats_dir():
     """Find a writable directory for stats from the list of candidates"""
     for dir_path in STATS_DIRS:
@@ -54,70 +69,88 @@ def find_writable_stats_dir():
         logger.error(f"Failed to create fallback stats directory: {e}")
         return None
 
-# Find the best stats directory
+# Find the best stats directory (the counters and hourly caps are in the runtime database,
+# only the time series file lives here)
 STATS_DIR = find_writable_stats_dir()
-STATS_FILE = os.path.join(STATS_DIR, "media_stats.json") if STATS_DIR else None
-HOURLY_CAP_FILE = os.path.join(STATS_DIR, "hourly_cap.json") if STATS_DIR else None
+TIMESERIES_FILE = os.path.join(STATS_DIR, "timeseries.bin") if STATS_DIR else None
 
-# Log the stats file location once at module load time
-if STATS_FILE:
-    logger.info(f"===> Stats will be stored at: {STATS_FILE}")
-    logger.info(f"===> Hourly API cap tracking will be stored at: {HOURLY_CAP_FILE}")
+# Log the time series file location once at module load time
+if TIMESERIES_FILE:
+    logger.info(f"===> Stats time series will be stored at: {TIMESERIES_FILE}")
 else:
-    logger.error("===> CRITICAL: No stats file location could be determined!")
-
-# Store the last hour we checked for resetting hourly caps
-last_hour_checked = None
+    logger.error("===> CRITICAL: No stats time series location could be determined!")
 
-# Schedule the next hourly reset check
-next_reset_check = None
+# Length of the sliding window the hourly caps are counted over, in minutes
+CAP_WINDOW_MINUTES = 60
 
-def ensure_stats_dir():
-    """Ensure the statistics directory exists"""
-    if not STATS_DIR:
-        logger.error("No writable stats directory found")
-        return False
+class MinuteWindow:
+    """
+    API hits of one app over the last CAP_WINDOW_MINUTES minutes.
     
-    try:
-        os.makedirs(STATS_DIR, exist_ok=True)
-        logger.debug(f"Stats directory ensured: {STATS_DIR}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to create stats directory: {e}")
-        return False
+    Hits are counted in per-minute slots with a running total, so the number
+    of hits in the window is available without summing the slots. Slots that
+    fall out of the window are subtracted as time moves on.
+    """
+    
+    def __init__(self):
+        self.minutes = [-1] * CAP_WINDOW_MINUTES
+        self.counts = [0] * CAP_WINDOW_MINUTES
+        self.total = 0
+        self.current_minute = None
+    
+    def _advance(self, minute: int) -> None:
+        """Expire the slots that are no longer inside the window ending at minute."""
+        if self.current_minute is not None and minute > self.current_minute:
+            for expired in range(self.current_minute + 1, min(minute, self.current_minute + CAP_WINDOW_MINUTES) + 1):
+                slot = expired % CAP_WINDOW_MINUTES
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+                self.minutes[slot] = -1
+        if self.current_minute is None or minute > self.current_minute:
+            self.current_minute = minute
+    
+    def add(self, count: int, now: Optional[float] = None) -> None:
+        minute = int(time.time() if now is None else now) // 60
+        self._advance(minute)
+        if minute <= self.current_minute - CAP_WINDOW_MINUTES:
+            return
+        slot = minute % CAP_WINDOW_MINUTES
+        self.minutes[slot] = minute
+        self.counts[slot] += count
+        self.total += count
+    
+    def count(self, now: Optional[float] = None) -> int:
+        """Number of hits in the last CAP_WINDOW_MINUTES minutes."""
+        self._advance(int(time.time() if now is None else now) // 60)
+        return self.total
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for HourlyCapRepository.save."""
+        return {
+            "api_hits": self.count(),
+            "minutes": [[minute, count] for minute, count in sorted(zip(self.minutes, self.counts)) if count]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MinuteWindow":
+        window = cls()
+        for minute, count in data.get("minutes", []):
+            window.add(int(count), int(minute) * 60)
+        window.count()
+        return window
 
 def load_stats() -> Dict[str, Dict[str, int]]:
     """
-    Load statistics from the stats file
+    Load statistics from the runtime database
     
     Returns:
         Dictionary containing statistics for each app
     """
-    if not ensure_stats_dir() or not STATS_FILE:
-        logger.error("Cannot load stats - no valid stats directory available")
-        return get_default_stats()
-    
-    default_stats = get_default_stats()
-    
-    try:
-        if os.path.exists(STATS_FILE):
-            logger.debug(f"Loading stats from: {STATS_FILE}")
-            with open(STATS_FILE, 'r') as f:
-                stats = json.load(f)
-                
-            # Ensure all apps are in the stats
-            for app in default_stats:
-                if app not in stats:
-                    stats[app] = default_stats[app]
-            
-            logger.debug(f"Loaded stats: {stats}")
-            return stats
-        else:
-            logger.info(f"Stats file not found at {STATS_FILE}, using default stats")
-        return default_stats
-    except Exception as e:
-        logger.error(f"Error loading stats from {STATS_FILE}: {e}")
-        return default_stats
+    stats = get_default_stats()
+    for app, values in stats_repository.load().items():
+        stats.setdefault(app, {}).update(values)
+    logger.debug(f"Loaded stats: {stats}")
+    return stats
 
 def get_default_stats() -> Dict[str, Dict[str, int]]:
     """Get the default stats structure"""
@@ -142,42 +175,21 @@ def get_default_hourly_caps() -> Dict[str, Dict[str, int]]:
         "eros": {"api_hits": 0}
     }
 
-def load_hourly_caps() -> Dict[str, Dict[str, int]]:
+def load_hourly_caps() -> Dict[str, Dict[str, Any]]:
     """
-    Load hourly API caps from the caps file
+    Load the per-minute API hits of the hourly caps from the runtime database
     
     Returns:
         Dictionary containing hourly API usage for each app
     """
-    if not ensure_stats_dir() or not HOURLY_CAP_FILE:
-        logger.error("Cannot load hourly caps - no valid stats directory available")
-        return get_default_hourly_caps()
-    
-    default_caps = get_default_hourly_caps()
-    
-    try:
-        if os.path.exists(HOURLY_CAP_FILE):
-            logger.debug(f"Loading hourly caps from: {HOURLY_CAP_FILE}")
-            with open(HOURLY_CAP_FILE, 'r') as f:
-                caps = json.load(f)
-                
-            # Ensure all apps are in the caps
-            for app in default_caps:
-                if app not in caps:
-                    caps[app] = default_caps[app]
-            
-            logger.debug(f"Loaded hourly caps: {caps}")
-            return caps
-        else:
-            logger.info(f"Hourly caps file not found at {HOURLY_CAP_FILE}, using default caps")
-            return default_caps
-    except Exception as e:
-        logger.error(f"Error loading hourly caps from {HOURLY_CAP_FILE}: {e}")
-        return default_caps
+    caps = get_default_hourly_caps()
+    caps.update(hourly_cap_repository.load())
+    logger.debug(f"Loaded hourly caps: {caps}")
+    return caps
 
-def save_hourly_caps(caps: Dict[str, Dict[str, int]]) -> bool:
+def save_hourly_caps(caps: Dict[str, Dict[str, Any]]) -> bool:
     """
-    Save hourly API caps to the caps file
+    Save the per-minute API hits of the hourly caps to the runtime database
     
     Args:
         caps: Dictionary containing hourly API usage for each app
@@ -185,44 +197,27 @@ def save_hourly_caps(caps: Dict[str, Dict[str, int]]) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    if not ensure_stats_dir() or not HOURLY_CAP_FILE:
-        logger.error("Cannot save hourly caps - no valid stats directory available")
+    if not hourly_cap_repository.save(caps):
+        logger.error("Error saving hourly caps")
         return False
     
-    try:
-        logger.debug(f"Saving hourly caps to: {HOURLY_CAP_FILE}")
-        # First write to a temp file, then move it to avoid partial writes
-        temp_file = f"{HOURLY_CAP_FILE}.tmp"
-        with open(temp_file, 'w') as f:
-            json.dump(caps, f, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
-        
-        # Move the temp file to the actual file
-        os.replace(temp_file, HOURLY_CAP_FILE)
-        
-        logger.debug(f"Hourly caps saved successfully: {caps}")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving hourly caps to {HOURLY_CAP_FILE}: {e}", exc_info=True)
-        return False
+    logger.debug(f"Hourly caps saved successfully: {caps}")
+    return True
 
 def reset_hourly_caps() -> bool:
     """
-    Reset all hourly API caps to zero at the top of the hour
+    Forget all API hits counted towards the hourly caps
     
     Returns:
         True if successful, False otherwise
     """
+    global _cap_windows, _caps_dirty
     logger.info("=== RESETTING HOURLY API CAPS ===")
     try:
-        if os.path.exists(HOURLY_CAP_FILE):
-            os.remove(HOURLY_CAP_FILE)
-            logger.info(f"Deleted hourly caps file at {HOURLY_CAP_FILE} to reset all API caps")
-            
-        # Create a fresh hourly caps file
-        caps = get_default_hourly_caps()
-        save_success = save_hourly_caps(caps)
+        with hourly_lock:
+            _cap_windows = {app: MinuteWindow() for app in get_default_hourly_caps()}
+            _caps_dirty = False
+            save_success = save_hourly_caps({app: window.to_dict() for app, window in _cap_windows.items()})
         
         if save_success:
             logger.info("Successfully reset all hourly API caps to zero")
@@ -234,25 +229,6 @@ def reset_hourly_caps() -> bool:
         logger.error(f"Error resetting hourly API caps: {e}")
         return False
 
-def check_hourly_reset():
-    """
-    Check if we need to reset hourly caps based on the current hour
-    """
-    global last_hour_checked, next_reset_check
-    
-    current_time = datetime.datetime.now()
-    current_hour = current_time.hour
-    
-    # Skip if we've already checked this hour
-    if last_hour_checked == current_hour:
-        return
-    
-    # Only reset at the top of the hour (00 minute mark)
-    if current_time.minute == 0:
-        logger.info(f"Hour changed to {current_hour}:00, resetting hourly API caps")
-        reset_hourly_caps()
-        last_hour_checked = current_hour
-
 def increment_hourly_cap(app_type: str, count: int = 1) -> bool:
     """
     Increment hourly API usage cap for a specific app
@@ -268,14 +244,13 @@ def increment_hourly_cap(app_type: str, count: int = 1) -> bool:
         logger.error(f"Invalid app_type for hourly cap: {app_type}")
         return False
     
-    # Check if we need to reset hourly caps
-    check_hourly_reset()
-    
+    global _caps_dirty
     with hourly_lock:
-        caps = load_hourly_caps()
-        prev_value = caps[app_type]["api_hits"]
-        caps[app_type]["api_hits"] += count
-        new_value = caps[app_type]["api_hits"]
+        window = _get_cap_windows_locked()[app_type]
+        prev_value = window.count()
+        window.add(count)
+        new_value = window.total
+        _caps_dirty = True
         
         # Get the hourly cap from the app's specific configuration
         from src.primary.settings_manager import load_settings
@@ -292,14 +267,9 @@ def increment_hourly_cap(app_type: str, count: int = 1) -> bool:
         # Alert if exceeding limit
         if new_value >= hourly_limit and prev_value < hourly_limit:
             logger.error(f"{app_type} has exceeded hourly API cap: {new_value}/{hourly_limit}")
-        
-        save_success = save_hourly_caps(caps)
-        
-        if not save_success:
-            logger.error(f"Failed to save hourly caps after incrementing {app_type}")
-            return False
-            
-        return True
+    
+    _mark_dirty(count)
+    return True
 
 def get_hourly_cap_status(app_type: str) -> Dict[str, Any]:
     """
@@ -315,15 +285,13 @@ def get_hourly_cap_status(app_type: str) -> Dict[str, Any]:
         return {"error": f"Invalid app_type: {app_type}"}
     
     with hourly_lock:
-        caps = load_hourly_caps()
+        current_usage = _get_cap_windows_locked()[app_type].count()
         
         # Get the hourly cap from the app's specific configuration
         from src.primary.settings_manager import load_settings
         app_settings = load_settings(app_type)
         hourly_limit = app_settings.get("hourly_cap", 20)  # Default to 20 if not set
         
-        current_usage = caps[app_type]["api_hits"]
-        
         return {
             "app": app_type,
             "current_usage": current_usage,
@@ -348,7 +316,7 @@ def check_hourly_cap_exceeded(app_type: str) -> bool:
 
 def save_stats(stats: Dict[str, Dict[str, int]]) -> bool:
     """
-    Save statistics to the stats file
+    Save statistics to the runtime database
     
     Args:
         stats: Dictionary containing statistics for each app
@@ -356,41 +324,96 @@ def save_stats(stats: Dict[str, Dict[str, int]]) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    if not ensure_stats_dir() or not STATS_FILE:
-        logger.error("Cannot save stats - no valid stats directory available")
+    if not stats_repository.save(stats):
+        logger.error("Error saving stats")
         return False
     
-    try:
-        logger.debug(f"Saving stats to: {STATS_FILE}")
-        # First write to a temp file, then move it to avoid partial writes
-        temp_file = f"{STATS_FILE}.tmp"
-        with open(temp_file, 'w') as f:
-            json.dump(stats, f, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
-        
-        # Move the temp file to the actual file
-        os.replace(temp_file, STATS_FILE)
-        
-        logger.info(f"===> Successfully wrote stats to file: {STATS_FILE}")
-        logger.debug(f"Stats saved successfully: {stats}")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving stats to {STATS_FILE}: {e}", exc_info=True)
-        return False
+    logger.debug(f"Stats saved successfully: {stats}")
+    return True
+
+def _get_stats_locked() -> Dict[str, Dict[str, int]]:
+    """Get the in-memory stats, loading them on first use. Caller must hold stats_lock."""
+    global _stats
+    if _stats is None:
+        _stats = load_stats()
+    return _stats
+
+def _get_cap_windows_locked() -> Dict[str, MinuteWindow]:
+    """Get the sliding windows of the hourly caps, loading them on first use. Caller must hold hourly_lock."""
+    global _cap_windows
+    if _cap_windows is None:
+        _cap_windows = {app: MinuteWindow.from_dict(data) for app, data in load_hourly_caps().items()}
+    return _cap_windows
+
+def _mark_dirty(count: int) -> None:
+    """Count pending changes and wake the flusher once there are enough of them."""
+    global _pending_changes
+    with _flusher_lock:
+        _pending_changes += count
+        threshold = max(1, int(get_advanced_setting("stats_flush_threshold", DEFAULT_FLUSH_THRESHOLD)))
+        if _pending_changes >= threshold:
+            _flush_event.set()
+    _ensure_flusher()
+
+def _ensure_flusher() -> None:
+    global _flusher_thread
+    with _flusher_lock:
+        if _flusher_thread is not None and _flusher_thread.is_alive():
+            return
+        _flusher_thread = threading.Thread(target=_flusher_loop, name="StatsFlusher", daemon=True)
+        _flusher_thread.start()
+
+def _flusher_loop() -> None:
+    """Write the counters on a timer, or sooner when the dirty threshold is reached."""
+    while True:
+        interval = max(1, int(get_advanced_setting("stats_flush_interval_seconds", DEFAULT_FLUSH_INTERVAL)))
+        _flush_event.wait(timeout=interval)
+        _flush_event.clear()
+        try:
+            flush_stats()
+        except Exception as e:
+            logger.error(f"Error flushing stats: {e}")
 
-def increment_stat(app_type: str, stat_type: str, count: int = 1) -> bool:
+def flush_stats() -> bool:
+    """
+    Write the in-memory stats and hourly caps to the runtime database if they changed
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    global _stats_dirty, _caps_dirty, _pending_changes
+    with _flusher_lock:
+        _pending_changes = 0
+    
+    success = True
+    with stats_lock:
+        if _stats_dirty and _stats is not None:
+            _stats_dirty = not save_stats(_stats)
+            success = not _stats_dirty
+    with hourly_lock:
+        if _caps_dirty and _cap_windows is not None:
+            _caps_dirty = not save_hourly_caps({app: window.to_dict() for app, window in _cap_windows.items()})
+            success = success and not _caps_dirty
+    if TIMESERIES_FILE:
+        success = timeseries_store.save(TIMESERIES_FILE) and success
+    return success
+
+def increment_stat(app_type: str, stat_type: str, count: int = 1, instance_name: Optional[str] = None) -> bool:
     """
     Increment a specific statistic
     
+    The counter is updated in memory and written to disk by the flusher thread.
+    
     Args:
         app_type: The application type (sonarr, radarr, etc.)
         stat_type: The type of statistic (hunted or upgraded)
         count: The amount to increment by (default: 1)
+        instance_name: The instance the items were searched on, for the time series
         
     Returns:
         True if successful, False otherwise
     """
+    global _stats_dirty
     if app_type not in ["sonarr", "radarr", "lidarr", "readarr", "whisparr", "eros", "swaparr"]:
         logger.error(f"Invalid app_type: {app_type}")
         return False
@@ -403,26 +426,18 @@ def increment_stat(app_type: str, stat_type: str, count: int = 1) -> bool:
     if app_type != "swaparr":
         increment_hourly_cap(app_type, count)
     
+    timeseries_store.record(app_type, instance_name, stat_type, count)
+    
     with stats_lock:
-        stats = load_stats()
+        stats = _get_stats_locked()
         prev_value = stats[app_type][stat_type]
         stats[app_type][stat_type] += count
         new_value = stats[app_type][stat_type]
+        _stats_dirty = True
         logger.info(f"*** STATS INCREMENT *** {app_type} {stat_type} by {count}: {prev_value} -> {new_value}")
-        save_success = save_stats(stats)
-        
-        if not save_success:
-            logger.error(f"Failed to save stats after incrementing {app_type} {stat_type}")
-            return False
-            
-        # Add debug verification that stats were actually saved
-        verification_stats = load_stats()
-        if verification_stats[app_type][stat_type] != new_value:
-            logger.error(f"Stats verification failed! Expected {new_value} but got {verification_stats[app_type][stat_type]} for {app_type} {stat_type}")
-            return False
-            
-        logger.info(f"Successfully incremented and verified {app_type} {stat_type}")
-        return True
+    
+    _mark_dirty(count)
+    return True
 
 def get_stats() -> Dict[str, Dict[str, int]]:
     """
@@ -432,10 +447,39 @@ def get_stats() -> Dict[str, Dict[str, int]]:
         Dictionary containing statistics for each app
     """
     with stats_lock:
-        stats = load_stats()
+        stats = {app: dict(values) for app, values in _get_stats_locked().items()}
         logger.debug(f"Retrieved stats: {stats}")
         return stats
 
+def get_stats_timeseries(app_type: str = "all", instance_name: Optional[str] = None, metric: Optional[str] = None,
+                         start: Optional[int] = None, end: Optional[int] = None,
+                         resolution: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get hunted and upgraded counts over time
+    
+    Args:
+        app_type: The application type, or "all"
+        instance_name: Optional instance to restrict the series to
+        metric: Optional metric (hunted or upgraded)
+        start: Start of the range (epoch seconds), defaults to 24 hours ago
+        end: End of the range (epoch seconds), defaults to now
+        resolution: "minute", "hour" or "day", defaults to the finest one covering start
+        
+    Returns:
+        Dictionary with the resolution and the points of every matching series
+    """
+    return timeseries_store.query(app_type, instance_name, metric, start, end, resolution)
+
+def get_hourly_caps() -> Dict[str, Dict[str, int]]:
+    """
+    Get the API hits of each app over the last hour (sliding window)
+    
+    Returns:
+        Dictionary containing hourly API usage for each app
+    """
+    with hourly_lock:
+        return {app: {"api_hits": window.count()} for app, window in _get_cap_windows_locked().items()}
+
 def reset_stats(app_type: Optional[str] = None) -> bool:
     """
     Reset statistics for a specific app or all apps
@@ -446,8 +490,9 @@ def reset_stats(app_type: Optional[str] = None) -> bool:
     Returns:
         True if successful, False otherwise
     """
+    global _stats_dirty
     with stats_lock:
-        stats = load_stats()
+        stats = _get_stats_locked()
         
         if app_type is None:
             # Reset all stats
@@ -455,30 +500,21 @@ def reset_stats(app_type: Optional[str] = None) -> bool:
             for app in stats:
                 stats[app]["hunted"] = 0
                 stats[app]["upgraded"] = 0
+            timeseries_store.clear(None, ("hunted", "upgraded"))
         elif app_type in stats:
             # Reset specific app stats
             logger.info(f"Resetting statistics for {app_type}")
             stats[app_type]["hunted"] = 0
             stats[app_type]["upgraded"] = 0
+            timeseries_store.clear(app_type, ("hunted", "upgraded"))
         else:
             logger.error(f"Invalid app_type for reset: {app_type}")
             return False
-            
-        return save_stats(stats)
-
-# Initialize the files with find_writable_stats_dir already called during import
-if STATS_DIR:
-    # Initialize stats file if it doesn't exist
-    if not os.path.exists(STATS_FILE):
-        logger.info(f"Creating new stats file at: {STATS_FILE}")
-        save_stats(get_default_stats())
         
-    # Initialize hourly caps file if it doesn't exist
-    if not os.path.exists(HOURLY_CAP_FILE):
-        logger.info(f"Creating new hourly caps file at: {HOURLY_CAP_FILE}")
-        save_hourly_caps(get_default_hourly_caps())
-    
-    # Set up the initial hour check
-    last_hour_checked = datetime.datetime.now().hour
-else:
-    logger.debug(f"Stats system initialized. Using file: {STATS_FILE}")
\ No newline at end of file
+        # Resets are rare and user-initiated, so write them right away
+        _stats_dirty = not save_stats(stats)
+        return not _stats_dirty
+
+# Load the time series kept across restarts
+if TIMESERIES_FILE:
+    timeseries_store.load(TIMESERIES_FILE)
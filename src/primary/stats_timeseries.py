@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Time-series statistics for Huntarr
+Keeps hunted and upgraded counts per app instance in fixed-size ring buffers
+at three resolutions: per minute for the last day, per hour for the last 30
+days and per day for the last year. Every increment updates all three, so
+older data is already downsampled when the finer ring wraps around. The rings
+are saved to a compact binary file by the stats flusher. Every slot has a
+fixed offset in that file, so a flush only writes the slots that changed.
+"""
+
+import os
+import time
+import struct
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.durable_store import write_bytes
+
+logger = get_logger("stats")
+
+METRICS = ("hunted", "upgraded")
+
+# (name, bucket width in seconds, number of buckets), finest first
+RESOLUTIONS = (
+    ("minute", 60, 1440),
+    ("hour", 3600, 720),
+    ("day", 86400, 365)
+)
+
+# File layout: magic, series count, then for each series its key (length
+# prefixed utf-8 "app|instance|metric") followed by, for each resolution, the
+# bucket numbers as int64 and the counts as uint32
+FILE_MAGIC = b"HTS1"
+FILE_HEADER = struct.Struct("<4sI")
+KEY_LENGTH = struct.Struct("<H")
+
+STAMP_SIZE = array("q").itemsize
+COUNT_SIZE = array("I").itemsize
+
+# Offset of each ring within a series record, relative to the end of its key
+RING_OFFSETS = tuple(sum(size for _, _, size in RESOLUTIONS[:ring]) * (STAMP_SIZE + COUNT_SIZE)
+                     for ring in range(len(RESOLUTIONS)))
+SERIES_DATA_SIZE = sum(size for _, _, size in RESOLUTIONS) * (STAMP_SIZE + COUNT_SIZE)
+
+
+def _write_at(fd: int, offset: int, data: bytes) -> None:
+    """Write data at a file offset (os.pwrite where the platform has it)."""
+    if hasattr(os, "pwrite"):
+        os.pwrite(fd, data, offset)
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+class RingSeries:
+    """Counts of one metric of one instance at every resolution."""
+
+    def __init__(self):
+        # Bucket number (time // width) held by each slot, so stale slots are recognized without clearing them
+        self.stamps = [array("q", [-1]) * size for _, _, size in RESOLUTIONS]
+        self.counts = [array("I", [0]) * size for _, _, size in RESOLUTIONS]
+
+    def add(self, timestamp: int, count: int) -> List[Tuple[int, int]]:
+        """Add count to the buckets holding timestamp. Returns the (ring, slot) pairs changed."""
+        changed = []
+        for ring, (_, width, size) in enumerate(RESOLUTIONS):
+            bucket = timestamp // width
+            slot = bucket % size
+            if self.stamps[ring][slot] != bucket:
+                self.stamps[ring][slot] = bucket
+                self.counts[ring][slot] = 0
+            self.counts[ring][slot] = min(self.counts[ring][slot] + count, 2 ** 32 - 1)
+            changed.append((ring, slot))
+        return changed
+
+    def slot_writes(self, data_offset: int, ring: int, slot: int) -> List[Tuple[int, bytes]]:
+        """Get the (file offset, bytes) writes storing one slot of a series whose data starts at data_offset."""
+        size = RESOLUTIONS[ring][2]
+        ring_offset = data_offset + RING_OFFSETS[ring]
+        return [
+            (ring_offset + slot * STAMP_SIZE, self.stamps[ring][slot:slot + 1].tobytes()),
+            (ring_offset + size * STAMP_SIZE + slot * COUNT_SIZE, self.counts[ring][slot:slot + 1].tobytes())
+        ]
+
+    def to_bytes(self) -> bytes:
+        chunks = []
+        for ring in range(len(RESOLUTIONS)):
+            chunks.append(self.stamps[ring].tobytes())
+            chunks.append(self.counts[ring].tobytes())
+        return b"".join(chunks)
+
+    def points(self, ring: int, start: int, end: int) -> List[Tuple[int, int]]:
+        """Get (bucket start time, count) for the non-empty buckets overlapping [start, end]."""
+        _, width, size = RESOLUTIONS[ring]
+        first_bucket = start // width
+        last_bucket = end // width
+        stamps = self.stamps[ring]
+        counts = self.counts[ring]
+        return sorted(
+            (stamps[slot] * width, counts[slot])
+            for slot in range(size)
+            if counts[slot] and first_bucket <= stamps[slot] <= last_bucket
+        )
+
+
+class TimeSeriesStore:
+    """Ring series keyed by (app_type, instance_name, metric)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], RingSeries] = {}
+        self.dirty = False
+        # Layout of the file last written or loaded: where each series' ring data starts
+        self._file_path: Optional[str] = None
+        self._file_offsets: Dict[Tuple[str, str, str], int] = {}
+        self._file_size = 0
+        # Slots changed since the last save, per series
+        self._dirty_slots: Dict[Tuple[str, str, str], Set[Tuple[int, int]]] = {}
+        # Set when series were removed, which needs the whole file rewritten
+        self._needs_rewrite = True
+
+    def record(self, app_type: str, instance_name: Optional[str], metric: str, count: int = 1,
+               timestamp: Optional[int] = None) -> None:
+        """Add count to the current buckets of a series."""
+        if metric not in METRICS or count <= 0:
+            return
+        key = (app_type, instance_name or "", metric)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = RingSeries()
+            changed = series.add(int(time.time()) if timestamp is None else timestamp, count)
+            self._dirty_slots.setdefault(key, set()).update(changed)
+            self.dirty = True
+
+    def clear(self, app_type: Optional[str] = None, metrics: Tuple[str, ...] = METRICS) -> None:
+        """Drop the series of one app, or of every app."""
+        with self._lock:
+            for key in list(self._series):
+                if (app_type is None or key[0] == app_type) and key[2] in metrics:
+                    del self._series[key]
+                    self._needs_rewrite = True
+            self.dirty = True
+
+    @staticmethod
+    def pick_resolution(start: int, now: int) -> int:
+        """The finest resolution whose ring still covers start."""
+        for ring, (_, width, size) in enumerate(RESOLUTIONS):
+            if now - start <= width * size:
+                return ring
+        return len(RESOLUTIONS) - 1
+
+    def query(self, app_type: str = "all", instance_name: Optional[str] = None, metric: Optional[str] = None,
+              start: Optional[int] = None, end: Optional[int] = None,
+              resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the counts of every matching series between start and end.
+
+        Args:
+            app_type: The app type, or "all"
+            instance_name: Optional instance to restrict the series to
+            metric: Optional metric (hunted or upgraded)
+            start: Start of the range (epoch seconds). Defaults to 24 hours ago.
+            end: End of the range (epoch seconds). Defaults to now.
+            resolution: "minute", "hour" or "day". Defaults to the finest one covering start.
+
+        Returns:
+            dict with the resolution, its bucket width and the series with their [time, count] points
+        """
+        now = int(time.time())
+        end = now if end is None else end
+        start = end - 86400 if start is None else start
+        names = [name for name, _, _ in RESOLUTIONS]
+        ring = names.index(resolution) if resolution in names else self.pick_resolution(start, now)
+
+        series_list = []
+        with self._lock:
+            for (app, instance, series_metric), series in sorted(self._series.items()):
+                if app_type != "all" and app != app_type:
+                    continue
+                if instance_name is not None and instance != instance_name:
+                    continue
+                if metric is not None and series_metric != metric:
+                    continue
+                points = series.points(ring, start, end)
+                if points:
+                    series_list.append({
+                        "app_type": app,
+                        "instance_name": instance,
+                        "metric": series_metric,
+                        "points": [list(point) for point in points]
+                    })
+
+        return {
+            "resolution": RESOLUTIONS[ring][0],
+            "bucket_seconds": RESOLUTIONS[ring][1],
+            "start": start,
+            "end": end,
+            "series": series_list
+        }
+
+    def save(self, path: str) -> bool:
+        """
+        Write the changes since the last save to the binary file.
+
+        Changed slots are written in place and new series are appended, so a
+        flush costs a few bytes per changed bucket. The whole file is only
+        rewritten (atomically) the first time, or after series were removed.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._lock:
+            if not self.dirty:
+                return True
+            if self._needs_rewrite or self._file_path != path or not os.path.exists(path):
+                return self._rewrite_locked(path)
+
+            writes: List[Tuple[int, bytes]] = []
+            new_offsets: Dict[Tuple[str, str, str], int] = {}
+            file_size = self._file_size
+            for key, slots in self._dirty_slots.items():
+                series = self._series.get(key)
+                if series is None:
+                    continue
+                data_offset = self._file_offsets.get(key)
+                if data_offset is None:
+                    # New series go to the end of the file, the header count is updated below
+                    encoded_key = "|".join(key).encode("utf-8")
+                    record = KEY_LENGTH.pack(len(encoded_key)) + encoded_key
+                    writes.append((file_size, record + series.to_bytes()))
+                    new_offsets[key] = file_size + len(record)
+                    file_size += len(record) + SERIES_DATA_SIZE
+                    continue
+                for ring, slot in slots:
+                    writes.extend(series.slot_writes(data_offset, ring, slot))
+            if new_offsets:
+                writes.append((0, FILE_HEADER.pack(FILE_MAGIC, len(self._file_offsets) + len(new_offsets))))
+
+            try:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    for offset, data in writes:
+                        _write_at(fd, offset, data)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error(f"Error updating stats time series in {path}: {e}")
+                # The file may be partly updated, replace it as a whole next time
+                self._needs_rewrite = True
+                return False
+
+            self._file_offsets.update(new_offsets)
+            self._file_size = file_size
+            self._dirty_slots = {}
+            self.dirty = False
+            return True
+
+    def _rewrite_locked(self, path: str) -> bool:
+        """Replace the whole file with the current series. Caller must hold the lock."""
+        chunks = [FILE_HEADER.pack(FILE_MAGIC, len(self._series))]
+        offsets = {}
+        file_size = FILE_HEADER.size
+        for key, series in self._series.items():
+            encoded_key = "|".join(key).encode("utf-8")
+            chunks.append(KEY_LENGTH.pack(len(encoded_key)) + encoded_key)
+            chunks.append(series.to_bytes())
+            file_size += KEY_LENGTH.size + len(encoded_key)
+            offsets[key] = file_size
+            file_size += SERIES_DATA_SIZE
+
+        if not write_bytes(path, b"".join(chunks)):
+            logger.error(f"Error saving stats time series to {path}")
+            return False
+        self._file_path = path
+        self._file_offsets = offsets
+        self._file_size = file_size
+        self._dirty_slots = {}
+        self._needs_rewrite = False
+        self.dirty = False
+        return True
+
+    def load(self, path: str) -> bool:
+        """
+        Read the series written by save(). A missing or invalid file leaves the store empty.
+
+        Returns:
+            True if the file was loaded, False otherwise
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Error reading stats time series from {path}: {e}")
+            return False
+
+        try:
+            magic, series_count = FILE_HEADER.unpack_from(data, 0)
+            if magic != FILE_MAGIC:
+                raise ValueError("invalid header")
+            offset = FILE_HEADER.size
+            loaded = {}
+            offsets = {}
+            for _ in range(series_count):
+                (key_length,) = KEY_LENGTH.unpack_from(data, offset)
+                offset += KEY_LENGTH.size
+                app_type, rest = data[offset:offset + key_length].decode("utf-8").split("|", 1)
+                instance_name, metric = rest.rsplit("|", 1)
+                key = (app_type, instance_name, metric)
+                offset += key_length
+                if offset + SERIES_DATA_SIZE > len(data):
+                    raise ValueError("truncated file")
+                offsets[key] = offset
+                series = RingSeries()
+                for ring in range(len(RESOLUTIONS)):
+                    for buffer in (series.stamps[ring], series.counts[ring]):
+                        size = len(buffer) * buffer.itemsize
+                        buffer[:] = array(buffer.typecode, data[offset:offset + size])
+                        offset += size
+                # Metrics that are no longer kept (api_hits) are dropped at the next rewrite
+                if metric in METRICS:
+                    loaded[key] = series
+        except Exception as e:
+            logger.warning(f"Ignoring invalid stats time series file {path}: {e}")
+            return False
+
+        with self._lock:
+            self._series = loaded
+            self._file_path = path
+            self._file_offsets = offsets
+            self._file_size = offset
+            self._dirty_slots = {}
+            self._needs_rewrite = len(loaded) != len(offsets) or offset != len(data)
+            self.dirty = self._needs_rewrite
+        return True
+
+
+# Process-wide store used by stats_manager
+timeseries_store = TimeSeriesStore()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Command tracker for Huntarr
+Tracks outstanding *arr commands (searches etc) per instance. One poller per
+instance reads the command list endpoint once per interval and resolves every
+waiting command from that single response, instead of each caller polling
+command/{id} on its own.
+
+The hunt modules never block on their search commands. A module that has
+follow-up work for a command hands it to queue_command() with an on_complete
+callback, which the poller thread runs once the command completed. Commands
+without follow-up work are not tracked at all.
+"""
+
+import time
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils import http_client
+
+logger = get_logger("huntarr")
+
+# Command states that end a command
+COMPLETED_STATES = ("completed",)
+FAILED_STATES = ("failed", "aborted", "cancelled", "orphaned")
+
+# Polls a command may be absent from the list before it is looked up directly
+MISSING_POLLS_BEFORE_LOOKUP = 3
+
+# Trackers keyed by (api_url, api_key)
+_trackers: Dict[Tuple[str, str], "CommandTracker"] = {}
+_trackers_lock = threading.Lock()
+
+
+def _command_state(command: Dict[str, Any]) -> Optional[str]:
+    """Sonarr/Radarr v3 report 'status'; older builds report 'state'."""
+    state = command.get("status") or command.get("state")
+    return state.lower() if isinstance(state, str) else None
+
+
+class CommandTracker:
+    """
+    Resolves outstanding commands of one *arr instance from a shared poll.
+
+    Each tracked command gets a Future that resolves with its final state
+    ("completed", "failed", ...). The poller thread only runs while there are
+    outstanding commands.
+    """
+
+    def __init__(self, app_type: str, api_url: str, api_key: str, api_version: str = "v3",
+                 poll_interval: float = 1.0, api_timeout: int = 120):
+        self.app_type = app_type
+        self.logger = get_logger(app_type)
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.api_version = api_version
+        self.poll_interval = max(0.5, float(poll_interval))
+        self.api_timeout = api_timeout
+        self._pending: Dict[int, Future] = {}
+        self._missing_polls: Dict[int, int] = {}
+        # Queued commands: (monotonic deadline, name), dropped once the deadline passes
+        self._deadlines: Dict[int, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, command_id: int) -> Future:
+        """
+        Start tracking a command.
+
+        Args:
+            command_id: The ID returned when the command was queued
+
+        Returns:
+            A Future resolving with the final command state
+        """
+        command_id = int(command_id)
+        with self._lock:
+            future = self._pending.get(command_id)
+            if future is None:
+                future = Future()
+                self._pending[command_id] = future
+                self._missing_polls[command_id] = 0
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.app_type}-CommandTracker", daemon=True)
+                self._thread.start()
+        return future
+
+    def _wait_future(self, command_id: int, future: Future, deadline: float,
+                     stop_check: Callable[[], bool], command_name: str) -> bool:
+        """Wait for a tracked command's future until a deadline. True if the command completed."""
+        while True:
+            if stop_check():
+                self.logger.info(f"Stopping wait for {command_name} due to stop request")
+                self._forget(command_id, future)
+                return False
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning(f"{self.app_type} {command_name} (ID: {command_id}) did not finish in time")
+                self._forget(command_id, future)
+                return False
+
+            try:
+                state = future.result(timeout=min(1.0, remaining))
+            except FutureTimeoutError:
+                continue
+
+            if state in COMPLETED_STATES:
+                self.logger.debug(f"{self.app_type} {command_name} (ID: {command_id}) completed successfully")
+                return True
+            self.logger.warning(f"{self.app_type} {command_name} (ID: {command_id}) {state}")
+            return False
+
+    def wait(self, command_id: int, timeout: float, stop_check: Callable[[], bool] = lambda: False,
+             command_name: str = "Command") -> bool:
+        """
+        Block until a command finishes, times out or a stop is requested.
+
+        Args:
+            command_id: The ID of the command to wait for
+            timeout: Maximum number of seconds to wait
+            stop_check: Function returning True if waiting should be aborted
+            command_name: Name of the command (for logging)
+
+        Returns:
+            True if the command completed successfully, False otherwise
+        """
+        future = self.track(command_id)
+        return self._wait_future(int(command_id), future, time.monotonic() + timeout, stop_check, command_name)
+
+    def queue(self, command_id: int, on_complete: Callable[[], None], command_name: str = "Command",
+              timeout: float = 600) -> None:
+        """
+        Track a command in the background and run on_complete once it completed.
+
+        Nothing waits for the command: the poller thread resolves it and runs
+        on_complete. A command still unfinished after timeout seconds is dropped.
+
+        Args:
+            command_id: The ID returned when the command was queued
+            on_complete: Called (on the poller thread) once the command completed successfully
+            command_name: Name of the command (for logging)
+            timeout: Seconds after which the command is no longer tracked
+        """
+        command_id = int(command_id)
+        with self._lock:
+            self._deadlines[command_id] = (time.monotonic() + timeout, command_name)
+        future = self.track(command_id)
+
+        def finished(done: Future) -> None:
+            if done.cancelled():
+                return
+            state = done.result()
+            if state not in COMPLETED_STATES:
+                self.logger.warning(f"{self.app_type} {command_name} (ID: {command_id}) {state}")
+                return
+            try:
+                on_complete()
+            except Exception as e:
+                self.logger.error(f"Error handling completed {command_name} (ID: {command_id}): {e}", exc_info=True)
+
+        future.add_done_callback(finished)
+
+    def _expire(self) -> None:
+        """Drop queued commands that did not finish before their deadline."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(command_id, name) for command_id, (deadline, name) in self._deadlines.items() if deadline <= now]
+            futures = [self._pending.get(command_id) for command_id, _ in expired]
+        for (command_id, name), future in zip(expired, futures):
+            self.logger.warning(f"{self.app_type} {name} (ID: {command_id}) did not finish in time")
+            if future is not None:
+                self._forget(command_id, future)
+            with self._lock:
+                self._deadlines.pop(command_id, None)
+
+    def _forget(self, command_id: int, future: Future) -> None:
+        """Stop tracking a command nobody is waiting for anymore."""
+        with self._lock:
+            if self._pending.get(command_id) is future and not future.done():
+                self._pending.pop(command_id, None)
+                self._missing_polls.pop(command_id, None)
+                self._deadlines.pop(command_id, None)
+                future.cancel()
+
+    def _request(self, endpoint: str) -> Any:
+        response = http_client.get(f"{self.api_url}/api/{self.api_version}/{endpoint}",
+                                   headers={"X-Api-Key": self.api_key}, timeout=self.api_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _resolve(self, command_id: int, state: str) -> None:
+        with self._lock:
+            future = self._pending.pop(command_id, None)
+            self._missing_polls.pop(command_id, None)
+            self._deadlines.pop(command_id, None)
+        if future is not None and not future.done():
+            future.set_result(state)
+
+    def _poll(self) -> None:
+        """Read the command list once and resolve every finished command in it."""
+        with self._lock:
+            pending_ids = list(self._pending.keys())
+        if not pending_ids:
+            return
+
+        try:
+            commands = self._request("command")
+        except Exception as e:
+            self.logger.warning(f"Error polling {self.app_type} command list: {e}")
+            return
+
+        seen = set()
+        for command in commands if isinstance(commands, list) else []:
+            command_id = command.get("id")
+            if command_id not in pending_ids:
+                continue
+            seen.add(command_id)
+            state = _command_state(command)
+            if state in COMPLETED_STATES or state in FAILED_STATES:
+                self._resolve(command_id, state)
+
+        # Finished commands can drop out of the list between polls - look those up directly
+        for command_id in pending_ids:
+            if command_id in seen:
+                continue
+            with self._lock:
+                if command_id not in self._missing_polls:
+                    continue
+                self._missing_polls[command_id] += 1
+                missing_polls = self._missing_polls[command_id]
+            if missing_polls < MISSING_POLLS_BEFORE_LOOKUP:
+                continue
+            try:
+                state = _command_state(self._request(f"command/{command_id}"))
+            except Exception as e:
+                self.logger.debug(f"Error looking up {self.app_type} command {command_id}: {e}")
+                continue
+            if state in COMPLETED_STATES or state in FAILED_STATES:
+                self._resolve(command_id, state)
+
+    def _run(self) -> None:
+        """Poll until no commands are outstanding."""
+        while True:
+            time.sleep(self.poll_interval)
+            self._poll()
+            self._expire()
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+
+def get_command_tracker(app_type: str, api_url: str, api_key: str, api_version: str = "v3",
+                        poll_interval: float = 1.0, api_timeout: int = 120) -> CommandTracker:
+    """
+    Get the shared command tracker for an instance.
+
+    Args:
+        app_type: The app type (for logging)
+        api_url: The base URL of the instance
+        api_key: The API key of the instance
+        api_version: API version used by the app ("v3" or "v1")
+        poll_interval: Seconds between command list polls
+        api_timeout: Timeout for the poll requests
+
+    Returns:
+        The CommandTracker for that instance
+    """
+    key = (api_url.rstrip("/"), api_key)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = CommandTracker(app_type, api_url, api_key, api_version, poll_interval, api_timeout)
+            _trackers[key] = tracker
+        else:
+            tracker.poll_interval = max(0.5, float(poll_interval))
+            tracker.api_timeout = api_timeout
+        return tracker
+
+
+def queue_command(app_type: str, api_url: str, api_key: str, command_id: Any, command_name: str = "Command",
+                  on_complete: Optional[Callable[[], None]] = None, api_version: str = "v3",
+                  wait_delay: int = 1, wait_attempts: int = 600, api_timeout: int = 120) -> None:
+    """
+    Run on_complete once a command completed, without blocking the caller.
+
+    Commands without on_complete are not tracked, nothing would come of it.
+
+    Args:
+        app_type: The app type (for logging)
+        api_url: The base URL of the instance
+        api_key: The API key of the instance
+        command_id: The ID returned when the command was queued
+        command_name: Name of the command (for logging)
+        on_complete: Called on the tracker's poller thread once the command completed successfully
+        api_version: API version used by the app ("v3" or "v1")
+        wait_delay: Seconds between command list polls ('command_wait_delay')
+        wait_attempts: Polls before the command is no longer tracked ('command_wait_attempts')
+        api_timeout: Timeout for the poll requests
+    """
+    if on_complete is None or not command_id:
+        return
+    if wait_delay <= 0 or wait_attempts <= 0:
+        # Command waiting is disabled - treat the command as completed
+        on_complete()
+        return
+    tracker = get_command_tracker(app_type, api_url, api_key, api_version, wait_delay, api_timeout)
+    tracker.queue(command_id, on_complete, command_name, wait_delay * wait_attempts)
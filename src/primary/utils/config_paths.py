@@ -90,10 +90,11 @@ RESET_DIR = CONFIG_PATH / "reset"  # Add reset directory
 TALLY_DIR = CONFIG_PATH / "tally"  # Add tally directory for stats
 SWAPARR_DIR = CONFIG_PATH / "swaparr"  # Add Swaparr directory
 EROS_DIR = CONFIG_PATH / "eros"  # Add Eros directory
+LIBRARY_DIR = CONFIG_PATH / "library"  # Library snapshots per instance
 
 # Create all directories
 for dir_path in [LOG_DIR, SETTINGS_DIR, USER_DIR, STATEFUL_DIR, HISTORY_DIR, 
-                SCHEDULER_DIR, RESET_DIR, TALLY_DIR, SWAPARR_DIR, EROS_DIR]:
+                SCHEDULER_DIR, RESET_DIR, TALLY_DIR, SWAPARR_DIR, EROS_DIR, LIBRARY_DIR]:
     try:
         dir_path.mkdir(parents=True, exist_ok=True)
     except Exception as e:
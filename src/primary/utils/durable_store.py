@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Durable file writes for Huntarr
+Every persistent file goes through here. Writes are atomic (temp file, then
+os.replace), so a crash leaves either the old or the new contents and never a
+truncated file. Callers that update the same file many times in a row can ask
+for coalescing: the latest contents wait for a short window and only the last
+version is written. When files are fsynced is set by one policy:
+
+    always    fsync each file (and its directory) as it is replaced
+    batched   fsync replaced files from the background thread every few seconds
+    shutdown  fsync replaced files only when Huntarr shuts down
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, Optional, Set, Tuple, Union
+
+from src.primary.utils.logger import get_logger
+
+logger = get_logger("huntarr")
+
+FSYNC_ALWAYS = "always"
+FSYNC_BATCHED = "batched"
+FSYNC_ON_SHUTDOWN = "shutdown"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_BATCHED, FSYNC_ON_SHUTDOWN)
+
+DEFAULT_COALESCE_SECONDS = 2.0
+DEFAULT_FSYNC_INTERVAL_SECONDS = 5.0
+
+PathLike = Union[str, os.PathLike]
+
+
+def _fsync_path(path: str) -> None:
+    """fsync a file or directory by path."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DurableStore:
+    """Atomic, optionally coalesced file writes with a shared fsync policy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for a whole sync, so a sync at shutdown waits for one already running
+        self._sync_lock = threading.Lock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        # Coalesced writes waiting for their window: path -> (due time, contents)
+        self._pending: Dict[str, Tuple[float, bytes]] = {}
+        # Files replaced but not fsynced yet (batched and shutdown policies)
+        self._unsynced: Set[str] = set()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.fsync_policy = FSYNC_ALWAYS
+        self.coalesce_seconds = DEFAULT_COALESCE_SECONDS
+        self.fsync_interval_seconds = DEFAULT_FSYNC_INTERVAL_SECONDS
+        self._last_sync = time.monotonic()
+
+        self._counters = {
+            "write_requests": 0,
+            "writes_coalesced": 0,
+            "files_written": 0,
+            "bytes_written": 0,
+            "fsyncs": 0,
+            "errors": 0
+        }
+
+    def configure(self, fsync_policy: Optional[str] = None, coalesce_seconds: Optional[float] = None,
+                  fsync_interval_seconds: Optional[float] = None) -> None:
+        """Change the fsync policy or timing. Unknown policies are ignored."""
+        if fsync_policy is not None:
+            if fsync_policy in FSYNC_POLICIES:
+                self.fsync_policy = fsync_policy
+            else:
+                logger.warning(f"Unknown fsync policy '{fsync_policy}', keeping '{self.fsync_policy}'")
+        if coalesce_seconds is not None:
+            self.coalesce_seconds = max(0.0, float(coalesce_seconds))
+        if fsync_interval_seconds is not None:
+            self.fsync_interval_seconds = max(1.0, float(fsync_interval_seconds))
+        self._wake_event.set()
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _get_path_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            lock = self._path_locks.get(path)
+            if lock is None:
+                lock = self._path_locks[path] = threading.Lock()
+            return lock
+
+    def _replace(self, path: str, data: bytes) -> bool:
+        """Atomically replace a file with data, fsyncing as the policy says. Caller must hold the path's lock."""
+        sync_now = self.fsync_policy == FSYNC_ALWAYS
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                if sync_now:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error(f"Error writing {path}: {e}")
+            self._count("errors")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+        fsyncs = 1 if sync_now else 0
+        if sync_now:
+            # Make the rename itself durable
+            try:
+                _fsync_path(os.path.dirname(path) or ".")
+                fsyncs += 1
+            except OSError:
+                # Directories cannot be opened on Windows
+                pass
+
+        with self._lock:
+            self._counters["files_written"] += 1
+            self._counters["bytes_written"] += len(data)
+            self._counters["fsyncs"] += fsyncs
+            if not sync_now:
+                self._unsynced.add(path)
+        if not sync_now:
+            self._ensure_thread()
+        return True
+
+    def write_bytes(self, path: PathLike, data: bytes, coalesce: bool = False) -> bool:
+        """
+        Replace a file with data.
+
+        Args:
+            path: File to write
+            data: The new contents
+            coalesce: Wait for the coalescing window and only write the latest contents
+
+        Returns:
+            True if the write succeeded or was queued, False otherwise
+        """
+        path = os.fspath(path)
+        if coalesce and self.coalesce_seconds > 0:
+            with self._lock:
+                self._counters["write_requests"] += 1
+                previous = self._pending.get(path)
+                if previous is not None:
+                    self._counters["writes_coalesced"] += 1
+                    due = previous[0]
+                else:
+                    due = time.monotonic() + self.coalesce_seconds
+                self._pending[path] = (due, data)
+            self._ensure_thread()
+            return True
+
+        # Queued contents are taken under the path lock, so an older version can never land after a newer one
+        with self._get_path_lock(path):
+            with self._lock:
+                self._counters["write_requests"] += 1
+                # A direct write supersedes any queued one
+                if self._pending.pop(path, None) is not None:
+                    self._counters["writes_coalesced"] += 1
+            return self._replace(path, data)
+
+    def write_text(self, path: PathLike, text: str, coalesce: bool = False) -> bool:
+        """Replace a file with utf-8 text. See write_bytes."""
+        return self.write_bytes(path, text.encode("utf-8"), coalesce)
+
+    def write_json(self, path: PathLike, data: Any, indent: Optional[int] = None, coalesce: bool = False) -> bool:
+        """
+        Replace a file with data serialized as JSON. The data is serialized
+        right away, so the caller may keep changing it.
+
+        Returns:
+            True if the write succeeded or was queued, False otherwise
+        """
+        try:
+            text = json.dumps(data, indent=indent)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error serializing data for {os.fspath(path)}: {e}")
+            self._count("errors")
+            return False
+        return self.write_text(path, text, coalesce)
+
+    def read_json(self, path: PathLike, default: Any = None) -> Any:
+        """
+        Load a JSON file, seeing writes that are still waiting to be coalesced.
+
+        Returns:
+            The parsed contents, or default if the file does not exist
+        """
+        path = os.fspath(path)
+        with self._lock:
+            pending = self._pending.get(path)
+        if pending is not None:
+            return json.loads(pending[1].decode("utf-8"))
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def flush(self, path: Optional[PathLike] = None) -> None:
+        """Write queued contents now, for one file or for all of them."""
+        if path is None:
+            with self._lock:
+                paths = list(self._pending)
+        else:
+            paths = [os.fspath(path)]
+        for pending_path in paths:
+            with self._get_path_lock(pending_path):
+                with self._lock:
+                    entry = self._pending.pop(pending_path, None)
+                if entry is not None:
+                    self._replace(pending_path, entry[1])
+
+    def discard(self, path: PathLike) -> int:
+        """
+        Drop queued writes of a file, or of every file under a directory, before it is deleted.
+
+        Returns:
+            The number of queued writes dropped
+        """
+        path = os.fspath(path)
+        prefix = os.path.join(path, "")
+        with self._lock:
+            dropped = [pending_path for pending_path in self._pending
+                       if pending_path == path or pending_path.startswith(prefix)]
+        for pending_path in dropped:
+            with self._get_path_lock(pending_path):
+                with self._lock:
+                    self._pending.pop(pending_path, None)
+        return len(dropped)
+
+    def sync(self) -> None:
+        """fsync every file replaced since the last sync, and their directories."""
+        with self._sync_lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        with self._lock:
+            paths = self._unsynced
+            self._unsynced = set()
+            self._last_sync = time.monotonic()
+        if not paths:
+            return
+
+        directories = set()
+        fsyncs = 0
+        for path in paths:
+            try:
+                with self._get_path_lock(path):
+                    _fsync_path(path)
+                fsyncs += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Error syncing {path}: {e}")
+                self._count("errors")
+                continue
+            directories.add(os.path.dirname(path) or ".")
+        for directory in directories:
+            try:
+                _fsync_path(directory)
+                fsyncs += 1
+            except OSError:
+                pass
+        self._count("fsyncs", fsyncs)
+
+    def shutdown(self) -> None:
+        """Write every queued file and fsync everything that is not durable yet."""
+        self.flush()
+        self.sync()
+
+    def get_io_counters(self) -> Dict[str, Any]:
+        """Get the write counters since startup, plus the current policy and backlog."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending_writes"] = len(self._pending)
+            counters["unsynced_files"] = len(self._unsynced)
+        counters["fsync_policy"] = self.fsync_policy
+        counters["coalesce_seconds"] = self.coalesce_seconds
+        return counters
+
+    def _ensure_thread(self) -> None:
+        """Start the background writer if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._wake_event.set()
+                return
+            self._thread = threading.Thread(target=self._writer_loop, name="DurableStoreWriter", daemon=True)
+            self._thread.start()
+
+    def _writer_loop(self) -> None:
+        """Write coalesced files when their window ends and run batched fsyncs."""
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due_paths = [path for path, (due, _) in self._pending.items() if due <= now]
+                next_due = min((due for due, _ in self._pending.values()), default=None)
+                sync_due = (self.fsync_policy == FSYNC_BATCHED and self._unsynced and
+                            now - self._last_sync >= self.fsync_interval_seconds)
+
+            for path in due_paths:
+                self.flush(path)
+            if sync_due:
+                self.sync()
+
+            timeout = self.fsync_interval_seconds
+            if next_due is not None:
+                timeout = min(timeout, max(0.05, next_due - time.monotonic()))
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
+
+
+# Process-wide store used for all persistent files
+durable_store = DurableStore()
+
+
+def write_json(path: PathLike, data: Any, indent: Optional[int] = None, coalesce: bool = False) -> bool:
+    """Atomically write data as JSON. See DurableStore.write_json."""
+    return durable_store.write_json(path, data, indent, coalesce)
+
+
+def write_text(path: PathLike, text: str, coalesce: bool = False) -> bool:
+    """Atomically write utf-8 text. See DurableStore.write_text."""
+    return durable_store.write_text(path, text, coalesce)
+
+
+def write_bytes(path: PathLike, data: bytes, coalesce: bool = False) -> bool:
+    """Atomically write bytes. See DurableStore.write_bytes."""
+    return durable_store.write_bytes(path, data, coalesce)
+
+
+def read_json(path: PathLike, default: Any = None) -> Any:
+    """Load a JSON file, including coalesced writes not on disk yet. See DurableStore.read_json."""
+    return durable_store.read_json(path, default)
+
+
+def discard_pending(path: PathLike) -> int:
+    """Drop queued writes under a path that is about to be deleted. See DurableStore.discard."""
+    return durable_store.discard(path)
+
+
+def flush_durable_writes() -> None:
+    """Write all coalesced files and fsync everything. Called on shutdown."""
+    durable_store.shutdown()
+
+
+def get_io_counters() -> Dict[str, Any]:
+    """Get the durable write counters. See DurableStore.get_io_counters."""
+    return durable_store.get_io_counters()
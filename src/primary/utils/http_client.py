@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for Huntarr
+Provides pooled keep-alive sessions for all *arr API modules, a single
+retry/backoff policy and per-host connection reuse counters. Health probes
+and status checks use a separate session per host that never retries, so an
+unreachable instance fails after one timeout.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Tuple, List, Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.json_stream import filter_json_array
+from src.primary.settings_manager import get_advanced_setting, get_ssl_verify_setting
+
+http_logger = get_logger("huntarr")
+
+# Identify Huntarr to the *arr applications
+USER_AGENT = "Huntarr/1.0 (https://github.com/plexguide/Huntarr.io)"
+
+# Status codes worth retrying - transient proxy/server failures and throttling
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Only idempotent methods are retried on read errors and bad statuses.
+# Connection errors are retried for every method since nothing was sent yet.
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+# Chunk size used when streaming large JSON responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Sessions keyed by (origin, verify_ssl, retries) so every instance keeps its own pools
+_sessions: Dict[Tuple[str, bool, bool], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Page fetch slots per host, shared by every paginator hitting that instance
+_page_semaphores: Dict[str, Tuple[threading.BoundedSemaphore, int]] = {}
+
+
+def _get_origin(url: str) -> str:
+    """Return the scheme://host:port portion of a URL, used as the pool key."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def build_retry_policy(retries_enabled: bool = True) -> Retry:
+    """
+    Build the retry/backoff policy shared by every pooled session.
+
+    Args:
+        retries_enabled: If False, return a policy that never retries (for health probes)
+
+    Returns:
+        A urllib3 Retry object configured from the advanced settings
+    """
+    if not retries_enabled:
+        return Retry(0, raise_on_status=False)
+
+    retries = int(get_advanced_setting("http_max_retries", 2))
+    backoff_factor = float(get_advanced_setting("http_backoff_factor", 1.0))
+
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        # Hand the final response back to the caller so existing status handling still applies
+        raise_on_status=False,
+        respect_retry_after_header=True
+    )
+
+
+def _create_session(verify_ssl: bool, retries_enabled: bool = True) -> requests.Session:
+    """Create a new pooled session with the shared retry policy (or no retries) mounted."""
+    pool_connections = int(get_advanced_setting("http_pool_connections", 10))
+    pool_maxsize = int(get_advanced_setting("http_pool_maxsize", 10))
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=build_retry_policy(retries_enabled)
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.verify = verify_ssl
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def get_session(api_url: str, verify_ssl: Optional[bool] = None, retries: bool = True) -> requests.Session:
+    """
+    Get the pooled session for an API URL.
+
+    Args:
+        api_url: The base URL (or any full URL) of the target application
+        verify_ssl: Whether to verify SSL certificates. Defaults to the general setting.
+        retries: Whether the session applies the retry/backoff policy
+
+    Returns:
+        A requests.Session that keeps connections to that host alive
+    """
+    if verify_ssl is None:
+        verify_ssl = get_ssl_verify_setting()
+
+    key = (_get_origin(api_url), bool(verify_ssl), bool(retries))
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            http_logger.debug(f"Creating pooled HTTP session for {key[0]} (verify_ssl={key[1]}, retries={key[2]})")
+            session = _create_session(key[1], key[2])
+            _sessions[key] = session
+        return session
+
+
+def request(method: str, url: str, retries: bool = True, **kwargs: Any) -> requests.Response:
+    """
+    Send a request through the pooled session for the URL's host.
+
+    Accepts the same keyword arguments as requests.request. The SSL verification
+    setting is applied automatically when 'verify' is not given.
+
+    Args:
+        method: HTTP method (GET, POST, PUT, DELETE)
+        url: The full URL to request
+        retries: Whether to apply the retry/backoff policy. Health probes and
+            status checks pass False so a dead instance costs a single timeout.
+
+    Returns:
+        The requests.Response object
+    """
+    verify_ssl = kwargs.pop("verify", None)
+    if verify_ssl is None:
+        verify_ssl = get_ssl_verify_setting()
+
+    session = get_session(url, verify_ssl, retries)
+    return session.request(method.upper(), url, verify=verify_ssl, **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """Send a pooled GET request."""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    """Send a pooled POST request."""
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs: Any) -> requests.Response:
+    """Send a pooled PUT request."""
+    return request("PUT", url, **kwargs)
+
+
+def delete(url: str, **kwargs: Any) -> requests.Response:
+    """Send a pooled DELETE request."""
+    return request("DELETE", url, **kwargs)
+
+
+def get_json_array(url: str, predicate: Optional[Callable[[Any], bool]] = None,
+                   transform: Optional[Callable[[Any], Any]] = None, **kwargs: Any) -> List[Any]:
+    """
+    GET a JSON array and decode it incrementally, keeping only matching elements.
+
+    The response body is streamed and parsed one element at a time, so large
+    library listings (e.g. /api/v3/movie) never sit in memory as a whole.
+
+    Args:
+        url: The full URL to request
+        predicate: Function returning True for elements to keep. Keeps everything if None.
+        transform: Optional function applied to each kept element
+
+    Returns:
+        The list of matching elements
+
+    Raises:
+        requests.exceptions.RequestException: On request or HTTP status errors
+        ValueError: If the body is not a valid JSON array
+    """
+    response = request("GET", url, stream=True, **kwargs)
+    try:
+        response.raise_for_status()
+        if not response.encoding:
+            response.encoding = "utf-8"
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)
+        return filter_json_array(chunks, predicate, transform)
+    finally:
+        response.close()
+
+
+def _get_page_semaphore(api_url: str) -> Tuple[threading.BoundedSemaphore, int]:
+    """Get the semaphore (and its limit) capping concurrent page fetches for one instance."""
+    origin = _get_origin(api_url)
+    with _sessions_lock:
+        entry = _page_semaphores.get(origin)
+        if entry is None:
+            limit = max(1, int(get_advanced_setting("http_page_concurrency", 4)))
+            entry = (threading.BoundedSemaphore(limit), limit)
+            _page_semaphores[origin] = entry
+        return entry
+
+
+def fetch_all_pages(api_url: str, fetch_page: Callable[[int], Optional[Dict[str, Any]]], page_size: int,
+                    records_key: str = "records", total_key: str = "totalRecords") -> Tuple[Optional[List[Any]], int]:
+    """
+    Fetch every page of a paginated *arr endpoint.
+
+    Page 1 is fetched first to learn the total record count. The remaining pages
+    are fetched on a bounded worker pool and merged back in page order. All
+    paginators for the same instance share one concurrency cap
+    ('http_page_concurrency'), so parallel callers cannot overload an instance.
+
+    Args:
+        api_url: The base URL of the instance, used to pick the concurrency cap
+        fetch_page: Function that takes a page number and returns the parsed JSON page (or None on failure)
+        page_size: The page size passed to the endpoint
+        records_key: Key holding the records in each page
+        total_key: Key holding the total record count
+
+    Returns:
+        A tuple of (records in page order, total records reported). Records is None if page 1 failed.
+        If a later page fails, only the pages before it are returned.
+    """
+    semaphore, limit = _get_page_semaphore(api_url)
+
+    def load_page(page: int) -> Optional[List[Any]]:
+        with semaphore:
+            data = fetch_page(page)
+        if isinstance(data, list):
+            return data
+        if not isinstance(data, dict):
+            return None
+        return data.get(records_key, [])
+
+    with semaphore:
+        first_page = fetch_page(1)
+
+    if first_page is None:
+        return None, 0
+
+    # Some v1 endpoints return a plain list without pagination
+    if isinstance(first_page, list):
+        return first_page, len(first_page)
+
+    if not isinstance(first_page, dict):
+        http_logger.error(f"Unexpected page format from {_get_origin(api_url)}: {type(first_page).__name__}")
+        return None, 0
+
+    records = list(first_page.get(records_key, []))
+    total_records = first_page.get(total_key)
+
+    if total_records is None:
+        # No total available - fall back to walking pages until a short one
+        page = 1
+        page_records = records
+        while len(page_records) >= page_size:
+            page += 1
+            page_records = load_page(page)
+            if not page_records:
+                break
+            records.extend(page_records)
+        return records, len(records)
+
+    total_pages = (total_records + page_size - 1) // page_size
+    if total_pages <= 1 or not records:
+        return records, total_records
+
+    results: Dict[int, Optional[List[Any]]] = {}
+
+    # Keep at most 'limit' pages in flight so results are consumed as fast as they arrive
+    with ThreadPoolExecutor(max_workers=min(limit, total_pages - 1), thread_name_prefix="PageFetch") as pool:
+        in_flight = {}
+        next_page = 2
+        while next_page <= total_pages or in_flight:
+            while next_page <= total_pages and len(in_flight) < limit:
+                in_flight[pool.submit(load_page, next_page)] = next_page
+                next_page += 1
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                try:
+                    results[page] = future.result()
+                except Exception as e:
+                    http_logger.error(f"Error fetching page {page} from {_get_origin(api_url)}: {e}")
+                    results[page] = None
+
+    # Merge in page order, stopping at the first page that failed
+    for page in range(2, total_pages + 1):
+        page_records = results.get(page)
+        if page_records is None:
+            http_logger.error(f"Failed to fetch page {page} of {total_pages} from {_get_origin(api_url)}. Returning {len(records)} records fetched so far.")
+            break
+        records.extend(page_records)
+
+    return records, total_records
+
+
+def get_connection_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get connection reuse counters for every host with a pooled session.
+
+    Returns:
+        A dict keyed by host with requests, new connections, reused connections
+        and the reuse ratio
+    """
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+
+    for (origin, _, _), session in sessions:
+        host_stats = stats.setdefault(origin, {"requests": 0, "connections": 0, "reused": 0, "reuse_ratio": 0.0})
+        seen_adapters = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen_adapters or not hasattr(adapter, "poolmanager"):
+                continue
+            seen_adapters.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host_stats["requests"] += getattr(pool, "num_requests", 0)
+                host_stats["connections"] += getattr(pool, "num_connections", 0)
+
+    for host_stats in stats.values():
+        host_stats["reused"] = max(host_stats["requests"] - host_stats["connections"], 0)
+        if host_stats["requests"]:
+            host_stats["reuse_ratio"] = round(host_stats["reused"] / host_stats["requests"], 3)
+
+    return stats
+
+
+def close_all_sessions() -> None:
+    """Close every pooled session, e.g. on shutdown or when settings change."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+
+    for session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            http_logger.debug(f"Error closing pooled HTTP session: {e}")
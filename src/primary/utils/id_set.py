@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Compact media ID sets for Huntarr
+Stores integer media IDs in a sorted array of 32-bit unsigned ints (4 bytes per
+ID instead of a ~60 byte Python string in a set) with bisect lookups. IDs that
+are not plain integers (season keys like "12_3", hashes, ...) fall back to a
+regular set. The sorted part can be saved to and memory-mapped from a binary
+sidecar file, so loading it needs no parsing.
+"""
+
+import os
+import mmap
+import struct
+import pathlib
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional, Set, Union
+
+from src.primary.utils.logger import get_logger
+from src.primary.utils.durable_store import write_bytes
+
+logger = get_logger("huntarr")
+
+# Sidecar layout: magic, ID count, mtime (ns) of the file the sidecar belongs to,
+# then the sorted IDs as native uint32, then the non-integer IDs one per line (utf-8)
+SIDECAR_MAGIC = b"HID1"
+SIDECAR_HEADER = struct.Struct("<4sIQ")
+
+# Merge the unsorted tail into the sorted array once it grows past this size
+MAX_TAIL_SIZE = 1024
+
+MAX_ID = 2 ** 32 - 1
+
+
+def _as_int_id(media_id: Union[str, int]) -> Optional[int]:
+    """Return the ID as an int if it can be stored in the array (canonical, unsigned 32-bit)."""
+    if isinstance(media_id, int):
+        return media_id if 0 <= media_id <= MAX_ID else None
+    # str.isdigit() alone also accepts non-ASCII digits such as "²", which int() rejects
+    if media_id.isascii() and media_id.isdigit() and (media_id == "0" or media_id[0] != "0"):
+        value = int(media_id)
+        if value <= MAX_ID:
+            return value
+    return None
+
+
+class CompactIdSet:
+    """
+    A set of media IDs optimized for large numbers of integer IDs.
+
+    Membership, iteration and length work with string IDs, like the set[str]
+    it replaces. Integer IDs live in a sorted uint32 array (possibly a
+    read-only view of a memory-mapped sidecar) plus a small unsorted tail that
+    is merged into the array periodically.
+    """
+
+    def __init__(self, media_ids: Iterable[Union[str, int]] = ()):
+        self._sorted: Union[array, memoryview] = array("I")
+        self._tail: Set[int] = set()
+        self._strings: Set[str] = set()
+        self._mmap: Optional[mmap.mmap] = None
+        self.update(media_ids)
+        self.merge()
+
+    def _in_sorted(self, value: int) -> bool:
+        index = bisect_left(self._sorted, value)
+        return index < len(self._sorted) and self._sorted[index] == value
+
+    def __contains__(self, media_id: object) -> bool:
+        if not isinstance(media_id, (str, int)):
+            return False
+        value = _as_int_id(media_id)
+        if value is None:
+            return str(media_id) in self._strings
+        return value in self._tail or self._in_sorted(value)
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._tail) + len(self._strings)
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self._sorted:
+            yield str(value)
+        for value in self._tail:
+            yield str(value)
+        yield from self._strings
+
+    def add(self, media_id: Union[str, int]) -> bool:
+        """Add an ID. Returns True if it was not in the set yet."""
+        value = _as_int_id(media_id)
+        if value is None:
+            media_id = str(media_id)
+            if media_id in self._strings:
+                return False
+            self._strings.add(media_id)
+            return True
+
+        if value in self._tail or self._in_sorted(value):
+            return False
+        self._tail.add(value)
+        if len(self._tail) >= MAX_TAIL_SIZE:
+            self.merge()
+        return True
+
+    def update(self, media_ids: Iterable[Union[str, int]]) -> None:
+        """Add several IDs."""
+        for media_id in media_ids:
+            self.add(media_id)
+
+    def difference(self, media_ids: Iterable[str]) -> Set[str]:
+        """Return the IDs from media_ids that are not in this set."""
+        return {media_id for media_id in media_ids if media_id not in self}
+
+    def merge(self) -> None:
+        """Merge the unsorted tail into the sorted array (releasing any memory map)."""
+        if not self._tail and self._mmap is None:
+            return
+        existing = self._sorted
+        merged = array("I")
+        # Two-way merge: only the tail is sorted, the runs of existing IDs
+        # between two tail values are copied over as slices
+        start = 0
+        for value in sorted(self._tail):
+            index = bisect_left(existing, value, start)
+            merged.extend(existing[start:index])
+            merged.append(value)
+            start = index + 1 if index < len(existing) and existing[index] == value else index
+        merged.extend(existing[start:])
+        self._release()
+        self._sorted = merged
+        self._tail = set()
+
+    def _release(self) -> None:
+        """Drop the memory-mapped view, if any."""
+        if self._mmap is None:
+            return
+        if isinstance(self._sorted, memoryview):
+            self._sorted.release()
+        self._sorted = array("I")
+        try:
+            self._mmap.close()
+        except (BufferError, ValueError):
+            pass
+        self._mmap = None
+
+    def close(self) -> None:
+        """Release the memory map backing this set (the set is emptied)."""
+        self._release()
+        self._tail = set()
+        self._strings = set()
+
+    def save(self, path: pathlib.Path, source_mtime_ns: int = 0) -> bool:
+        """
+        Write the set to a binary sidecar file.
+
+        Args:
+            path: Sidecar file to write
+            source_mtime_ns: mtime of the file this sidecar mirrors, checked again on load
+
+        Returns:
+            True if successful, False otherwise
+        """
+        self.merge()
+        data = [SIDECAR_HEADER.pack(SIDECAR_MAGIC, len(self._sorted), source_mtime_ns), self._sorted.tobytes()]
+        if self._strings:
+            data.append("\n".join(sorted(self._strings)).encode("utf-8"))
+        if not write_bytes(path, b"".join(data)):
+            logger.error(f"Error writing ID sidecar {path}")
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path: pathlib.Path, source_mtime_ns: Optional[int] = None) -> Optional["CompactIdSet"]:
+        """
+        Memory-map a sidecar file written by save().
+
+        Args:
+            path: Sidecar file to read
+            source_mtime_ns: If given, the sidecar is only used if it was written for this mtime
+
+        Returns:
+            The loaded set, or None if the sidecar is missing, stale or invalid
+        """
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < SIDECAR_HEADER.size:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, count, mtime_ns = SIDECAR_HEADER.unpack_from(mapped, 0)
+            ids_end = SIDECAR_HEADER.size + count * array("I").itemsize
+            if magic != SIDECAR_MAGIC or ids_end > len(mapped):
+                raise ValueError("invalid sidecar header")
+            if source_mtime_ns is not None and mtime_ns != source_mtime_ns:
+                mapped.close()
+                return None
+
+            id_set = cls()
+            id_set._mmap = mapped
+            id_set._sorted = memoryview(mapped)[SIDECAR_HEADER.size:ids_end].cast("I")
+            if ids_end < len(mapped):
+                id_set._strings = set(mapped[ids_end:].decode("utf-8").split("\n"))
+            return id_set
+        except Exception as e:
+            logger.warning(f"Ignoring invalid ID sidecar {path}: {e}")
+            mapped.close()
+            return None
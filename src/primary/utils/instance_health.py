@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Instance health registry for Huntarr
+Caches the result of *arr connection checks per instance and wraps them in a
+circuit breaker, so the hunting loops and the web status API share one view of
+which instances are reachable. Instances that keep failing are skipped without
+waiting for a timeout, and are re-probed with exponential backoff.
+
+Only the hunting loops' checks (made with the full API timeout) drive the
+circuit. The status API serves the cached health and refreshes it with short
+background probes, whose failures are shown but never open the circuit.
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from src.primary.utils.logger import get_logger
+from src.primary.settings_manager import get_advanced_setting
+
+logger = get_logger("huntarr")
+
+# Circuit states
+STATE_CLOSED = "closed"        # Instance is healthy, checks are cached
+STATE_OPEN = "open"            # Instance is failing, calls are skipped until the backoff expires
+STATE_HALF_OPEN = "half_open"  # Backoff expired, a single probe decides the next state
+
+# Defaults for the advanced settings
+DEFAULT_CACHE_SECONDS = 60
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_BACKOFF_SECONDS = 30
+DEFAULT_MAX_BACKOFF_SECONDS = 1800
+
+
+class InstanceHealth:
+    """Health and circuit state of one instance."""
+
+    def __init__(self, app_type: str, api_url: str):
+        self.app_type = app_type
+        self.api_url = api_url
+        self.state = STATE_CLOSED
+        self.healthy: Optional[bool] = None
+        self.checked_at = 0.0
+        self.failures = 0
+        self.open_count = 0
+        self.retry_at = 0.0
+        self.probing = False
+        # A background status probe is running (separate, so it never stands in for a hunt check)
+        self.status_probing = False
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the health state for the status API."""
+        return {
+            "app": self.app_type,
+            "api_url": self.api_url,
+            "state": self.state,
+            "healthy": self.healthy,
+            "checked_at": self.checked_at,
+            "failures": self.failures,
+            "retry_in": max(0, int(self.retry_at - time.time())) if self.state == STATE_OPEN else 0
+        }
+
+
+# Health entries keyed by (app_type, api_url, api_key)
+_registry: Dict[Tuple[str, str, str], InstanceHealth] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_entry(app_type: str, api_url: str, api_key: str) -> InstanceHealth:
+    key = (app_type, (api_url or "").rstrip("/"), api_key or "")
+    with _registry_lock:
+        entry = _registry.get(key)
+        if entry is None:
+            entry = InstanceHealth(app_type, key[1])
+            _registry[key] = entry
+        return entry
+
+
+def _backoff_seconds(open_count: int) -> float:
+    """Exponential backoff for the n-th consecutive time a circuit opens."""
+    base = float(get_advanced_setting("health_backoff_seconds", DEFAULT_BACKOFF_SECONDS))
+    maximum = float(get_advanced_setting("health_max_backoff_seconds", DEFAULT_MAX_BACKOFF_SECONDS))
+    return min(maximum, base * (2 ** max(0, open_count - 1)))
+
+
+def _record(entry: InstanceHealth, healthy: bool, count_failure: bool = True) -> None:
+    """
+    Apply a check result to an entry. Caller must hold the entry lock.
+
+    Failures with count_failure=False (short status probes) only update the
+    cached health, they do not count towards opening the circuit.
+    """
+    now = time.time()
+    entry.healthy = healthy
+    entry.checked_at = now
+
+    if healthy:
+        if entry.state != STATE_CLOSED:
+            logger.info(f"{entry.app_type} instance at {entry.api_url} is reachable again. Closing circuit.")
+        entry.state = STATE_CLOSED
+        entry.failures = 0
+        entry.open_count = 0
+        entry.retry_at = 0.0
+        return
+
+    if not count_failure:
+        return
+
+    entry.failures += 1
+    threshold = max(1, int(get_advanced_setting("health_failure_threshold", DEFAULT_FAILURE_THRESHOLD)))
+    if entry.state == STATE_HALF_OPEN or entry.failures >= threshold:
+        entry.open_count += 1
+        backoff = _backoff_seconds(entry.open_count)
+        entry.state = STATE_OPEN
+        entry.retry_at = now + backoff
+        logger.warning(f"{entry.app_type} instance at {entry.api_url} failed {entry.failures} check(s). Skipping it for {backoff:.0f}s.")
+
+
+def check_instance(app_type: str, api_url: str, api_key: str, check_func: Callable[..., bool],
+                   api_timeout: int, max_age: Optional[float] = None) -> bool:
+    """
+    Check whether an instance is reachable, using the cached health when possible.
+
+    A healthy result is reused for 'health_cache_seconds'. An instance whose
+    circuit is open returns False immediately until its backoff expires, then a
+    single caller probes it while concurrent callers keep getting the last result.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        api_url: The base URL of the instance
+        api_key: The API key of the instance
+        check_func: The app's check_connection(api_url, api_key, api_timeout) function
+        api_timeout: Timeout passed to check_func
+        max_age: Maximum age in seconds of a cached healthy result. Defaults to 'health_cache_seconds'.
+
+    Returns:
+        True if the instance is considered reachable, False otherwise
+    """
+    entry = _get_entry(app_type, api_url, api_key)
+    if max_age is None:
+        max_age = float(get_advanced_setting("health_cache_seconds", DEFAULT_CACHE_SECONDS))
+
+    with entry.lock:
+        now = time.time()
+        if entry.state == STATE_OPEN:
+            if now < entry.retry_at:
+                return False
+            entry.state = STATE_HALF_OPEN
+        elif entry.state == STATE_CLOSED and entry.healthy and now - entry.checked_at < max_age:
+            return True
+
+        if entry.probing:
+            # Another thread is already checking - don't stack up timeouts behind it
+            return bool(entry.healthy)
+        entry.probing = True
+
+    try:
+        healthy = bool(check_func(api_url, api_key, api_timeout))
+    except Exception as e:
+        logger.error(f"Error checking connection to {app_type} instance at {api_url}: {e}")
+        healthy = False
+
+    with entry.lock:
+        entry.probing = False
+        _record(entry, healthy)
+    return healthy
+
+
+def get_cached_health(app_type: str, api_url: str, api_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the cached health of an instance without checking it.
+
+    Returns:
+        The health dict, or None if the instance was never checked
+    """
+    key = (app_type, (api_url or "").rstrip("/"), api_key or "")
+    with _registry_lock:
+        entry = _registry.get(key)
+    if entry is None or entry.healthy is None:
+        return None
+    with entry.lock:
+        return entry.to_dict()
+
+
+def _status_probe(entry: InstanceHealth, api_url: str, api_key: str, check_func: Callable[..., bool],
+                  api_timeout: int) -> None:
+    """Refresh the cached health of an instance for the status API."""
+    try:
+        healthy = bool(check_func(api_url, api_key, api_timeout))
+    except Exception as e:
+        logger.debug(f"Status probe of {entry.app_type} instance at {api_url} failed: {e}")
+        healthy = False
+
+    with entry.lock:
+        entry.status_probing = False
+        # A short probe timing out says little about the hunt's longer timeout
+        _record(entry, healthy, count_failure=False)
+
+
+def get_status(app_type: str, api_url: str, api_key: str, check_func: Callable[..., bool],
+               api_timeout: int) -> bool:
+    """
+    Get whether an instance is reachable for the status API, without blocking on a check.
+
+    Returns the cached health right away. If it is older than 'health_cache_seconds'
+    (or the instance was never checked) a probe runs in the background and the
+    next status request sees its result. Instances with an open circuit are not
+    probed until the hunting loop's backoff expires.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        api_url: The base URL of the instance
+        api_key: The API key of the instance
+        check_func: The app's check_connection(api_url, api_key, api_timeout) function
+        api_timeout: Timeout for the background probe
+
+    Returns:
+        The last known health, False if it is not known yet
+    """
+    health = get_cached_health(app_type, api_url, api_key)
+    max_age = float(get_advanced_setting("health_cache_seconds", DEFAULT_CACHE_SECONDS))
+    if health is not None and (health["state"] == STATE_OPEN or time.time() - health["checked_at"] < max_age):
+        return bool(health["healthy"])
+
+    entry = _get_entry(app_type, api_url, api_key)
+    with entry.lock:
+        start_probe = not entry.status_probing
+        entry.status_probing = True
+    if start_probe:
+        threading.Thread(target=_status_probe, args=(entry, api_url, api_key, check_func, api_timeout),
+                         name=f"HealthProbe-{app_type}", daemon=True).start()
+    return bool(health and health["healthy"])
+
+
+def reset_health(app_type: Optional[str] = None) -> None:
+    """Forget the health of one app's instances, or of every instance."""
+    with _registry_lock:
+        for key in list(_registry.keys()):
+            if app_type is None or key[0] == app_type:
+                _registry.pop(key, None)
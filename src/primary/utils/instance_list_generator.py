@@ -11,6 +11,8 @@ import json
 import logging
 from pathlib import Path
 
+from src.primary.utils.durable_store import write_json
+
 # Set up logging
 logger = logging.getLogger("huntarr.instance_list_generator")
 
@@ -123,15 +125,15 @@ def generate_instance_list():
     
     # Write the consolidated list to list.json in Docker config volume
     list_file = scheduling_dir / "list.json"
-    with open(list_file, 'w') as f:
-        json.dump(instances, f, indent=2)
+    if not write_json(list_file, instances, indent=2):
+        raise OSError(f"Could not write {list_file}")
     
     # Also write to web-accessible location if path is valid
     if web_accessible_path_valid:
         try:
             web_list_file = web_accessible_dir / "app_instances.json"
-            with open(web_list_file, 'w') as f:
-                json.dump(instances, f, indent=2)
+            if not write_json(web_list_file, instances, indent=2):
+                raise OSError(f"Could not write {web_list_file}")
             logger.debug(f"Instance list generated successfully at {list_file} and {web_list_file}")
         except (PermissionError, OSError) as e:
             logger.debug(f"Cannot write to web-accessible file: {e}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON array decoding for Huntarr
+Parses a top-level JSON array one element at a time from a stream of text
+chunks, so whole-library responses never have to be held in memory at once.
+"""
+
+import json
+import re
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+# A bare scalar (number, true, false, null) only ends at one of these
+_SCALAR_END = re.compile(r"[ \t\n\r,\]]")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+
+
+def _skip_whitespace(buffer: str, pos: int) -> int:
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+class _ElementScanner:
+    """
+    Finds where an array element ends, one chunk at a time.
+
+    The nesting depth and string state carry over from chunk to chunk, so an
+    element spanning many chunks is scanned once and decoded once.
+    """
+
+    __slots__ = ("scalar", "depth", "in_string", "escaped")
+
+    def __init__(self, first_char: str):
+        self.scalar = first_char not in '{["'
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def scan(self, buffer: str, pos: int) -> Optional[int]:
+        """Scan buffer from pos. Returns the index just past the element, or None if it continues in the next chunk."""
+        if self.scalar:
+            match = _SCALAR_END.search(buffer, pos)
+            return match.start() if match else None
+
+        length = len(buffer)
+        while pos < length:
+            if self.escaped:
+                self.escaped = False
+                pos += 1
+                continue
+            if self.in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    self.escaped = True
+                    continue
+                self.in_string = False
+                if self.depth == 0:
+                    return pos
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                return None
+            pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return pos
+        return None
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array as they are decoded.
+
+    Args:
+        chunks: An iterable of text chunks making up the JSON document
+
+    Yields:
+        Each decoded element of the array, in order
+
+    Raises:
+        ValueError: If the document is not a JSON array or is malformed/truncated
+    """
+    chunk_iter = iter(chunks)
+    buffer = ""
+    pos = 0
+    started = False
+
+    def next_chunk() -> bool:
+        nonlocal buffer, pos
+        for chunk in chunk_iter:
+            if chunk:
+                buffer = chunk
+                pos = 0
+                return True
+        return False
+
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        if pos >= len(buffer):
+            if not next_chunk():
+                raise ValueError("Unexpected end of JSON stream")
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError(f"Expected a JSON array, found {char!r}")
+            started = True
+            pos += 1
+            continue
+
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            continue
+
+        # Fast path: the element is complete within this chunk. A bare scalar
+        # additionally needs its delimiter, "2." may continue as "2.5" in the next chunk.
+        try:
+            element, end = _decoder.raw_decode(buffer, pos)
+            if not isinstance(element, (dict, list, str)) and not _SCALAR_END.match(buffer, end):
+                end = None
+        except json.JSONDecodeError:
+            end = None
+        if end is not None:
+            pos = end
+            yield element
+            continue
+
+        # The element continues past this chunk: collect its text chunk by chunk, then decode it once
+        scanner = _ElementScanner(char)
+        pieces = []
+        start = pos
+        end = scanner.scan(buffer, pos)
+        while end is None:
+            pieces.append(buffer[start:])
+            if not next_chunk():
+                raise ValueError("Truncated JSON array in stream")
+            start = 0
+            end = scanner.scan(buffer, 0)
+        pieces.append(buffer[start:end])
+        text = "".join(pieces)
+
+        try:
+            element, decoded_end = _decoder.raw_decode(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed element in JSON array: {e}") from e
+        if decoded_end != len(text):
+            raise ValueError(f"Malformed element in JSON array: {text[:50]!r}")
+        pos = end
+        yield element
+
+
+def filter_json_array(chunks: Iterable[str], predicate: Optional[Callable[[Any], bool]] = None,
+                      transform: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """
+    Decode a streamed JSON array, keeping only the elements that match a predicate.
+
+    Elements that do not match are dropped as soon as they are decoded.
+
+    Args:
+        chunks: An iterable of text chunks making up the JSON document
+        predicate: Function returning True for elements to keep. Keeps everything if None.
+        transform: Optional function applied to each kept element (e.g. to drop unused fields)
+
+    Returns:
+        The list of matching (transformed) elements
+    """
+    results = []
+    for element in iter_json_array(chunks):
+        if predicate is not None and not predicate(element):
+            continue
+        results.append(transform(element) if transform is not None else element)
+    return results
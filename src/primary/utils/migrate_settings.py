@@ -15,6 +15,7 @@ logger = logging.getLogger("settings_migration")
 
 # Use the centralized path configuration
 from src.primary.utils.config_paths import CONFIG_PATH
+from src.primary.utils.durable_store import write_json
 
 # Settings file path using cross-platform configuration
 SETTINGS_DIR = CONFIG_PATH
@@ -69,8 +70,8 @@ def migrate_settings():
         
         # Save changes if needed
         if changes_made:
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as file:
-                json.dump(settings, file, indent=2)
+            if not write_json(SETTINGS_FILE, settings, indent=2):
+                raise OSError(f"Could not write {SETTINGS_FILE}")
             logger.info("Settings migration completed successfully.")
         else:
             logger.info("No changes needed, settings are already in the correct format.")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+API rate limiter for Huntarr
+Token buckets refilled from each app's hourly API cap, so search commands are
+spread evenly across the hour instead of bursting at the start of a cycle.
+Every app has one bucket for the whole cap plus one bucket per instance holding
+that instance's share of it.
+
+Only search commands are paced, one token per item searched. Library listings,
+queue, status and other read requests are not counted against the buckets.
+"""
+
+import time
+import threading
+from typing import Dict, Optional, Callable, Tuple
+
+from src.primary.utils.logger import get_logger
+from src.primary.settings_manager import load_settings, get_advanced_setting
+
+logger = get_logger("huntarr")
+
+# Default hourly cap when an app has none configured
+DEFAULT_HOURLY_CAP = 20
+
+# Default longest wait for tokens. A batch that would wait longer is skipped and
+# left for a later cycle, so the hunt thread is never parked for long.
+DEFAULT_MAX_WAIT_SECONDS = 60
+
+# Buckets keyed by (app_type, instance key). The app-wide bucket uses None as instance key.
+_buckets: Dict[Tuple[str, Optional[str]], "TokenBucket"] = {}
+_buckets_lock = threading.Lock()
+
+# Set on shutdown to release every waiting caller
+_cancel_event = threading.Event()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+
+    Tokens refill continuously at 'rate' tokens per second up to 'capacity'.
+    A request for more tokens than the capacity is allowed once the bucket is
+    full and leaves the bucket in debt. The debt is capped at one capacity, so an
+    oversized batch delays the following ones by a bounded time instead of
+    starving them for the rest of the hour.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_time(self, tokens: float) -> float:
+        """Seconds until 'tokens' can be taken. Caller must hold the condition."""
+        needed = min(tokens, self.capacity) - self._tokens
+        if needed <= 0:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return needed / self.rate
+
+    def configure(self, rate: float, capacity: float) -> None:
+        """Update the refill rate and capacity, e.g. after the hourly cap was changed."""
+        with self._condition:
+            self._refill()
+            self.rate = rate
+            self.capacity = capacity
+            self._tokens = min(self._tokens, capacity)
+            self._condition.notify_all()
+
+    def time_until_available(self, tokens: float = 1) -> float:
+        """Return the number of seconds until 'tokens' could be taken."""
+        with self._condition:
+            self._refill()
+            return self._wait_time(tokens)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if they are available right now."""
+        with self._condition:
+            self._refill()
+            if self._wait_time(tokens) > 0:
+                return False
+            self._tokens = max(self._tokens - tokens, -self.capacity)
+            return True
+
+    def release(self, tokens: float = 1) -> None:
+        """Give back tokens that were taken but not used."""
+        with self._condition:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            self._condition.notify_all()
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None,
+                stop_check: Callable[[], bool] = lambda: False) -> bool:
+        """
+        Block until tokens are available and take them.
+
+        Args:
+            tokens: Number of tokens to take
+            timeout: Maximum number of seconds to wait. Waits indefinitely if None.
+            stop_check: Function returning True if waiting should be aborted
+
+        Returns:
+            True if the tokens were taken, False on timeout, stop or shutdown
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                self._refill()
+                delay = self._wait_time(tokens)
+                if delay <= 0:
+                    self._tokens = max(self._tokens - tokens, -self.capacity)
+                    return True
+                if stop_check() or _cancel_event.is_set():
+                    return False
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or delay > remaining:
+                        return False
+                    delay = min(delay, remaining)
+                # Wake up at least once a second to notice stop requests
+                self._condition.wait(timeout=min(delay, 1.0))
+
+
+def is_rate_limit_enabled() -> bool:
+    """Return True if search commands should be paced by the token buckets."""
+    return bool(get_advanced_setting("api_rate_limit_enabled", True))
+
+
+def _get_cap_and_instances(app_type: str) -> Tuple[int, int]:
+    """Get the hourly cap of an app and its number of enabled instances."""
+    app_settings = load_settings(app_type) or {}
+    hourly_cap = int(app_settings.get("hourly_cap", DEFAULT_HOURLY_CAP) or 0)
+    instances = [instance for instance in app_settings.get("instances", [])
+                 if isinstance(instance, dict) and instance.get("enabled", True) and instance.get("api_url")]
+    return hourly_cap, max(1, len(instances))
+
+
+def _get_bucket(app_type: str, instance_key: Optional[str], hourly_cap: float) -> TokenBucket:
+    """Get (or create) a bucket and keep it in sync with the current cap."""
+    rate = max(hourly_cap, 0) / 3600.0
+    burst = max(1.0, float(get_advanced_setting("api_rate_limit_burst", 1)))
+    # A full bucket must hold a whole search batch, or every batch would leave
+    # it in debt and the next one would be skipped
+    batch_size = max(1, int(get_advanced_setting("search_batch_size", 10)))
+    capacity = max(burst, float(batch_size))
+
+    key = (app_type, instance_key)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            _buckets[key] = bucket
+            return bucket
+    if bucket.rate != rate or bucket.capacity != capacity:
+        bucket.configure(rate, capacity)
+    return bucket
+
+
+def get_buckets(app_type: str, api_url: str) -> Tuple[TokenBucket, TokenBucket]:
+    """
+    Get the app-wide bucket and the instance bucket for an instance.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        api_url: The base URL identifying the instance (must not be empty)
+
+    Returns:
+        A tuple of (app bucket, instance bucket)
+    """
+    hourly_cap, instance_count = _get_cap_and_instances(app_type)
+    app_bucket = _get_bucket(app_type, None, hourly_cap)
+    instance_bucket = _get_bucket(app_type, api_url.rstrip("/"), hourly_cap / instance_count)
+    return app_bucket, instance_bucket
+
+
+def acquire(app_type: str, api_url: str, tokens: int = 1, timeout: Optional[float] = None,
+            stop_check: Callable[[], bool] = lambda: False) -> bool:
+    """
+    Wait for permission to send a search command counted against the hourly cap.
+
+    Only search commands call this; other API requests are not paced. The
+    instance bucket is drained first so one busy instance cannot use up the
+    share of the others, then the app-wide bucket.
+
+    Args:
+        app_type: The app type (sonarr, radarr, etc)
+        api_url: The base URL identifying the instance
+        tokens: Number of API hits the request will count as
+        timeout: Maximum number of seconds to wait. Defaults to 'api_rate_limit_max_wait'.
+        stop_check: Function returning True if waiting should be aborted
+
+    Returns:
+        True if the request may be sent, False if it should be skipped
+    """
+    if not is_rate_limit_enabled():
+        return True
+
+    if timeout is None:
+        timeout = float(get_advanced_setting("api_rate_limit_max_wait", DEFAULT_MAX_WAIT_SECONDS))
+
+    if not api_url:
+        logger.error(f"{app_type} rate limit: no API URL to identify the instance. Skipping.")
+        return False
+
+    app_bucket, instance_bucket = get_buckets(app_type, api_url)
+    start = time.monotonic()
+
+    wait_time = max(app_bucket.time_until_available(tokens), instance_bucket.time_until_available(tokens))
+    if wait_time > 0:
+        if wait_time > timeout:
+            logger.info(f"{app_type} rate limit: {tokens} API hit(s) would need {wait_time:.0f}s, more than the {timeout:.0f}s maximum wait. Leaving them for a later cycle.")
+            return False
+        logger.info(f"{app_type} rate limit: waiting {wait_time:.0f}s to spread API hits across the hour")
+
+    if not instance_bucket.acquire(tokens, timeout, stop_check):
+        return False
+    remaining = max(0.0, timeout - (time.monotonic() - start))
+    if not app_bucket.acquire(tokens, remaining, stop_check):
+        # The hits are not sent, so the instance keeps its share
+        instance_bucket.release(tokens)
+        logger.debug(f"{app_type} rate limit: app-wide bucket unavailable after instance wait")
+        return False
+    return True
+
+
+def cancel_waits() -> None:
+    """Release every caller currently waiting for tokens, e.g. on shutdown."""
+    _cancel_event.set()
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    for bucket in buckets:
+        with bucket._condition:
+            bucket._condition.notify_all()
+
+
+def reset_buckets(app_type: Optional[str] = None) -> None:
+    """Forget the buckets of one app, or of every app, so they start full again."""
+    with _buckets_lock:
+        for key in list(_buckets.keys()):
+            if app_type is None or key[0] == app_type:
+                _buckets.pop(key, None)
@@ -51,6 +51,7 @@ from src.primary.routes.scheduler_routes import scheduler_api
 
 # Import background module to trigger manual cycle resets
 from src.primary import background
+from src.primary.utils import instance_health
 
 # Disable Flask default logging
 log = logging.getLogger('werkzeug')
@@ -733,8 +734,8 @@ def api_app_status(app_name):
                                 inst_key = instance.get("api_key")
                                 inst_name = instance.get("instance_name", "Default")
                                 try:
-                                    # Use a short timeout per instance check
-                                    if check_connection_func(inst_url, inst_key, min(api_timeout, 5)):
+                                    # Cached health shared with the hunting loop, refreshed in the background with a short timeout
+                                    if instance_health.get_status(app_name, inst_url, inst_key, check_connection_func, min(api_timeout, 5)):
                                         web_logger.debug(f"{app_name.capitalize()} instance '{inst_name}' connected successfully.")
                                         connected_count += 1
                                     else:
@@ -757,7 +758,7 @@ def api_app_status(app_name):
                     is_connected = False
                     if is_configured and hasattr(api_module, 'check_connection'):
                         check_connection_func = getattr(api_module, 'check_connection')
-                        is_connected = check_connection_func(api_url, api_key, min(api_timeout, 5))
+                        is_connected = instance_health.get_status(app_name, api_url, api_key, check_connection_func, min(api_timeout, 5))
                     response_data = {"total_configured": 1 if is_configured else 0, "connected_count": 1 if is_connected else 0}
                                 
             except ImportError as e:
@@ -784,8 +785,8 @@ def api_app_status(app_name):
                     
                     if hasattr(api_module, 'check_connection'):
                         check_connection_func = getattr(api_module, 'check_connection')
-                        # Use a short timeout to prevent long waits
-                        is_connected = check_connection_func(api_url, api_key, min(api_timeout, 5))
+                        # Cached health, refreshed in the background with a short timeout
+                        is_connected = instance_health.get_status(app_name, api_url, api_key, check_connection_func, min(api_timeout, 5))
                     else:
                         web_logger.warning(f"check_connection function not found in {module_path}")
                 except ImportError:
@@ -882,6 +883,42 @@ def api_get_stats():
         web_logger.error(f"Error fetching statistics: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/stats/timeseries', methods=['GET'])
+def api_get_stats_timeseries():
+    """Get hunted and upgraded counts over a time range"""
+    try:
+        from src.primary.stats_manager import get_stats_timeseries
+
+        app_type = request.args.get('app_type', 'all')
+        instance_name = request.args.get('instance') or None
+        metric = request.args.get('metric') or None
+        resolution = request.args.get('resolution') or None
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+
+        if metric is not None and metric not in ("hunted", "upgraded"):
+            return jsonify({"success": False, "error": f"Invalid metric: {metric}"}), 400
+        if resolution is not None and resolution not in ("minute", "hour", "day"):
+            return jsonify({"success": False, "error": f"Invalid resolution: {resolution}"}), 400
+
+        timeseries = get_stats_timeseries(app_type, instance_name, metric, start, end, resolution)
+        return jsonify({"success": True, "timeseries": timeseries})
+    except Exception as e:
+        web_logger = get_logger("web_server")
+        web_logger.error(f"Error fetching statistics time series: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/stats/io', methods=['GET'])
+def api_get_io_stats():
+    """Get the durable write counters (writes, coalesced writes, bytes, fsyncs)"""
+    try:
+        from src.primary.utils.durable_store import get_io_counters
+        return jsonify({"success": True, "io": get_io_counters()})
+    except Exception as e:
+        web_logger = get_logger("web_server")
+        web_logger.error(f"Error fetching I/O statistics: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/stats/reset', methods=['POST'])
 def api_reset_stats():
     """Reset the media statistics for all apps or a specific app"""
@@ -917,14 +954,14 @@ def api_get_hourly_caps():
     """Get hourly API usage caps for each app"""
     try:
         # Import necessary functions
-        from src.primary.stats_manager import load_hourly_caps
+        from src.primary.stats_manager import get_hourly_caps
         from src.primary.settings_manager import load_settings
         
         # Get the logger
         web_logger = get_logger("web_server")
         
         # Load the current hourly caps
-        caps = load_hourly_caps()
+        caps = get_hourly_caps()
         
         # Get app-specific hourly cap limits
         app_limits = {}
@@ -948,6 +985,18 @@ def api_get_hourly_caps():
             "message": "Error retrieving hourly API caps."
         }), 500
 
+@app.route('/api/http-stats', methods=['GET'])
+def api_get_http_stats():
+    """Get connection reuse counters for each *arr host"""
+    try:
+        from src.primary.utils.http_client import get_connection_stats
+
+        return jsonify({"success": True, "hosts": get_connection_stats()})
+    except Exception as e:
+        web_logger = get_logger("web_server")
+        web_logger.error(f"Error retrieving HTTP connection stats: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/stats/reset_public', methods=['POST'])
 def api_reset_stats_public():
     """Reset the media statistics for all apps or a specific app - public endpoint without auth"""
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the runtime database schema migrations (src/primary/datastore.py, src/primary/migrate_configs.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import json
+import os
+import pathlib
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary import datastore as datastore_module
+from src.primary import migrate_configs
+from src.primary.datastore import Datastore
+
+LATEST_VERSION = migrate_configs.SCHEMA_MIGRATIONS[-1][0]
+
+
+class DatastoreMigrationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = pathlib.Path(self.directory.name)
+        # Point the legacy state locations at this test's directory
+        stateful_dir = self.config_path / "stateful"
+        patcher = mock.patch.multiple(
+            migrate_configs,
+            CONFIG_PATH=self.config_path,
+            STATEFUL_DIR=stateful_dir,
+            TALLY_DIR=self.config_path / "tally",
+            SWAPARR_DIR=self.config_path / "swaparr",
+            SCHEDULER_DIR=self.config_path / "scheduler",
+            LEGACY_STATEFUL_DATABASE=stateful_dir / "stateful.db")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.datastore = Datastore(self.config_path / "huntarr.db")
+
+    def tearDown(self):
+        self.datastore.close()
+        self.directory.cleanup()
+
+    def _write_json(self, relative_path: str, data) -> None:
+        path = self.config_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data))
+
+    def _tables(self):
+        rows = self.datastore.connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return {row[0] for row in rows}
+
+    def _user_version(self) -> int:
+        return self.datastore.connection().execute("PRAGMA user_version").fetchone()[0]
+
+    def test_fresh_database_is_migrated_to_latest_version(self):
+        self.assertEqual(self.datastore.migrate(), LATEST_VERSION)
+        self.assertEqual(self._user_version(), LATEST_VERSION)
+
+        tables = self._tables()
+        for table in ("processed_ids", "stateful_lock", "app_stats", "hourly_cap_hits", "app_state",
+                      "schedules", "meta", "swaparr_strike_records", "swaparr_removed_items"):
+            with self.subTest(table=table):
+                self.assertIn(table, tables)
+        # Replaced by the per-instance Swaparr tables of version 3
+        self.assertNotIn("swaparr_strikes", tables)
+        self.assertNotIn("swaparr_removed", tables)
+
+    def test_migrations_run_once(self):
+        self.datastore.migrate()
+        with self.datastore.transaction() as connection:
+            connection.execute("INSERT INTO app_stats (app_type, stat_type, value) VALUES ('sonarr', 'hunted', 5)")
+
+        reopened = Datastore(self.datastore.db_path)
+        self.addCleanup(reopened.close)
+        applied = []
+        migrations = [(version, description, lambda connection, version=version: applied.append(version))
+                      for version, description, _ in migrate_configs.SCHEMA_MIGRATIONS]
+        with mock.patch.object(datastore_module, "SCHEMA_MIGRATIONS", migrations):
+            self.assertEqual(self.datastore.migrate(), LATEST_VERSION)
+            self.assertEqual(reopened.migrate(), LATEST_VERSION)
+        self.assertEqual(applied, [])
+        row = self.datastore.connection().execute("SELECT value FROM app_stats").fetchone()
+        self.assertEqual(row[0], 5)
+
+    def test_only_newer_migrations_are_applied(self):
+        applied = []
+        migrations = [
+            (1, "first", lambda connection: applied.append(1)),
+            (2, "second", lambda connection: applied.append(2))
+        ]
+        with mock.patch.object(datastore_module, "SCHEMA_MIGRATIONS", migrations[:1]):
+            self.assertEqual(self.datastore.migrate(), 1)
+        with mock.patch.object(datastore_module, "SCHEMA_MIGRATIONS", migrations):
+            self.assertEqual(self.datastore.migrate(), 2)
+        self.assertEqual(applied, [1, 2])
+        self.assertEqual(self._user_version(), 2)
+
+    def test_failed_migration_is_rolled_back(self):
+        def broken(connection):
+            connection.execute("CREATE TABLE half_done (id INTEGER)")
+            raise sqlite3.OperationalError("boom")
+
+        migrations = [(1, "create runtime state tables", migrate_configs._create_runtime_tables),
+                      (2, "broken", broken)]
+        with mock.patch.object(datastore_module, "SCHEMA_MIGRATIONS", migrations):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.datastore.migrate()
+        self.assertEqual(self._user_version(), 1)
+        self.assertIn("processed_ids", self._tables())
+        self.assertNotIn("half_done", self._tables())
+
+    def test_legacy_state_files_are_imported(self):
+        self._write_json("stateful/lock.json", {"created_at": 1000, "expires_at": 2000})
+        # The malformed counter is skipped, the rest of the file is still imported
+        self._write_json("tally/media_stats.json", {"sonarr": {"hunted": 3, "upgraded": "many"},
+                                                    "radarr": {"hunted": 4}})
+        self._write_json("tally/hourly_cap.json", {"sonarr": {"minutes": [[100, 2], [101, 1], ["bad"]]}})
+        self._write_json("swaparr/sonarr/removed_items.json", {
+            "abc123": {"name": "Some.Show.S01E01", "size": 1024, "reason": "Max strikes reached",
+                       "removed_time": "2024-01-02T03:04:05"},
+            "nodate": {"name": "No.Time"}
+        })
+        self._write_json("swaparr/sonarr/strikes.json", {"17": {"strikes": 2, "removed": False}})
+        self._write_json("state/sonarr/last_reset.json", {"time": "2024-01-01"})
+        (self.config_path / "state" / "radarr").mkdir(parents=True)
+        (self.config_path / "state" / "radarr" / "last_reset.json").write_text("2024-01-01T00:00:00\n")
+        self._write_json("scheduler/schedule.json", {"sonarr": [{"action": "pause"}]})
+
+        legacy = sqlite3.connect(str(self.config_path / "stateful" / "stateful.db"))
+        legacy.execute("CREATE TABLE processed_ids (app_type TEXT, instance_name TEXT, media_id TEXT, "
+                       "processed_at INTEGER, operation_type TEXT)")
+        legacy.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        legacy.execute("INSERT INTO processed_ids VALUES ('sonarr', 'Main', '42', 1234, 'missing')")
+        legacy.execute("INSERT INTO meta VALUES ('json_imported', '1234')")
+        legacy.commit()
+        legacy.close()
+
+        self.assertEqual(self.datastore.migrate(), LATEST_VERSION)
+        connection = self.datastore.connection()
+
+        self.assertEqual(connection.execute("SELECT created_at, expires_at FROM stateful_lock").fetchall(), [(1000, 2000)])
+        self.assertEqual(sorted(connection.execute("SELECT app_type, stat_type, value FROM app_stats").fetchall()),
+                         [("radarr", "hunted", 4), ("sonarr", "hunted", 3)])
+        self.assertEqual(sorted(connection.execute("SELECT app_type, minute, hits FROM hourly_cap_hits").fetchall()),
+                         [("sonarr", 100, 2), ("sonarr", 101, 1)])
+        self.assertEqual(connection.execute(
+            "SELECT app_type, instance_name, media_id, processed_at FROM processed_ids").fetchall(),
+            [("sonarr", "Main", "42", 1234)])
+        self.assertEqual(connection.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()[0], "1234")
+
+        removed = connection.execute(
+            "SELECT app_type, instance_name, item_hash, name, size, removed_time, reason FROM swaparr_removed_items").fetchall()
+        expected_time = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc).timestamp()
+        self.assertEqual(removed, [("sonarr", "", "abc123", "Some.Show.S01E01", 1024, expected_time, "Max strikes reached")])
+        # Strikes were keyed by queue ID and are not carried over
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM swaparr_strike_records").fetchone()[0], 0)
+
+        state = dict(((app_type, name), json.loads(value)) for app_type, name, value in
+                     connection.execute("SELECT app_type, name, value FROM app_state").fetchall())
+        self.assertEqual(state, {("sonarr", "last_reset"): {"time": "2024-01-01"},
+                                 ("radarr", "last_reset"): "2024-01-01T00:00:00"})
+        schedules = connection.execute("SELECT app_type, entries FROM schedules").fetchall()
+        self.assertEqual([(app_type, json.loads(entries)) for app_type, entries in schedules],
+                         [("sonarr", [{"action": "pause"}])])
+
+
+if __name__ == "__main__":
+    unittest.main()
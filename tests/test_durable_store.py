@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for atomic and coalesced file writes (src/primary/utils/durable_store.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary.utils.durable_store import DurableStore, FSYNC_ALWAYS, FSYNC_ON_SHUTDOWN
+
+
+class DurableStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = DurableStore()
+        # Long enough that the background writer never flushes during a test
+        self.store.configure(coalesce_seconds=60)
+        self.path = os.path.join(self.directory.name, "state.json")
+
+    def _read(self, path=None):
+        with open(path or self.path) as f:
+            return json.load(f)
+
+    def test_write_replaces_file_atomically(self):
+        self.assertTrue(self.store.write_json(self.path, {"version": 1}))
+        self.assertTrue(self.store.write_json(self.path, {"version": 2}))
+        self.assertEqual(self._read(), {"version": 2})
+        self.assertEqual(os.listdir(self.directory.name), ["state.json"])
+
+    def test_failed_replace_keeps_old_contents(self):
+        self.store.write_json(self.path, {"version": 1})
+        with mock.patch("src.primary.utils.durable_store.os.replace", side_effect=OSError("disk full")):
+            self.assertFalse(self.store.write_json(self.path, {"version": 2}))
+        self.assertEqual(self._read(), {"version": 1})
+        # The temp file is cleaned up
+        self.assertEqual(os.listdir(self.directory.name), ["state.json"])
+        self.assertEqual(self.store.get_io_counters()["errors"], 1)
+
+    def test_unserializable_data_is_rejected(self):
+        self.assertFalse(self.store.write_json(self.path, {"value": object()}))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_coalesced_writes_only_write_latest(self):
+        for version in range(1, 4):
+            self.assertTrue(self.store.write_json(self.path, {"version": version}, coalesce=True))
+        self.assertFalse(os.path.exists(self.path))
+        # Readers see the queued contents before they reach the disk
+        self.assertEqual(self.store.read_json(self.path), {"version": 3})
+
+        counters = self.store.get_io_counters()
+        self.assertEqual(counters["pending_writes"], 1)
+        self.assertEqual(counters["writes_coalesced"], 2)
+
+        self.store.flush()
+        self.assertEqual(self._read(), {"version": 3})
+        counters = self.store.get_io_counters()
+        self.assertEqual(counters["pending_writes"], 0)
+        self.assertEqual(counters["files_written"], 1)
+
+    def test_direct_write_supersedes_queued_write(self):
+        self.store.write_json(self.path, {"version": 1}, coalesce=True)
+        self.store.write_json(self.path, {"version": 2})
+        self.store.flush()
+        self.assertEqual(self._read(), {"version": 2})
+        self.assertEqual(self.store.get_io_counters()["files_written"], 1)
+
+    def test_coalesced_write_lands_after_window(self):
+        self.store.configure(coalesce_seconds=0.05)
+        self.store.write_json(self.path, {"version": 1}, coalesce=True)
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.path) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self._read(), {"version": 1})
+
+    def test_discard_drops_queued_writes_under_directory(self):
+        subdirectory = os.path.join(self.directory.name, "swaparr")
+        os.mkdir(subdirectory)
+        inside = os.path.join(subdirectory, "strikes.json")
+        self.store.write_json(inside, {}, coalesce=True)
+        self.store.write_json(self.path, {}, coalesce=True)
+
+        self.assertEqual(self.store.discard(subdirectory), 1)
+        self.store.flush()
+        self.assertFalse(os.path.exists(inside))
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_fsync_policies(self):
+        with mock.patch("src.primary.utils.durable_store.os.fsync") as fsync:
+            self.store.configure(fsync_policy=FSYNC_ALWAYS)
+            self.store.write_bytes(self.path, b"{}")
+            self.assertTrue(fsync.called)
+            self.assertEqual(self.store.get_io_counters()["unsynced_files"], 0)
+
+            fsync.reset_mock()
+            self.store.configure(fsync_policy=FSYNC_ON_SHUTDOWN)
+            self.store.write_bytes(self.path, b"[]")
+            fsync.assert_not_called()
+            self.assertEqual(self.store.get_io_counters()["unsynced_files"], 1)
+
+            self.store.shutdown()
+            self.assertTrue(fsync.called)
+            self.assertEqual(self.store.get_io_counters()["unsynced_files"], 0)
+
+        self.store.configure(fsync_policy="sometimes")
+        self.assertEqual(self.store.fsync_policy, FSYNC_ON_SHUTDOWN)
+
+
+if __name__ == "__main__":
+    unittest.main()
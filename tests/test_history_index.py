@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for history paging and search (src/primary/history_index.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import os
+import tempfile
+import unittest
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary.history_index import HistoryIndex, decode_cursor
+
+START = 1_700_000_000
+
+
+def make_entry(number: int, app_type: str = "sonarr", date_time: int = None, info: str = None):
+    return {
+        "date_time": START + number if date_time is None else date_time,
+        "processed_info": info or f"Show {number} - S01E{number:02d}",
+        "id": str(number),
+        "instance_name": "Default",
+        "operation_type": "missing",
+        "app_type": app_type
+    }
+
+
+def walk_pages(index: HistoryIndex, app_type: str, page_size: int, search_query=None, between_pages=None):
+    """Follow next_cursor from the first page to the last, returning the IDs in page order."""
+    ids = []
+    cursor = None
+    while True:
+        result = index.query(app_type, search_query, page_size=page_size, cursor=cursor)
+        ids.extend(entry["id"] for entry in result["entries"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return ids
+        if between_pages:
+            between_pages()
+
+
+class HistoryIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = HistoryIndex()
+        self.index.load(make_entry(number) for number in range(1, 26))
+
+    def test_pages_are_newest_first(self):
+        result = self.index.query("all", page=1, page_size=10)
+        self.assertEqual([entry["id"] for entry in result["entries"]], [str(n) for n in range(25, 15, -1)])
+        self.assertEqual(result["total_entries"], 25)
+        self.assertEqual(result["total_pages"], 3)
+
+        last_page = self.index.query("all", page=3, page_size=10)
+        self.assertEqual([entry["id"] for entry in last_page["entries"]], [str(n) for n in range(5, 0, -1)])
+        self.assertIsNone(last_page["next_cursor"])
+
+    def test_cursor_walk_covers_every_entry_once(self):
+        for page_size in (1, 7, 10, 25, 100):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(walk_pages(self.index, "all", page_size), [str(n) for n in range(25, 0, -1)])
+
+    def test_cursor_is_stable_while_entries_are_appended(self):
+        appended = iter(range(100, 200))
+
+        def append_entry():
+            number = next(appended)
+            self.index.add_entries([make_entry(number, date_time=START + 1000 + number)])
+
+        # Offset pages would shift by one entry per append and repeat entries
+        self.assertEqual(walk_pages(self.index, "all", 4, between_pages=append_entry),
+                         [str(n) for n in range(25, 0, -1)])
+
+    def test_entries_in_the_same_second_keep_their_order(self):
+        index = HistoryIndex()
+        index.load(make_entry(number, date_time=START) for number in range(1, 8))
+        self.assertEqual(walk_pages(index, "all", 3), [str(n) for n in range(7, 0, -1)])
+
+    def test_cursor_walk_per_app_and_search(self):
+        self.index.add_entries([make_entry(number, app_type="radarr", info=f"Movie {number}")
+                                for number in range(30, 40)])
+        self.assertEqual(walk_pages(self.index, "radarr", 3), [str(n) for n in range(39, 29, -1)])
+        self.assertEqual(walk_pages(self.index, "sonarr", 6), [str(n) for n in range(25, 0, -1)])
+        self.assertEqual(walk_pages(self.index, "all", 2, search_query="show 1"),
+                         [str(n) for n in range(19, 9, -1)] + ["1"])
+
+    def test_invalid_cursor_falls_back_to_page(self):
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+        result = self.index.query("all", page=2, page_size=10, cursor="not-a-cursor")
+        self.assertEqual(result["entries"][0]["id"], "15")
+
+    def test_index_keeps_only_the_newest_rows(self):
+        index = HistoryIndex(max_rows=10)
+        # Loaded out of order, the newest ten are kept
+        index.load(make_entry(number) for number in reversed(range(1, 31)))
+        self.assertEqual(walk_pages(index, "all", 4), [str(n) for n in range(30, 20, -1)])
+
+        index.add_entries([make_entry(number) for number in range(31, 36)])
+        self.assertEqual(index.query("all", page_size=100)["total_entries"], 10)
+        self.assertEqual(walk_pages(index, "all", 100)[0], "35")
+        self.assertEqual(index.query("all", search_query="show 21", page_size=100)["total_entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
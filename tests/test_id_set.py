@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact media ID set (src/primary/utils/id_set.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import os
+import pathlib
+import random
+import tempfile
+import unittest
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary.utils import id_set
+from src.primary.utils.id_set import CompactIdSet
+
+
+class CompactIdSetTests(unittest.TestCase):
+
+    def test_integer_and_string_ids(self):
+        ids = CompactIdSet(["12", 7, "12_3", "007", "²", str(2 ** 32)])
+        self.assertEqual(len(ids), 6)
+        for media_id in ("12", 12, "7", 7, "12_3", "007", "²", str(2 ** 32)):
+            with self.subTest(media_id=media_id):
+                self.assertIn(media_id, ids)
+        for media_id in ("13", 13, "0012", "12_4", None, 1.5):
+            with self.subTest(media_id=media_id):
+                self.assertNotIn(media_id, ids)
+        self.assertEqual(sorted(ids), sorted(["12", "7", "12_3", "007", "²", str(2 ** 32)]))
+
+    def test_add_reports_new_ids(self):
+        ids = CompactIdSet([5])
+        self.assertFalse(ids.add("5"))
+        self.assertTrue(ids.add("6"))
+        self.assertFalse(ids.add(6))
+        self.assertTrue(ids.add("x"))
+        self.assertFalse(ids.add("x"))
+        self.assertEqual(ids.difference(["5", "6", "7", "x", "y"]), {"7", "y"})
+
+    def test_merge_keeps_array_sorted_and_unique(self):
+        rng = random.Random(42)
+        expected = set()
+        ids = CompactIdSet()
+        original_tail_size = id_set.MAX_TAIL_SIZE
+        # A small tail forces many merges into a growing array
+        id_set.MAX_TAIL_SIZE = 16
+        try:
+            for _ in range(2000):
+                value = rng.randrange(5000)
+                self.assertEqual(ids.add(value), value not in expected)
+                expected.add(value)
+        finally:
+            id_set.MAX_TAIL_SIZE = original_tail_size
+        ids.merge()
+        self.assertEqual(list(ids._sorted), sorted(expected))
+        self.assertEqual(len(ids), len(expected))
+
+    def test_sidecar_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / "ids.bin"
+            ids = CompactIdSet(["3", "1", "2", "42_1", "abc"])
+            self.assertTrue(ids.save(path, source_mtime_ns=123))
+
+            loaded = CompactIdSet.load(path, source_mtime_ns=123)
+            self.assertIsNotNone(loaded)
+            try:
+                self.assertEqual(sorted(loaded), sorted(ids))
+                self.assertIn("2", loaded)
+                self.assertIn("42_1", loaded)
+                # Adding to a memory-mapped set copies it out of the map
+                self.assertTrue(loaded.add("4"))
+                loaded.merge()
+                self.assertEqual(list(loaded._sorted), [1, 2, 3, 4])
+            finally:
+                loaded.close()
+
+    def test_sidecar_rejected_when_stale_or_invalid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / "ids.bin"
+            self.assertIsNone(CompactIdSet.load(path))
+            CompactIdSet(["1"]).save(path, source_mtime_ns=123)
+            self.assertIsNone(CompactIdSet.load(path, source_mtime_ns=456))
+            path.write_bytes(b"garbage-garbage-garbage")
+            self.assertIsNone(CompactIdSet.load(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental JSON array decoder (src/primary/utils/json_stream.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import json
+import unittest
+
+from src.primary.utils.json_stream import iter_json_array, filter_json_array
+
+DOCUMENT = '[2.5, -3e5, 1.5e3, 42, true, false, null, "a \\"quoted\\" \\\\ string", {"k": [1, {"n": "]}"}]}, [], {}]'
+
+
+def split_at(text, *cuts):
+    """Split text into chunks at the given offsets."""
+    bounds = [0, *cuts, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class IterJsonArrayTests(unittest.TestCase):
+
+    def test_single_chunk(self):
+        self.assertEqual(list(iter_json_array([DOCUMENT])), json.loads(DOCUMENT))
+
+    def test_every_two_chunk_split(self):
+        expected = json.loads(DOCUMENT)
+        for cut in range(1, len(DOCUMENT)):
+            with self.subTest(cut=cut, chunks=split_at(DOCUMENT, cut)):
+                self.assertEqual(list(iter_json_array(split_at(DOCUMENT, cut))), expected)
+
+    def test_one_character_chunks(self):
+        self.assertEqual(list(iter_json_array(list(DOCUMENT))), json.loads(DOCUMENT))
+
+    def test_scalars_split_across_chunks(self):
+        cases = [
+            (["[2.", "5]"], [2.5]),
+            (["[-", "3e5]"], [-300000.0]),
+            (["[-3e", "5]"], [-300000.0]),
+            (["[1.5", "e3]"], [1500.0]),
+            (["[1.5e", "3, 7]"], [1500.0, 7]),
+            (["[12", "34", "5]"], [12345]),
+            (["[tr", "ue, nu", "ll]"], [True, None]),
+            (["[1", "", "0 ]"], [10]),
+        ]
+        for chunks, expected in cases:
+            with self.subTest(chunks=chunks):
+                self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    def test_element_spanning_many_chunks(self):
+        element = {"title": "x" * 5000, "tags": list(range(500))}
+        text = json.dumps([element, 1.25])
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)]
+        self.assertEqual(list(iter_json_array(chunks)), [element, 1.25])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(["[", " ", "]"])), [])
+
+    def test_malformed_documents(self):
+        for chunks in (["{}"], ["[1, 2"], ["[2.", "5x]"], ["[1.5e", "]"], ['["abc'], ["[{", '"a": 1']):
+            with self.subTest(chunks=chunks):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(chunks))
+
+    def test_filter_json_array(self):
+        chunks = split_at('[{"id": 1, "m": true}, {"id": 2, "m": false}, {"id": 3, "m": true}]', 9, 30)
+        self.assertEqual(filter_json_array(chunks, lambda item: item["m"], lambda item: item["id"]), [1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
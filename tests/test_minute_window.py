@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the sliding hourly cap window (MinuteWindow in src/primary/stats_manager.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary.stats_manager import MinuteWindow, CAP_WINDOW_MINUTES
+
+# A minute boundary, so offsets below land in predictable minutes
+START = 1_700_000_040.0
+MINUTE = 60
+WINDOW = CAP_WINDOW_MINUTES * MINUTE
+
+
+class MinuteWindowTests(unittest.TestCase):
+
+    def test_hits_are_counted_within_the_window(self):
+        window = MinuteWindow()
+        window.add(1, START)
+        window.add(2, START + 30)
+        window.add(3, START + 10 * MINUTE)
+        self.assertEqual(window.count(START + 10 * MINUTE), 6)
+        self.assertEqual(window.count(START + WINDOW - 1), 6)
+
+    def test_old_minutes_slide_out(self):
+        window = MinuteWindow()
+        window.add(1, START)
+        window.add(3, START + 10 * MINUTE)
+        # The first minute leaves the window a full window after it started
+        self.assertEqual(window.count(START + WINDOW), 3)
+        self.assertEqual(window.count(START + WINDOW + 10 * MINUTE - 1), 3)
+        self.assertEqual(window.count(START + WINDOW + 10 * MINUTE), 0)
+
+    def test_long_gap_clears_every_slot(self):
+        window = MinuteWindow()
+        for offset in range(CAP_WINDOW_MINUTES):
+            window.add(1, START + offset * MINUTE)
+        self.assertEqual(window.count(START + (CAP_WINDOW_MINUTES - 1) * MINUTE), CAP_WINDOW_MINUTES)
+
+        later = START + 10 * WINDOW
+        self.assertEqual(window.count(later), 0)
+        window.add(2, later)
+        self.assertEqual(window.count(later), 2)
+
+    def test_slots_are_reused_after_wrapping(self):
+        window = MinuteWindow()
+        window.add(5, START)
+        window.add(7, START + WINDOW)
+        self.assertEqual(window.count(START + WINDOW), 7)
+
+    def test_late_hits_outside_the_window_are_dropped(self):
+        window = MinuteWindow()
+        window.add(1, START + WINDOW)
+        window.add(4, START)
+        self.assertEqual(window.count(START + WINDOW), 1)
+        # Late, but still inside the window
+        window.add(2, START + WINDOW - 5 * MINUTE)
+        self.assertEqual(window.count(START + WINDOW), 3)
+
+    def test_round_trip(self):
+        now = time.time()
+        window = MinuteWindow()
+        window.add(2, now - 5 * MINUTE)
+        window.add(1, now)
+        data = window.to_dict()
+        self.assertEqual(data["api_hits"], 3)
+        self.assertEqual([count for _, count in data["minutes"]], [2, 1])
+        self.assertEqual(MinuteWindow.from_dict(data).count(), 3)
+
+    def test_restored_minutes_outside_the_window_are_dropped(self):
+        stale_minute = int(time.time() - 2 * WINDOW) // 60
+        restored = MinuteWindow.from_dict({"minutes": [[stale_minute, 4]]})
+        self.assertEqual(restored.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
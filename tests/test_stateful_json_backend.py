@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the journal and compaction of the JSON stateful backend (src/primary/stateful_backends.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary import stateful_backends
+from src.primary.stateful_backends import JsonStatefulBackend, SIDECAR_SUFFIX
+
+
+class JsonStatefulBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = self._make_backend()
+
+    def tearDown(self):
+        self.backend.clear()
+
+    @staticmethod
+    def _make_backend():
+        backend = JsonStatefulBackend()
+        # Compaction is driven by the tests, not the timer thread
+        backend._ensure_compactor = lambda: None
+        return backend
+
+    def test_added_ids_are_journaled(self):
+        self.assertTrue(self.backend.add_many("sonarr", "Main", ["1", "2", "abc"]))
+        self.assertTrue(self.backend.add_many("sonarr", "Main", ["2", "3"]))
+
+        file_path, journal_path = JsonStatefulBackend.get_state_paths("sonarr", "Main")
+        self.assertFalse(file_path.exists())
+        self.assertEqual(JsonStatefulBackend.read_journal(journal_path), ["1", "2", "abc", "3"])
+
+        # A new process replays the journal
+        reloaded = self._make_backend()
+        self.assertEqual(reloaded.get_ids("sonarr", "Main"), {"1", "2", "3", "abc"})
+        self.assertTrue(reloaded.contains("sonarr", "Main", "abc"))
+        self.assertEqual(reloaded.filter_unprocessed("sonarr", "Main", ["3", "4"]), {"4"})
+
+    def test_flush_compacts_journal_into_snapshot(self):
+        self.backend.add_many("radarr", "Movies 4K", ["10", "9", "x_1"])
+        file_path, journal_path = JsonStatefulBackend.get_state_paths("radarr", "Movies 4K")
+
+        self.assertTrue(self.backend.flush())
+        self.assertFalse(journal_path.exists())
+        with open(file_path) as f:
+            data = json.load(f)
+        self.assertEqual(sorted(data["processed_ids"]), ["10", "9", "x_1"])
+        self.assertIsInstance(data["last_updated"], int)
+        self.assertTrue(file_path.with_suffix(SIDECAR_SUFFIX).exists())
+
+        # IDs added after compaction land in a new journal on top of the snapshot
+        self.backend.add_many("radarr", "Movies 4K", ["11"])
+        self.assertEqual(JsonStatefulBackend.read_journal(journal_path), ["11"])
+
+        reloaded = self._make_backend()
+        self.assertEqual(reloaded.get_ids("radarr", "Movies 4K"), {"9", "10", "11", "x_1"})
+
+    def test_large_journal_compacts_early(self):
+        original_limit = stateful_backends.MAX_JOURNAL_ENTRIES
+        stateful_backends.MAX_JOURNAL_ENTRIES = 5
+        try:
+            self.backend.add_many("lidarr", "Music", ["1", "2"])
+            file_path, journal_path = JsonStatefulBackend.get_state_paths("lidarr", "Music")
+            self.assertTrue(journal_path.exists())
+            self.backend.add_many("lidarr", "Music", ["3", "4", "5"])
+        finally:
+            stateful_backends.MAX_JOURNAL_ENTRIES = original_limit
+
+        self.assertFalse(journal_path.exists())
+        processed_ids, journal_entries, _ = JsonStatefulBackend.read_instance_files(file_path, journal_path)
+        self.assertEqual(processed_ids, {"1", "2", "3", "4", "5"})
+        self.assertEqual(journal_entries, 0)
+
+    def test_clear_removes_state_files(self):
+        self.backend.add_many("sonarr", "Main", ["1"])
+        self.backend.flush()
+        self.backend.add_many("sonarr", "Main", ["2"])
+        file_path, journal_path = JsonStatefulBackend.get_state_paths("sonarr", "Main")
+
+        self.backend.clear()
+        for path in (file_path, journal_path, file_path.with_suffix(SIDECAR_SUFFIX)):
+            with self.subTest(path=path.name):
+                self.assertFalse(path.exists())
+        self.assertEqual(self.backend.get_ids("sonarr", "Main"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
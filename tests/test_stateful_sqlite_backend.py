@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for per-item expiry in the SQLite stateful backend (src/primary/stateful_backends.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+from src.primary.datastore import Datastore
+from src.primary.stateful_backends import SqliteStatefulBackend
+
+HOUR = 3600
+
+
+class SqliteStatefulBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.datastore = Datastore(pathlib.Path(self.directory.name) / "huntarr.db")
+        self.datastore.migrate()
+        self.backend = SqliteStatefulBackend(self.datastore)
+        # Expiry is driven by the tests, not by add_many's hourly prune
+        self.backend._last_prune = time.time()
+
+    def tearDown(self):
+        self.datastore.close()
+        self.directory.cleanup()
+
+    def _age(self, media_id: str, seconds: int) -> None:
+        """Backdate the processed time of an ID."""
+        with self.datastore.transaction() as connection:
+            connection.execute("UPDATE processed_ids SET processed_at = processed_at - ? WHERE media_id = ?",
+                               (seconds, media_id))
+
+    def test_ids_expire_individually(self):
+        self.assertTrue(self.backend.add_many("sonarr", "Main", ["1", "2", "3"]))
+        self._age("1", 10 * HOUR)
+        self._age("2", 2 * HOUR)
+
+        max_age = 5 * HOUR
+        self.assertEqual(self.backend.get_ids("sonarr", "Main", max_age), {"2", "3"})
+        self.assertFalse(self.backend.contains("sonarr", "Main", "1", max_age))
+        self.assertTrue(self.backend.contains("sonarr", "Main", "2", max_age))
+        self.assertEqual(self.backend.filter_unprocessed("sonarr", "Main", ["1", "2", "4"], max_age), {"1", "4"})
+        # Without a max age every stored ID still counts as processed
+        self.assertEqual(self.backend.get_ids("sonarr", "Main"), {"1", "2", "3"})
+
+        self.assertEqual(self.backend.expire(max_age), 1)
+        self.assertEqual(self.backend.get_ids("sonarr", "Main"), {"2", "3"})
+        self.assertEqual(self.backend.expire(max_age), 0)
+
+    def test_reprocessing_restarts_expiry(self):
+        self.backend.add_many("radarr", "Movies", ["7"])
+        self._age("7", 10 * HOUR)
+        self.assertFalse(self.backend.contains("radarr", "Movies", "7", 5 * HOUR))
+
+        self.backend.add_many("radarr", "Movies", ["7"])
+        self.assertTrue(self.backend.contains("radarr", "Movies", "7", 5 * HOUR))
+        self.assertEqual(self.backend.expire(5 * HOUR), 0)
+
+    def test_instances_are_separate(self):
+        self.backend.add_many("sonarr", "Main", ["1"])
+        self.backend.add_many("sonarr", "Anime", ["2"])
+        self.backend.add_many("radarr", "Main", ["3"])
+        self.assertEqual(self.backend.get_ids("sonarr", "Main"), {"1"})
+        self.assertEqual(self.backend.get_ids("sonarr", "Anime"), {"2"})
+        self.assertEqual(self.backend.get_ids("radarr", "Main"), {"3"})
+
+        self.backend.clear()
+        self.assertEqual(self.backend.get_ids("sonarr", "Main"), set())
+
+    def test_lookups_larger_than_one_chunk(self):
+        media_ids = [str(i) for i in range(1200)]
+        self.backend.add_many("lidarr", "Music", media_ids[::2])
+        self.assertEqual(self.backend.filter_unprocessed("lidarr", "Music", media_ids, HOUR), set(media_ids[1::2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
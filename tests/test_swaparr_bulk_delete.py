@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for removing stalled downloads in bulk (delete_downloads in src/primary/apps/swaparr/handler.py)
+Run from the repository root with: python -m pytest tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Keep every file the modules under test write out of the real config directory
+os.environ.setdefault("HUNTARR_CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-tests-"))
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+if requests is not None:
+    from src.primary.apps.swaparr import handler
+
+API_URL = "http://sonarr:8989/"
+
+
+def make_response(error=None):
+    response = mock.Mock()
+    if error is not None:
+        response.raise_for_status.side_effect = error
+    return response
+
+
+@unittest.skipUnless(requests, "requests is not installed")
+class DeleteDownloadsTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(handler.queue_cache, "get_queue_api_version", return_value="v3")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(handler.http_client, "delete")
+        self.delete = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bulk_request_removes_all_downloads(self):
+        self.delete.return_value = make_response()
+
+        removed = handler.delete_downloads("sonarr", API_URL, "key", [1, 2, 3])
+
+        self.assertEqual(removed, {1, 2, 3})
+        self.delete.assert_called_once()
+        args, kwargs = self.delete.call_args
+        self.assertEqual(args[0], "http://sonarr:8989/api/v3/queue/bulk?removeFromClient=true&blocklist=true")
+        self.assertEqual(kwargs["json"], {"ids": [1, 2, 3]})
+        self.assertEqual(kwargs["headers"], {"X-Api-Key": "key"})
+
+    def test_failed_bulk_request_falls_back_to_single_deletes(self):
+        def delete(url, **kwargs):
+            if "/queue/bulk" in url:
+                return make_response(requests.exceptions.HTTPError("405 Method Not Allowed"))
+            if "/queue/2?" in url:
+                return make_response(requests.exceptions.HTTPError("404 Not Found"))
+            return make_response()
+        self.delete.side_effect = delete
+
+        removed = handler.delete_downloads("sonarr", API_URL, "key", [1, 2, 3], remove_from_client=False)
+
+        # Downloads that could not be removed one at a time are left out
+        self.assertEqual(removed, {1, 3})
+        urls = [call.args[0] for call in self.delete.call_args_list]
+        self.assertEqual(urls, [
+            "http://sonarr:8989/api/v3/queue/bulk?removeFromClient=false&blocklist=true",
+            "http://sonarr:8989/api/v3/queue/1?removeFromClient=false&blocklist=true",
+            "http://sonarr:8989/api/v3/queue/2?removeFromClient=false&blocklist=true",
+            "http://sonarr:8989/api/v3/queue/3?removeFromClient=false&blocklist=true"
+        ])
+
+    def test_bulk_connection_error_falls_back(self):
+        self.delete.side_effect = [requests.exceptions.ConnectionError("refused"), make_response(), make_response()]
+        self.assertEqual(handler.delete_downloads("sonarr", API_URL, "key", [4, 5]), {4, 5})
+        self.assertEqual(self.delete.call_count, 3)
+
+    def test_single_download_skips_bulk_endpoint(self):
+        self.delete.return_value = make_response()
+        self.assertEqual(handler.delete_downloads("sonarr", API_URL, "key", [7]), {7})
+        self.assertEqual(self.delete.call_args.args[0],
+                         "http://sonarr:8989/api/v3/queue/7?removeFromClient=true&blocklist=true")
+        self.assertEqual(handler.delete_downloads("sonarr", API_URL, "key", []), set())
+        self.assertEqual(self.delete.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()